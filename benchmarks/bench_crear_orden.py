@@ -0,0 +1,116 @@
+"""
+Benchmark de creación de órdenes: sentencias y tiempo antes/después de la expansión
+de perfiles con CTE recursiva + inserciones en bloque.
+
+"sentencias" son las llamadas a execute/executemany registradas en db.stats (sin el
+commit). Con fast_executemany (SQL Server) cada executemany es un solo envío, así que
+en ese motor coincide con los round-trips de la creación.
+
+Uso (desde la raíz del proyecto, contra una base de pruebas):
+    python -m benchmarks.bench_crear_orden --paciente 1 --perfiles 3 7 --repeticiones 5
+
+Las órdenes creadas se eliminan al terminar.
+"""
+import argparse
+import statistics
+import time
+
+from database import db
+
+
+def _get_analitos_legacy(cursor, perfil_id):
+    # Implementación previa: dos consultas por nodo del árbol de perfiles
+    results = []
+    cursor.execute("""
+        SELECT analitoId FROM DetallePerfilAnalito WHERE perfilExamenId = ? ORDER BY orden ASC
+    """, (perfil_id,))
+    for row in cursor.fetchall():
+        results.append((row[0], perfil_id))
+    cursor.execute("""
+        SELECT perfilHijoId FROM DetallePerfilComposicion WHERE perfilPadreId = ? ORDER BY orden ASC
+    """, (perfil_id,))
+    for hijo in cursor.fetchall():
+        results.extend(_get_analitos_legacy(cursor, hijo[0]))
+    return results
+
+
+def crear_orden_legacy(paciente_id, medico_id, items, total_pagar=0.0):
+    """Copia del create_orden_trabajo anterior (una sentencia por fila), como línea base."""
+    with db.pool.connection() as conn, db.stats.metodo('crear_orden_legacy'):
+        cursor = conn.cursor()
+        default_profile_id = db.ensure_default_profile()
+        cursor.execute(db.dialecto.con_salida(f"""
+            INSERT INTO OrdenesTrabajo (pacienteId, medicoId, estado, totalPagar, fechaCreacion)
+            {{salida}}
+            VALUES (?, ?, 'Pendiente', ?, {db.dialecto.ahora})
+        """, "{t}id"), (paciente_id, medico_id, total_pagar))
+        orden_id = cursor.fetchone()[0]
+
+        for item in items:
+            if item['type'] == 'perfil':
+                cursor.execute("""
+                    INSERT INTO OrdenPerfiles (ordenTrabajoId, perfilExamenId, precioCobrado)
+                    VALUES (?, ?, ?)
+                """, (orden_id, item['id'], item.get('precio', 0)))
+                for aid, pid in _get_analitos_legacy(cursor, item['id']):
+                    cursor.execute("""
+                        INSERT INTO OrdenResultados (ordenTrabajoId, perfilExamenId, analitoId, estado)
+                        VALUES (?, ?, ?, 'Pendiente')
+                    """, (orden_id, pid, aid))
+            elif item['type'] == 'analito':
+                cursor.execute("""
+                    INSERT INTO OrdenResultados (ordenTrabajoId, perfilExamenId, analitoId, estado)
+                    VALUES (?, ?, ?, 'Pendiente')
+                """, (orden_id, default_profile_id, item['id']))
+        conn.commit()
+        return orden_id
+
+
+def _sentencias():
+    return sum(fila['llamadas'] for fila in db.stats.resumen())
+
+
+def medir(nombre, crear, args, repeticiones):
+    tiempos, sentencias, ordenes = [], [], []
+    for _ in range(repeticiones):
+        db.stats.reiniciar()
+        inicio = time.perf_counter()
+        ordenes.append(crear(*args))
+        tiempos.append(time.perf_counter() - inicio)
+        sentencias.append(_sentencias())
+    print(f"{nombre:<10} sentencias={statistics.median(sentencias):>6.0f}  "
+          f"mediana={statistics.median(tiempos) * 1000:8.1f} ms  "
+          f"max={max(tiempos) * 1000:8.1f} ms")
+    return ordenes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paciente', type=int, required=True)
+    parser.add_argument('--medico', type=int, default=None)
+    parser.add_argument('--perfiles', type=int, nargs='*', default=[])
+    parser.add_argument('--analitos', type=int, nargs='*', default=[])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    items = [{'type': 'perfil', 'id': pid, 'precio': 0} for pid in args.perfiles]
+    items += [{'type': 'analito', 'id': aid} for aid in args.analitos]
+    if not items:
+        parser.error("indique al menos un perfil o analito")
+
+    habilitado = db.stats.habilitado
+    db.stats.habilitado = True
+    creadas = []
+    try:
+        db.ensure_default_profile()  # fuera de la medición
+        crear_args = (args.paciente, args.medico, items, 0.0)
+        creadas += medir("anterior", crear_orden_legacy, crear_args, args.repeticiones)
+        creadas += medir("actual", db.create_orden_trabajo, crear_args, args.repeticiones)
+    finally:
+        for oid in creadas:
+            db.delete_orden(oid)
+        db.stats.habilitado = habilitado
+
+
+if __name__ == "__main__":
+    main()
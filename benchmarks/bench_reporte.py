@@ -0,0 +1,71 @@
+"""
+Benchmark del render de reportes PDF, aislado de la base de datos y del disco: dibuja
+órdenes sintéticas con renderizar_bytes y mide tiempo y tamaño.
+
+Uso (desde la raíz del proyecto, para que se encuentren los assets/):
+    python -m benchmarks.bench_reporte --grupos 8 --analitos 12 --repeticiones 5
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+from services.reporte_pdf import configurar_reportlab, renderizar_bytes
+
+
+def generar_reporte(orden_id, medico, grupos, analitos, seed=7):
+    rnd = random.Random(seed + orden_id)
+    header = (f"PACIENTE DE PRUEBA {orden_id}", rnd.randint(1, 90), "Años",
+              rnd.choice(["Masculino", "Femenino"]), medico, datetime(2024, 5, 1, 9, 30))
+    referencias = {}
+    config = []
+    for g in range(grupos):
+        items = []
+        for k in range(analitos):
+            aid = g * 100 + k
+            referencias[aid] = {'valores': None, 'referencia': f"{rnd.randint(1, 50)}.0 - {rnd.randint(60, 200)}.0"}
+            items.append({
+                'analitoId': aid, 'nombre': f"ANALITO {g}-{k}", 'valor': f"{rnd.uniform(1, 300):.1f}",
+                'unidad': "mg/dL", 'categoria': "QUIMICA", 'metodo': "Automatizado", 'subtitulo': None
+            })
+        config.append({'title': f"PERFIL {g}", 'type': 'Perfil', 'items': items, 'include': True, 'page_break': False})
+    return (orden_id, header, referencias, config)
+
+
+def medir(reportes, include_signature, repeticiones):
+    tiempos = []
+    datos = b""
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        datos = renderizar_bytes(reportes, include_signature)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), len(datos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grupos', type=int, default=8)
+    parser.add_argument('--analitos', type=int, default=12, help="analitos por grupo")
+    parser.add_argument('--ordenes', type=int, default=10, help="órdenes del escenario combinado")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+    configurar_reportlab()  # como al iniciar la app
+
+    escenarios = [
+        ("1 orden, membrete estándar", "DRA. ROJAS", 1, True),
+        ("1 orden, sin firma", "DRA. ROJAS", 1, False),
+        ("1 orden, membrete Céspedes", "DR. HUGO CESPEDES", 1, True),
+        (f"{args.ordenes} órdenes combinadas", "DRA. ROJAS", args.ordenes, True),
+    ]
+
+    print(f"{args.grupos} grupos x {args.analitos} analitos por orden, mediana de {args.repeticiones} repeticiones\n")
+    print(f"{'escenario':<32} {'ms':>9} {'ms/orden':>9} {'KB':>9}")
+    for nombre, medico, n, firma in escenarios:
+        reportes = [generar_reporte(i, medico, args.grupos, args.analitos) for i in range(1, n + 1)]
+        segundos, tamano = medir(reportes, firma, args.repeticiones)
+        print(f"{nombre:<32} {segundos * 1000:>9.1f} {segundos * 1000 / n:>9.1f} {tamano / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
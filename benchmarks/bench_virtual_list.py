@@ -0,0 +1,163 @@
+"""
+Benchmark del panel de órdenes: tamaño de los mensajes enviados al cliente Flet con la
+lista completa (controls.clear() + reconstrucción) frente a VirtualList.
+
+No necesita base de datos ni cliente: usa una conexión Flet en memoria que sólo mide
+los comandos serializados.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_virtual_list --ordenes 5000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import flet as ft
+from flet.core.connection import Connection
+from flet.core.protocol import CommandEncoder, PageCommandsBatchResponsePayload
+
+from views.virtual_list import VirtualList
+
+
+class _ConexionMedida(Connection):
+    """Conexión falsa: cuenta bytes/comandos y asigna ids a los controles agregados."""
+
+    def __init__(self):
+        super().__init__()
+        self._ids = itertools.count()
+        self.reset()
+
+    def reset(self):
+        self.bytes = 0
+        self.mensajes = 0
+
+    def send_commands(self, session_id, commands):
+        self.bytes += len(json.dumps(commands, cls=CommandEncoder))
+        self.mensajes += 1
+        results = []
+        for cmd in commands:
+            if cmd.name == "add":
+                results.append(" ".join(f"_{next(self._ids)}" for _ in cmd.commands))
+        return PageCommandsBatchResponsePayload(results=results, error=None)
+
+    def send_command(self, session_id, command):
+        return self.send_commands(session_id, [command])
+
+
+def generar_ordenes(n, seed=7):
+    rnd = random.Random(seed)
+    nombres = ["GARCIA", "LOPEZ", "TORRES", "QUISPE", "FLORES", "RAMOS", "CHAVEZ", "MENDOZA"]
+    inicio = datetime(2024, 1, 1)
+    ordenes = []
+    for oid in range(n, 0, -1):
+        nombre = f"{rnd.choice(nombres)} {rnd.choice(nombres)}, PACIENTE {oid}"
+        fecha = inicio + timedelta(minutes=oid * 37)
+        estado = rnd.choice(["Pendiente", "Completado"])
+        ordenes.append((oid, nombre, fecha, estado, rnd.choice([None, "DR. HUGO CESPEDES", "DRA. ROJAS"]), f"{rnd.randint(10000000, 99999999)}"))
+    return ordenes
+
+
+def _tile_completo(o):
+    # Igual que la versión anterior de ResultadosView.load_ordenes
+    fecha = o[2].strftime("%d/%m %H:%M") if o[2] else ""
+    return ft.ListTile(
+        leading=ft.Icon(ft.Icons.RECEIPT_LONG),
+        title=ft.Text(f"#{o[0]} - {o[1]}"),
+        subtitle=ft.Text(f"{fecha} | {o[3]}"),
+        on_click=lambda e, x=o[0]: None
+    )
+
+
+def _tile_vacio():
+    return ft.ListTile(leading=ft.Icon(ft.Icons.RECEIPT_LONG), title=ft.Text(""), subtitle=ft.Text(""),
+                       on_click=lambda e: None)
+
+
+def _bind_tile(tile, o):
+    fecha = o[2].strftime("%d/%m %H:%M") if o[2] else ""
+    tile.data = o[0]
+    tile.title.value = f"#{o[0]} - {o[1]}"
+    tile.subtitle.value = f"{fecha} | {o[3]}"
+
+
+class _Scroll:
+    # Evento de scroll mínimo con los campos que usa VirtualList
+    def __init__(self, pixels, viewport, max_extent):
+        self.pixels = pixels
+        self.viewport_dimension = viewport
+        self.max_scroll_extent = max_extent
+
+
+def _medir(conn, nombre, accion, resultados):
+    conn.reset()
+    inicio = time.perf_counter()
+    accion()
+    resultados.append((nombre, conn.bytes, conn.mensajes, time.perf_counter() - inicio))
+
+
+def escenario_completo(ordenes, filtradas):
+    conn = _ConexionMedida()
+    page = ft.Page(conn, "bench", asyncio.new_event_loop())
+    lv = ft.ListView(expand=True, spacing=5, padding=10)
+    resultados = []
+
+    def cargar(lista):
+        lv.controls.clear()
+        for o in lista:
+            lv.controls.append(_tile_completo(o))
+
+    _medir(conn, "carga inicial", lambda: (cargar(ordenes), page.add(lv)), resultados)
+    _medir(conn, "cambio de filtro", lambda: (cargar(filtradas), lv.update()), resultados)
+    _medir(conn, "quitar filtro", lambda: (cargar(ordenes), lv.update()), resultados)
+
+    cambiada = (ordenes[3][0], ordenes[3][1], ordenes[3][2], "Completado", ordenes[3][4], ordenes[3][5])
+    _medir(conn, "cambio de estado", lambda: (cargar([cambiada if o[0] == cambiada[0] else o for o in ordenes]), lv.update()), resultados)
+    _medir(conn, "scroll", lambda: None, resultados)
+    _medir(conn, "scroll 1 fila", lambda: None, resultados)
+    return resultados
+
+
+def escenario_virtual(ordenes, filtradas, viewport):
+    conn = _ConexionMedida()
+    page = ft.Page(conn, "bench", asyncio.new_event_loop())
+    vl = VirtualList(item_height=72, build_row=_tile_vacio, bind_row=_bind_tile, viewport_height=viewport, padding=10)
+    resultados = []
+
+    _medir(conn, "carga inicial", lambda: (vl.set_items(ordenes), page.add(vl)), resultados)
+    _medir(conn, "cambio de filtro", lambda: vl.set_items(filtradas), resultados)
+    _medir(conn, "quitar filtro", lambda: vl.set_items(ordenes), resultados)
+
+    cambiada = (ordenes[3][0], ordenes[3][1], ordenes[3][2], "Completado", ordenes[3][4], ordenes[3][5])
+    _medir(conn, "cambio de estado", lambda: vl.upsert(cambiada), resultados)
+
+    total = len(ordenes) * vl.item_height
+    _medir(conn, "scroll", lambda: vl._on_scroll(_Scroll(total / 2, viewport, total - viewport)), resultados)
+    _medir(conn, "scroll 1 fila", lambda: vl._on_scroll(_Scroll(total / 2 + vl.item_height, viewport, total - viewport)),
+           resultados)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ordenes', type=int, default=5000)
+    parser.add_argument('--viewport', type=float, default=800, help="alto visible del panel en píxeles")
+    args = parser.parse_args()
+
+    ordenes = generar_ordenes(args.ordenes)
+    filtradas = [o for o in ordenes if "GARCIA" in o[1]]
+
+    completo = escenario_completo(ordenes, filtradas)
+    virtual = escenario_virtual(ordenes, filtradas, args.viewport)
+
+    print(f"{args.ordenes} órdenes, {len(filtradas)} tras el filtro, viewport {args.viewport:.0f}px\n")
+    print(f"{'operación':<18} {'lista completa':>16} {'VirtualList':>14} {'ms completo':>12} {'ms virtual':>11}")
+    for (nombre, b1, _, t1), (_, b2, _, t2) in zip(completo, virtual):
+        print(f"{nombre:<18} {b1:>14,} B {b2:>12,} B {t1 * 1000:>12.1f} {t2 * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+"""
+Generador de carga multiusuario: N recepcionistas creando órdenes y M técnicos
+guardando y validando resultados a la vez contra el singleton `db`, cada uno en su
+hilo, con tiempos de pausa y mezcla de acciones configurables.
+
+Cada acción repite las llamadas que hace la vista correspondiente:
+    recepción   buscar (search_pacientes), crear (tarifas de convenio + create_orden_trabajo),
+                lista (get_ordenes_filtradas_page)
+    técnicos    abrir (ResultadosView.fetch_detalle_orden), guardar (save_all: reenvía todos
+                los valores de la pantalla), validar (toggle_validation: guardar + validate_orden),
+                lista
+Reporta throughput, latencias p50/p95/p99 y errores por acción (bloqueos y deadlocks
+aparte), y al terminar revisa la base buscando:
+    - actualizaciones perdidas: un valor escrito que ninguna escritura posterior debía
+      reemplazar y que no es el valor final (y quién lo pisó reenviando un valor viejo)
+    - escrituras que modificaron filas de una orden ya validada
+    - órdenes validadas con filas sin validar
+    - OrdenesTrabajo.estado que no corresponde a sus resultados
+
+Las órdenes creadas se eliminan al terminar. Sale con código 1 si hubo deadlocks o
+anomalías.
+
+Uso (desde la raíz del proyecto, contra una base sembrada con benchmarks.semilla):
+    python -m benchmarks.carga --recepcionistas 3 --tecnicos 4 --duracion 60
+    python -m benchmarks.carga --tecnicos 8 --pensar-tecnico 0.2 --conflicto 0.5
+    python -m benchmarks.carga --mix-tecnico abrir=20,guardar=60,validar=20 --salida carga.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from database import db
+from services.connection_pool import PoolTimeoutError
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def clasificar_error(error):
+    """Tipo de error para el reporte: deadlock, bloqueo (timeout de lock), pool o la clase de la excepción."""
+    if isinstance(error, PoolTimeoutError):
+        return 'pool_timeout'
+    texto = str(error).lower()
+    # SQL Server: 1205 / SQLSTATE 40001 es víctima de deadlock; 1222 es timeout de lock
+    if 'deadlock' in texto or '1205' in texto or '40001' in texto:
+        return 'deadlock'
+    if 'database is locked' in texto or 'database table is locked' in texto or '1222' in texto:
+        return 'bloqueo'
+    return type(error).__name__
+
+
+def parsear_mix(texto, por_defecto):
+    """'abrir=25,guardar=50' -> {'abrir': 25.0, 'guardar': 50.0} (sólo acciones conocidas)."""
+    if not texto:
+        return dict(por_defecto)
+    mix = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in por_defecto:
+            raise ValueError(f"Acción desconocida '{nombre}' (opciones: {', '.join(por_defecto)})")
+        mix[nombre] = float(peso or 1)
+    return mix
+
+
+class Registro:
+    """Latencias, errores y escrituras de todos los usuarios simulados (compartido entre hilos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)     # (rol, acción) -> [ms]
+        self.errores = defaultdict(Counter)    # (rol, acción) -> {tipo: n}
+        self.ejemplos = {}                     # tipo de error -> primer mensaje
+        self.escrituras = []                   # update_resultado_batch completados
+        self.validaciones = {}                 # orden_id -> fin de validate_orden
+        self.creadas = []
+        self.tablero = []                      # órdenes sin validar que los técnicos pueden abrir
+        self.en_trabajo = {}                   # usuario -> orden abierta
+
+    def latencia(self, rol, accion, ms):
+        with self._lock:
+            self.latencias[(rol, accion)].append(ms)
+
+    def error(self, rol, accion, error):
+        tipo = clasificar_error(error)
+        with self._lock:
+            self.errores[(rol, accion)][tipo] += 1
+            self.ejemplos.setdefault(tipo, f"{type(error).__name__}: {error}")
+
+    def nueva_orden(self, orden_id):
+        with self._lock:
+            self.creadas.append(orden_id)
+            self.tablero.append(orden_id)
+
+    def escritura(self, usuario, orden_id, enviados, editados, cambiadas, inicio, fin):
+        with self._lock:
+            self.escrituras.append({
+                'usuario': usuario, 'orden': orden_id, 'enviados': enviados, 'editados': editados,
+                'cambiadas': cambiadas, 'inicio': inicio, 'fin': fin,
+            })
+
+    def validada(self, orden_id, fin):
+        with self._lock:
+            self.validaciones[orden_id] = fin
+            if orden_id in self.tablero:
+                self.tablero.remove(orden_id)
+
+    def elegir_orden(self, usuario, rnd, conflicto):
+        """
+        Una orden del tablero: con probabilidad `conflicto`, una que otro técnico tiene abierta;
+        si no, una libre (o cualquiera si todas están abiertas).
+        """
+        with self._lock:
+            ajenas = {o for u, o in self.en_trabajo.items() if u != usuario and o in self.tablero}
+            libres = [o for o in self.tablero if o not in ajenas]
+            if ajenas and rnd.random() < conflicto:
+                orden_id = rnd.choice(sorted(ajenas))
+            elif libres or self.tablero:
+                orden_id = rnd.choice(libres or self.tablero)
+            else:
+                return None
+            self.en_trabajo[usuario] = orden_id
+            return orden_id
+
+
+class Usuario(threading.Thread):
+    ROL = None
+    MIX = {}
+
+    def __init__(self, numero, registro, ctx, mix, pensar_s, fin, seed):
+        super().__init__(name=f"{self.ROL}-{numero}", daemon=True)
+        self.numero = numero
+        self.registro = registro
+        self.ctx = ctx
+        self.acciones = list(mix)
+        self.pesos = list(mix.values())
+        self.pensar_s = pensar_s
+        self.fin = fin
+        self.rnd = random.Random(seed)
+
+    def run(self):
+        while not self.fin.is_set():
+            self.ejecutar(self.rnd.choices(self.acciones, self.pesos)[0])
+            if self.pensar_s > 0:
+                self.fin.wait(self.rnd.expovariate(1 / self.pensar_s))
+
+    def ejecutar(self, accion):
+        inicio = time.perf_counter()
+        try:
+            hecha = getattr(self, f"accion_{accion}")()
+        except Exception as e:
+            self.registro.error(self.ROL, accion, e)
+            return
+        # Una acción puede derivar en otra (guardar sin orden abierta -> abrir) y registrarla ella misma
+        if hecha is not False:
+            self.registro.latencia(self.ROL, accion, (time.perf_counter() - inicio) * 1000)
+
+    def accion_lista(self):
+        db.get_ordenes_filtradas_page(None, None, "Pendiente", 50)
+
+
+class Recepcionista(Usuario):
+    ROL = 'recepcion'
+    MIX = {'buscar': 30, 'crear': 60, 'lista': 10}
+
+    candidatos = ()
+
+    def accion_buscar(self):
+        self.candidatos = db.search_pacientes(self.rnd.choice(self.ctx['terminos']))
+
+    def accion_crear(self):
+        # Como CrearOrdenView: paciente de la última búsqueda, precios de convenio y guardar
+        rnd = self.rnd
+        paciente_id = rnd.choice(self.candidatos)[0] if self.candidatos else rnd.choice(self.ctx['pacientes'])
+        medico = rnd.choice(self.ctx['medicos'] + [None])
+        items = [{'type': 'perfil', 'id': p.id, 'precio': p.precioEstandar}
+                 for p in rnd.sample(self.ctx['perfiles'], min(len(self.ctx['perfiles']), rnd.choice([1, 1, 2, 3])))]
+        items += [{'type': 'analito', 'id': a.id, 'precio': 10.0}
+                  for a in rnd.sample(self.ctx['analitos'], rnd.choice([0, 0, 1, 2]))]
+        if medico and medico.tieneConvenio:
+            for item in items:
+                if item['type'] == 'perfil':
+                    especial = db.get_tarifa_especial(medico.id, item['id'])
+                    if especial is not None:
+                        item['precio'] = especial
+
+        orden_id = db.create_orden_trabajo(paciente_id, medico.id if medico else None, items,
+                                           sum(item['precio'] for item in items))
+        if orden_id is None:
+            raise ConnectionError("create_orden_trabajo no obtuvo conexión")
+        self.registro.nueva_orden(orden_id)
+
+
+class Tecnico(Usuario):
+    ROL = 'laboratorio'
+    MIX = {'abrir': 25, 'guardar': 50, 'validar': 10, 'lista': 15}
+
+    def __init__(self, *args, conflicto=0.2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conflicto = conflicto
+        self.orden_id = None
+        self.pantalla = {}       # id de resultado -> valor en los controles
+        self.validada = False
+        self.secuencia = 0
+
+    def _valor_nuevo(self):
+        # Único por técnico y escritura: permite saber al final quién escribió cada valor
+        self.secuencia += 1
+        return f"{self.numero}.{self.secuencia:06d}"
+
+    def accion_abrir(self):
+        orden_id = self.registro.elegir_orden(self.name, self.rnd, self.conflicto)
+        if orden_id is None:
+            self.orden_id = None
+            return
+        # ResultadosView.fetch_detalle_orden
+        header = db.get_orden_header(orden_id)
+        if not header:
+            self.orden_id = None
+            return
+        db.get_paciente(header[1])
+        grupos = db.get_resultados_grouped(orden_id)
+        db.resolve_references_for_order(orden_id)
+
+        items = [item for grupo in grupos for item in grupo['items']]
+        self.orden_id = orden_id
+        self.pantalla = {item['id']: item['valor'] if item['valor'] is not None else "" for item in items}
+        self.validada = any(item['estado'] == 'Validado' for item in items)
+
+    def _abrir_en_su_lugar(self):
+        self.ejecutar('abrir')
+        return False
+
+    def _guardar(self, editar):
+        """ResultadosView.save_all: escribe `editar` filas nuevas y reenvía todo lo que hay en pantalla."""
+        editados = set(editar)
+        for rid in editados:
+            self.pantalla[rid] = self._valor_nuevo()
+        enviados = dict(self.pantalla)
+        inicio = time.perf_counter()
+        cambiadas = db.update_resultado_batch([{'id': rid, 'valor': valor} for rid, valor in enviados.items()])
+        fin = time.perf_counter()
+        self.registro.escritura(self.name, self.orden_id, enviados, editados, cambiadas, inicio, fin)
+
+    def accion_guardar(self):
+        if self.orden_id is None:
+            return self._abrir_en_su_lugar()
+        if self.validada or not self.pantalla:
+            return self._abrir_en_su_lugar()  # la vista no deja guardar una orden validada
+        filas = list(self.pantalla)
+        self._guardar(self.rnd.sample(filas, self.rnd.randint(1, min(len(filas), 5))))
+
+    def accion_validar(self):
+        if self.orden_id is None:
+            return self._abrir_en_su_lugar()
+        if self.validada:
+            return self._abrir_en_su_lugar()
+        # toggle_validation no valida con campos vacíos: el técnico los completa, guarda y valida
+        self._guardar([rid for rid, valor in self.pantalla.items() if not valor])
+        db.validate_orden(self.orden_id, self.name)
+        self.registro.validada(self.orden_id, time.perf_counter())
+        self.validada = True
+
+
+# --- PREPARACIÓN ---
+
+def preparar(ordenes_iniciales, rnd):
+    pacientes = db.get_pacientes_page(500)
+    ctx = {
+        'pacientes': [p[0] for p in pacientes],
+        'medicos': db.catalogos.medicos(),
+        'perfiles': [p for p in db.catalogos.perfiles() if p.nombre != "Examenes Individuales"],
+        'analitos': db.catalogos.analitos(),
+    }
+    if not (ctx['pacientes'] and ctx['perfiles']):
+        raise RuntimeError("La base no tiene datos suficientes: siembre primero con python -m benchmarks.semilla")
+
+    terminos = set()
+    for p in pacientes:
+        if p[1]:
+            terminos.add(p[1].split()[0])
+        if p[5]:
+            terminos.add(p[5][:5])
+    ctx['terminos'] = sorted(terminos)
+
+    # Trabajo pendiente para los técnicos desde el primer segundo
+    registro = Registro()
+    for _ in range(ordenes_iniciales):
+        items = [{'type': 'perfil', 'id': p.id, 'precio': p.precioEstandar}
+                 for p in rnd.sample(ctx['perfiles'], min(len(ctx['perfiles']), 2))]
+        registro.nueva_orden(db.create_orden_trabajo(rnd.choice(ctx['pacientes']), None, items, 0.0))
+    return ctx, registro
+
+
+# --- VERIFICACIÓN ---
+
+def _estado_final(orden_ids):
+    """Filas de OrdenResultados ({id: (orden, valor, estado)}) y estado de las órdenes ({id: estado})."""
+    filas, ordenes = {}, {}
+    orden_ids = list(orden_ids)
+    with db.pool.connection() as conn:
+        cursor = conn.cursor()
+        for inicio in range(0, len(orden_ids), 1000):
+            lote = orden_ids[inicio:inicio + 1000]
+            placeholders = ", ".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT id, ordenTrabajoId, valorResultado, estado FROM OrdenResultados
+                WHERE ordenTrabajoId IN ({placeholders})
+            """, lote)
+            for rid, oid, valor, estado in cursor.fetchall():
+                filas[rid] = (oid, valor, estado)
+            cursor.execute(f"SELECT id, estado FROM OrdenesTrabajo WHERE id IN ({placeholders})", lote)
+            ordenes.update((oid, estado) for oid, estado in cursor.fetchall())
+    return filas, ordenes
+
+
+def verificar(registro):
+    """Anomalías de concurrencia encontradas en la base al terminar: lista de (tipo, detalle)."""
+    anomalias = []
+    efectivas = [w for w in registro.escrituras if w['cambiadas']]
+    ordenes = {w['orden'] for w in efectivas} | set(registro.validaciones)
+    filas, estados = _estado_final(ordenes)
+
+    # Escrituras que cambiaron algo después de que la orden quedó validada
+    for w in efectivas:
+        validada = registro.validaciones.get(w['orden'])
+        if validada is not None and w['inicio'] > validada:
+            anomalias.append(('escritura_sobre_validada',
+                              f"orden {w['orden']}: {w['usuario']} modificó {w['cambiadas']} filas ya validadas"))
+
+    # Actualizaciones perdidas: el valor final debe venir de una edición que nadie reemplazó después
+    por_fila = defaultdict(list)
+    for w in efectivas:
+        for rid in w['enviados']:
+            por_fila[rid].append(w)
+    for rid, escrituras in por_fila.items():
+        ediciones = [w for w in escrituras if rid in w['editados']]
+        if not ediciones or rid not in filas:
+            continue
+        final = filas[rid][1]
+        vigentes = [w for w in ediciones if not any(o['inicio'] > w['fin'] for o in ediciones)]
+        if any(w['enviados'][rid] == final for w in vigentes):
+            continue
+        perdida = max(vigentes, key=lambda w: w['fin'])
+        pisaron = sorted({w['usuario'] for w in escrituras
+                          if rid not in w['editados'] and w['enviados'][rid] == final and w['fin'] > perdida['inicio']})
+        if pisaron:
+            anomalias.append(('reenvio_obsoleto',
+                              f"fila {rid} (orden {perdida['orden']}): '{perdida['enviados'][rid]}' de {perdida['usuario']} "
+                              f"pisado por {', '.join(pisaron)} con el valor viejo '{final}'"))
+        else:
+            anomalias.append(('actualizacion_perdida',
+                              f"fila {rid} (orden {perdida['orden']}): se esperaba '{perdida['enviados'][rid]}' "
+                              f"de {perdida['usuario']} y quedó '{final}'"))
+
+    # Órdenes validadas: todas sus filas deben haber quedado validadas
+    for oid in registro.validaciones:
+        sin_validar = [rid for rid, (o, _, estado) in filas.items() if o == oid and estado != 'Validado']
+        if sin_validar:
+            anomalias.append(('validacion_incompleta', f"orden {oid}: {len(sin_validar)} filas sin validar"))
+
+    # OrdenesTrabajo.estado según sus resultados, como lo recalcula update_resultado_batch
+    totales, llenos = Counter(), Counter()
+    for oid, valor, _ in filas.values():
+        totales[oid] += 1
+        if valor is not None and valor != '':
+            llenos[oid] += 1
+    for oid in {w['orden'] for w in efectivas}:
+        esperado = 'Completado' if totales[oid] and totales[oid] == llenos[oid] else 'Pendiente'
+        if estados.get(oid) != esperado:
+            anomalias.append(('estado_orden', f"orden {oid}: '{estados.get(oid)}' con {llenos[oid]}/{totales[oid]} resultados"))
+
+    return anomalias
+
+
+# --- EJECUCIÓN ---
+
+def ejecutar(recepcionistas=3, tecnicos=4, duracion=60.0, pensar_recepcion=2.0, pensar_tecnico=1.0,
+             mix_recepcion=None, mix_tecnico=None, conflicto=0.2, ordenes_iniciales=None, seed=11,
+             conservar=False):
+    rnd = random.Random(seed)
+    habilitado, db.stats.habilitado = db.stats.habilitado, True
+    db.stats.reiniciar()
+    ctx, registro = preparar(tecnicos * 3 if ordenes_iniciales is None else ordenes_iniciales, rnd)
+
+    fin = threading.Event()
+    usuarios = [Recepcionista(i + 1, registro, ctx, mix_recepcion or Recepcionista.MIX, pensar_recepcion, fin, seed + i)
+                for i in range(recepcionistas)]
+    usuarios += [Tecnico(i + 1, registro, ctx, mix_tecnico or Tecnico.MIX, pensar_tecnico, fin, seed + 100 + i,
+                         conflicto=conflicto)
+                 for i in range(tecnicos)]
+
+    inicio = time.perf_counter()
+    for usuario in usuarios:
+        usuario.start()
+    try:
+        fin.wait(duracion)
+    except KeyboardInterrupt:
+        print("Interrumpido: cerrando usuarios...")
+    fin.set()
+    for usuario in usuarios:
+        usuario.join()
+    transcurrido = time.perf_counter() - inicio
+
+    try:
+        anomalias = verificar(registro)
+    finally:
+        if not conservar:
+            for orden_id in registro.creadas:
+                db.delete_orden(orden_id)
+        consultas = db.stats.resumen(top=8)
+        db.stats.habilitado = habilitado
+
+    acciones = {}
+    for clave in sorted(set(registro.latencias) | set(registro.errores)):
+        tiempos = sorted(registro.latencias.get(clave, []))
+        errores = registro.errores.get(clave, Counter())
+        acciones[f"{clave[0]}.{clave[1]}"] = {
+            'n': len(tiempos),
+            'por_segundo': len(tiempos) / transcurrido,
+            'errores': dict(errores),
+            'tasa_error': sum(errores.values()) / max(1, len(tiempos) + sum(errores.values())),
+            'p50_ms': _percentil(tiempos, 50),
+            'p95_ms': _percentil(tiempos, 95),
+            'p99_ms': _percentil(tiempos, 99),
+            'max_ms': tiempos[-1] if tiempos else 0.0,
+        }
+
+    return {
+        'config': {
+            'backend': db.dialecto.nombre, 'recepcionistas': recepcionistas, 'tecnicos': tecnicos,
+            'duracion_s': transcurrido, 'pensar_recepcion_s': pensar_recepcion, 'pensar_tecnico_s': pensar_tecnico,
+            'mix_recepcion': mix_recepcion or Recepcionista.MIX, 'mix_tecnico': mix_tecnico or Tecnico.MIX,
+            'conflicto': conflicto, 'seed': seed,
+        },
+        'acciones': acciones,
+        'ejemplos_error': registro.ejemplos,
+        'escrituras': len(registro.escrituras),
+        'validaciones': len(registro.validaciones),
+        'anomalias': [{'tipo': tipo, 'detalle': detalle} for tipo, detalle in anomalias],
+        'pool': db.pool.metrics(),
+        'consultas': [{k: f[k] for k in ('metodo', 'llamadas', 'errores', 'p95_ms', 'max_ms', 'espera_ms')}
+                      for f in consultas],
+    }
+
+
+def imprimir(resultado):
+    cfg = resultado['config']
+    print(f"\n{cfg['recepcionistas']} recepcionistas + {cfg['tecnicos']} técnicos durante {cfg['duracion_s']:.1f}s "
+          f"({cfg['backend']})\n")
+    print(f"{'acción':<22}{'n':>7}{'ops/s':>8}{'err %':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}  errores")
+    total = 0
+    for nombre, a in resultado['acciones'].items():
+        total += a['n']
+        errores = ", ".join(f"{tipo}={n}" for tipo, n in a['errores'].items())
+        print(f"{nombre:<22}{a['n']:>7}{a['por_segundo']:>8.2f}{a['tasa_error'] * 100:>7.1f}"
+              f"{a['p50_ms']:>9.1f}{a['p95_ms']:>9.1f}{a['p99_ms']:>9.1f}{a['max_ms']:>9.1f}  {errores}")
+    print(f"\nThroughput total: {total / cfg['duracion_s']:.2f} acciones/s; "
+          f"{resultado['escrituras']} guardados, {resultado['validaciones']} validaciones")
+
+    pool = resultado['pool']
+    print(f"Pool: {pool['open']} conexiones abiertas, espera media {pool['wait_avg'] * 1000:.1f} ms, "
+          f"máx {pool['wait_max'] * 1000:.1f} ms")
+
+    if resultado['ejemplos_error']:
+        print("\nErrores:")
+        for tipo, mensaje in resultado['ejemplos_error'].items():
+            print(f"  {tipo}: {mensaje[:200]}")
+
+    anomalias = resultado['anomalias']
+    print(f"\nAnomalías: {len(anomalias) or 'ninguna'}")
+    for tipo, n in Counter(a['tipo'] for a in anomalias).items():
+        print(f"  {tipo}: {n}")
+    for a in anomalias[:10]:
+        print(f"    {a['detalle']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recepcionistas', type=int, default=3)
+    parser.add_argument('--tecnicos', type=int, default=4)
+    parser.add_argument('--duracion', type=float, default=60.0, help="segundos")
+    parser.add_argument('--pensar-recepcion', type=float, default=2.0, help="pausa media entre acciones (s, exponencial)")
+    parser.add_argument('--pensar-tecnico', type=float, default=1.0, help="pausa media entre acciones (s, exponencial)")
+    parser.add_argument('--mix-recepcion', help=f"pesos, p.ej. {','.join(f'{k}={v}' for k, v in Recepcionista.MIX.items())}")
+    parser.add_argument('--mix-tecnico', help=f"pesos, p.ej. {','.join(f'{k}={v}' for k, v in Tecnico.MIX.items())}")
+    parser.add_argument('--conflicto', type=float, default=0.2,
+                        help="probabilidad de que un técnico abra una orden que otro tiene abierta")
+    parser.add_argument('--ordenes-iniciales', type=int, help="órdenes creadas antes de empezar (por defecto 3 por técnico)")
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--salida', help="guardar el resultado en JSON")
+    parser.add_argument('--conservar', action='store_true', help="no eliminar las órdenes creadas")
+    args = parser.parse_args()
+
+    try:
+        mix_recepcion = parsear_mix(args.mix_recepcion, Recepcionista.MIX)
+        mix_tecnico = parsear_mix(args.mix_tecnico, Tecnico.MIX)
+    except ValueError as e:
+        parser.error(str(e))
+
+    resultado = ejecutar(args.recepcionistas, args.tecnicos, args.duracion, args.pensar_recepcion, args.pensar_tecnico,
+                         mix_recepcion, mix_tecnico, args.conflicto, args.ordenes_iniciales, args.seed, args.conservar)
+    imprimir(resultado)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False, default=str)
+        print(f"\nResultado guardado en {args.salida}")
+
+    deadlocks = sum(a['errores'].get('deadlock', 0) for a in resultado['acciones'].values())
+    if deadlocks or resultado['anomalias']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Genera un dataset sintético realista para benchmarks y pruebas de carga: médicos,
+pacientes, analitos (con RangosReferencia y OpcionesAnalito), perfiles anidados y
+órdenes con sus OrdenResultados en distintos estados.
+
+Escribe con la conexión del backend configurado (LIS_DB_BACKEND), en bloques con
+executemany. Por seguridad se niega a sembrar una base que ya tiene pacientes salvo
+con --permitir-existente: no apuntar a producción.
+
+Uso (desde la raíz del proyecto):
+    LIS_DB_BACKEND=sqlite LIS_SQLITE_PATH=bench.sqlite3 python -m benchmarks.semilla
+    python -m benchmarks.semilla --pacientes 200000 --analitos 500 --ordenes 30000   # ~1M OrdenResultados
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from database import db
+
+NOMBRES = ["JUAN", "MARIA", "JOSE", "ROSA", "LUIS", "CARMEN", "CARLOS", "ANA", "JORGE", "JULIA",
+           "MIGUEL", "ELENA", "PEDRO", "LUCIA", "VICTOR", "SOFIA", "RAUL", "GLADYS", "CESAR", "NANCY",
+           "HUGO", "PATRICIA", "WILLIAM", "ROCIO", "FERNANDO", "ISABEL", "ALBERTO", "BEATRIZ"]
+APELLIDOS = ["QUISPE", "FLORES", "SANCHEZ", "RODRIGUEZ", "GARCIA", "ROJAS", "MENDOZA", "TORRES",
+             "RAMIREZ", "CHAVEZ", "CASTILLO", "HUAMAN", "VARGAS", "ESPINOZA", "DIAZ", "MAMANI",
+             "GUTIERREZ", "CRUZ", "VASQUEZ", "GOMEZ", "PALACIOS", "COBEÑAS", "CESPEDES", "ÑAUPARI"]
+CATEGORIAS = ["HEMATOLOGIA", "BIOQUIMICA", "INMUNOLOGIA", "ORINA", "HECES", "HORMONAS", "MICROBIOLOGIA"]
+UNIDADES = ["mg/dL", "g/dL", "U/L", "mmol/L", "%", "x10^3/uL", "ng/mL", "uUI/mL"]
+OPCIONES = ["Negativo", "Positivo", "Reactivo", "No reactivo", "Escasos", "Abundantes", "Amarillo", "Ámbar"]
+SUBTITULOS = [None, None, None, "SERIE ROJA", "SERIE BLANCA", "EXAMEN FISICO", "EXAMEN QUIMICO"]
+
+LOTE = 5000
+
+
+def _insertar(cursor, sql, filas):
+    db.dialecto.preparar_lote(cursor)
+    for inicio in range(0, len(filas), LOTE):
+        cursor.executemany(sql, filas[inicio:inicio + LOTE])
+
+
+def _ids(cursor, tabla, desde):
+    cursor.execute(f"SELECT id FROM {tabla} WHERE id > ? ORDER BY id", (desde,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _max_id(cursor, tabla):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}")
+    return cursor.fetchone()[0]
+
+
+def sembrar(pacientes=200000, analitos=500, perfiles=80, ordenes=30000, medicos=40,
+            seed=42, dias=365, permitir_existente=False, progreso=print):
+    """Siembra el dataset y devuelve un resumen {tabla: filas insertadas}."""
+    rnd = random.Random(seed)
+    ahora = datetime.now().replace(microsecond=0)
+    resumen = {}
+
+    with db.pool.connection() as conn:
+        if conn is None:
+            raise ConnectionError("No se pudo conectar a la base de datos")
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT COUNT(*) FROM Pacientes")
+        if cursor.fetchone()[0] and not permitir_existente:
+            raise RuntimeError("La base ya tiene pacientes: use una base vacía o --permitir-existente")
+
+        default_profile_id = db.ensure_default_profile()
+
+        # --- MÉDICOS ---
+        base = _max_id(cursor, "Medicos")
+        _insertar(cursor, "INSERT INTO Medicos (nombre, especialidad, telefono, tieneConvenio) VALUES (?, ?, ?, ?)", [
+            (f"DR. {rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {i}", rnd.choice(["MEDICINA GENERAL", "PEDIATRIA", "GINECOLOGIA"]),
+             f"9{rnd.randint(10000000, 99999999)}", int(rnd.random() < 0.3))
+            for i in range(medicos)
+        ])
+        medico_ids = _ids(cursor, "Medicos", base)
+        resumen['Medicos'] = len(medico_ids)
+
+        # --- ANALITOS, OPCIONES Y RANGOS ---
+        base = _max_id(cursor, "Analitos")
+        filas = []
+        tipos = []
+        for i in range(analitos):
+            tipo = rnd.choices(["Numerico", "Opciones", "Texto"], weights=[80, 12, 8])[0]
+            tipos.append(tipo)
+            v_min = round(rnd.uniform(1, 100), 1) if tipo == "Numerico" else None
+            filas.append((
+                f"ANALITO {i:04d} {rnd.choice(APELLIDOS)}", rnd.choice(UNIDADES) if tipo == "Numerico" else None,
+                rnd.choice(CATEGORIAS), rnd.choice(["Automatizado", "Automatizado", "Manual", "Colorimétrico"]),
+                rnd.choice(["Sangre", "Suero", "Orina", "Heces"]), tipo,
+                v_min, round(v_min * rnd.uniform(1.2, 3), 1) if v_min is not None else None,
+                None, rnd.choice(SUBTITULOS), None, 0, f"A{i:04d}", None
+            ))
+        _insertar(cursor, """
+            INSERT INTO Analitos (nombre, unidad, categoria, metodo, tipoMuestra, tipoDato,
+                                  valorRefMin, valorRefMax, referenciaVisual, subtituloReporte,
+                                  formula, esCalculado, abreviatura, valorPorDefecto)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, filas)
+        analito_ids = _ids(cursor, "Analitos", base)
+        resumen['Analitos'] = len(analito_ids)
+
+        opciones, rangos = [], []
+        for aid, tipo in zip(analito_ids, tipos):
+            if tipo == "Opciones":
+                for k, valor in enumerate(rnd.sample(OPCIONES, rnd.randint(2, 4))):
+                    opciones.append((aid, valor, int(k == 0)))
+            elif tipo == "Numerico":
+                # Adultos por género y un rango pediátrico en meses
+                for genero in rnd.choice([["Ambos"], ["Masculino", "Femenino"]]):
+                    v_min = round(rnd.uniform(1, 100), 1)
+                    rangos.append((aid, genero, 18, 120, "Años", v_min, round(v_min * 2, 1),
+                                   round(v_min * 0.5, 1), round(v_min * 4, 1)))
+                v_min = round(rnd.uniform(1, 100), 1)
+                rangos.append((aid, "Ambos", 0, 215, "Meses", v_min, round(v_min * 2, 1), None, None))
+        _insertar(cursor, "INSERT INTO OpcionesAnalito (analitoId, valorOpcion, esPredeterminado) VALUES (?, ?, ?)", opciones)
+        _insertar(cursor, """
+            INSERT INTO RangosReferencia (analitoId, genero, edadMin, edadMax, unidadEdad, valorMin, valorMax, panicoMin, panicoMax)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rangos)
+        resumen['OpcionesAnalito'] = len(opciones)
+        resumen['RangosReferencia'] = len(rangos)
+        conn.commit()
+        progreso(f"catálogo: {len(analito_ids)} analitos, {len(rangos)} rangos, {len(opciones)} opciones")
+
+        # --- PERFILES ANIDADOS ---
+        base = _max_id(cursor, "PerfilesExamen")
+        _insertar(cursor, "INSERT INTO PerfilesExamen (nombre, categoria, precioEstandar) VALUES (?, ?, ?)", [
+            (f"PERFIL {i:03d}", rnd.choice(CATEGORIAS), float(rnd.randint(10, 200))) for i in range(perfiles)
+        ])
+        perfil_ids = _ids(cursor, "PerfilesExamen", base)
+        detalle, composicion = [], []
+        for n, pid in enumerate(perfil_ids):
+            for orden, aid in enumerate(rnd.sample(analito_ids, rnd.randint(4, 15))):
+                detalle.append((pid, aid, orden))
+            # Sub-perfiles sólo entre los anteriores: árbol sin ciclos de hasta unos 3 niveles
+            if n >= 5 and rnd.random() < 0.25:
+                for orden, hijo in enumerate(rnd.sample(perfil_ids[:n], rnd.randint(1, 3))):
+                    composicion.append((pid, hijo, orden))
+        _insertar(cursor, "INSERT INTO DetallePerfilAnalito (perfilExamenId, analitoId, orden) VALUES (?, ?, ?)", detalle)
+        _insertar(cursor, "INSERT INTO DetallePerfilComposicion (perfilPadreId, perfilHijoId, orden) VALUES (?, ?, ?)", composicion)
+        conn.commit()
+        resumen['PerfilesExamen'] = len(perfil_ids)
+        resumen['DetallePerfilComposicion'] = len(composicion)
+        expansion = dict(zip(perfil_ids, db.expandir_perfiles(perfil_ids)))
+
+        # --- PACIENTES ---
+        base = _max_id(cursor, "Pacientes")
+        filas = []
+        for i in range(pacientes):
+            unidad = rnd.choices(["Años", "Meses", "Días"], weights=[90, 8, 2])[0]
+            edad = rnd.randint(1, 95) if unidad == "Años" else rnd.randint(1, 11 if unidad == "Meses" else 29)
+            nombre = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)} {rnd.choice(NOMBRES)}"
+            if rnd.random() < 0.4:
+                nombre += f" {rnd.choice(NOMBRES)}"
+            filas.append((nombre, edad, unidad, rnd.choice(["Masculino", "Femenino"]),
+                          f"{40000000 + i:08d}" if rnd.random() < 0.85 else None,
+                          f"9{rnd.randint(10000000, 99999999)}" if rnd.random() < 0.5 else None,
+                          ahora - timedelta(days=dias * 2, seconds=rnd.randint(0, 86400 * dias))))
+        _insertar(cursor, """
+            INSERT INTO Pacientes (nombreCompleto, edad, unidadEdad, genero, dni, telefono, fechaCreacion)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, filas)
+        conn.commit()
+        paciente_ids = _ids(cursor, "Pacientes", base)
+        resumen['Pacientes'] = len(paciente_ids)
+        progreso(f"pacientes: {len(paciente_ids)}")
+
+        # --- ÓRDENES Y RESULTADOS ---
+        resumen['OrdenesTrabajo'] = resumen['OrdenResultados'] = 0
+        inicio_t = time.perf_counter()
+        for bloque in range(0, ordenes, LOTE):
+            n = min(LOTE, ordenes - bloque)
+            base = _max_id(cursor, "OrdenesTrabajo")
+            cabeceras, items = [], []
+            for k in range(n):
+                fecha = ahora - timedelta(seconds=rnd.randint(0, 86400 * dias))
+                elegidos = rnd.sample(perfil_ids, rnd.choices([1, 2, 3], weights=[50, 35, 15])[0])
+                sueltos = rnd.sample(analito_ids, rnd.choice([0, 0, 1, 2]))
+                # Las más antiguas ya están validadas; las de los últimos días, a medias
+                antiguedad = (ahora - fecha).days
+                etapa = "Validado" if antiguedad > 3 else rnd.choice(["Validado", "Ingresado", "Pendiente"])
+                cabeceras.append((rnd.choice(paciente_ids), rnd.choice(medico_ids + [None]),
+                                  "Pendiente" if etapa == "Pendiente" else "Completado",
+                                  float(rnd.randint(20, 400)), fecha,
+                                  None if etapa == "Pendiente" else fecha + timedelta(hours=4)))
+                items.append((elegidos, sueltos, etapa, fecha))
+            _insertar(cursor, """
+                INSERT INTO OrdenesTrabajo (pacienteId, medicoId, estado, totalPagar, fechaCreacion, fechaCompletado)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, cabeceras)
+            orden_ids = _ids(cursor, "OrdenesTrabajo", base)
+
+            orden_perfiles, resultados = [], []
+            for oid, (elegidos, sueltos, etapa, fecha) in zip(orden_ids, items):
+                pares = []
+                for pid in elegidos:
+                    orden_perfiles.append((oid, pid, 0.0))
+                    pares.extend((aid, origen) for aid, origen in expansion[pid])
+                pares.extend((aid, default_profile_id) for aid in sueltos)
+                for aid, origen in pares:
+                    if etapa == "Pendiente":
+                        valor, estado, validado = None, "Pendiente", None
+                    else:
+                        valor = f"{rnd.uniform(1, 300):.1f}"
+                        estado, validado = (etapa, "LIC. BENCHMARK") if etapa == "Validado" else (etapa, None)
+                    resultados.append((oid, origen, aid, valor, estado,
+                                       None if valor is None else fecha + timedelta(hours=2), validado))
+            _insertar(cursor, "INSERT INTO OrdenPerfiles (ordenTrabajoId, perfilExamenId, precioCobrado) VALUES (?, ?, ?)",
+                      orden_perfiles)
+            _insertar(cursor, """
+                INSERT INTO OrdenResultados (ordenTrabajoId, perfilExamenId, analitoId, valorResultado, estado, fechaRegistro, validadoPor)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, resultados)
+            conn.commit()
+            resumen['OrdenesTrabajo'] += len(orden_ids)
+            resumen['OrdenResultados'] += len(resultados)
+            progreso(f"órdenes: {resumen['OrdenesTrabajo']}/{ordenes}, resultados: {resumen['OrdenResultados']} "
+                     f"({time.perf_counter() - inicio_t:.0f}s)")
+
+    # Los catálogos e índices en memoria se cargan de nuevo con los datos sembrados
+    db.catalogos.invalidar()
+    db.paciente_index.cargado = False
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pacientes', type=int, default=200000)
+    parser.add_argument('--analitos', type=int, default=500)
+    parser.add_argument('--perfiles', type=int, default=80)
+    parser.add_argument('--ordenes', type=int, default=30000, help="~35 resultados por orden")
+    parser.add_argument('--medicos', type=int, default=40)
+    parser.add_argument('--dias', type=int, default=365, help="antigüedad máxima de las órdenes")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--permitir-existente', action='store_true', help="sembrar aunque la base ya tenga datos")
+    args = parser.parse_args()
+
+    # Millones de filas en lotes: no tiene sentido medirlas ni llenar el log de consultas lentas
+    db.stats.habilitado = False
+    inicio = time.perf_counter()
+    resumen = sembrar(args.pacientes, args.analitos, args.perfiles, args.ordenes, args.medicos,
+                      args.seed, args.dias, args.permitir_existente)
+    print(f"\nListo en {time.perf_counter() - inicio:.1f}s ({db.dialecto.nombre})")
+    for tabla, filas in resumen.items():
+        print(f"  {tabla:<26} {filas:>10}")
+
+
+if __name__ == "__main__":
+    main()
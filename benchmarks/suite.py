@@ -0,0 +1,281 @@
+"""
+Suite de benchmarks de punta a punta sobre los caminos reales de DatabaseManager con
+un dataset sembrado (ver benchmarks.semilla): crear órdenes, leer y guardar resultados,
+filtrar órdenes y generar el PDF. Por operación reporta p50/p95/p99/máx y consultas
+SQL por llamada (de db.stats), y guarda un JSON para comparar entre versiones.
+
+Las órdenes que crea la suite se eliminan al terminar. Los PDFs se generan con una
+caché de reportes temporal, así que 'generar_pdf' mide siempre el render completo.
+
+Uso (desde la raíz del proyecto, contra una base sembrada):
+    LIS_DB_BACKEND=sqlite LIS_SQLITE_PATH=bench.sqlite3 python -m benchmarks.suite
+    python -m benchmarks.suite --repeticiones 200 --salida base.json
+    python -m benchmarks.suite --comparar base.json --tolerancia 15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from database import db
+from services.reporte_cache import ReporteCache
+from services.reporte_pdf import config_por_defecto, configurar_reportlab
+from views.reporte import generar_pdf_orden_bytes
+
+TABLAS = ["Pacientes", "Medicos", "Analitos", "RangosReferencia", "OpcionesAnalito",
+          "PerfilesExamen", "OrdenesTrabajo", "OrdenResultados"]
+MUESTRA = 5000
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def _consultas():
+    return sum(fila['llamadas'] for fila in db.stats.resumen())
+
+
+def _git_commit():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _muestra(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def preparar(rnd):
+    """Ids de muestra del dataset: la suite elige al azar entre ellos en cada llamada."""
+    limite = db.dialecto.limite
+    with db.pool.connection() as conn:
+        if conn is None:
+            raise ConnectionError("No se pudo conectar a la base de datos")
+        cursor = conn.cursor()
+        dataset = {}
+        for tabla in TABLAS:
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+            dataset[tabla] = cursor.fetchone()[0]
+
+        ctx = {
+            'dataset': dataset,
+            'pacientes': _muestra(cursor, f"SELECT id FROM Pacientes ORDER BY id DESC {limite}", (MUESTRA,)),
+            'medicos': _muestra(cursor, "SELECT id FROM Medicos"),
+            'perfiles': _muestra(cursor, "SELECT id FROM PerfilesExamen WHERE nombre <> 'Examenes Individuales'"),
+            'analitos': _muestra(cursor, "SELECT id FROM Analitos"),
+            'ordenes': _muestra(cursor, f"SELECT id FROM OrdenesTrabajo ORDER BY id DESC {limite}", (MUESTRA,)),
+            'validadas': _muestra(cursor, f"""
+                SELECT DISTINCT ordenTrabajoId FROM OrdenResultados WHERE estado = 'Validado'
+                ORDER BY ordenTrabajoId DESC {limite}
+            """, (MUESTRA,)),
+            'apellidos': [],
+            'creadas': [],
+        }
+        cursor.execute(f"SELECT nombreCompleto FROM Pacientes ORDER BY id DESC {limite}", (200,))
+        ctx['apellidos'] = sorted({row[0].split()[0] for row in cursor.fetchall() if row[0]})
+
+    if not (ctx['pacientes'] and ctx['perfiles'] and ctx['ordenes'] and ctx['validadas']):
+        raise RuntimeError("La base no tiene datos suficientes: siembre primero con python -m benchmarks.semilla")
+    return ctx
+
+
+# --- OPERACIONES ---
+# Cada una recibe (ctx, rnd), hace lo que no se mide y devuelve la llamada a medir.
+
+def op_crear_orden(ctx, rnd):
+    items = [{'type': 'perfil', 'id': pid, 'precio': 50.0}
+             for pid in rnd.sample(ctx['perfiles'], min(len(ctx['perfiles']), rnd.choice([1, 2, 3])))]
+    items += [{'type': 'analito', 'id': aid, 'precio': 10.0}
+              for aid in rnd.sample(ctx['analitos'], rnd.choice([0, 1, 2]))]
+    paciente = rnd.choice(ctx['pacientes'])
+    medico = rnd.choice(ctx['medicos'] + [None])
+
+    def llamada():
+        ctx['creadas'].append(db.create_orden_trabajo(paciente, medico, items, 100.0))
+    return llamada
+
+
+def op_resultados_grouped(ctx, rnd):
+    orden_id = rnd.choice(ctx['ordenes'])
+    return lambda: db.get_resultados_grouped(orden_id)
+
+
+def op_guardar_resultados(ctx, rnd):
+    # Sobre las órdenes que creó la suite: pendientes y nunca validadas
+    if not ctx['creadas']:
+        op_crear_orden(ctx, rnd)()
+    orden_id = rnd.choice(ctx['creadas'])
+    updates = [{'id': item['id'], 'valor': f"{rnd.uniform(1, 300):.1f}"}
+               for grupo in db.get_resultados_grouped(orden_id) for item in grupo['items']]
+    return lambda: db.update_resultado_batch(updates)
+
+
+def op_ordenes_filtradas(ctx, rnd):
+    termino = rnd.choice(ctx['apellidos']) if ctx['apellidos'] else None
+    estado = rnd.choice(["Todos", "Pendiente", "Completado"])
+    return lambda: db.get_ordenes_filtradas(termino, None, estado)
+
+
+def op_ordenes_pagina(ctx, rnd):
+    termino = rnd.choice(ctx['apellidos'] + [None]) if ctx['apellidos'] else None
+    return lambda: db.get_ordenes_filtradas_page(termino, None, "Todos", 50)
+
+
+def op_generar_pdf(ctx, rnd):
+    orden_id = rnd.choice(ctx['validadas'])
+    config_list = config_por_defecto(db.get_resultados_grouped(orden_id))
+    db.reportes.invalidar([orden_id])
+    return lambda: generar_pdf_orden_bytes(orden_id, config_list, True)
+
+
+OPERACIONES = {
+    'crear_orden': op_crear_orden,
+    'resultados_grouped': op_resultados_grouped,
+    'guardar_resultados': op_guardar_resultados,
+    'ordenes_filtradas': op_ordenes_filtradas,
+    'ordenes_pagina': op_ordenes_pagina,
+    'generar_pdf': op_generar_pdf,
+}
+
+
+def medir(nombre, ctx, rnd, repeticiones, calentamiento=2):
+    operacion = OPERACIONES[nombre]
+    for _ in range(calentamiento):
+        operacion(ctx, rnd)()
+
+    tiempos = []
+    consultas = 0
+    for _ in range(repeticiones):
+        llamada = operacion(ctx, rnd)
+        antes = _consultas()
+        inicio = time.perf_counter()
+        llamada()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas += _consultas() - antes
+
+    tiempos.sort()
+    return {
+        'n': repeticiones,
+        'p50_ms': _percentil(tiempos, 50),
+        'p95_ms': _percentil(tiempos, 95),
+        'p99_ms': _percentil(tiempos, 99),
+        'max_ms': tiempos[-1],
+        'media_ms': sum(tiempos) / len(tiempos),
+        'consultas': consultas / repeticiones,
+    }
+
+
+def ejecutar(operaciones, repeticiones, seed=7, conservar=False, progreso=print):
+    rnd = random.Random(seed)
+    # Se cuenta con db.stats aunque el proceso lo tenga apagado (LIS_QUERY_STATS=0)
+    habilitado, db.stats.habilitado = db.stats.habilitado, True
+    reportes, directorio = db.reportes, tempfile.mkdtemp(prefix="lis_bench_")
+    db.reportes = ReporteCache(directorio)
+    ctx = preparar(rnd)
+    resultados = {}
+    try:
+        for nombre in operaciones:
+            resultados[nombre] = medir(nombre, ctx, rnd, repeticiones)
+            progreso(_linea(nombre, resultados[nombre]))
+    finally:
+        if not conservar:
+            for orden_id in ctx['creadas']:
+                db.delete_orden(orden_id)
+        db.reportes = reportes
+        db.stats.habilitado = habilitado
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return {
+        'meta': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'backend': db.dialecto.nombre,
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'repeticiones': repeticiones,
+            'seed': seed,
+            'dataset': ctx['dataset'],
+        },
+        'operaciones': resultados,
+    }
+
+
+def _linea(nombre, r):
+    return (f"{nombre:<20} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f}  "
+            f"máx {r['max_ms']:8.2f} ms  {r['consultas']:5.1f} consultas/llamada")
+
+
+def comparar(base, actual, tolerancia=15.0, minimo_ms=1.0):
+    """
+    Imprime la variación contra `base` y devuelve las regresiones: operaciones que hacen
+    más consultas por llamada (media; los índices en memoria la hacen fluctuar) o cuyo p50/p95 empeoró más de `tolerancia` % y más de `minimo_ms`
+    (por debajo de eso en operaciones de décimas de ms es ruido).
+    """
+    print(f"\nComparación contra {base['meta'].get('commit')} ({base['meta'].get('fecha')}, {base['meta'].get('backend')})")
+    if base['meta'].get('dataset') != actual['meta'].get('dataset'):
+        print("  Aviso: el dataset no es el mismo; las diferencias pueden no ser comparables")
+
+    regresiones = []
+    for nombre, r in actual['operaciones'].items():
+        b = base['operaciones'].get(nombre)
+        if not b:
+            print(f"  {nombre:<20} (sin línea base)")
+            continue
+        deltas = {m: (r[m] - b[m]) / b[m] * 100 if b[m] else 0.0 for m in ('p50_ms', 'p95_ms')}
+        peor = any(deltas[m] > tolerancia and r[m] - b[m] > minimo_ms for m in deltas)
+        marca = ""
+        if peor or r['consultas'] > b['consultas'] + 0.5:
+            regresiones.append(nombre)
+            marca = "  <-- REGRESIÓN"
+        print(f"  {nombre:<20} p50 {deltas['p50_ms']:+7.1f}%  p95 {deltas['p95_ms']:+7.1f}%  "
+              f"consultas {b['consultas']:.1f} -> {r['consultas']:.1f}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--operaciones', nargs='+', choices=list(OPERACIONES), default=list(OPERACIONES))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--salida', help="JSON de resultados (por defecto benchmarks/resultados/<fecha>_<backend>.json)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=15.0, help="%% de empeoramiento de p50/p95 tolerado")
+    parser.add_argument('--minimo-ms', type=float, default=1.0, help="diferencia absoluta mínima para contar como regresión")
+    parser.add_argument('--conservar', action='store_true', help="no eliminar las órdenes creadas")
+    args = parser.parse_args()
+    configurar_reportlab()  # como al iniciar la app
+
+    print(f"Backend: {db.dialecto.nombre}, {args.repeticiones} repeticiones por operación\n")
+    actual = ejecutar(args.operaciones, args.repeticiones, args.seed, args.conservar)
+
+    salida = args.salida
+    if not salida:
+        carpeta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+        os.makedirs(carpeta, exist_ok=True)
+        salida = os.path.join(carpeta, f"{datetime.now():%Y%m%d_%H%M%S}_{db.dialecto.nombre}.json")
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(actual, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        if comparar(base, actual, args.tolerancia, args.minimo_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,49 @@
-import pyodbc
 import threading
+import functools
+import os
+import time
 from datetime import datetime
+from services.connection_pool import ConnectionPool
+from services.rango_index import RangoIndex, RangoNormalizado
+from services.catalog_cache import CatalogCache
+from services.paciente_index import PacienteIndex, tokens
+from services.duplicados import DetectorDuplicados
+from services.reporte_cache import ReporteCache
+from services.query_stats import QueryStats
+from services.dialectos import crear_dialecto, CHECKSUM_PACIENTE
+from models.analito import Analito
+from models.medico import Medico
+from models.paciente import Paciente
+from models.perfil_examen import PerfilExamen
+from models.rango_referencia import RangoReferencia
+
+# Perfil al que van los analitos pedidos sueltos (no se ofrece en el formulario de órdenes)
+PERFIL_POR_DEFECTO = 'Examenes Individuales'
+
+@functools.lru_cache(maxsize=None)
+def proyeccion(modelo, alias=None):
+    """Lista de columnas de modelo.COLUMNS para un SELECT (armada una vez por modelo y alias)."""
+    prefijo = f"{alias}." if alias else ""
+    return ", ".join(prefijo + columna for columna in modelo.COLUMNS)
+
+def with_connection(func):
+    """
+    Leases a pooled connection for the duration of the call (reentrant per thread).
+    Las consultas del método quedan registradas en self.stats con su nombre.
+    """
+    nombre = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.pool.connection():
+            with self.stats.metodo(nombre, self.pool.last_wait()):
+                return func(self, *args, **kwargs)
+    return wrapper
+
+def parece_documento(term):
+    """Un término sin espacios y con algún dígito puede ser un DNI ('4512', 'AB123456', '12-345')."""
+    term = (term or "").strip()
+    return bool(term) and not any(c.isspace() for c in term) and any(c.isdigit() for c in term)
 
 class DatabaseManager:
     _instance = None
@@ -18,72 +61,99 @@ class DatabaseManager:
         if self._initialized:
             return
 
-        # Connection Details
-        self.driver = '{ODBC Driver 17 for SQL Server}'
-        self.server = r'LAPTOP-3COEKCGP\SQLEXPRESS'
-        self.database = 'LabDivinoNinoDB'
-        self.trusted_connection = 'yes'
-
-        self.connection_string = (
-            f"DRIVER={self.driver};"
-            f"SERVER={self.server};"
-            f"DATABASE={self.database};"
-            f"Trusted_Connection={self.trusted_connection};"
+        # Motor (SQL Server o SQLite) y lo específico de su SQL: LIS_DB_BACKEND, ver services.dialectos
+        self.dialecto = crear_dialecto()
+
+        # Tiempos por consulta y log de consultas lentas (LIS_QUERY_STATS, LIS_SLOW_QUERY_MS)
+        self.stats = QueryStats()
+        self.pool = ConnectionPool(
+            self.stats.envolver(self.dialecto.conectar),
+            pool_size=5,
+            max_overflow=5,
+            timeout=30.0,
+            ping_after=60.0,
+            recycle_after=1800.0
         )
-
-        self.connection = None
+        # Índice de RangosReferencia compartido por todo el proceso
+        self.rango_index = RangoIndex(self._to_days)
+        # Médicos, perfiles y analitos como modelos, invalidados por sus upsert/delete
+        self.catalogos = CatalogCache(self, check_interval=30.0)
+        # Índice de nombres de pacientes (palabras/trigramas) para búsquedas y duplicados
+        self.paciente_index = PacienteIndex()
+        self.paciente_index_sync = 0.0
+        # Claves de bloqueo de pacientes para detectar duplicados (se sincroniza con el índice de nombres)
+        self.duplicados = DetectorDuplicados()
+        # PDFs ya dibujados de órdenes validadas; se invalidan al cambiar resultados o referencias
+        self.reportes = ReporteCache(os.path.join(os.getcwd(), ".cache", "reportes"))
+        # Id de PERFIL_POR_DEFECTO, resuelto una vez por proceso (ver default_profile_id)
+        self._default_profile_id = None
+        self._default_profile_lock = threading.Lock()
         self._initialized = True
 
     def connect(self):
-        """Establishes the database connection."""
+        """Verifies the database is reachable and warms up the connection pool."""
         try:
-            self.connection = pyodbc.connect(self.connection_string)
+            with self.pool.connection() as conn:
+                if conn is None:
+                    raise ConnectionError("no se pudo abrir una conexión")
             print("Conexión a base de datos exitosa.")
             return True
         except Exception as e:
             print(f"Error conectando a la base de datos: {e}")
-            self.connection = None
             return False
 
     def close(self):
-        """Closes the database connection."""
-        if self.connection:
-            self.connection.close()
-            print("Conexión cerrada.")
-            self.connection = None
+        """Closes every idle pooled connection."""
+        self.pool.close_all()
+        print("Conexiones cerradas.")
 
     def get_connection(self):
-        try:
-            # Si no existe, conectamos
-            if not hasattr(self, 'connection') or self.connection is None:
-                self.connection = pyodbc.connect(self.connection_string)
-            
-            # Probamos si está viva
-            try:
-                cursor = self.connection.cursor()
-                cursor.execute("SELECT 1")
-            except Exception:
-                # Si falló, reconectamos a la fuerza
-                self.connection = pyodbc.connect(self.connection_string)
-            
-            return self.connection
-        except Exception as e:
-            print(f"Error connecting to DB: {e}")
-            return None
+        # Conexión prestada por @with_connection al hilo actual (None si falló el checkout)
+        return self.pool.current()
+
+    def pool_metrics(self):
+        return self.pool.metrics()
+
+    def query_stats(self, top=None):
+        """Consultas por (método, huella SQL) con p50/p95/p99, de mayor a menor tiempo total."""
+        return self.stats.resumen(top)
 
     def sanitize_input(self, value):
         if value == '':
             return None
         return value
 
+    @with_connection
+    def get_catalog_version(self, tabla):
+        """Versión barata de un catálogo (filas + checksum) para detectar cambios hechos desde otra estación."""
+        if tabla not in ('Medicos', 'PerfilesExamen', 'Analitos'):
+            raise ValueError(f"Catálogo desconocido: {tabla}")
+        conn = self.get_connection()
+        if not conn: return None
+        return self.dialecto.version_catalogo(conn.cursor(), tabla)
+
     # --- CRUD ANALITOS ---
+    @with_connection
     def get_all_analitos(self):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Analitos ORDER BY nombre")
+        cursor.execute(f"SELECT {proyeccion(Analito)} FROM Analitos ORDER BY nombre")
+        return cursor.fetchall()
+
+    @with_connection
+    def get_formulas_calculadas(self):
+        """(id, abreviatura, formula) de los analitos calculados, para validar el grafo de fórmulas."""
+        conn = self.get_connection()
+        if not conn: return []
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, abreviatura, formula FROM Analitos
+            WHERE esCalculado = 1 AND formula IS NOT NULL AND formula <> ''
+        """)
         return cursor.fetchall()
 
+    @with_connection
     def upsert_analito(self, data):
         conn = self.get_connection()
         if not conn: return
@@ -131,15 +201,23 @@ class DatabaseManager:
                                    val_min, val_max, visual, esCalculado, formula,
                                    subtitulo, valor_defecto, abreviatura))
         conn.commit()
+        self.catalogos.invalidar('analitos')
+        # La referencia genérica del analito se imprime en los reportes
+        self.reportes.limpiar()
 
+    @with_connection
     def delete_analito(self, analito_id):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
         cursor.execute("DELETE FROM Analitos WHERE id = ?", (analito_id,))
         conn.commit()
+        self.catalogos.invalidar('analitos')
+        self.rango_index.invalidar(analito_id)
+        self.reportes.limpiar()
 
     # --- CRUD OPCIONES ANALITO ---
+    @with_connection
     def get_opciones_analito(self, analito_id):
         conn = self.get_connection()
         if not conn: return []
@@ -147,6 +225,33 @@ class DatabaseManager:
         cursor.execute("SELECT id, analitoId, valorOpcion, esPredeterminado FROM OpcionesAnalito WHERE analitoId = ? ORDER BY id", (analito_id,))
         return cursor.fetchall()
 
+    @with_connection
+    def get_opciones_by_orden(self, orden_id):
+        """
+        Devuelve {analitoId: [{'text', 'default'}, ...]} para todos los analitos
+        de tipo Opciones de la orden, en una sola consulta.
+        """
+        conn = self.get_connection()
+        if not conn: return {}
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT o.analitoId, o.valorOpcion, o.esPredeterminado
+            FROM OpcionesAnalito o
+            WHERE o.analitoId IN (
+                SELECT r.analitoId
+                FROM OrdenResultados r
+                JOIN Analitos a ON r.analitoId = a.id
+                WHERE r.ordenTrabajoId = ? AND a.tipoDato = 'Opciones'
+            )
+            ORDER BY o.analitoId, o.id
+        """, (orden_id,))
+
+        opciones = {}
+        for aid, valor, es_def in cursor.fetchall():
+            opciones.setdefault(aid, []).append({'text': valor, 'default': bool(es_def)})
+        return opciones
+
+    @with_connection
     def add_opcion_analito(self, analito_id, valor, es_predeterminado):
         conn = self.get_connection()
         if not conn: return
@@ -159,6 +264,7 @@ class DatabaseManager:
                        (analito_id, valor, 1 if es_predeterminado else 0))
         conn.commit()
 
+    @with_connection
     def delete_opcion_analito(self, opcion_id):
         conn = self.get_connection()
         if not conn: return
@@ -167,13 +273,15 @@ class DatabaseManager:
         conn.commit()
 
     # --- CRUD RANGOS ---
+    @with_connection
     def get_rangos_by_analito(self, analito_id):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM RangosReferencia WHERE analitoId = ?", analito_id)
+        cursor.execute(f"SELECT {proyeccion(RangoReferencia)} FROM RangosReferencia WHERE analitoId = ?", (analito_id,))
         return cursor.fetchall()
 
+    @with_connection
     def add_rango(self, data):
         conn = self.get_connection()
         if not conn: return
@@ -193,48 +301,57 @@ class DatabaseManager:
             float(data['panicoMax']) if data.get('panicoMax') else None
         ))
         conn.commit()
+        self.rango_index.invalidar(data['analitoId'])
+        self.reportes.limpiar()
 
+    @with_connection
     def delete_rango(self, rango_id):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM RangosReferencia WHERE id = ?", rango_id)
+        cursor.execute("DELETE FROM RangosReferencia WHERE id = ?", (rango_id,))
         conn.commit()
+        self.rango_index.invalidar_rango(rango_id)
+        self.reportes.limpiar()
 
     # --- CRUD PERFILES ---
+    @with_connection
     def get_all_perfiles(self):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM PerfilesExamen ORDER BY nombre")
+        cursor.execute(f"SELECT {proyeccion(PerfilExamen)} FROM PerfilesExamen ORDER BY nombre")
         return cursor.fetchall()
 
+    @with_connection
     def get_perfil_analitos(self, perfil_id):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT a.*
+        cursor.execute(f"""
+            SELECT {proyeccion(Analito, 'a')}
             FROM Analitos a
             JOIN DetallePerfilAnalito dpa ON a.id = dpa.analitoId
             WHERE dpa.perfilExamenId = ?
             ORDER BY dpa.orden ASC
-        """, perfil_id)
+        """, (perfil_id,))
         return cursor.fetchall()
 
+    @with_connection
     def get_perfil_hijos(self, perfil_id):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT p.*
+        cursor.execute(f"""
+            SELECT {proyeccion(PerfilExamen, 'p')}
             FROM PerfilesExamen p
             JOIN DetallePerfilComposicion dpc ON p.id = dpc.perfilHijoId
             WHERE dpc.perfilPadreId = ?
             ORDER BY dpc.orden ASC
-        """, perfil_id)
+        """, (perfil_id,))
         return cursor.fetchall()
 
+    @with_connection
     def upsert_perfil(self, data, analito_ids, sub_perfil_ids=[]):
         conn = self.get_connection()
         if not conn: return
@@ -249,14 +366,14 @@ class DatabaseManager:
                 WHERE id=?
             """, (data['nombre'], data['categoria'], precio, perfil_id))
             # Limpiar relaciones anteriores
-            cursor.execute("DELETE FROM DetallePerfilAnalito WHERE perfilExamenId=?", perfil_id)
-            cursor.execute("DELETE FROM DetallePerfilComposicion WHERE perfilPadreId=?", perfil_id)
+            cursor.execute("DELETE FROM DetallePerfilAnalito WHERE perfilExamenId=?", (perfil_id,))
+            cursor.execute("DELETE FROM DetallePerfilComposicion WHERE perfilPadreId=?", (perfil_id,))
         else:
-            cursor.execute("""
+            cursor.execute(self.dialecto.con_salida("""
                 INSERT INTO PerfilesExamen (nombre, categoria, precioEstandar)
-                OUTPUT INSERTED.ID
+                {salida}
                 VALUES (?, ?, ?)
-            """, (data['nombre'], data['categoria'], precio))
+            """, "{t}id"), (data['nombre'], data['categoria'], precio))
             perfil_id = cursor.fetchone()[0]
 
         # Insertar Analitos Directos
@@ -274,68 +391,177 @@ class DatabaseManager:
             """, (perfil_id, sub_pid, idx))
 
         conn.commit()
+        self.catalogos.invalidar('perfiles')
+        if perfil_id == self._default_profile_id:
+            self._default_profile_id = None  # renombrado: se resuelve de nuevo en el próximo uso
 
+    @with_connection
     def delete_perfil(self, perfil_id):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
         cursor.execute("DELETE FROM PerfilesExamen WHERE id = ?", (perfil_id,))
         conn.commit()
+        self.catalogos.invalidar('perfiles')
+        if perfil_id == self._default_profile_id:
+            self._default_profile_id = None
 
+    @with_connection
     def get_analitos_by_perfil_recursivo(self, perfil_id):
         """
         Devuelve una lista de tuplas (analito_id, perfil_origen_id)
         Traversa recursivamente los sub-perfiles.
         """
-        results = []
+        return self.expandir_perfiles([perfil_id])[0]
+
+    @with_connection
+    def expandir_perfiles(self, perfil_ids):
+        """
+        Expande varios perfiles (y sus sub-perfiles, a cualquier profundidad) con una
+        sola consulta recursiva. Devuelve una lista paralela a perfil_ids, cada una con
+        tuplas (analito_id, perfil_origen_id) en el mismo orden que el recorrido en
+        profundidad anterior: primero los analitos directos del perfil, luego cada
+        sub-perfil según DetallePerfilComposicion.orden.
+
+        Un perfil que aparece entre sus propios ancestros se descarta (protección de ciclos).
+        """
+        if not perfil_ids: return []
         conn = self.get_connection()
-        if not conn: return []
+        if not conn: return [[] for _ in perfil_ids]
         cursor = conn.cursor()
 
-        # 1. Analitos directos de este perfil
-        cursor.execute("""
-            SELECT analitoId
-            FROM DetallePerfilAnalito
-            WHERE perfilExamenId = ?
-            ORDER BY orden ASC
-        """, perfil_id)
-        direct_analitos = cursor.fetchall()
-        for row in direct_analitos:
-            results.append((row[0], perfil_id))
-
-        # 2. Analitos de sub-perfiles
-        cursor.execute("""
-            SELECT perfilHijoId
-            FROM DetallePerfilComposicion
-            WHERE perfilPadreId = ?
-            ORDER BY orden ASC
-        """, perfil_id)
-        hijos = cursor.fetchall()
-
-        for hijo in hijos:
-            hijo_id = hijo[0]
-            # Recursion: los analitos del hijo pertenecen al hijo (o sus propios hijos)
-            sub_results = self.get_analitos_by_perfil_recursivo(hijo_id)
-            results.extend(sub_results)
+        valores = ", ".join("(?, ?)" for _ in perfil_ids)
+        params = []
+        for posicion, pid in enumerate(perfil_ids):
+            params.extend([posicion, pid])
+
+        cursor.execute(self.dialecto.sql_expandir_perfiles(valores), params)
 
+        results = [[] for _ in perfil_ids]
+        for posicion, aid, pid in cursor.fetchall():
+            results[posicion].append((aid, pid))
         return results
 
     # --- PHASE 2: PACIENTES ---
+    @with_connection
     def get_all_pacientes(self):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Pacientes ORDER BY id DESC")
+        cursor.execute(f"SELECT {proyeccion(Paciente)} FROM Pacientes ORDER BY id DESC")
+        return cursor.fetchall()
+
+    @with_connection
+    def get_pacientes_page(self, page_size=100, after_id=None):
+        """Pacientes más recientes primero, paginados por id (keyset): after_id = último id de la página anterior."""
+        conn = self.get_connection()
+        if not conn: return []
+        cursor = conn.cursor()
+        if after_id is None:
+            cursor.execute(f"SELECT {proyeccion(Paciente)} FROM Pacientes ORDER BY id DESC {self.dialecto.limite}", (page_size,))
+        else:
+            cursor.execute(f"SELECT {proyeccion(Paciente)} FROM Pacientes WHERE id < ? ORDER BY id DESC {self.dialecto.limite}",
+                           (after_id, page_size))
         return cursor.fetchall()
 
-    def search_pacientes(self, term):
+    @with_connection
+    def get_pacientes_para_duplicados(self):
+        """Columnas que usa el detector de duplicados, para el modo por lotes."""
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        term = f"%{term}%"
-        cursor.execute("SELECT * FROM Pacientes WHERE nombreCompleto LIKE ? OR dni LIKE ? ORDER BY id DESC", (term, term))
+        cursor.execute("SELECT id, nombreCompleto, edad, unidadEdad, genero, dni, fechaCreacion FROM Pacientes")
         return cursor.fetchall()
 
+    @with_connection
+    def search_pacientes(self, term, limit=50):
+        """
+        Búsqueda de pacientes limitada a `limit` filas.
+        Si el término puede ser un documento (ver parece_documento) se busca también como
+        prefijo de DNI (LIKE 'term%', puede usar el índice de dni) y esas filas van primero;
+        el nombre se busca siempre.
+        """
+        conn = self.get_connection()
+        if not conn: return []
+        cursor = conn.cursor()
+        term = (term or "").strip()
+        if not term: return []
+
+        filas = []
+        if parece_documento(term):
+            cursor.execute(f"""
+                SELECT {proyeccion(Paciente)}
+                FROM Pacientes WHERE dni LIKE ?{self.dialecto.like_escape} ORDER BY dni {self.dialecto.limite}
+            """, (f"{self.dialecto.escapar_like(term)}%", limit))
+            filas = cursor.fetchall()
+
+        # Nombres: índice de palabras (sin tildes, en cualquier orden, tolera errores de tipeo)
+        self._sincronizar_paciente_index(cursor)
+        vistos = {row[0] for row in filas}
+        ranking = [pid for pid, _ in self.paciente_index.buscar(term, limit) if pid not in vistos]
+        filas += self._get_pacientes_por_ids(cursor, ranking)
+        return filas[:limit]
+
+    def _get_pacientes_por_ids(self, cursor, ids):
+        """Filas de Pacientes en el mismo orden que `ids`."""
+        if not ids: return []
+        placeholders = ", ".join("?" * len(ids))
+        cursor.execute(f"""
+            SELECT {proyeccion(Paciente)}
+            FROM Pacientes WHERE id IN ({placeholders})
+        """, ids)
+        por_id = {row[0]: row for row in cursor.fetchall()}
+        return [por_id[pid] for pid in ids if pid in por_id]
+
+    def _sincronizar_paciente_index(self, cursor, intervalo=30.0):
+        """
+        Carga el índice de nombres y el detector de duplicados la primera vez y, cada
+        `intervalo` segundos, los compara con la tabla. La versión es
+        (hasta_id, COUNT, SUM(CHECKSUM(id, nombreCompleto, edad, unidadEdad, genero, dni)))
+        de las filas con id <= hasta_id: si coincide sólo se agregan las altas posteriores
+        (id > hasta_id, p.ej. de otra estación); si no (edición o baja remota), se recarga
+        completo. Las ediciones y bajas de este proceso ajustan la versión en
+        upsert/delete_paciente.
+        """
+        idx = self.paciente_index
+        ahora = time.monotonic()
+        if idx.cargado and ahora - self.paciente_index_sync < intervalo:
+            return
+        self.paciente_index_sync = ahora
+
+        version_sql = f"""
+            SELECT COUNT(*),
+                   COALESCE(SUM(CAST({CHECKSUM_PACIENTE.format(t='')} AS BIGINT)), 0),
+                   (SELECT COALESCE(MAX(id), 0) FROM Pacientes)
+            FROM Pacientes WHERE id <= ?
+        """
+        columnas = "id, nombreCompleto, edad, unidadEdad, genero, dni, fechaCreacion"
+        recargar = True
+        if idx.cargado and idx.version:
+            hasta, filas, suma = idx.version
+            cursor.execute(version_sql, (hasta,))
+            filas_db, suma_db, max_id = cursor.fetchone()
+            if (filas_db, suma_db) == (filas, suma):
+                if max_id <= hasta:
+                    return
+                recargar = False
+                cursor.execute(f"SELECT {columnas} FROM Pacientes WHERE id > ? ORDER BY id", (hasta,))
+                for row in cursor.fetchall():
+                    idx.agregar(row[0], row[1])
+                    self.duplicados.agregar(*row)
+
+        if recargar:
+            cursor.execute(f"SELECT {columnas} FROM Pacientes")
+            rows = cursor.fetchall()
+            idx.cargar((r[0], r[1]) for r in rows)
+            self.duplicados.cargar(rows)
+            max_id = max((r[0] for r in rows), default=0)
+
+        cursor.execute(version_sql, (max_id,))
+        filas_db, suma_db, _ = cursor.fetchone()
+        idx.version = (max_id, filas_db, suma_db)
+
+    @with_connection
     def upsert_paciente(self, data):
         conn = self.get_connection()
         if not conn: return
@@ -349,39 +575,70 @@ class DatabaseManager:
         telefono = self.sanitize_input(data.get('telefono'))
 
         if data.get('id'):
-             cursor.execute("""
-                UPDATE Pacientes SET nombreCompleto=?, edad=?, unidadEdad=?, genero=?, dni=?, telefono=?
-                WHERE id=?
-            """, (nombre, edad, unidad_edad, genero, dni, telefono, data['id']))
+            # (id, fechaCreacion, checksum nuevo - anterior)
+            row = self.dialecto.actualizar_paciente(cursor, (nombre, edad, unidad_edad, genero, dni, telefono, data['id']))
+            filas = 0
         else:
-            cursor.execute("""
+            cursor.execute(self.dialecto.con_salida(f"""
                 INSERT INTO Pacientes (nombreCompleto, edad, unidadEdad, genero, dni, telefono, fechaCreacion)
-                VALUES (?, ?, ?, ?, ?, ?, GETDATE())
-            """, (nombre, edad, unidad_edad, genero, dni, telefono))
+                {{salida}}
+                VALUES (?, ?, ?, ?, ?, ?, {self.dialecto.ahora})
+            """, f"{{t}}id, {{t}}fechaCreacion, CAST({CHECKSUM_PACIENTE} AS BIGINT)"),
+                (nombre, edad, unidad_edad, genero, dni, telefono))
+            row = cursor.fetchone()
+            filas = 1
         conn.commit()
 
+        if row and self.paciente_index.cargado:
+            paciente_id, fecha, delta = row
+            self.paciente_index.agregar(paciente_id, nombre)
+            self.duplicados.agregar(paciente_id, nombre, edad, unidad_edad, genero, dni, fecha)
+            self.paciente_index.ajustar_version(paciente_id, filas, delta)
+        return row[0] if row else None
+
+    @with_connection
     def delete_paciente(self, paciente_id):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM Pacientes WHERE id = ?", (paciente_id,))
+        cursor.execute(self.dialecto.con_salida("""
+            DELETE FROM Pacientes
+            {salida}
+            WHERE id = ?
+        """, f"CAST({CHECKSUM_PACIENTE} AS BIGINT)", fila="DELETED"), (paciente_id,))
+        row = cursor.fetchone()
         conn.commit()
+        if row:
+            self.paciente_index.quitar(paciente_id)
+            self.duplicados.quitar(paciente_id)
+            self.paciente_index.ajustar_version(paciente_id, -1, -row[0])
 
     # --- PHASE 7: DUPLICADOS & HISTORIAL ---
-    def check_paciente_duplicates(self, dni, nombre):
+    @with_connection
+    def check_paciente_duplicates(self, dni, nombre, edad=None, unidad_edad=None, genero=None, excluir_id=None):
+        """
+        Pacientes que podrían ser la misma persona: primero por DNI exacto y, si no hay,
+        por el detector de duplicados (nombre fonético + año de nacimiento + género),
+        ordenados del más al menos probable.
+        """
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
 
         if dni:
-            cursor.execute("SELECT * FROM Pacientes WHERE dni = ?", (dni,))
+            cursor.execute(f"""
+                SELECT {proyeccion(Paciente)}
+                FROM Pacientes WHERE dni = ? AND id <> ?
+            """, (dni, excluir_id or 0))
             by_dni = cursor.fetchall()
             if by_dni: return by_dni
 
-        term = f"%{nombre}%"
-        cursor.execute("SELECT * FROM Pacientes WHERE nombreCompleto LIKE ?", (term,))
-        return cursor.fetchall()
+        if not tokens(nombre): return []
+        self._sincronizar_paciente_index(cursor)
+        ranking = self.duplicados.candidatos(nombre, edad, unidad_edad, genero, dni, limit=20, excluir=excluir_id)
+        return self._get_pacientes_por_ids(cursor, [pid for pid, _ in ranking])
 
+    @with_connection
     def get_historial_fechas(self, paciente_id):
         conn = self.get_connection()
         if not conn: return []
@@ -395,13 +652,15 @@ class DatabaseManager:
         return cursor.fetchall()
 
     # --- PHASE 6: MEDICOS ---
+    @with_connection
     def get_all_medicos(self):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Medicos ORDER BY nombre")
+        cursor.execute(f"SELECT {proyeccion(Medico)} FROM Medicos ORDER BY nombre")
         return cursor.fetchall()
 
+    @with_connection
     def upsert_medico(self, data):
         conn = self.get_connection()
         if not conn: return
@@ -423,15 +682,19 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?)
             """, (nombre, especialidad, telefono, tiene_convenio))
         conn.commit()
+        self.catalogos.invalidar('medicos')
 
+    @with_connection
     def delete_medico(self, medico_id):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
         cursor.execute("DELETE FROM Medicos WHERE id = ?", (medico_id,))
         conn.commit()
+        self.catalogos.invalidar('medicos')
 
     # --- TARIFAS CONVENIO ---
+    @with_connection
     def get_tarifa_especial(self, medico_id, perfil_id):
         conn = self.get_connection()
         if not conn: return None
@@ -443,6 +706,7 @@ class DatabaseManager:
         row = cursor.fetchone()
         return float(row[0]) if row else None
 
+    @with_connection
     def upsert_tarifa_convenio(self, medico_id, perfil_id, precio):
         conn = self.get_connection()
         if not conn: return
@@ -459,6 +723,7 @@ class DatabaseManager:
                            (medico_id, perfil_id, precio))
         conn.commit()
 
+    @with_connection
     def get_tarifas_medico(self, medico_id):
         conn = self.get_connection()
         if not conn: return []
@@ -473,6 +738,7 @@ class DatabaseManager:
         cursor.execute(query, (medico_id,))
         return cursor.fetchall()
 
+    @with_connection
     def delete_tarifa_convenio(self, tarifa_id):
         conn = self.get_connection()
         if not conn: return
@@ -481,109 +747,185 @@ class DatabaseManager:
         conn.commit()
 
 
+    @property
+    def default_profile_id(self):
+        """
+        Id del perfil por defecto, cacheado por proceso: los caminos calientes (crear órdenes,
+        cargar resultados) no consultan PerfilesExamen. Se resuelve en el primer uso.
+        """
+        perfil_id = self._default_profile_id
+        if perfil_id is None:
+            with self._default_profile_lock:
+                if self._default_profile_id is None:
+                    self.ensure_default_profile()
+                perfil_id = self._default_profile_id
+        return perfil_id
+
+    @with_connection
     def ensure_default_profile(self):
+        """Busca (o crea, de forma atómica) el perfil por defecto y refresca default_profile_id."""
         conn = self.get_connection()
         if not conn: return None
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id FROM PerfilesExamen WHERE nombre = 'Examenes Individuales'")
-        row = cursor.fetchone()
-        if row:
-            return row[0]
-        else:
-            cursor.execute("""
-                INSERT INTO PerfilesExamen (nombre, categoria, precioEstandar)
-                OUTPUT INSERTED.ID
-                VALUES ('Examenes Individuales', 'General', 0)
-            """)
-            conn.commit()
-            return cursor.fetchone()[0]
+        perfil_id, creado = self.dialecto.crear_perfil_por_defecto(cursor, PERFIL_POR_DEFECTO)
+        conn.commit()
+        if creado:
+            self.catalogos.invalidar('perfiles')
+        self._default_profile_id = perfil_id
+        return perfil_id
 
+    @with_connection
     def create_orden_trabajo(self, paciente_id, medico_id, items, total_pagar=0.0):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
 
-        default_profile_id = self.ensure_default_profile()
+        default_profile_id = self.default_profile_id
 
         # Insertar Orden
-        cursor.execute("""
+        cursor.execute(self.dialecto.con_salida(f"""
             INSERT INTO OrdenesTrabajo (pacienteId, medicoId, estado, totalPagar, fechaCreacion)
-            OUTPUT INSERTED.ID
-            VALUES (?, ?, 'Pendiente', ?, GETDATE())
-        """, (paciente_id, medico_id, total_pagar))
+            {{salida}}
+            VALUES (?, ?, 'Pendiente', ?, {self.dialecto.ahora})
+        """, "{t}id"), (paciente_id, medico_id, total_pagar))
         orden_id = cursor.fetchone()[0]
 
+        perfiles = [item for item in items if item['type'] == 'perfil']
+        # RECURSIVIDAD: todos los analitos (hijos, nietos...) con su padre inmediato, en una consulta
+        expansion = iter(self.expandir_perfiles([item['id'] for item in perfiles]))
+
         # Insertar Items (Perfiles facturados)
+        orden_perfiles = []
+        orden_resultados = []
         for item in items:
             if item['type'] == 'perfil':
                 # Solo guardamos el perfil Padre en OrdenPerfiles para facturación
-                cursor.execute("""
-                    INSERT INTO OrdenPerfiles (ordenTrabajoId, perfilExamenId, precioCobrado)
-                    VALUES (?, ?, ?)
-                """, (orden_id, item['id'], item.get('precio', 0)))
-
-                # RECURSIVIDAD: Obtener todos los analitos (hijos, nietos...) con su padre inmediato
-                analitos_data = self.get_analitos_by_perfil_recursivo(item['id'])
-
-                for aid, pid in analitos_data:
-                    cursor.execute("""
-                        INSERT INTO OrdenResultados (ordenTrabajoId, perfilExamenId, analitoId, estado)
-                        VALUES (?, ?, ?, 'Pendiente')
-                    """, (orden_id, pid, aid))
+                orden_perfiles.append((orden_id, item['id'], item.get('precio', 0)))
+                for aid, pid in next(expansion):
+                    orden_resultados.append((orden_id, pid, aid))
 
             elif item['type'] == 'analito':
-                cursor.execute("""
-                    INSERT INTO OrdenResultados (ordenTrabajoId, perfilExamenId, analitoId, estado)
-                    VALUES (?, ?, ?, 'Pendiente')
-                """, (orden_id, default_profile_id, item['id']))
+                orden_resultados.append((orden_id, default_profile_id, item['id']))
+
+        # Inserciones en bloque: un único envío por tabla
+        self.dialecto.preparar_lote(cursor)
+        if orden_perfiles:
+            cursor.executemany("""
+                INSERT INTO OrdenPerfiles (ordenTrabajoId, perfilExamenId, precioCobrado)
+                VALUES (?, ?, ?)
+            """, orden_perfiles)
+        if orden_resultados:
+            cursor.executemany("""
+                INSERT INTO OrdenResultados (ordenTrabajoId, perfilExamenId, analitoId, estado)
+                VALUES (?, ?, ?, 'Pendiente')
+            """, orden_resultados)
 
         conn.commit()
         return orden_id
 
     # --- PHASE 6: FILTROS ORDENES ---
+    def _filtro_ordenes(self, search_term=None, medico_id=None, estado=None):
+        where = ""
+        params = []
+
+        if search_term:
+            # % y _ escritos por el usuario se buscan literalmente
+            escape = self.dialecto.like_escape
+            where += f" AND (p.nombreCompleto LIKE ?{escape} OR p.dni LIKE ?{escape})"
+            term = f"%{self.dialecto.escapar_like(search_term)}%"
+            params.extend([term, term])
+
+        if medico_id and str(medico_id).isdigit():
+            where += " AND o.medicoId = ?"
+            params.append(medico_id)
+
+        if estado and estado != "Todos":
+            where += " AND o.estado = ?"
+            params.append(estado)
+
+        return where, params
+
+    @with_connection
     def get_ordenes_filtradas(self, search_term=None, medico_id=None, estado=None):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
 
-        query = """
+        where, params = self._filtro_ordenes(search_term, medico_id, estado)
+        query = f"""
             SELECT o.id, p.nombreCompleto, o.fechaCreacion, o.estado, m.nombre as nombreMedico, p.dni
             FROM OrdenesTrabajo o
             JOIN Pacientes p ON o.pacienteId = p.id
             LEFT JOIN Medicos m ON o.medicoId = m.id
-            WHERE 1=1
+            WHERE 1=1 {where}
+            ORDER BY o.fechaCreacion DESC
         """
-        params = []
 
-        if search_term:
-            query += " AND (p.nombreCompleto LIKE ? OR p.dni LIKE ?)"
-            term = f"%{search_term}%"
-            params.extend([term, term])
+        cursor.execute(query, params)
+        return cursor.fetchall()
 
-        if medico_id and str(medico_id).isdigit():
-            query += " AND o.medicoId = ?"
-            params.append(medico_id)
+    @with_connection
+    def get_ordenes_filtradas_page(self, search_term=None, medico_id=None, estado=None, page_size=50, after=None):
+        """
+        Una página de get_ordenes_filtradas con paginación por clave (keyset).
+        after: (fechaCreacion, id) de la última fila de la página anterior, o None para la primera.
+        """
+        conn = self.get_connection()
+        if not conn: return []
+        cursor = conn.cursor()
 
-        if estado and estado != "Todos":
-            query += " AND o.estado = ?"
-            params.append(estado)
+        where, params = self._filtro_ordenes(search_term, medico_id, estado)
+        if after:
+            fecha, oid = after
+            where += " AND (o.fechaCreacion < ? OR (o.fechaCreacion = ? AND o.id < ?))"
+            params.extend([fecha, fecha, oid])
 
-        query += " ORDER BY o.fechaCreacion DESC"
+        query = f"""
+            SELECT o.id, p.nombreCompleto, o.fechaCreacion, o.estado, m.nombre as nombreMedico, p.dni
+            FROM OrdenesTrabajo o
+            JOIN Pacientes p ON o.pacienteId = p.id
+            LEFT JOIN Medicos m ON o.medicoId = m.id
+            WHERE 1=1 {where}
+            ORDER BY o.fechaCreacion DESC, o.id DESC
+            {self.dialecto.limite}
+        """
 
-        cursor.execute(query, params)
+        cursor.execute(query, params + [page_size])
         return cursor.fetchall()
 
+    @with_connection
+    def get_orden_fila(self, orden_id, search_term=None, medico_id=None, estado=None):
+        """Fila de get_ordenes_filtradas de una sola orden, o None si no cumple los filtros."""
+        conn = self.get_connection()
+        if not conn: return None
+        cursor = conn.cursor()
+
+        where, params = self._filtro_ordenes(search_term, medico_id, estado)
+        query = f"""
+            SELECT o.id, p.nombreCompleto, o.fechaCreacion, o.estado, m.nombre as nombreMedico, p.dni
+            FROM OrdenesTrabajo o
+            JOIN Pacientes p ON o.pacienteId = p.id
+            LEFT JOIN Medicos m ON o.medicoId = m.id
+            WHERE o.id = ? {where}
+        """
+
+        cursor.execute(query, [orden_id] + params)
+        return cursor.fetchone()
+
     def get_ordenes_pendientes_filtradas(self, search_term=None, medico_id=None):
         return self.get_ordenes_filtradas(search_term, medico_id, estado=None)
 
+    @with_connection
     def delete_orden(self, orden_id):
         conn = self.get_connection()
         if not conn: return
         cursor = conn.cursor()
         cursor.execute("DELETE FROM OrdenesTrabajo WHERE id = ?", (orden_id,))
         conn.commit()
+        self.reportes.invalidar([orden_id])
 
+    @with_connection
     def validate_orden(self, orden_id, user):
         conn = self.get_connection()
         if not conn: return
@@ -601,6 +943,7 @@ class DatabaseManager:
 
         conn.commit()
 
+    @with_connection
     def unlock_orden(self, orden_id):
         conn = self.get_connection()
         if not conn: return
@@ -613,14 +956,15 @@ class DatabaseManager:
         """, (orden_id,))
 
         conn.commit()
+        self.reportes.invalidar([orden_id])
 
-
+    @with_connection
     def get_resultados_grouped(self, orden_id):
         conn = self.get_connection()
         if not conn: return []
         cursor = conn.cursor()
 
-        default_profile_id = self.ensure_default_profile()
+        default_profile_id = self.default_profile_id
 
         # Added a.abreviatura, a.formula, a.esCalculado, r.validadoPor
         query = """
@@ -634,11 +978,51 @@ class DatabaseManager:
             JOIN PerfilesExamen p ON r.perfilExamenId = p.id
             LEFT JOIN DetallePerfilAnalito dpa ON (dpa.perfilExamenId = r.perfilExamenId AND dpa.analitoId = r.analitoId)
             WHERE r.ordenTrabajoId = ?
-            ORDER BY p.nombre, ISNULL(dpa.orden, 9999) ASC, a.categoria, a.nombre
+            ORDER BY p.nombre, COALESCE(dpa.orden, 9999) ASC, a.categoria, a.nombre
         """
         cursor.execute(query, (orden_id,))
         rows = cursor.fetchall()
 
+        # Todas las opciones de los analitos de la orden en una sola consulta
+        opciones_por_analito = self.get_opciones_by_orden(orden_id)
+        return self._agrupar_resultados(rows, opciones_por_analito, default_profile_id)
+
+    @with_connection
+    def get_resultados_grouped_bulk(self, orden_ids):
+        """
+        get_resultados_grouped de varias órdenes (reportes por lote): {orden_id: grupos}.
+        Una consulta por cada 1000 órdenes; sin 'opciones' (el reporte no las usa).
+        """
+        conn = self.get_connection()
+        if not conn: return {}
+        cursor = conn.cursor()
+
+        default_profile_id = self.default_profile_id
+        orden_ids = list(dict.fromkeys(orden_ids))
+        por_orden = {}
+        for inicio in range(0, len(orden_ids), 1000):
+            lote = orden_ids[inicio:inicio + 1000]
+            placeholders = ", ".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT
+                    r.ordenTrabajoId,
+                    r.id, r.analitoId, a.nombre, r.valorResultado, r.estado, a.unidad, a.tipoDato, a.categoria,
+                    p.id as perfilId, p.nombre as perfilNombre, a.metodo,
+                    a.subtituloReporte, a.valorPorDefecto,
+                    a.abreviatura, a.formula, a.esCalculado, r.validadoPor
+                FROM OrdenResultados r
+                JOIN Analitos a ON r.analitoId = a.id
+                JOIN PerfilesExamen p ON r.perfilExamenId = p.id
+                LEFT JOIN DetallePerfilAnalito dpa ON (dpa.perfilExamenId = r.perfilExamenId AND dpa.analitoId = r.analitoId)
+                WHERE r.ordenTrabajoId IN ({placeholders})
+                ORDER BY r.ordenTrabajoId, p.nombre, COALESCE(dpa.orden, 9999) ASC, a.categoria, a.nombre
+            """, lote)
+            for row in cursor.fetchall():
+                por_orden.setdefault(row[0], []).append(tuple(row[1:]))
+
+        return {oid: self._agrupar_resultados(rows, {}, default_profile_id) for oid, rows in por_orden.items()}
+
+    def _agrupar_resultados(self, rows, opciones_por_analito, default_profile_id):
         groups = {}
 
         for row in rows:
@@ -646,9 +1030,7 @@ class DatabaseManager:
 
             opciones_list = []
             if dtype == 'Opciones':
-                opts = self.get_opciones_analito(aid)
-                for o in opts:
-                    opciones_list.append({'text': o[2], 'default': bool(o[3])})
+                opciones_list = [dict(o) for o in opciones_por_analito.get(aid, [])]
 
             item_data = {
                 'id': rid, 'analitoId': aid, 'nombre': aname, 'valor': val,
@@ -676,186 +1058,185 @@ class DatabaseManager:
         result_list.sort(key=lambda x: (0 if x['type'] == 'Perfil' else 1, x['title']))
         return result_list
 
+    @with_connection
     def update_resultado_batch(self, updates):
+        """
+        Guarda los valores en un solo lote SQL por cada 1000 filas (límite de 2100
+        parámetros): sólo toca filas no validadas cuyo valor o estado cambia, y recalcula
+        el estado de la orden en la misma sentencia. Devuelve el número de filas modificadas.
+        Si un id se repite, vale el último valor.
+        """
         conn = self.get_connection()
-        if not conn: return
+        if not conn: return 0
         cursor = conn.cursor()
 
-        orden_id = None
-        for u in updates:
-            if not orden_id:
-                cursor.execute("SELECT ordenTrabajoId FROM OrdenResultados WHERE id = ?", (u['id'],))
-                res = cursor.fetchone()
-                if res: orden_id = res[0]
-
-            cursor.execute("""
-                UPDATE OrdenResultados SET valorResultado = ?, estado = 'Ingresado', fechaRegistro = GETDATE()
-                WHERE id = ? AND estado != 'Validado'
-            """, (u['valor'], u['id']))
+        # Un id por fila: la tabla de cambios del lote tiene clave primaria en id
+        filas = list({u['id']: u['valor'] for u in updates}.items())
+        cambiadas = 0
+        ordenes = set()
+        for inicio in range(0, len(filas), 1000):
+            lote = filas[inicio:inicio + 1000]
+            filas_lote, ordenes_lote = self.dialecto.guardar_resultados(cursor, lote)
+            cambiadas += filas_lote
+            ordenes.update(ordenes_lote)
 
         conn.commit()
+        self.reportes.invalidar(ordenes)
+        return cambiadas
 
-        if orden_id:
-            self._check_and_update_orden_status(orden_id)
+    def _format_rango_reference(self, rango):
+        """rango = (valorMin, valorMax, panicoMin, panicoMax, referenciaVisualEspecifica, textoInterpretacion)"""
+        if not rango:
+            return ""
+        r_min, r_max, r_pmin, r_pmax, r_visual_esp, r_interp = rango
 
-    def _check_and_update_orden_status(self, orden_id):
-        conn = self.get_connection()
-        if not conn: return
-        cursor = conn.cursor()
+        # Lógica de Prioridades para mostrar el texto
 
-        cursor.execute("SELECT COUNT(*) FROM OrdenResultados WHERE ordenTrabajoId = ?", (orden_id,))
-        total = cursor.fetchone()[0]
+        # A. Si tiene Texto Largo (Ej: Tabla de semanas), gana esto.
+        if r_visual_esp and str(r_visual_esp).strip():
+            return str(r_visual_esp)
 
-        cursor.execute("SELECT COUNT(*) FROM OrdenResultados WHERE ordenTrabajoId = ? AND valorResultado IS NOT NULL AND valorResultado <> ''", (orden_id,))
-        filled = cursor.fetchone()[0]
+        # B. Si tiene Interpretación Corta (Ej: "Negativo" o "R.N."), lo mostramos.
+        if r_interp and str(r_interp).strip():
+            # Si además tiene números, los ponemos juntos: "R.N.: 10 - 20"
+            if r_min is not None and r_max is not None:
+                return f"{r_interp}: {r_min} - {r_max}"
+            return str(r_interp)
 
-        if total > 0 and total == filled:
-            cursor.execute("""
-                UPDATE OrdenesTrabajo SET estado = 'Completado', fechaCompletado = GETDATE()
-                WHERE id = ?
-            """, (orden_id,))
-        else:
-            cursor.execute("""
-                UPDATE OrdenesTrabajo SET estado = 'Pendiente', fechaCompletado = NULL
-                WHERE id = ?
-            """, (orden_id,))
+        # C. Si solo son números, mostramos el rango numérico
+        if r_min is not None and r_max is not None:
+            return f"{r_min} - {r_max}"
+        return ""
 
-        conn.commit()
+    def _format_smart_reference(self, rango, generico):
+        """
+        Texto de referencia para el informe: el rango específico del paciente si produce texto,
+        si no el genérico del Analito (referenciaVisual, valorRefMin, valorRefMax).
+        """
+        texto = self._format_rango_reference(rango)
+        if texto:
+            return texto
 
-    # REEMPLAZA TU FUNCIÓN get_smart_reference ACTUAL CON ESTA:
-    def get_smart_reference(self, analito_id, genero_paciente, edad_paciente, unidad_edad_paciente):
-        conn = self.get_connection()
-        if not conn: return ""
-        try:
-            cursor = conn.cursor()
-            
-            # 1. HACEMOS LA CONSULTA DIRECTA AQUÍ (Pidiendo explícitamente las 6 columnas)
-            # Nota: Usamos ISNULL(col, 0) o manejo de NULLs si fuera necesario, pero aquí Python lo maneja.
-            query = """
-                SELECT valorMin, valorMax, panicoMin, panicoMax, referenciaVisualEspecifica, textoInterpretacion
-                FROM RangosReferencia
-                WHERE analitoId = ? 
-                AND (genero = ? OR genero = 'Ambos' OR genero = 'Indistinto')
-                AND unidadEdad = ?
-                AND ? BETWEEN edadMin AND edadMax
-            """
-            # Ejecutamos buscando al paciente específico
-            cursor.execute(query, (analito_id, genero_paciente, unidad_edad_paciente, edad_paciente))
-            row = cursor.fetchone()
-            
-            # 2. SI ENCONTRAMOS RANGO ESPECÍFICO
-            if row:
-                # Ahora sí, row tiene 6 elementos porque los pedimos arriba en el SELECT
-                r_min, r_max, r_pmin, r_pmax, r_visual_esp, r_interp = row
-                
-                # Lógica de Prioridades para mostrar el texto
-                
-                # A. Si tiene Texto Largo (Ej: Tabla de semanas), gana esto.
-                if r_visual_esp and str(r_visual_esp).strip():
-                    return str(r_visual_esp)
-                
-                # B. Si tiene Interpretación Corta (Ej: "Negativo" o "R.N."), lo mostramos.
-                if r_interp and str(r_interp).strip():
-                    # Si además tiene números, los ponemos juntos: "R.N.: 10 - 20"
-                    if r_min is not None and r_max is not None:
-                        return f"{r_interp}: {r_min} - {r_max}"
-                    return str(r_interp)
-
-                # C. Si solo son números, mostramos el rango numérico
-                if r_min is not None and r_max is not None:
-                    return f"{r_min} - {r_max}"
-            
-            # 3. SI NO HAY RANGO ESPECÍFICO (Buscamos el genérico del Analito)
-            cursor.execute("SELECT referenciaVisual, valorRefMin, valorRefMax FROM Analitos WHERE id = ?", (analito_id,))
-            row_gen = cursor.fetchone()
-            if row_gen:
-                ref_vis, v_min, v_max = row_gen
-                if ref_vis: return str(ref_vis)
-                if v_min is not None and v_max is not None: return f"{v_min} - {v_max}"
-            
-            return "" # Nada encontrado
+        if generico:
+            ref_vis, v_min, v_max = generico
+            if ref_vis: return str(ref_vis)
+            if v_min is not None and v_max is not None: return f"{v_min} - {v_max}"
 
-        except Exception as e:
-            print(f"Error getting smart reference: {e}")
-            return ""
- 
-    def get_patient_range_values(self, analito_id, p_genero, p_edad, p_unidad):
+        return "" # Nada encontrado
+
+    @with_connection
+    def resolve_references_for_order(self, orden_id):
         """
-        Returns (min, max, panicoMin, panicoMax) for validation.
+        Resuelve de una vez las referencias de todos los analitos de una orden.
+        Devuelve {analitoId: {'valores': (min, max, panicoMin, panicoMax) | None, 'referencia': str}}
+
+        - 'valores': primer rango del género (o 'Ambos') que contiene la edad normalizada a días.
+        - 'referencia': rango de la misma unidad de edad; si no produce texto, el genérico del Analito.
         """
         conn = self.get_connection()
-        if not conn: return None
+        if not conn: return {}
         cursor = conn.cursor()
 
-        p_days = self._to_days(p_edad, p_unidad)
-        cursor.execute("SELECT * FROM RangosReferencia WHERE analitoId = ?", (analito_id,))
+        cursor.execute("""
+            SELECT a.id, a.referenciaVisual, a.valorRefMin, a.valorRefMax,
+                   pac.genero, pac.edad, pac.unidadEdad
+            FROM (SELECT DISTINCT analitoId FROM OrdenResultados WHERE ordenTrabajoId = ?) r
+            JOIN Analitos a ON a.id = r.analitoId
+            CROSS JOIN (
+                SELECT p.genero, p.edad, p.unidadEdad
+                FROM OrdenesTrabajo o
+                JOIN Pacientes p ON o.pacienteId = p.id
+                WHERE o.id = ?
+            ) pac
+        """, (orden_id, orden_id))
         rows = cursor.fetchall()
+        if not rows:
+            return {}
 
-        for row in rows:
-            # 2=genero, 3=min, 4=max
-            r_genero = row[2]
-            r_min = row[3]
-            r_max = row[4]
-            r_unidad = row[8]
+        # Rangos desde el índice en memoria (sólo se consultan los analitos aún no cargados)
+        self._ensure_rangos_indexados(cursor, [row[0] for row in rows])
 
-            if r_genero != 'Ambos' and r_genero != p_genero: continue
+        return self._resolver_referencias(rows)
 
-            r_min_days = self._to_days(r_min, r_unidad)
-            r_max_days = self._to_days(r_max, r_unidad)
-
-            if r_min_days <= p_days <= r_max_days:
-                # Found match
-                # 5=valMin, 6=valMax, 10=panicoMin, 11=panicoMax
-                return (row[5], row[6], row[10], row[11])
-
-        return None
-
-    def _build_smart_ref_string(self, analito_id, p_genero, p_edad, p_unidad):
-        # Re-implementation of previous get_smart_reference but fully self-contained
+    @with_connection
+    def resolve_references_for_orders(self, orden_ids):
+        """resolve_references_for_order de varias órdenes (reportes por lote): {orden_id: {analitoId: ...}}."""
         conn = self.get_connection()
-        if not conn: return ""
+        if not conn: return {}
         cursor = conn.cursor()
 
+        orden_ids = list(dict.fromkeys(orden_ids))
+        por_orden = {}
+        for inicio in range(0, len(orden_ids), 1000):
+            lote = orden_ids[inicio:inicio + 1000]
+            placeholders = ", ".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT r.ordenTrabajoId, a.id, a.referenciaVisual, a.valorRefMin, a.valorRefMax,
+                       p.genero, p.edad, p.unidadEdad
+                FROM (SELECT DISTINCT ordenTrabajoId, analitoId FROM OrdenResultados
+                      WHERE ordenTrabajoId IN ({placeholders})) r
+                JOIN Analitos a ON a.id = r.analitoId
+                JOIN OrdenesTrabajo o ON o.id = r.ordenTrabajoId
+                JOIN Pacientes p ON o.pacienteId = p.id
+            """, lote)
+            for row in cursor.fetchall():
+                por_orden.setdefault(row[0], []).append(tuple(row[1:]))
+
+        self._ensure_rangos_indexados(cursor, list({row[0] for rows in por_orden.values() for row in rows}))
+        return {oid: self._resolver_referencias(rows) for oid, rows in por_orden.items()}
+
+    def _resolver_referencias(self, rows):
+        # rows: (analitoId, referenciaVisual, valorRefMin, valorRefMax, genero, edad, unidadEdad) de una orden
+        p_genero, p_edad, p_unidad = rows[0][4], rows[0][5], rows[0][6]
         p_days = self._to_days(p_edad, p_unidad)
+        p_unidad_cmp = (p_unidad or "").lower()
+        p_genero_cmp = (p_genero or "").lower()
+
+        result = {}
+        for aid, ref_vis, v_ref_min, v_ref_max, _, _, _ in rows:
+            # Validación numérica
+            rango_num = self.rango_index.buscar(aid, p_genero, p_days)
+
+            # Texto de referencia: misma unidad de edad, edad sin normalizar
+            rango_ref = None
+            for r in self.rango_index.rangos(aid):
+                genero_ok = (r.genero or "").lower() in (p_genero_cmp, 'ambos', 'indistinto')
+                unidad_ok = (r.unidadEdad or "").lower() == p_unidad_cmp
+                if genero_ok and unidad_ok and r.edadMin is not None and r.edadMax is not None \
+                        and p_edad is not None and r.edadMin <= p_edad <= r.edadMax:
+                    rango_ref = r.valores() + (r.referenciaVisualEspecifica, r.textoInterpretacion)
+                    break
+
+            result[aid] = {
+                'valores': rango_num.valores() if rango_num else None,
+                'referencia': self._format_smart_reference(rango_ref, (ref_vis, v_ref_min, v_ref_max))
+            }
+        return result
 
-        cursor.execute("SELECT * FROM RangosReferencia WHERE analitoId = ?", (analito_id,))
-        rows = cursor.fetchall()
-
-        for row in rows:
-            r_genero = row[2]
-            r_min = row[3]
-            r_max = row[4]
-            r_val_min = row[5]
-            r_val_max = row[6]
-            r_visual = row[7]
-            r_unidad = row[8]
-            r_interp = row[9]
-
-            if r_genero != 'Ambos' and r_genero != p_genero: continue
-
-            r_min_days = self._to_days(r_min, r_unidad)
-            r_max_days = self._to_days(r_max, r_unidad)
-
-            if r_min_days <= p_days <= r_max_days:
-                prefix = ""
-                if r_genero == 'Masculino': prefix = "H: "
-                elif r_genero == 'Femenino': prefix = "M: "
-                if r_interp: prefix += f"{r_interp}: "
-
-                content = ""
-                if r_visual: content = r_visual
-                elif r_val_min is not None and r_val_max is not None: content = f"{r_val_min} - {r_val_max}"
-
-                if content: return prefix + content
-        return ""
-
+    def _ensure_rangos_indexados(self, cursor, analito_ids):
+        """Carga en rango_index los analitos que aún no están (un IN por cada 1000 analitos)."""
+        faltantes = self.rango_index.faltantes(analito_ids)
+        if not faltantes:
+            return
+        columnas = ", ".join(RangoNormalizado.COLUMNS)
+        for inicio in range(0, len(faltantes), 1000):
+            lote = faltantes[inicio:inicio + 1000]
+            placeholders = ", ".join("?" * len(lote))
+            cursor.execute(f"SELECT {columnas} FROM RangosReferencia WHERE analitoId IN ({placeholders})", lote)
+            self.rango_index.cargar(lote, cursor.fetchall())
+
+    @with_connection
     def get_orden_header(self, orden_id):
         conn = self.get_connection()
         if not conn: return None
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM OrdenesTrabajo WHERE id = ?", (orden_id,))
+        cursor.execute("""
+            SELECT id, pacienteId, medicoId, estado, totalPagar, fechaCreacion, fechaCompletado
+            FROM OrdenesTrabajo WHERE id = ?
+        """, (orden_id,))
         return cursor.fetchone()
 
+    @with_connection
     def get_report_header(self, orden_id):
         conn = self.get_connection()
         if not conn: return None
@@ -870,11 +1251,36 @@ class DatabaseManager:
         """, (orden_id,))
         return cursor.fetchone()
 
+    @with_connection
+    def get_report_headers_bulk(self, orden_ids):
+        """get_report_header de varias órdenes: {orden_id: (paciente, edad, unidad, genero, medico, fecha)}."""
+        conn = self.get_connection()
+        if not conn: return {}
+        cursor = conn.cursor()
+
+        orden_ids = list(dict.fromkeys(orden_ids))
+        headers = {}
+        for inicio in range(0, len(orden_ids), 1000):
+            lote = orden_ids[inicio:inicio + 1000]
+            placeholders = ", ".join("?" * len(lote))
+            cursor.execute(f"""
+                SELECT o.id, p.nombreCompleto, p.edad, p.unidadEdad, p.genero,
+                       m.nombre as Medico, o.fechaCreacion
+                FROM OrdenesTrabajo o
+                JOIN Pacientes p ON o.pacienteId = p.id
+                LEFT JOIN Medicos m ON o.medicoId = m.id
+                WHERE o.id IN ({placeholders})
+            """, lote)
+            for row in cursor.fetchall():
+                headers[row[0]] = tuple(row[1:])
+        return headers
+
+    @with_connection
     def get_paciente(self, paciente_id):
         conn = self.get_connection()
         if not conn: return None
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Pacientes WHERE id = ?", (paciente_id,))
+        cursor.execute(f"SELECT {proyeccion(Paciente)} FROM Pacientes WHERE id = ?", (paciente_id,))
         return cursor.fetchone()
 
     def _to_days(self, value, unit):
@@ -6,6 +6,7 @@ from views.crear_orden import CrearOrdenView
 from views.resultados import ResultadosView
 from views.ordenes import OrdenesView
 from views.medicos import MedicosView
+from services.reporte_pdf import configurar_reportlab
 
 def main(page: ft.Page):
     page.title = "LIS - Lab Divino Niño"
@@ -99,4 +100,6 @@ def main(page: ft.Page):
     )
 
 if __name__ == "__main__":
+    # Opciones globales de ReportLab (PDF sin ASCII85), una vez para todo el proceso
+    configurar_reportlab()
     ft.app(target=main)
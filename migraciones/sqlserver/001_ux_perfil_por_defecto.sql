@@ -0,0 +1,64 @@
+-- Un solo perfil "Examenes Individuales" (DatabaseManager.default_profile_id).
+--
+-- El esquema SQLite de services/dialectos.py ya trae este índice; en SQL Server hay que
+-- aplicarlo a mano, una vez (sqlcmd o SSMS). Es idempotente: se puede volver a ejecutar.
+-- Sin él, SqlServer.crear_perfil_por_defecto depende sólo de UPDLOCK + HOLDLOCK.
+--
+-- 1. Si ya hay duplicados, se conserva el más antiguo (el mismo que devuelve
+--    crear_perfil_por_defecto) y se le reasignan las referencias de los demás.
+-- 2. Índice único filtrado sobre ese nombre.
+
+SET ANSI_NULLS ON;
+SET QUOTED_IDENTIFIER ON;
+SET XACT_ABORT ON;
+GO
+
+BEGIN TRANSACTION;
+
+DECLARE @conservar INT = (
+    SELECT MIN(id) FROM dbo.PerfilesExamen WITH (UPDLOCK, HOLDLOCK)
+    WHERE nombre = 'Examenes Individuales'
+);
+
+IF @conservar IS NOT NULL
+BEGIN
+    DECLARE @duplicados TABLE (id INT PRIMARY KEY);
+    INSERT INTO @duplicados (id)
+    SELECT id FROM dbo.PerfilesExamen
+    WHERE nombre = 'Examenes Individuales' AND id <> @conservar;
+
+    UPDATE dbo.OrdenResultados SET perfilExamenId = @conservar
+    WHERE perfilExamenId IN (SELECT id FROM @duplicados);
+
+    UPDATE dbo.OrdenPerfiles SET perfilExamenId = @conservar
+    WHERE perfilExamenId IN (SELECT id FROM @duplicados);
+
+    -- Detalle y tarifas: lo que el conservado ya tiene se descarta, el resto se mueve
+    DELETE d FROM dbo.DetallePerfilAnalito d
+    WHERE d.perfilExamenId IN (SELECT id FROM @duplicados)
+      AND EXISTS (SELECT 1 FROM dbo.DetallePerfilAnalito k
+                  WHERE k.perfilExamenId = @conservar AND k.analitoId = d.analitoId);
+    UPDATE dbo.DetallePerfilAnalito SET perfilExamenId = @conservar
+    WHERE perfilExamenId IN (SELECT id FROM @duplicados);
+
+    DELETE t FROM dbo.TarifasConvenio t
+    WHERE t.perfilExamenId IN (SELECT id FROM @duplicados)
+      AND EXISTS (SELECT 1 FROM dbo.TarifasConvenio k
+                  WHERE k.perfilExamenId = @conservar AND k.medicoId = t.medicoId);
+    UPDATE dbo.TarifasConvenio SET perfilExamenId = @conservar
+    WHERE perfilExamenId IN (SELECT id FROM @duplicados);
+
+    DELETE FROM dbo.DetallePerfilComposicion
+    WHERE perfilPadreId IN (SELECT id FROM @duplicados) OR perfilHijoId IN (SELECT id FROM @duplicados);
+
+    DELETE FROM dbo.PerfilesExamen WHERE id IN (SELECT id FROM @duplicados);
+END
+
+COMMIT TRANSACTION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes
+               WHERE name = 'UX_PerfilesExamen_porDefecto' AND object_id = OBJECT_ID('dbo.PerfilesExamen'))
+    CREATE UNIQUE INDEX UX_PerfilesExamen_porDefecto ON dbo.PerfilesExamen (nombre)
+        WHERE nombre = 'Examenes Individuales';
+GO
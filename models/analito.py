@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import ClassVar, Optional
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Analito:
     id: int
     nombre: str
@@ -17,25 +17,21 @@ class Analito:
     formula: Optional[str] = None
     esCalculado: bool = False
     abreviatura: Optional[str] = None
+    valorPorDefecto: Optional[str] = None
+
+    # Columnas que proyectan los SELECT de analitos, en el orden de los campos
+    COLUMNS: ClassVar[tuple] = ('id', 'nombre', 'tipoDato', 'categoria', 'unidad', 'metodo', 'tipoMuestra',
+                                'valorRefMin', 'valorRefMax', 'referenciaVisual', 'subtituloReporte',
+                                'formula', 'esCalculado', 'abreviatura', 'valorPorDefecto')
 
     @classmethod
     def from_tuple(cls, t):
-        # Maps a pyodbc Row (tuple) to the Analito object.
-        # Assumes order: id, nombre, unidad, categoria, metodo, tipoMuestra, tipoDato,
-        # valorRefMin, valorRefMax, referenciaVisual, subtituloReporte, formula, esCalculado, abreviatura
+        # Fila con las columnas de COLUMNS (no SELECT *: no depende del orden físico de la tabla)
+        (id_, nombre, tipo, categoria, unidad, metodo, muestra, ref_min, ref_max,
+         ref_visual, subtitulo, formula, es_calculado, abreviatura, por_defecto) = t
         return cls(
-            id=t[0],
-            nombre=t[1],
-            unidad=t[2],
-            categoria=t[3],
-            metodo=t[4],
-            tipoMuestra=t[5],
-            tipoDato=t[6],
-            valorRefMin=float(t[7]) if t[7] is not None else None,
-            valorRefMax=float(t[8]) if t[8] is not None else None,
-            referenciaVisual=t[9],
-            subtituloReporte=t[10],
-            formula=t[11],
-            esCalculado=bool(t[12]),
-            abreviatura=t[13]
+            id_, nombre, tipo, categoria, unidad, metodo, muestra,
+            float(ref_min) if ref_min is not None else None,
+            float(ref_max) if ref_max is not None else None,
+            ref_visual, subtitulo, formula, bool(es_calculado), abreviatura, por_defecto
         )
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import ClassVar, Optional
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Medico:
     id: int
     nombre: str
@@ -9,12 +9,9 @@ class Medico:
     telefono: Optional[str] = None
     tieneConvenio: bool = False
 
+    COLUMNS: ClassVar[tuple] = ('id', 'nombre', 'especialidad', 'telefono', 'tieneConvenio')
+
     @classmethod
     def from_tuple(cls, t):
-        return cls(
-            id=t[0],
-            nombre=t[1],
-            especialidad=t[2],
-            telefono=t[3],
-            tieneConvenio=bool(t[4])
-        )
+        id_, nombre, especialidad, telefono, convenio = t
+        return cls(id_, nombre, especialidad, telefono, bool(convenio))
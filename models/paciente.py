@@ -1,8 +1,8 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import ClassVar, Optional
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True)
 class Paciente:
     id: int
     nombreCompleto: str
@@ -13,15 +13,9 @@ class Paciente:
     telefono: Optional[str] = None
     fechaCreacion: Optional[datetime] = None
 
+    COLUMNS: ClassVar[tuple] = ('id', 'nombreCompleto', 'edad', 'unidadEdad', 'genero', 'dni', 'telefono', 'fechaCreacion')
+
     @classmethod
     def from_tuple(cls, t):
-        return cls(
-            id=t[0],
-            nombreCompleto=t[1],
-            edad=t[2],
-            unidadEdad=t[3],
-            genero=t[4],
-            dni=t[5],
-            telefono=t[6],
-            fechaCreacion=t[7]
-        )
+        # Sin conversiones: la fila de COLUMNS va directo al constructor
+        return cls(*t)
@@ -1,18 +1,16 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import ClassVar
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PerfilExamen:
     id: int
     nombre: str
     categoria: str
     precioEstandar: float
 
+    COLUMNS: ClassVar[tuple] = ('id', 'nombre', 'categoria', 'precioEstandar')
+
     @classmethod
     def from_tuple(cls, t):
-        return cls(
-            id=t[0],
-            nombre=t[1],
-            categoria=t[2],
-            precioEstandar=float(t[3]) if t[3] is not None else 0.0
-        )
+        id_, nombre, categoria, precio = t
+        return cls(id_, nombre, categoria, float(precio) if precio is not None else 0.0)
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import ClassVar, Optional
 
-@dataclass
+@dataclass(slots=True)
 class RangoReferencia:
     id: int
     analitoId: int
@@ -16,19 +16,19 @@ class RangoReferencia:
     panicoMin: Optional[float] = None
     panicoMax: Optional[float] = None
 
+    COLUMNS: ClassVar[tuple] = ('id', 'analitoId', 'unidadEdad', 'genero', 'edadMin', 'edadMax',
+                                'valorMin', 'valorMax', 'referenciaVisualEspecifica', 'textoInterpretacion',
+                                'panicoMin', 'panicoMax')
+
     @classmethod
     def from_tuple(cls, t):
+        (id_, analito_id, unidad, genero, edad_min, edad_max, v_min, v_max,
+         ref_visual, interpretacion, p_min, p_max) = t
         return cls(
-            id=t[0],
-            analitoId=t[1],
-            genero=t[2],
-            edadMin=t[3],
-            edadMax=t[4],
-            valorMin=float(t[5]) if t[5] is not None else None,
-            valorMax=float(t[6]) if t[6] is not None else None,
-            referenciaVisualEspecifica=t[7],
-            unidadEdad=t[8],
-            textoInterpretacion=t[9],
-            panicoMin=float(t[10]) if t[10] is not None else None,
-            panicoMax=float(t[11]) if t[11] is not None else None
+            id_, analito_id, unidad, genero, edad_min, edad_max,
+            float(v_min) if v_min is not None else None,
+            float(v_max) if v_max is not None else None,
+            ref_visual, interpretacion,
+            float(p_min) if p_min is not None else None,
+            float(p_max) if p_max is not None else None
         )
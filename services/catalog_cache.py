@@ -0,0 +1,112 @@
+import threading
+import time
+
+from models.analito import Analito
+from models.medico import Medico
+from models.perfil_examen import PerfilExamen
+
+
+class CatalogCache:
+    """
+    Caché de proceso para los catálogos pequeños (Medicos, PerfilesExamen, Analitos)
+    como objetos de modelo.
+
+    Se llena en la primera lectura y los upsert/delete de DatabaseManager la invalidan.
+    Para ver cambios hechos desde otra estación, si pasaron más de `check_interval`
+    segundos desde la última comprobación se consulta una versión barata de la tabla
+    (COUNT + CHECKSUM_AGG) y sólo se recarga si cambió. check_interval=None la desactiva.
+
+    Todos los llamadores reciben las mismas instancias: los modelos de catálogo son
+    dataclasses congeladas (frozen), de sólo lectura. Las consultas se hacen fuera del lock,
+    así que un invalidar() (que corre con una conexión del pool tomada) nunca espera a una
+    carga que a su vez espera una conexión.
+    """
+
+    # nombre -> (modelo, método de carga en DatabaseManager, tabla)
+    CATALOGOS = {
+        'medicos': (Medico, 'get_all_medicos', 'Medicos'),
+        'perfiles': (PerfilExamen, 'get_all_perfiles', 'PerfilesExamen'),
+        'analitos': (Analito, 'get_all_analitos', 'Analitos'),
+    }
+
+    def __init__(self, db, check_interval=30.0):
+        self._db = db
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._datos = {}      # nombre -> [modelo]
+        self._por_id = {}     # nombre -> {id: modelo}
+        self._versiones = {}  # nombre -> versión de la tabla al cargar
+        self._revisado = {}   # nombre -> time.monotonic() de la última comprobación
+        self._generacion = {}  # nombre -> número de invalidaciones
+
+    def medicos(self):
+        return list(self._obtener('medicos'))
+
+    def perfiles(self):
+        return list(self._obtener('perfiles'))
+
+    def analitos(self):
+        return list(self._obtener('analitos'))
+
+    def get(self, nombre, item_id):
+        """Modelo por id (p.ej. get('medicos', 3)), o None."""
+        datos = self._obtener(nombre)
+        por_id = self._por_id.get(nombre)
+        if por_id is None:
+            # Carga que no se guardó (invalidada mientras tanto)
+            return next((m for m in datos if m.id == item_id), None)
+        return por_id.get(item_id)
+
+    def invalidar(self, nombre=None):
+        with self._lock:
+            nombres = [nombre] if nombre else list(self._datos)
+            for n in nombres:
+                self._datos.pop(n, None)
+                self._por_id.pop(n, None)
+                self._versiones.pop(n, None)
+                self._revisado.pop(n, None)
+            for n in ([nombre] if nombre else self.CATALOGOS):
+                self._generacion[n] = self._generacion.get(n, 0) + 1
+
+    def _obtener(self, nombre):
+        with self._lock:
+            datos = self._datos.get(nombre)
+            if datos is not None and not self._vencido(nombre):
+                return datos
+            generacion = self._generacion.get(nombre, 0)
+            version_cargada = self._versiones.get(nombre)
+
+        # Consultas sin el lock (ver docstring de la clase)
+        modelo, metodo, tabla = self.CATALOGOS[nombre]
+        if datos is not None:
+            # Comprobación barata antes de recargar todo el catálogo
+            version = self._db.get_catalog_version(tabla)
+            if version is not None and version == version_cargada:
+                with self._lock:
+                    if self._generacion.get(nombre, 0) == generacion:
+                        self._revisado[nombre] = time.monotonic()
+                return datos
+        else:
+            version = self._db.get_catalog_version(tabla) if self.check_interval is not None else None
+
+        rows = getattr(self._db, metodo)()
+        datos = [modelo.from_tuple(r) for r in rows]
+        if not datos:
+            # Sin conexión o tabla vacía: no se guarda, la próxima lectura vuelve a consultar
+            return datos
+
+        with self._lock:
+            # Si se invalidó durante la carga, lo leído puede ser anterior al cambio: se
+            # devuelve pero no se guarda
+            if self._generacion.get(nombre, 0) != generacion:
+                return datos
+            self._datos[nombre] = datos
+            self._por_id[nombre] = {m.id: m for m in datos}
+            self._versiones[nombre] = version
+            self._revisado[nombre] = time.monotonic()
+            return datos
+
+    def _vencido(self, nombre):
+        if self.check_interval is None:
+            return False
+        return time.monotonic() - self._revisado.get(nombre, 0) > self.check_interval
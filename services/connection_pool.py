@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """No hay conexiones disponibles dentro del tiempo de espera."""
+
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones con préstamo por checkout.
+
+    - pool_size: conexiones que se mantienen abiertas en reposo.
+    - max_overflow: conexiones extra permitidas en picos; se cierran al devolverse
+      si el pool ya está lleno.
+    - ping_after: segundos de inactividad tras los cuales se verifica la conexión
+      con SELECT 1 antes de prestarla (antes se hacía en cada consulta).
+    - recycle_after: antigüedad máxima de una conexión antes de reemplazarla.
+
+    El préstamo es reentrante por hilo: si un método de DatabaseManager llama a otro
+    mientras tiene una conexión prestada, ambos comparten la misma conexión (y transacción).
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=5, timeout=30.0,
+                 ping_after=60.0, recycle_after=1800.0):
+        self.creator = creator
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.recycle_after = recycle_after
+
+        self._idle = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._open = 0  # conexiones vivas (en reposo + prestadas)
+        self._local = threading.local()
+
+        # Métricas
+        self._in_use = 0
+        self._created = 0
+        self._recycled = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_wait = threading.local()
+
+    # --- PRÉSTAMO ---
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión al hilo actual. Produce None si no se pudo conectar,
+        igual que el antiguo get_connection(). Ante una excepción hace rollback.
+        """
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            self._local.depth += 1
+            try:
+                yield lease.raw
+            finally:
+                self._local.depth -= 1
+            return
+
+        try:
+            lease = self._checkout()
+        except Exception as e:
+            print(f"Error connecting to DB: {e}")
+            lease = None
+        if lease is None:
+            yield None
+            return
+
+        self._local.lease = lease
+        self._local.depth = 1
+        broken = False
+        try:
+            yield lease.raw
+        except Exception:
+            try:
+                lease.raw.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._local.lease = None
+            self._local.depth = 0
+            self._checkin(lease, broken)
+
+    def current(self):
+        """Conexión prestada al hilo actual, o None si no tiene préstamo activo."""
+        lease = getattr(self._local, 'lease', None)
+        return lease.raw if lease is not None else None
+
+    def last_wait(self):
+        """Tiempo (s) que esperó el último checkout del hilo actual."""
+        return getattr(self._last_wait, 'value', 0.0)
+
+    def _checkout(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        lease = None
+        create = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    lease = self._idle.pop()
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    self._open += 1
+                    create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Pool agotado ({self.pool_size}+{self.max_overflow}) tras {self.timeout}s")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if create:
+                lease = self._new_connection()
+            else:
+                lease = self._validate(lease)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+        self._last_wait.value = waited
+        return lease
+
+    def _checkin(self, lease, broken=False):
+        lease.last_used = time.monotonic()
+        discard = broken
+        with self._cond:
+            self._in_use -= 1
+            if not discard and len(self._idle) >= self.pool_size:
+                discard = True  # conexión de overflow
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append(lease)
+            self._cond.notify()
+        if discard:
+            self._close_raw(lease.raw)
+
+    def _new_connection(self):
+        raw = self.creator()
+        with self._cond:
+            self._created += 1
+        return _PooledConnection(raw)
+
+    def _validate(self, lease):
+        now = time.monotonic()
+        if self.recycle_after and now - lease.created_at > self.recycle_after:
+            return self._recycle(lease)
+        if self.ping_after is not None and now - lease.last_used > self.ping_after:
+            try:
+                cursor = lease.raw.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            except Exception:
+                return self._recycle(lease)
+        return lease
+
+    def _recycle(self, lease):
+        self._close_raw(lease.raw)
+        with self._cond:
+            self._recycled += 1
+        return self._new_connection()
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # --- ADMINISTRACIÓN ---
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for lease in idle:
+            self._close_raw(lease.raw)
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self._created,
+                'recycled': self._recycled,
+                'checkouts': self._checkouts,
+                'wait_total': self._wait_total,
+                'wait_avg': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_max': self._wait_max,
+            }
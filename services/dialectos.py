@@ -0,0 +1,469 @@
+"""
+Dialectos SQL de DatabaseManager: SQL Server (producción, pyodbc) y SQLite embebido
+(benchmarks, pruebas de carga y uso sin servidor en cualquier equipo).
+
+DatabaseManager escribe SQL común (COALESCE, CTEs, JOINs, '?') y pide al dialecto sólo
+lo que cambia entre motores:
+- conectar(): conexión DB-API nueva para el pool.
+- ahora / limite: fragmentos para la fecha actual y el "TOP N" al final de la consulta.
+- con_salida(): OUTPUT INSERTED.x (SQL Server) o RETURNING x (SQLite).
+- version_catalogo, sql_expandir_perfiles, guardar_resultados, actualizar_paciente:
+  sentencias que no tienen una forma común.
+
+Selección por variables de entorno:
+    LIS_DB_BACKEND=sqlserver | sqlite      (por defecto sqlserver)
+    LIS_ODBC_CONNECTION_STRING=...          cadena ODBC completa para SQL Server
+    LIS_SQLITE_PATH=ruta                    archivo SQLite (por defecto lab.sqlite3); el
+                                            esquema se crea al conectar si no existe
+"""
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+
+# Columnas del checksum de Pacientes (índice de nombres y detector de duplicados)
+CHECKSUM_PACIENTE = "CHECKSUM({t}id, {t}nombreCompleto, {t}edad, {t}unidadEdad, {t}genero, {t}dni)"
+
+
+class SqlServer:
+    nombre = 'sqlserver'
+    ahora = "GETDATE()"
+    # ORDER BY ... {limite}, con el tamaño como último parámetro (equivale a TOP (?))
+    limite = "OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+    like_escape = ""
+
+    def __init__(self, connection_string=None):
+        self.connection_string = connection_string or os.environ.get('LIS_ODBC_CONNECTION_STRING') or (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            r"SERVER=LAPTOP-3COEKCGP\SQLEXPRESS;"
+            "DATABASE=LabDivinoNinoDB;"
+            "Trusted_Connection=yes;"
+        )
+
+    def conectar(self):
+        import pyodbc  # sólo hace falta (y sólo tiene que estar instalado) con este dialecto
+        return pyodbc.connect(self.connection_string)
+
+    @staticmethod
+    def escapar_like(term):
+        # Los comodines escritos por el usuario se buscan literalmente
+        return term.replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')
+
+    def preparar_lote(self, cursor):
+        # Un único envío por executemany en lugar de una fila por round-trip
+        cursor.fast_executemany = True
+
+    def con_salida(self, sql, columnas, fila="INSERTED"):
+        """
+        Coloca `columnas` como OUTPUT en la marca {salida} de `sql`.
+        columnas usa {t} como prefijo de fila: "{t}id, {t}fechaCreacion".
+        """
+        return sql.replace("{salida}", "OUTPUT " + columnas.format(t=f"{fila}."))
+
+    def version_catalogo(self, cursor, tabla):
+        cursor.execute(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {tabla}")
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+    def crear_perfil_por_defecto(self, cursor, nombre):
+        """
+        Id del perfil `nombre` (el más antiguo si hubiera varios), insertándolo si falta.
+        Devuelve (id, creado). UPDLOCK + HOLDLOCK retiene el rango de la clave hasta el
+        commit: dos procesos que arrancan a la vez no pueden insertarlo los dos. El índice
+        único de migraciones/sqlserver/001_ux_perfil_por_defecto.sql lo asegura en la tabla.
+        """
+        cursor.execute("""
+            SET NOCOUNT ON;
+            DECLARE @id INT;
+            DECLARE @creado BIT = 0;
+            SELECT TOP 1 @id = id FROM PerfilesExamen WITH (UPDLOCK, HOLDLOCK)
+            WHERE nombre = ? ORDER BY id;
+            IF @id IS NULL
+            BEGIN
+                INSERT INTO PerfilesExamen (nombre, categoria, precioEstandar) VALUES (?, 'General', 0);
+                SET @id = SCOPE_IDENTITY();
+                SET @creado = 1;
+            END
+            SELECT @id, @creado;
+        """, (nombre, nombre))
+        row = cursor.fetchone()
+        return row[0], bool(row[1])
+
+    def sql_expandir_perfiles(self, valores):
+        return f"""
+            WITH Items (posicion, perfilId) AS (
+                SELECT posicion, perfilId FROM (VALUES {valores}) v (posicion, perfilId)
+            ),
+            Arbol (posicion, perfilId, ruta, claveOrden) AS (
+                SELECT posicion, perfilId,
+                       CAST('/' + CAST(perfilId AS VARCHAR(12)) + '/' AS VARCHAR(4000)),
+                       CAST('' AS VARCHAR(4000))
+                FROM Items
+                UNION ALL
+                SELECT a.posicion, dpc.perfilHijoId,
+                       CAST(a.ruta + CAST(dpc.perfilHijoId AS VARCHAR(12)) + '/' AS VARCHAR(4000)),
+                       CAST(a.claveOrden
+                            + RIGHT('0000000000' + CAST(dpc.orden AS VARCHAR(10)), 10) + ':'
+                            + RIGHT('000000000000' + CAST(dpc.perfilHijoId AS VARCHAR(12)), 12) + '/'
+                            AS VARCHAR(4000))
+                FROM Arbol a
+                JOIN DetallePerfilComposicion dpc ON dpc.perfilPadreId = a.perfilId
+                WHERE a.ruta NOT LIKE '%/' + CAST(dpc.perfilHijoId AS VARCHAR(12)) + '/%'
+            )
+            SELECT t.posicion, dpa.analitoId, t.perfilId
+            FROM Arbol t
+            JOIN DetallePerfilAnalito dpa ON dpa.perfilExamenId = t.perfilId
+            ORDER BY t.posicion, t.claveOrden, dpa.orden
+            OPTION (MAXRECURSION 100)
+        """
+
+    def guardar_resultados(self, cursor, lote):
+        """
+        Un lote de update_resultado_batch (<= 1000 filas (id, valor)) en una sola sentencia.
+        Devuelve (filas modificadas, ids de las órdenes tocadas).
+        """
+        valores = ", ".join(["(?, ?)"] * len(lote))
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @cambios TABLE (id INT PRIMARY KEY, valor NVARCHAR(MAX));
+            DECLARE @ordenes TABLE (id INT);
+            INSERT INTO @cambios (id, valor) VALUES {valores};
+
+            UPDATE r SET valorResultado = c.valor, estado = 'Ingresado', fechaRegistro = GETDATE()
+            OUTPUT INSERTED.ordenTrabajoId INTO @ordenes
+            FROM OrdenResultados r
+            JOIN @cambios c ON r.id = c.id
+            WHERE r.estado != 'Validado'
+              AND (r.estado != 'Ingresado'
+                   OR (r.valorResultado IS NULL AND c.valor IS NOT NULL)
+                   OR (r.valorResultado IS NOT NULL AND c.valor IS NULL)
+                   OR r.valorResultado <> c.valor COLLATE Latin1_General_BIN2);
+            DECLARE @filas INT = @@ROWCOUNT;
+
+            UPDATE o SET
+                estado = CASE WHEN s.total > 0 AND s.total = s.llenos THEN 'Completado' ELSE 'Pendiente' END,
+                fechaCompletado = CASE WHEN s.total > 0 AND s.total = s.llenos THEN GETDATE() ELSE NULL END
+            FROM OrdenesTrabajo o
+            JOIN (
+                SELECT ordenTrabajoId,
+                       COUNT(*) AS total,
+                       SUM(CASE WHEN valorResultado IS NOT NULL AND valorResultado <> '' THEN 1 ELSE 0 END) AS llenos
+                FROM OrdenResultados
+                WHERE ordenTrabajoId IN (
+                    SELECT r.ordenTrabajoId FROM OrdenResultados r JOIN @cambios c ON r.id = c.id
+                )
+                GROUP BY ordenTrabajoId
+            ) s ON s.ordenTrabajoId = o.id;
+
+            SELECT @filas;
+            SELECT DISTINCT id FROM @ordenes;
+        """, [p for fila in lote for p in fila])
+        cambiadas = cursor.fetchone()[0]
+        ordenes = set()
+        if cursor.nextset():
+            ordenes.update(row[0] for row in cursor.fetchall())
+        return cambiadas, ordenes
+
+    def actualizar_paciente(self, cursor, params):
+        """
+        UPDATE de un paciente (params = columnas editables + id).
+        Devuelve (id, fechaCreacion, checksum nuevo - checksum anterior) o None si no existe.
+        """
+        cursor.execute(f"""
+            UPDATE Pacientes SET nombreCompleto=?, edad=?, unidadEdad=?, genero=?, dni=?, telefono=?
+            OUTPUT INSERTED.id, INSERTED.fechaCreacion,
+                   CAST({CHECKSUM_PACIENTE.format(t="INSERTED.")} AS BIGINT)
+                   - CAST({CHECKSUM_PACIENTE.format(t="DELETED.")} AS BIGINT)
+            WHERE id=?
+        """, params)
+        return cursor.fetchone()
+
+
+# --- SQLITE ---
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS Medicos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    especialidad TEXT,
+    telefono TEXT,
+    tieneConvenio INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Pacientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombreCompleto TEXT NOT NULL,
+    edad INTEGER,
+    unidadEdad TEXT,
+    genero TEXT,
+    dni TEXT,
+    telefono TEXT,
+    fechaCreacion TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS IX_Pacientes_dni ON Pacientes (dni);
+
+CREATE TABLE IF NOT EXISTS Analitos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    unidad TEXT,
+    categoria TEXT,
+    metodo TEXT,
+    tipoMuestra TEXT,
+    tipoDato TEXT,
+    valorRefMin REAL,
+    valorRefMax REAL,
+    referenciaVisual TEXT,
+    subtituloReporte TEXT,
+    formula TEXT,
+    esCalculado INTEGER NOT NULL DEFAULT 0,
+    abreviatura TEXT,
+    valorPorDefecto TEXT
+);
+
+CREATE TABLE IF NOT EXISTS OpcionesAnalito (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    analitoId INTEGER NOT NULL REFERENCES Analitos (id) ON DELETE CASCADE,
+    valorOpcion TEXT NOT NULL,
+    esPredeterminado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS IX_OpcionesAnalito_analito ON OpcionesAnalito (analitoId);
+
+CREATE TABLE IF NOT EXISTS RangosReferencia (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    analitoId INTEGER NOT NULL REFERENCES Analitos (id) ON DELETE CASCADE,
+    genero TEXT,
+    edadMin INTEGER,
+    edadMax INTEGER,
+    valorMin REAL,
+    valorMax REAL,
+    referenciaVisualEspecifica TEXT,
+    unidadEdad TEXT,
+    textoInterpretacion TEXT,
+    panicoMin REAL,
+    panicoMax REAL
+);
+CREATE INDEX IF NOT EXISTS IX_RangosReferencia_analito ON RangosReferencia (analitoId);
+
+CREATE TABLE IF NOT EXISTS PerfilesExamen (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    categoria TEXT,
+    precioEstandar REAL NOT NULL DEFAULT 0
+);
+-- Un solo perfil de analitos sueltos (DatabaseManager.default_profile_id)
+CREATE UNIQUE INDEX IF NOT EXISTS UX_PerfilesExamen_porDefecto ON PerfilesExamen (nombre)
+    WHERE nombre = 'Examenes Individuales';
+
+CREATE TABLE IF NOT EXISTS DetallePerfilAnalito (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    perfilExamenId INTEGER NOT NULL REFERENCES PerfilesExamen (id) ON DELETE CASCADE,
+    analitoId INTEGER NOT NULL REFERENCES Analitos (id) ON DELETE CASCADE,
+    orden INTEGER
+);
+CREATE INDEX IF NOT EXISTS IX_DetallePerfilAnalito_perfil ON DetallePerfilAnalito (perfilExamenId, analitoId);
+
+CREATE TABLE IF NOT EXISTS DetallePerfilComposicion (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    perfilPadreId INTEGER NOT NULL REFERENCES PerfilesExamen (id) ON DELETE CASCADE,
+    perfilHijoId INTEGER NOT NULL REFERENCES PerfilesExamen (id) ON DELETE CASCADE,
+    orden INTEGER
+);
+CREATE INDEX IF NOT EXISTS IX_DetallePerfilComposicion_padre ON DetallePerfilComposicion (perfilPadreId);
+
+CREATE TABLE IF NOT EXISTS TarifasConvenio (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    medicoId INTEGER NOT NULL REFERENCES Medicos (id) ON DELETE CASCADE,
+    perfilExamenId INTEGER NOT NULL REFERENCES PerfilesExamen (id) ON DELETE CASCADE,
+    precioEspecial REAL
+);
+CREATE INDEX IF NOT EXISTS IX_TarifasConvenio_medico ON TarifasConvenio (medicoId, perfilExamenId);
+
+CREATE TABLE IF NOT EXISTS OrdenesTrabajo (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pacienteId INTEGER NOT NULL REFERENCES Pacientes (id),
+    medicoId INTEGER REFERENCES Medicos (id),
+    estado TEXT NOT NULL DEFAULT 'Pendiente',
+    totalPagar REAL NOT NULL DEFAULT 0,
+    fechaCreacion TIMESTAMP,
+    fechaCompletado TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS IX_OrdenesTrabajo_fecha ON OrdenesTrabajo (fechaCreacion, id);
+CREATE INDEX IF NOT EXISTS IX_OrdenesTrabajo_paciente ON OrdenesTrabajo (pacienteId);
+
+CREATE TABLE IF NOT EXISTS OrdenPerfiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ordenTrabajoId INTEGER NOT NULL REFERENCES OrdenesTrabajo (id) ON DELETE CASCADE,
+    perfilExamenId INTEGER NOT NULL REFERENCES PerfilesExamen (id),
+    precioCobrado REAL
+);
+CREATE INDEX IF NOT EXISTS IX_OrdenPerfiles_orden ON OrdenPerfiles (ordenTrabajoId);
+
+CREATE TABLE IF NOT EXISTS OrdenResultados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ordenTrabajoId INTEGER NOT NULL REFERENCES OrdenesTrabajo (id) ON DELETE CASCADE,
+    perfilExamenId INTEGER NOT NULL REFERENCES PerfilesExamen (id),
+    analitoId INTEGER NOT NULL REFERENCES Analitos (id),
+    valorResultado TEXT,
+    estado TEXT NOT NULL DEFAULT 'Pendiente',
+    fechaRegistro TIMESTAMP,
+    validadoPor TEXT
+);
+CREATE INDEX IF NOT EXISTS IX_OrdenResultados_orden ON OrdenResultados (ordenTrabajoId);
+"""
+
+
+def _checksum(*valores):
+    # Equivalente de CHECKSUM(): entero de 32 bits con signo, estable entre procesos
+    c = zlib.crc32(repr(valores).encode('utf-8'))
+    return c - (1 << 32) if c >= (1 << 31) else c
+
+
+def _adaptar_fecha(valor):
+    # Mismo formato que strftime('%Y-%m-%d %H:%M:%f'): se compara bien como texto
+    return valor.isoformat(" ", timespec="milliseconds")
+
+
+def _convertir_fecha(valor):
+    return datetime.fromisoformat(valor.decode())
+
+
+sqlite3.register_adapter(datetime, _adaptar_fecha)
+sqlite3.register_converter("TIMESTAMP", _convertir_fecha)
+
+
+class Sqlite:
+    nombre = 'sqlite'
+    ahora = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+    limite = "LIMIT ?"
+    like_escape = " ESCAPE '\\'"
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or os.environ.get('LIS_SQLITE_PATH') or os.path.join(os.getcwd(), "lab.sqlite3")
+        self._esquema_listo = False
+        self._lock = threading.Lock()
+        self._columnas = {}
+
+    def conectar(self):
+        # El pool presta cada conexión a un solo hilo a la vez, aunque no siempre el mismo
+        conn = sqlite3.connect(self.ruta, timeout=30.0, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False)
+        conn.create_function("CHECKSUM", -1, _checksum, deterministic=True)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            if not self._esquema_listo:
+                conn.executescript(ESQUEMA_SQLITE)
+                self._esquema_listo = True
+        return conn
+
+    @staticmethod
+    def escapar_like(term):
+        return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    def preparar_lote(self, cursor):
+        pass  # executemany de sqlite3 ya es un único paso en proceso
+
+    def con_salida(self, sql, columnas, fila="INSERTED"):
+        # RETURNING va al final y ve la fila nueva (INSERT/UPDATE) o la borrada (DELETE)
+        return sql.replace("{salida}", "").rstrip() + "\nRETURNING " + columnas.format(t="")
+
+    def version_catalogo(self, cursor, tabla):
+        # Sin BINARY_CHECKSUM(*): se suma CHECKSUM sobre las columnas de la tabla
+        columnas = self._columnas.get(tabla)
+        if columnas is None:
+            cursor.execute(f"PRAGMA table_info({tabla})")
+            columnas = self._columnas[tabla] = ", ".join(row[1] for row in cursor.fetchall())
+        cursor.execute(f"SELECT COUNT(*), TOTAL(CHECKSUM({columnas})) FROM {tabla}")
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+    def crear_perfil_por_defecto(self, cursor, nombre):
+        # El índice único parcial del esquema hace atómico el INSERT OR IGNORE entre procesos
+        cursor.execute("INSERT OR IGNORE INTO PerfilesExamen (nombre, categoria, precioEstandar) VALUES (?, 'General', 0)",
+                       (nombre,))
+        creado = cursor.rowcount == 1
+        cursor.execute("SELECT id FROM PerfilesExamen WHERE nombre = ? ORDER BY id LIMIT 1", (nombre,))
+        return cursor.fetchone()[0], creado
+
+    def sql_expandir_perfiles(self, valores):
+        return f"""
+            WITH RECURSIVE Items (posicion, perfilId) AS (
+                VALUES {valores}
+            ),
+            Arbol (posicion, perfilId, ruta, claveOrden, nivel) AS (
+                SELECT posicion, perfilId, '/' || perfilId || '/', '', 0
+                FROM Items
+                UNION ALL
+                SELECT a.posicion, dpc.perfilHijoId,
+                       a.ruta || dpc.perfilHijoId || '/',
+                       a.claveOrden || printf('%010d:%012d/', dpc.orden, dpc.perfilHijoId),
+                       a.nivel + 1
+                FROM Arbol a
+                JOIN DetallePerfilComposicion dpc ON dpc.perfilPadreId = a.perfilId
+                WHERE a.ruta NOT LIKE '%/' || dpc.perfilHijoId || '/%'
+                  AND a.nivel < 100
+            )
+            SELECT t.posicion, dpa.analitoId, t.perfilId
+            FROM Arbol t
+            JOIN DetallePerfilAnalito dpa ON dpa.perfilExamenId = t.perfilId
+            ORDER BY t.posicion, t.claveOrden, dpa.orden
+        """
+
+    def guardar_resultados(self, cursor, lote):
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS cambios (id INTEGER PRIMARY KEY, valor TEXT)")
+        cursor.execute("DELETE FROM temp.cambios")
+        cursor.executemany("INSERT OR REPLACE INTO temp.cambios (id, valor) VALUES (?, ?)", lote)
+
+        cursor.execute(f"""
+            UPDATE OrdenResultados SET valorResultado = c.valor, estado = 'Ingresado', fechaRegistro = {self.ahora}
+            FROM temp.cambios c
+            WHERE OrdenResultados.id = c.id
+              AND OrdenResultados.estado != 'Validado'
+              AND (OrdenResultados.estado != 'Ingresado' OR OrdenResultados.valorResultado IS NOT c.valor)
+            RETURNING ordenTrabajoId
+        """)
+        tocadas = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"""
+            UPDATE OrdenesTrabajo SET
+                estado = CASE WHEN s.total > 0 AND s.total = s.llenos THEN 'Completado' ELSE 'Pendiente' END,
+                fechaCompletado = CASE WHEN s.total > 0 AND s.total = s.llenos THEN {self.ahora} ELSE NULL END
+            FROM (
+                SELECT ordenTrabajoId,
+                       COUNT(*) AS total,
+                       SUM(CASE WHEN valorResultado IS NOT NULL AND valorResultado <> '' THEN 1 ELSE 0 END) AS llenos
+                FROM OrdenResultados
+                WHERE ordenTrabajoId IN (
+                    SELECT r.ordenTrabajoId FROM OrdenResultados r JOIN temp.cambios c ON r.id = c.id
+                )
+                GROUP BY ordenTrabajoId
+            ) s
+            WHERE s.ordenTrabajoId = OrdenesTrabajo.id
+        """)
+        return len(tocadas), set(tocadas)
+
+    def actualizar_paciente(self, cursor, params):
+        # RETURNING sólo ve la fila nueva: el checksum anterior se lee antes, en la misma transacción
+        cursor.execute(f"SELECT {CHECKSUM_PACIENTE.format(t='')} FROM Pacientes WHERE id = ?", (params[-1],))
+        antes = cursor.fetchone()
+        if antes is None:
+            return None
+        cursor.execute(f"""
+            UPDATE Pacientes SET nombreCompleto=?, edad=?, unidadEdad=?, genero=?, dni=?, telefono=?
+            WHERE id=?
+            RETURNING id, fechaCreacion, {CHECKSUM_PACIENTE.format(t='')}
+        """, params)
+        row = cursor.fetchone()
+        return (row[0], row[1], row[2] - antes[0]) if row else None
+
+
+DIALECTOS = {'sqlserver': SqlServer, 'sqlite': Sqlite}
+
+
+def crear_dialecto(nombre=None):
+    nombre = (nombre or os.environ.get('LIS_DB_BACKEND') or 'sqlserver').strip().lower()
+    if nombre not in DIALECTOS:
+        raise ValueError(f"LIS_DB_BACKEND desconocido: {nombre} (opciones: {', '.join(DIALECTOS)})")
+    return DIALECTOS[nombre]()
@@ -0,0 +1,395 @@
+"""
+Detección de pacientes duplicados.
+
+Cada paciente se resume en claves de bloqueo: el código fonético (español) de cada
+palabra del nombre y una banda de año de nacimiento estimada desde edad/unidadEdad.
+Sólo se comparan pacientes que comparten alguna clave, y a esos candidatos se les
+calcula un puntaje (Jaro-Winkler por palabras + edad + género + DNI).
+
+- En línea: DatabaseManager mantiene un DetectorDuplicados en memoria (se carga junto
+  con el índice de nombres y se actualiza en upsert/delete_paciente) y lo usa en
+  check_paciente_duplicates.
+- Por lotes: `python -m services.duplicados` recorre toda la tabla Pacientes y agrupa
+  los duplicados probables en clusters (union-find).
+"""
+import argparse
+import csv
+import sys
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from services.paciente_index import normalizar, tokens
+
+UMBRAL = 0.88            # puntaje mínimo para considerar un par como duplicado probable
+MIN_NOMBRE = 0.85        # similitud mínima de nombres, sin importar edad/género
+ANCHO_BANDA = 5          # años por banda de nacimiento
+TOLERANCIA_ANIOS = 2     # diferencia de año de nacimiento que aún se considera la misma persona
+MAX_CANDIDATOS = 500     # candidatos a puntuar por consulta (los que más claves comparten)
+MAX_BLOQUE = 2000        # en modo lote, bloques más grandes se omiten (p.ej. "JUAN" en una banda)
+MIN_LARGO_PALABRA = 2    # palabras más cortas ("DE", iniciales) no generan claves
+
+PESO_NOMBRE = 0.75
+PESO_EDAD = 0.15
+PESO_GENERO = 0.10
+
+
+# --- Código fonético ---
+
+_REGLAS = (
+    # (grupo de letras, reemplazo), en orden; se aplican sobre el texto normalizado
+    ("ll", "y"), ("ch", "C"), ("qu", "k"), ("gue", "Ge"), ("gui", "Gi"),
+    ("ge", "je"), ("gi", "ji"), ("ce", "se"), ("ci", "si"),
+    ("c", "k"), ("z", "s"), ("x", "ks"), ("v", "b"), ("w", "u"), ("h", ""),
+)
+
+
+@lru_cache(maxsize=100000)
+def codigo_fonetico(palabra):
+    """
+    Código fonético de una palabra en español: sin vocales (salvo la inicial), con las
+    letras que suenan igual unificadas (b/v, c/k/q, c/s/z, g/j, ll/y, h muda) y sin
+    consonantes repetidas. "Vásquez", "Basques" y "Vazquez" -> "BSKS".
+    """
+    p = "".join(c for c in normalizar(palabra) if c.isalpha())
+    if not p:
+        return ""
+    for grupo, reemplazo in _REGLAS:
+        p = p.replace(grupo, reemplazo)
+    if p.endswith("y"):
+        p = p[:-1] + "i"
+    if not p:
+        return ""
+
+    codigo = [p[0].upper()]
+    for c in p[1:]:
+        if c in "aeiou":
+            codigo.append("")  # una vocal separa consonantes repetidas ("CARRERA" vs "CARERA" ya se unifican)
+            continue
+        c = c.upper()
+        if c != codigo[-1]:
+            codigo.append(c)
+    return "".join(codigo)[:8]
+
+
+# --- Similitud ---
+
+def jaro_winkler(a, b, p=0.1):
+    if a == b:
+        return 1.0
+    la, lb = len(a), len(b)
+    if not la or not lb:
+        return 0.0
+    ventana = max(max(la, lb) // 2 - 1, 0)
+    usados_b = [False] * lb
+    coincidencias_a = []
+    for i, ca in enumerate(a):
+        inicio, fin = max(0, i - ventana), min(lb, i + ventana + 1)
+        for j in range(inicio, fin):
+            if not usados_b[j] and b[j] == ca:
+                usados_b[j] = True
+                coincidencias_a.append(ca)
+                break
+    m = len(coincidencias_a)
+    if not m:
+        return 0.0
+    coincidencias_b = [b[j] for j in range(lb) if usados_b[j]]
+    transposiciones = sum(x != y for x, y in zip(coincidencias_a, coincidencias_b)) / 2
+    jaro = (m / la + m / lb + (m - transposiciones) / m) / 3
+
+    prefijo = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefijo += 1
+    return jaro + prefijo * p * (1 - jaro)
+
+
+def similitud_nombres(palabras_a, palabras_b):
+    """
+    Similitud de dos nombres ya tokenizados (0..1), sin importar el orden de las palabras:
+    cada palabra del nombre más corto se empareja con su mejor Jaro-Winkler en el otro.
+    Se penaliza levemente que un nombre tenga palabras de más (segundo apellido omitido).
+    """
+    if not palabras_a or not palabras_b:
+        return 0.0
+    if len(palabras_a) > len(palabras_b):
+        palabras_a, palabras_b = palabras_b, palabras_a
+    total = sum(max(jaro_winkler(x, y) for y in palabras_b) for x in palabras_a)
+    promedio = total / len(palabras_a)
+    cobertura = len(palabras_a) / len(palabras_b)
+    return promedio * (0.9 + 0.1 * cobertura)
+
+
+# --- Edad ---
+
+def anio_nacimiento(edad, unidad_edad, referencia=None):
+    """Año de nacimiento estimado a partir de la edad registrada en la fecha `referencia`."""
+    try:
+        edad = float(edad)
+    except (TypeError, ValueError):
+        return None
+    if edad < 0:
+        return None
+    referencia = referencia or datetime.now()
+    unidad = normalizar(unidad_edad)
+    if unidad.startswith("mes"):
+        edad /= 12
+    elif unidad.startswith("dia"):
+        edad /= 365
+    return int(referencia.year + referencia.timetuple().tm_yday / 366 - edad)
+
+
+def banda(anio):
+    return None if anio is None else anio // ANCHO_BANDA
+
+
+class Registro:
+    """Lo necesario de un paciente para bloquear y puntuar."""
+    __slots__ = ('id', 'palabras', 'codigos', 'anio', 'genero', 'dni')
+
+    def __init__(self, paciente_id, nombre, edad=None, unidad_edad=None, genero=None, dni=None, fecha=None):
+        self.id = paciente_id
+        self.palabras = tuple(dict.fromkeys(p for p in tokens(nombre) if len(p) >= MIN_LARGO_PALABRA))
+        self.codigos = tuple(dict.fromkeys(c for c in map(codigo_fonetico, self.palabras) if c))
+        self.anio = anio_nacimiento(edad, unidad_edad, fecha)
+        self.genero = normalizar(genero)[:1] or None
+        self.dni = str(dni).strip() if dni and str(dni).strip() else None
+
+    @classmethod
+    def from_row(cls, row):
+        """row: (id, nombreCompleto, edad, unidadEdad, genero, dni, fechaCreacion)."""
+        return cls(*row)
+
+
+def puntaje(a, b):
+    """Probabilidad aproximada (0..1) de que dos registros sean la misma persona."""
+    if a.dni and b.dni:
+        if a.dni == b.dni:
+            return 1.0
+        # Dos DNI distintos: sólo un nombre casi idéntico lo mantiene como sospechoso
+        factor_dni = 0.9
+    else:
+        factor_dni = 1.0
+
+    nombre = similitud_nombres(a.palabras, b.palabras)
+    # Género distinto (ambos registrados): sólo queda el nombre, que no alcanza el umbral.
+    # "JUANA PEREZ" (F) y "JUAN PÉREZ" (M) se parecen en 0.98 pero son dos personas.
+    if nombre < MIN_NOMBRE or (a.genero and b.genero and a.genero != b.genero):
+        return nombre * PESO_NOMBRE
+
+    if a.anio is None or b.anio is None:
+        edad = 0.5
+    else:
+        diferencia = abs(a.anio - b.anio)
+        edad = 1.0 if diferencia <= 1 else 0.5 if diferencia <= TOLERANCIA_ANIOS + 1 else 0.0
+
+    genero = 0.5 if a.genero is None or b.genero is None else 1.0
+
+    return (PESO_NOMBRE * nombre + PESO_EDAD * edad + PESO_GENERO * genero) * factor_dni
+
+
+class DetectorDuplicados:
+    """
+    Índice en memoria de claves de bloqueo: código fonético -> banda de nacimiento -> ids.
+    Se mantiene con agregar()/quitar() desde upsert_paciente/delete_paciente.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._registros = {}  # id -> Registro
+        self._bloques = {}    # código -> {banda: set(ids)}
+
+    def __len__(self):
+        return len(self._registros)
+
+    def cargar(self, rows):
+        """rows: (id, nombreCompleto, edad, unidadEdad, genero, dni, fechaCreacion)."""
+        with self._lock:
+            self._registros.clear()
+            self._bloques.clear()
+            for row in rows:
+                self._agregar(Registro.from_row(row))
+
+    def agregar(self, paciente_id, nombre, edad=None, unidad_edad=None, genero=None, dni=None, fecha=None):
+        registro = Registro(paciente_id, nombre, edad, unidad_edad, genero, dni, fecha)
+        with self._lock:
+            self._quitar(paciente_id)
+            self._agregar(registro)
+
+    def quitar(self, paciente_id):
+        with self._lock:
+            self._quitar(paciente_id)
+
+    def _agregar(self, registro):
+        self._registros[registro.id] = registro
+        b = banda(registro.anio)
+        for codigo in registro.codigos:
+            self._bloques.setdefault(codigo, {}).setdefault(b, set()).add(registro.id)
+
+    def _quitar(self, paciente_id):
+        registro = self._registros.pop(paciente_id, None)
+        if registro is None:
+            return
+        b = banda(registro.anio)
+        for codigo in registro.codigos:
+            bandas = self._bloques.get(codigo)
+            ids = bandas.get(b) if bandas else None
+            if ids is None:
+                continue
+            ids.discard(paciente_id)
+            if not ids:
+                del bandas[b]
+                if not bandas:
+                    del self._bloques[codigo]
+
+    def candidatos(self, nombre, edad=None, unidad_edad=None, genero=None, dni=None,
+                   limit=20, umbral=UMBRAL, excluir=None):
+        """
+        Pacientes que probablemente son la misma persona que los datos dados: [(id, puntaje)],
+        de mayor a menor puntaje. Sin edad se buscan todas las bandas de nacimiento.
+        """
+        consulta = Registro(None, nombre, edad, unidad_edad, genero, dni)
+        if not consulta.codigos:
+            return []
+        b = banda(consulta.anio)
+
+        with self._lock:
+            compartidas = {}
+            for codigo in consulta.codigos:
+                bandas = self._bloques.get(codigo)
+                if not bandas:
+                    continue
+                if b is None:
+                    grupos = bandas.values()
+                else:
+                    # Bandas vecinas (y sin edad conocida): la edad estimada no es exacta
+                    grupos = [bandas[x] for x in (b - 1, b, b + 1, None) if x in bandas]
+                for ids in grupos:
+                    for pid in ids:
+                        compartidas[pid] = compartidas.get(pid, 0) + 1
+            compartidas.pop(excluir, None)
+
+            # Primero los que más claves comparten
+            orden = sorted(compartidas, key=lambda pid: -compartidas[pid])[:MAX_CANDIDATOS]
+            resultados = []
+            for pid in orden:
+                s = puntaje(consulta, self._registros[pid])
+                if s >= umbral:
+                    resultados.append((pid, s))
+
+        resultados.sort(key=lambda x: (-x[1], -x[0]))
+        return resultados[:limit]
+
+    def pares(self, umbral=UMBRAL, max_bloque=MAX_BLOQUE):
+        """
+        Modo lote: todos los pares (id_a, id_b, puntaje) con puntaje >= umbral.
+        Compara dentro de cada bloque (código, banda) y con la banda siguiente; los bloques
+        más grandes que max_bloque se omiten (quedan cubiertos por las otras palabras del nombre).
+        Devuelve (pares, bloques_omitidos).
+        """
+        with self._lock:
+            registros = self._registros
+            vistos = set()
+            encontrados = []
+            omitidos = 0
+
+            def comparar(ids_a, ids_b=None):
+                mismos = ids_b is None
+                ids_b = ids_a if mismos else ids_b
+                for i, x in enumerate(ids_a):
+                    ra = registros[x]
+                    for y in (ids_b[i + 1:] if mismos else ids_b):
+                        par = (x, y) if x < y else (y, x)
+                        if par in vistos:
+                            continue
+                        vistos.add(par)
+                        s = puntaje(ra, registros[y])
+                        if s >= umbral:
+                            encontrados.append((par[0], par[1], s))
+
+            for bandas in self._bloques.values():
+                for b, ids in bandas.items():
+                    if len(ids) > max_bloque:
+                        omitidos += 1
+                        continue
+                    ids = sorted(ids)
+                    comparar(ids)
+                    if b is not None and b + 1 in bandas and len(bandas[b + 1]) <= max_bloque:
+                        comparar(ids, sorted(bandas[b + 1]))
+
+            # Mismo DNI: siempre es el mismo paciente, aunque el nombre no se parezca
+            por_dni = {}
+            for r in registros.values():
+                if r.dni:
+                    por_dni.setdefault(r.dni, []).append(r.id)
+            for ids in por_dni.values():
+                if len(ids) > 1:
+                    comparar(sorted(ids))
+
+        return encontrados, omitidos
+
+
+def agrupar(pares):
+    """Une los pares en clusters (union-find); devuelve listas de ids, las más grandes primero."""
+    padre = {}
+
+    def raiz(x):
+        padre.setdefault(x, x)
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for a, b, _ in pares:
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            padre[max(ra, rb)] = min(ra, rb)
+
+    clusters = {}
+    for x in padre:
+        clusters.setdefault(raiz(x), []).append(x)
+    return sorted((sorted(c) for c in clusters.values()), key=lambda c: (-len(c), c[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca pacientes duplicados en toda la tabla Pacientes.")
+    parser.add_argument('--umbral', type=float, default=UMBRAL, help="puntaje mínimo de un par (0..1)")
+    parser.add_argument('--max-bloque', type=int, default=MAX_BLOQUE)
+    parser.add_argument('--csv', help="guarda los clusters en un CSV (cluster, id, nombre, edad, dni)")
+    args = parser.parse_args()
+
+    from database import db
+
+    inicio = datetime.now()
+    rows = db.get_pacientes_para_duplicados()
+    detector = DetectorDuplicados()
+    detector.cargar(rows)
+    pares, omitidos = detector.pares(args.umbral, args.max_bloque)
+    clusters = agrupar(pares)
+    segundos = (datetime.now() - inicio).total_seconds()
+
+    print(f"{len(rows)} pacientes, {len(pares)} pares sospechosos, {len(clusters)} clusters "
+          f"({omitidos} bloques omitidos por tamaño) en {segundos:.1f} s")
+
+    por_id = {r[0]: r for r in rows}
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(['cluster', 'id', 'nombreCompleto', 'edad', 'unidadEdad', 'genero', 'dni'])
+            for n, cluster in enumerate(clusters, 1):
+                for pid in cluster:
+                    r = por_id[pid]
+                    w.writerow([n, pid, r[1], r[2], r[3], r[4], r[5]])
+        print(f"Clusters guardados en {args.csv}")
+    else:
+        for n, cluster in enumerate(clusters, 1):
+            print(f"\nCluster {n}:")
+            for pid in cluster:
+                r = por_id[pid]
+                print(f"  #{pid:<7} {r[1]} | {r[2]} {r[3]} | {r[4]} | DNI {r[5] or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
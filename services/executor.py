@@ -0,0 +1,155 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+
+class DataRequest:
+    """Consulta enviada al executor. `key` agrupa consultas que se reemplazan entre sí."""
+    __slots__ = ('key', 'future', 'loading', '_cancelada', '_carga_terminada')
+
+    def __init__(self, key, loading):
+        self.key = key
+        self.loading = loading
+        self.future = None
+        self._cancelada = False
+        self._carga_terminada = False
+
+    @property
+    def cancelada(self):
+        return self._cancelada
+
+    def _cancelar(self):
+        self._cancelada = True
+        if self.future is not None:
+            self.future.cancel()  # sólo tiene efecto si aún no empezó
+
+
+class DataExecutor:
+    """
+    Ejecuta las llamadas a `db` de las vistas en un pool de hilos para no congelar la UI.
+
+    submit(fn, *args, key=..., on_result=..., on_error=..., loading=...):
+      - fn(*args) corre en un hilo del pool; on_result(resultado) / on_error(excepción) se
+        llaman en ese mismo hilo al terminar (Flet permite actualizar controles desde ahí).
+      - key: una nueva consulta con la misma clave deja obsoleta a la anterior; si ésta aún
+        no empezó se cancela y, si ya está en SQL Server, su resultado se descarta.
+      - loading: callable(bool). Se llama con True al enviar y con False una sola vez cuando
+        esa consulta termina, se cancela o queda reemplazada. Ver indicador().
+
+    Los resultados de una misma clave se entregan de a uno, y la cancelación se vuelve a
+    comprobar justo antes de on_result: un resultado viejo nunca se aplica después de que
+    empezó a entregarse uno más nuevo.
+    """
+
+    def __init__(self, max_workers=4, nombre="lis-data"):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=nombre)
+        self._lock = threading.Lock()
+        self._vigentes = {}  # key -> DataRequest
+        self._entregas = [threading.Lock() for _ in range(32)]  # por hash de la clave
+
+    def submit(self, fn, *args, key=None, on_result=None, on_error=None, loading=None, **kwargs):
+        request = DataRequest(key, loading)
+        anterior = None
+        if key is not None:
+            with self._lock:
+                anterior = self._vigentes.get(key)
+                if anterior is not None:
+                    anterior._cancelar()
+                self._vigentes[key] = request
+
+        if loading:
+            loading(True)
+        if anterior is not None:
+            # Después del True de la nueva: un indicador compartido no parpadea
+            self._fin_carga(anterior)
+        request.future = self._pool.submit(self._ejecutar, request, fn, args, kwargs, on_result, on_error)
+        return request
+
+    def cancel(self, key):
+        """Descarta la consulta vigente de una clave (p.ej. al salir de la vista)."""
+        with self._lock:
+            request = self._vigentes.pop(key, None)
+        if request is None:
+            return False
+        request._cancelar()
+        self._fin_carga(request)
+        return True
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _fin_carga(self, request):
+        # Exactamente un loading(False) por consulta, la termine quien la termine
+        with self._lock:
+            if request._carga_terminada or not request.loading:
+                return
+            request._carga_terminada = True
+        request.loading(False)
+
+    def _entrega(self, key):
+        if key is None:
+            return nullcontext()
+        return self._entregas[hash(key) % len(self._entregas)]
+
+    def _ejecutar(self, request, fn, args, kwargs, on_result, on_error):
+        if request.cancelada:
+            return
+        resultado, error = None, None
+        try:
+            resultado = fn(*args, **kwargs)
+        except Exception as e:
+            error = e
+
+        with self._entrega(request.key):
+            # Sigue en _vigentes mientras se entrega: un submit más nuevo todavía la cancela
+            if request.cancelada:
+                return
+            try:
+                self._fin_carga(request)
+                if request.cancelada:
+                    return
+                if error is None:
+                    if on_result:
+                        on_result(resultado)
+                elif on_error:
+                    on_error(error)
+                else:
+                    print(f"Error en consulta de fondo: {error}")
+            except Exception as e:
+                print(f"Error actualizando la vista: {e}")
+            finally:
+                with self._lock:
+                    if request.key is not None and self._vigentes.get(request.key) is request:
+                        del self._vigentes[request.key]
+
+
+_cargas = {}  # id(control) -> consultas en curso que lo muestran
+_cargas_lock = threading.Lock()
+
+
+def indicador(control):
+    """
+    Contrato de carga para un control (ProgressBar, ProgressRing...): visible mientras tenga
+    al menos una consulta en curso. Lleva la cuenta por control, así que lecturas y
+    escrituras pueden compartirlo sin que la primera que termine lo oculte.
+    """
+    def set_loading(activo):
+        with _cargas_lock:
+            n = max(_cargas.get(id(control), 0) + (1 if activo else -1), 0)
+            if n:
+                _cargas[id(control)] = n
+            else:
+                _cargas.pop(id(control), None)
+            control.visible = n > 0
+        if control.page:
+            control.update()
+    return set_loading
+
+
+executor = DataExecutor()
+
+# Escrituras de las vistas (guardar, validar, crear, borrar): un solo hilo, en el orden en
+# que se envían, para que dos guardados de la misma orden nunca se crucen. Se envían sin
+# key: una escritura no se cancela; su on_result debe comprobar que la vista sigue
+# mostrando lo mismo antes de tocarla.
+escrituras = DataExecutor(max_workers=1, nombre="lis-escritura")
@@ -0,0 +1,219 @@
+import ast
+import re
+
+TOKEN_RE = re.compile(r'\[(.*?)\]')
+
+_NODOS_PERMITIDOS = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub,
+)
+
+
+class FormulaError(Exception):
+    """Fórmula con sintaxis inválida o con operaciones no permitidas."""
+
+
+class FormulaCycleError(FormulaError):
+    """Las fórmulas se referencian entre sí en ciclo."""
+
+    def __init__(self, ciclo):
+        self.ciclo = ciclo
+        super().__init__("Referencia circular entre fórmulas: " + " -> ".join(f"[{c}]" for c in ciclo))
+
+
+class FormulaCompilada:
+    """Fórmula [ABBR] compilada una sola vez a un AST validado."""
+    __slots__ = ('texto', 'dependencias', '_code', '_nombres')
+
+    def __init__(self, texto):
+        self.texto = texto
+        tokens = []
+        for token in TOKEN_RE.findall(texto):
+            if token not in tokens:
+                tokens.append(token)
+        self.dependencias = tuple(tokens)
+        self._nombres = {token: f"_v{i}" for i, token in enumerate(tokens)}
+
+        expr = TOKEN_RE.sub(lambda m: self._nombres[m.group(1)], texto)
+        try:
+            tree = ast.parse(expr.strip(), mode='eval')
+        except SyntaxError as e:
+            raise FormulaError(f"Fórmula inválida '{texto}': {e.msg}")
+
+        permitidos = set(self._nombres.values())
+        for node in ast.walk(tree):
+            if not isinstance(node, _NODOS_PERMITIDOS):
+                raise FormulaError(f"Operación no permitida en '{texto}'")
+            if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+                raise FormulaError(f"Constante no numérica en '{texto}'")
+            if isinstance(node, ast.Name) and node.id not in permitidos:
+                raise FormulaError(f"Nombre no permitido en '{texto}'")
+
+        self._code = compile(tree, '<formula>', 'eval')
+
+    def evaluar(self, valores):
+        """
+        valores: dict abreviatura -> float. Devuelve None si falta algún valor
+        o la operación no es calculable (p.ej. división entre cero).
+        """
+        env = {}
+        for token, nombre in self._nombres.items():
+            val = valores.get(token)
+            if val is None:
+                return None
+            env[nombre] = val
+        try:
+            return float(eval(self._code, {'__builtins__': {}}, env))
+        except (ArithmeticError, ValueError, TypeError):
+            return None
+
+
+def compilar(formula):
+    return FormulaCompilada(formula)
+
+
+class FormulaEngine:
+    """
+    Conjunto de analitos calculados con su grafo de dependencias.
+
+    formulas: dict clave -> texto de la fórmula. La clave es la abreviatura del analito
+    calculado (o cualquier identificador único si no tiene abreviatura). Las dependencias
+    son las abreviaturas entre corchetes.
+    """
+
+    def __init__(self, formulas, estricto=True):
+        """
+        Con estricto=False las fórmulas inválidas o en ciclo se descartan (quedan en
+        self.errores) en lugar de lanzar excepción; útil al cargar datos ya guardados.
+        """
+        self.errores = []
+        self.compiladas = {}
+        for clave, texto in formulas.items():
+            try:
+                self.compiladas[clave] = compilar(texto)
+            except FormulaError as e:
+                if estricto:
+                    raise
+                self.errores.append((clave, e))
+
+        while True:
+            try:
+                self.orden = self._orden_topologico()
+                break
+            except FormulaCycleError as e:
+                if estricto:
+                    raise
+                self.errores.append((e.ciclo[0], e))
+                for clave in e.ciclo:
+                    self.compiladas.pop(clave, None)
+
+        # dependencia -> calculados que la usan
+        self._dependientes = {}
+        for clave, f in self.compiladas.items():
+            for dep in f.dependencias:
+                self._dependientes.setdefault(dep, []).append(clave)
+        self._posicion = {clave: i for i, clave in enumerate(self.orden)}
+
+    def _orden_topologico(self):
+        orden = []
+        estado = {}  # clave -> 1 visitando, 2 terminado
+
+        def visitar(clave, camino):
+            estado[clave] = 1
+            camino.append(clave)
+            for dep in self.compiladas[clave].dependencias:
+                if dep not in self.compiladas:
+                    continue
+                if estado.get(dep) == 1:
+                    raise FormulaCycleError(camino[camino.index(dep):] + [dep])
+                if dep not in estado:
+                    visitar(dep, camino)
+            camino.pop()
+            estado[clave] = 2
+            orden.append(clave)
+
+        for clave in self.compiladas:
+            if clave not in estado:
+                visitar(clave, [])
+        return orden
+
+    def afectados(self, abreviatura):
+        """Calculados que dependen (directa o transitivamente) de una abreviatura, en orden topológico."""
+        vistos = set()
+        pendientes = [abreviatura]
+        while pendientes:
+            actual = pendientes.pop()
+            for dep in self._dependientes.get(actual, ()):
+                if dep not in vistos:
+                    vistos.add(dep)
+                    pendientes.append(dep)
+        return sorted(vistos, key=self._posicion.__getitem__)
+
+    def recalcular(self, valores, cambiado=None, decimales=None):
+        """
+        Recalcula en orden topológico todos los calculados (cambiado=None) o sólo los que
+        dependen de la abreviatura cambiada. valores (dict abreviatura -> float) se actualiza
+        con cada resultado (redondeado a `decimales` si se indica) para que lo usen los
+        calculados siguientes.
+        Devuelve la lista de (clave, resultado) con resultado None si no fue calculable.
+        """
+        claves = self.orden if cambiado is None else self.afectados(cambiado)
+        resultados = []
+        for clave in claves:
+            res = self.compiladas[clave].evaluar(valores)
+            if res is not None:
+                if decimales is not None:
+                    res = round(res, decimales)
+                valores[clave] = res
+            resultados.append((clave, res))
+        return resultados
+
+
+def validar_formulas(formulas):
+    """Compila y ordena las fórmulas; lanza FormulaError / FormulaCycleError si no son válidas."""
+    FormulaEngine(formulas)
+
+
+def validar_formula(clave, texto, existentes, conocidas=None):
+    """
+    Valida la fórmula `texto` del calculado `clave` contra las ya guardadas
+    (existentes: dict clave -> texto).
+
+    Sólo la fórmula nueva bloquea: lanza FormulaError si su sintaxis es inválida o
+    referencia una abreviatura fuera de `conocidas`, y FormulaCycleError si cierra un
+    ciclo a través de las existentes. Las existentes que ya eran inválidas no bloquean;
+    se devuelven como avisos, lista de (clave, FormulaError).
+    """
+    nueva = compilar(texto)
+    if conocidas is not None:
+        desconocidas = [d for d in nueva.dependencias if d != clave and d not in conocidas]
+        if desconocidas:
+            raise FormulaError(f"Referencia desconocida en '{texto}': " + ", ".join(f"[{d}]" for d in desconocidas))
+
+    otras = {k: t for k, t in existentes.items() if k != clave}
+    avisos = FormulaEngine(otras, estricto=False).errores
+
+    # Grafo de las existentes compilables (incluidas las que ya forman ciclo entre sí)
+    grafo = {}
+    for k, t in otras.items():
+        try:
+            grafo[k] = compilar(t).dependencias
+        except FormulaError:
+            pass
+
+    camino = [clave]
+    vistos = set()
+
+    def visitar(dep):
+        camino.append(dep)
+        if dep == clave:
+            raise FormulaCycleError(list(camino))
+        if dep not in vistos:
+            vistos.add(dep)
+            for siguiente in grafo.get(dep, ()):
+                visitar(siguiente)
+        camino.pop()
+
+    for dep in nueva.dependencias:
+        visitar(dep)
+    return avisos
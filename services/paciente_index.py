@@ -0,0 +1,233 @@
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+
+_SEPARADORES = re.compile(r"[\W_]+")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, como compara la collation CI_AI de SQL Server."""
+    texto = str(texto or "")
+    if texto.isascii():
+        return texto.lower()
+    texto = unicodedata.normalize('NFKD', texto).casefold()
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokens(texto):
+    """Palabras normalizadas de un nombre ("Pérez, Juan" -> ['perez', 'juan'])."""
+    return [t for t in _SEPARADORES.split(normalizar(texto)) if t]
+
+
+def trigramas(token):
+    t = f"${token}$"
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def similitud(a, b):
+    """Coeficiente de Dice entre los trigramas de dos palabras (0..1)."""
+    ta, tb = trigramas(a), trigramas(b)
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+# Puntaje de una palabra de la consulta contra una palabra del nombre
+PUNTAJE_EXACTO = 1.0
+PUNTAJE_PREFIJO = 0.9
+FACTOR_APROXIMADO = 0.8
+MIN_SIMILITUD = 0.6
+MIN_LARGO_APROXIMADO = 4
+
+
+def puntaje_token(q, token):
+    if token == q:
+        return PUNTAJE_EXACTO
+    if token.startswith(q):
+        return PUNTAJE_PREFIJO
+    if len(q) >= MIN_LARGO_APROXIMADO:
+        sim = similitud(q, token)
+        if sim >= MIN_SIMILITUD:
+            return sim * FACTOR_APROXIMADO
+    return 0.0
+
+
+def puntaje(consulta, nombre):
+    """Relevancia de un nombre para la consulta, igual que PacienteIndex.buscar (0 si no coincide)."""
+    consulta = list(dict.fromkeys(tokens(consulta)))
+    palabras = tuple(dict.fromkeys(tokens(nombre)))
+    if not consulta:
+        return 0.0
+    total = 0.0
+    for q in consulta:
+        mejor = max((puntaje_token(q, t) for t in palabras), default=0.0)
+        if not mejor:
+            return 0.0
+        total += mejor
+    cobertura = len(consulta) / max(len(palabras), len(consulta))
+    return total / len(consulta) + 0.05 * cobertura
+
+
+class PacienteIndex:
+    """
+    Índice en memoria de Pacientes.nombreCompleto por palabras normalizadas.
+
+    Palabra -> ids de pacientes, más un vocabulario ordenado (búsqueda por prefijo con
+    bisect) y trigramas -> palabras del vocabulario (coincidencia aproximada: tildes,
+    errores de tipeo). El orden de las palabras no importa: "Pérez Juan" encuentra a
+    "JUAN PEREZ". Se carga una vez y se mantiene con agregar()/quitar() desde
+    upsert_paciente/delete_paciente.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cargado = False
+        # (hasta_id, filas, suma de checksums) de la tabla en la última sincronización (ver DatabaseManager)
+        self.version = None
+        self._nombres = {}    # id -> tuple(palabras)
+        self._postings = {}   # palabra -> set(ids)
+        self._vocabulario = []  # palabras ordenadas
+        self._trigramas = {}  # trigrama -> set(palabras)
+        self._n_trigramas = {}  # palabra -> cantidad de trigramas distintos
+
+    def __len__(self):
+        return len(self._nombres)
+
+    def cargar(self, rows):
+        """rows: (id, nombreCompleto) de toda la tabla."""
+        with self._lock:
+            self._nombres.clear()
+            self._postings.clear()
+            self._vocabulario = []
+            self._trigramas.clear()
+            self._n_trigramas.clear()
+            for pid, nombre in rows:
+                self._agregar(pid, nombre)
+            self._vocabulario = sorted(self._postings)
+            self.cargado = True
+
+    def agregar(self, paciente_id, nombre):
+        """Alta o modificación de un paciente."""
+        with self._lock:
+            self._quitar(paciente_id)
+            for palabra in self._agregar(paciente_id, nombre):
+                insort(self._vocabulario, palabra)
+
+    def quitar(self, paciente_id):
+        with self._lock:
+            self._quitar(paciente_id)
+
+    def ajustar_version(self, paciente_id, filas, suma):
+        """Aplica a la versión guardada el efecto de un cambio hecho por este proceso."""
+        with self._lock:
+            if self.version is not None and paciente_id <= self.version[0]:
+                hasta, n, total = self.version
+                self.version = (hasta, n + filas, total + suma)
+
+    def _agregar(self, pid, nombre):
+        # Devuelve las palabras que son nuevas en el vocabulario
+        nuevas = []
+        palabras = tuple(dict.fromkeys(tokens(nombre)))
+        self._nombres[pid] = palabras
+        for palabra in palabras:
+            ids = self._postings.get(palabra)
+            if ids is None:
+                ids = self._postings[palabra] = set()
+                nuevas.append(palabra)
+                tris = trigramas(palabra)
+                self._n_trigramas[palabra] = len(tris)
+                for tri in tris:
+                    self._trigramas.setdefault(tri, set()).add(palabra)
+            ids.add(pid)
+        return nuevas
+
+    def _quitar(self, pid):
+        palabras = self._nombres.pop(pid, None)
+        if not palabras:
+            return
+        for palabra in palabras:
+            ids = self._postings.get(palabra)
+            if ids is None:
+                continue
+            ids.discard(pid)
+            if not ids:
+                del self._postings[palabra]
+                del self._n_trigramas[palabra]
+                i = bisect_left(self._vocabulario, palabra)
+                if i < len(self._vocabulario) and self._vocabulario[i] == palabra:
+                    del self._vocabulario[i]
+                for tri in trigramas(palabra):
+                    grupo = self._trigramas.get(tri)
+                    if grupo:
+                        grupo.discard(palabra)
+                        if not grupo:
+                            del self._trigramas[tri]
+
+    def _candidatas(self, q):
+        """Palabras del vocabulario que coinciden con q -> puntaje."""
+        puntajes = {}
+        # Exacta y por prefijo (la última palabra suele estar a medio escribir)
+        vocab = self._vocabulario
+        i = bisect_left(vocab, q)
+        while i < len(vocab) and vocab[i].startswith(q):
+            palabra = vocab[i]
+            puntajes[palabra] = PUNTAJE_EXACTO if palabra == q else PUNTAJE_PREFIJO
+            i += 1
+        # Aproximada por trigramas
+        if len(q) >= MIN_LARGO_APROXIMADO:
+            tq = trigramas(q)
+            comunes = {}
+            for tri in tq:
+                for palabra in self._trigramas.get(tri, ()):
+                    comunes[palabra] = comunes.get(palabra, 0) + 1
+            for palabra, n in comunes.items():
+                if palabra in puntajes:
+                    continue
+                sim = 2 * n / (len(tq) + self._n_trigramas[palabra])
+                if sim >= MIN_SIMILITUD:
+                    puntajes[palabra] = sim * FACTOR_APROXIMADO
+        return puntajes
+
+    def buscar(self, texto, limit=50, minimo=1.0):
+        """
+        Pacientes que coinciden con `texto`, ordenados por relevancia: [(id, puntaje)].
+        minimo: fracción de palabras de la consulta que deben coincidir (1.0 = todas).
+        El puntaje es el promedio, por palabra de la consulta, de su mejor coincidencia.
+        """
+        consulta = list(dict.fromkeys(tokens(texto)))
+        if not consulta:
+            return []
+
+        with self._lock:
+            por_palabra = [self._candidatas(q) for q in consulta]
+            conjuntos = []
+            for candidatas in por_palabra:
+                ids = set()
+                for palabra in candidatas:
+                    ids |= self._postings[palabra]
+                conjuntos.append(ids)
+
+            requeridas = max(1, math.ceil(minimo * len(consulta) - 1e-9))
+            if requeridas >= len(consulta):
+                conjuntos.sort(key=len)
+                ids = set.intersection(*conjuntos) if conjuntos else set()
+            else:
+                conteo = {}
+                for c in conjuntos:
+                    for pid in c:
+                        conteo[pid] = conteo.get(pid, 0) + 1
+                ids = {pid for pid, n in conteo.items() if n >= requeridas}
+
+            resultados = []
+            for pid in ids:
+                palabras = self._nombres[pid]
+                total = 0.0
+                for candidatas in por_palabra:
+                    total += max((candidatas.get(p, 0.0) for p in palabras), default=0.0)
+                # Bonus leve si el nombre no tiene palabras de más (coincidencia más completa)
+                cobertura = len(consulta) / max(len(palabras), len(consulta))
+                resultados.append((pid, total / len(consulta) + 0.05 * cobertura))
+
+        resultados.sort(key=lambda x: (-x[1], -x[0]))
+        return resultados[:limit]
@@ -0,0 +1,109 @@
+import threading
+
+from database import db, parece_documento
+from models.paciente import Paciente
+from services.executor import executor
+from services.paciente_index import MIN_LARGO_APROXIMADO, normalizar, puntaje, tokens
+
+# Posiciones en las filas de search_pacientes (proyección de Paciente.COLUMNS)
+_ID, _NOMBRE, _DNI = (Paciente.COLUMNS.index(c) for c in ('id', 'nombreCompleto', 'dni'))
+
+
+class PacienteSearch:
+    """
+    Búsqueda incremental de pacientes (search-as-you-type).
+
+    - Debounce: buscar() espera `debounce` segundos sin nuevas teclas antes de consultar.
+    - Cancelación: cada consulta reemplaza a la anterior en el executor (clave propia),
+      así un resultado viejo nunca pisa a uno nuevo.
+    - Reutilización: si el término nuevo extiende al anterior (misma clase: documento o nombre)
+      y el resultado anterior no llegó al límite, se filtra en memoria sin ir a la base.
+      Con nombres sólo vale mientras ninguna palabra llegue a MIN_LARGO_APROXIMADO: la
+      coincidencia aproximada no es monótona ("onzal" se parece a "gonzal" pero no a
+      "gonza"), así que un término más largo puede encontrar filas que el anterior no trajo.
+    """
+
+    def __init__(self, limit=20, debounce=0.3, min_chars=2):
+        self.limit = limit
+        self.debounce = debounce
+        self.min_chars = min_chars
+        self._lock = threading.Lock()
+        self._timer = None
+        self._key = (id(self), 'buscar_paciente')
+        self._ultimo = None  # (término normalizado, filas) de la última consulta completa a la base
+
+    def buscar(self, term, on_result, loading=None, on_error=None, inmediato=False):
+        """
+        Programa la búsqueda de `term`; on_result(filas) se llama con el resultado,
+        o con None si el término es demasiado corto para buscar.
+        """
+        term = (term or "").strip()
+        corto = len(term) < self.min_chars and not (inmediato and term)
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if corto:
+                self._ultimo = None
+            elif not inmediato and self.debounce:
+                self._timer = threading.Timer(self.debounce, self._lanzar, (term, on_result, loading, on_error))
+                self._timer.daemon = True
+                self._timer.start()
+                return
+
+        if corto:
+            # Por el executor con la misma clave: una búsqueda anterior que aún se esté
+            # entregando no puede mostrarse después de ocultar la lista
+            executor.submit(lambda: None, key=self._key, on_result=on_result, loading=loading)
+        else:
+            self._lanzar(term, on_result, loading, on_error)
+
+    def cancelar(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._ultimo = None
+        executor.cancel(self._key)
+
+    def _lanzar(self, term, on_result, loading, on_error):
+        local = self._filtrar_previo(term)
+        if local is not None:
+            executor.submit(lambda: local, key=self._key, on_result=on_result, loading=loading)
+            return
+
+        def guardar(filas):
+            self._ultimo = (normalizar(term), filas)
+            on_result(filas)
+
+        executor.submit(
+            db.search_pacientes, term, self.limit,
+            key=self._key,
+            on_result=guardar,
+            on_error=on_error,
+            loading=loading
+        )
+
+    def _filtrar_previo(self, term):
+        if self._ultimo is None:
+            return None
+        previo, filas = self._ultimo
+        nuevo = normalizar(term)
+        if len(filas) >= self.limit or not nuevo.startswith(previo) \
+                or parece_documento(previo) != parece_documento(nuevo):
+            return None
+        # Un número sólo puede coincidir con el DNI; en los demás términos la parte de nombre
+        # se reutiliza sólo si es exacta o por prefijo (contenida en el resultado anterior)
+        if not nuevo.isdigit() and any(len(q) >= MIN_LARGO_APROXIMADO for q in tokens(nuevo)):
+            return None
+        # Se vuelve a ordenar como el índice (una palabra completa pasa de prefijo a exacta)
+        puntajes = [(puntaje(nuevo, r[_NOMBRE]), r) for r in filas]
+        puntajes = [(p, r) for p, r in puntajes if p]
+        puntajes.sort(key=lambda x: (-x[0], -x[1][_ID]))
+        por_nombre = [r for _, r in puntajes]
+        if not parece_documento(nuevo):
+            return por_nombre
+        # Mismo criterio que la consulta: prefijo de DNI primero (en orden de dni), luego nombre
+        por_dni = [r for r in filas if normalizar(r[_DNI]).startswith(nuevo)]
+        ids = {r[_ID] for r in por_dni}
+        return por_dni + [r for r in por_nombre if r[_ID] not in ids]
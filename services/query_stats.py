@@ -0,0 +1,386 @@
+"""
+Instrumentación de consultas de DatabaseManager.
+
+Las conexiones que crea el pool se envuelven en ConexionInstrumentada: cada execute queda
+registrado con el método de DatabaseManager que lo lanzó, la huella del SQL (literales y
+listas IN normalizadas), número de parámetros, filas devueltas, tiempo (execute + fetch) y
+espera por la conexión del pool.
+
+- QueryStats.resumen(): percentiles p50/p95/p99 sobre una ventana móvil por (método, huella).
+- Las consultas que superan el umbral y las que fallan se escriben como JSON por línea en
+  el log de consultas lentas.
+
+Configuración por variables de entorno (sin tocar código):
+    LIS_QUERY_STATS=0          desactiva la instrumentación (por defecto activa)
+    LIS_SLOW_QUERY_MS=500      umbral del log de consultas lentas, en ms
+    LIS_SLOW_QUERY_LOG=ruta    archivo del log (por defecto .cache/slow_queries.jsonl)
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from hashlib import sha1
+
+VENTANA = 512  # últimas ejecuciones por consulta usadas para los percentiles
+
+_RE_CADENA = re.compile(r"N?'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w@#.])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_VALUES = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def huella(sql):
+    """
+    SQL normalizado para agrupar ejecuciones de la misma consulta: sin espacios extra, con
+    los literales como ? y las listas de placeholders de tamaño variable colapsadas.
+    Devuelve (texto, id corto).
+    """
+    texto = _RE_ESPACIOS.sub(" ", sql).strip()
+    texto = _RE_CADENA.sub("?", texto)
+    texto = _RE_NUMERO.sub("?", texto)
+    texto = _RE_LISTA.sub("(?...)", texto)
+    texto = _RE_VALUES.sub("(?...), ...", texto)
+    return texto, sha1(texto.encode('utf-8')).hexdigest()[:12]
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+class _Registro:
+    __slots__ = ('metodo', 'sql', 'parametros', 'filas', 'segundos', 'espera', 'error', 'abierto')
+
+    def __init__(self, metodo, sql, parametros, espera):
+        self.metodo = metodo
+        self.sql = sql
+        self.parametros = parametros
+        self.filas = 0
+        self.segundos = 0.0
+        self.espera = espera
+        self.error = None
+        self.abierto = True
+
+
+class _Estadistica:
+    __slots__ = ('metodo', 'texto', 'id', 'llamadas', 'errores', 'filas', 'total', 'maximo', 'espera', 'tiempos')
+
+    def __init__(self, metodo, texto, id_huella):
+        self.metodo = metodo
+        self.texto = texto
+        self.id = id_huella
+        self.llamadas = 0
+        self.errores = 0
+        self.filas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.espera = 0.0
+        self.tiempos = deque(maxlen=VENTANA)
+
+
+class QueryStats:
+    def __init__(self, habilitado=None, umbral_ms=None, ruta_log=None):
+        if habilitado is None:
+            habilitado = os.environ.get('LIS_QUERY_STATS', '1').strip().lower() not in ('0', 'no', 'off', 'false')
+        if umbral_ms is None:
+            umbral_ms = float(os.environ.get('LIS_SLOW_QUERY_MS', '500'))
+        if ruta_log is None:
+            ruta_log = os.environ.get('LIS_SLOW_QUERY_LOG') or os.path.join(os.getcwd(), ".cache", "slow_queries.jsonl")
+
+        # Se puede cambiar en caliente: las conexiones ya abiertas lo consultan en cada execute
+        self.habilitado = habilitado
+        self.umbral_ms = umbral_ms
+        self.ruta_log = ruta_log
+
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._stats = {}
+        self._global = deque(maxlen=VENTANA * 4)
+        self._local = threading.local()
+
+    # --- CONTEXTO DE MÉTODO ---
+    @contextmanager
+    def metodo(self, nombre, espera=0.0):
+        """
+        Marca las consultas del hilo actual como lanzadas por `nombre` (lo usa @with_connection).
+        `espera` (checkout del pool) se atribuye sólo al método más externo, que es el que esperó.
+        Al salir se cierran los registros pendientes (filas ya leídas o abandonadas).
+        """
+        pila = getattr(self._local, 'pila', None)
+        if pila is None:
+            pila = self._local.pila = []
+        pila.append([nombre, espera if not pila else 0.0, []])
+        try:
+            yield
+        finally:
+            _, _, pendientes = pila.pop()
+            for registro in pendientes:
+                self.cerrar(registro)
+
+    def abrir(self, sql, parametros):
+        pila = getattr(self._local, 'pila', None)
+        if pila:
+            marco = pila[-1]
+            registro = _Registro(marco[0], sql, parametros, marco[1])
+            marco[1] = 0.0  # la espera cuenta una sola vez
+            marco[2].append(registro)
+        else:
+            registro = _Registro(None, sql, parametros, 0.0)
+        return registro
+
+    def cerrar(self, registro):
+        if not registro.abierto:
+            return
+        registro.abierto = False
+
+        texto, id_huella = huella(registro.sql)
+        metodo = registro.metodo or "(sin método)"
+        ms = registro.segundos * 1000
+
+        with self._lock:
+            est = self._stats.get((metodo, id_huella))
+            if est is None:
+                est = self._stats[(metodo, id_huella)] = _Estadistica(metodo, texto, id_huella)
+            est.llamadas += 1
+            est.filas += registro.filas
+            est.total += ms
+            if ms > est.maximo:
+                est.maximo = ms
+            est.espera += registro.espera * 1000
+            est.tiempos.append(ms)
+            if registro.error:
+                est.errores += 1
+            self._global.append(ms)
+
+        if registro.error or ms >= self.umbral_ms:
+            self._escribir_log(registro, texto, id_huella, ms)
+
+    def _escribir_log(self, registro, texto, id_huella, ms):
+        linea = json.dumps({
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'metodo': registro.metodo,
+            'huella': id_huella,
+            'sql': texto,
+            'parametros': registro.parametros,
+            'filas': registro.filas,
+            'ms': round(ms, 3),
+            'espera_ms': round(registro.espera * 1000, 3),
+            'error': registro.error,
+            'hilo': threading.current_thread().name,
+        }, ensure_ascii=False)
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.ruta_log) or ".", exist_ok=True)
+                with open(self.ruta_log, 'a', encoding='utf-8') as f:
+                    f.write(linea + "\n")
+        except OSError as e:
+            print(f"No se pudo escribir el log de consultas lentas: {e}")
+
+    # --- CONSULTA ---
+    def resumen(self, top=None):
+        """Estadísticas por (método, huella), de mayor a menor tiempo total."""
+        with self._lock:
+            filas = []
+            for est in self._stats.values():
+                ordenados = sorted(est.tiempos)
+                filas.append({
+                    'metodo': est.metodo,
+                    'huella': est.id,
+                    'sql': est.texto,
+                    'llamadas': est.llamadas,
+                    'errores': est.errores,
+                    'filas': est.filas,
+                    'total_ms': est.total,
+                    'promedio_ms': est.total / est.llamadas,
+                    'p50_ms': _percentil(ordenados, 50),
+                    'p95_ms': _percentil(ordenados, 95),
+                    'p99_ms': _percentil(ordenados, 99),
+                    'max_ms': est.maximo,
+                    'espera_ms': est.espera,
+                })
+        filas.sort(key=lambda f: f['total_ms'], reverse=True)
+        return filas[:top] if top else filas
+
+    def percentiles(self):
+        """p50/p95/p99 de las últimas consultas de todo el proceso."""
+        with self._lock:
+            ordenados = sorted(self._global)
+        return {
+            'consultas': len(ordenados),
+            'p50_ms': _percentil(ordenados, 50),
+            'p95_ms': _percentil(ordenados, 95),
+            'p99_ms': _percentil(ordenados, 99),
+        }
+
+    def reiniciar(self):
+        with self._lock:
+            self._stats.clear()
+            self._global.clear()
+
+    def envolver(self, creator):
+        """creator del pool cuyas conexiones quedan instrumentadas."""
+        def crear():
+            return ConexionInstrumentada(creator(), self)
+        return crear
+
+
+class CursorInstrumentado:
+    """Cursor que mide execute/fetch; el resto de atributos pasan al cursor real."""
+    __slots__ = ('_cursor', '_stats', '_registro')
+
+    def __init__(self, cursor, stats):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_stats', stats)
+        object.__setattr__(self, '_registro', None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # p.ej. fast_executemany
+        setattr(self._cursor, nombre, valor)
+
+    def _medir(self, metodo, sql, n_parametros, *args):
+        stats = self._stats
+        if not stats.habilitado:
+            metodo(sql, *args)
+            return self
+        self._cerrar()
+        registro = stats.abrir(sql, n_parametros)
+        object.__setattr__(self, '_registro', registro)
+        inicio = time.perf_counter()
+        try:
+            metodo(sql, *args)
+        except Exception as e:
+            registro.segundos = time.perf_counter() - inicio
+            registro.error = f"{type(e).__name__}: {e}"
+            self._cerrar()
+            raise
+        registro.segundos = time.perf_counter() - inicio
+        if self._cursor.rowcount is not None and self._cursor.rowcount > 0:
+            registro.filas = self._cursor.rowcount  # INSERT/UPDATE/DELETE
+        return self
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            n = len(params[0])
+        else:
+            n = len(params)
+        return self._medir(self._cursor.execute, sql, n, *params)
+
+    def executemany(self, sql, seq):
+        seq = seq if isinstance(seq, (list, tuple)) else list(seq)
+        n = sum(len(p) for p in seq)
+        self._medir(self._cursor.executemany, sql, n, seq)
+
+    def _leido(self, inicio, filas, agotado):
+        registro = self._registro
+        if registro is None:
+            return
+        registro.segundos += time.perf_counter() - inicio
+        registro.filas += filas
+        if agotado:
+            self._cerrar()
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = self._cursor.fetchone()
+        self._leido(inicio, fila is not None, fila is None)
+        return fila
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchall()
+        self._leido(inicio, len(filas), True)
+        return filas
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._leido(inicio, len(filas), not filas)
+        return filas
+
+    def __iter__(self):
+        while True:
+            fila = self.fetchone()
+            if fila is None:
+                return
+            yield fila
+
+    def nextset(self):
+        # Cada result set se cuenta como parte de la misma consulta
+        inicio = time.perf_counter()
+        hay = self._cursor.nextset()
+        self._leido(inicio, 0, not hay)
+        return hay
+
+    def close(self):
+        self._cerrar()
+        self._cursor.close()
+
+    def _cerrar(self):
+        registro = self._registro
+        if registro is not None:
+            object.__setattr__(self, '_registro', None)
+            self._stats.cerrar(registro)
+
+
+class ConexionInstrumentada:
+    """Conexión cuyo cursor() devuelve CursorInstrumentado; el resto pasa a la conexión real."""
+    __slots__ = ('_conn', '_stats')
+
+    def __init__(self, conn, stats):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_stats', stats)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._conn, nombre, valor)
+
+    def cursor(self):
+        return CursorInstrumentado(self._conn.cursor(), self._stats)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+
+def main():
+    """Resume un log de consultas lentas: python -m services.query_stats [ruta]"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Resumen del log de consultas lentas")
+    parser.add_argument('ruta', nargs='?', default=QueryStats(habilitado=False).ruta_log)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    grupos = {}
+    with open(args.ruta, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                e = json.loads(linea)
+            except ValueError:
+                continue
+            g = grupos.setdefault((e.get('metodo'), e['huella']), {'sql': e['sql'], 'ms': [], 'errores': 0})
+            g['ms'].append(e['ms'])
+            g['errores'] += bool(e.get('error'))
+
+    filas = sorted(grupos.items(), key=lambda kv: sum(kv[1]['ms']), reverse=True)[:args.top]
+    print(f"{'método':<36} {'n':>5} {'err':>4} {'p50':>9} {'p95':>9} {'max':>9}  sql")
+    for (metodo, _), g in filas:
+        ms = sorted(g['ms'])
+        print(f"{str(metodo):<36} {len(ms):>5} {g['errores']:>4} {_percentil(ms, 50):>9.1f} "
+              f"{_percentil(ms, 95):>9.1f} {ms[-1]:>9.1f}  {g['sql'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import threading
+from bisect import bisect_left
+
+
+class RangoNormalizado:
+    """Fila de RangosReferencia con la edad ya convertida a días."""
+    __slots__ = ('id', 'analitoId', 'genero', 'edadMin', 'edadMax', 'unidadEdad',
+                 'valorMin', 'valorMax', 'panicoMin', 'panicoMax',
+                 'referenciaVisualEspecifica', 'textoInterpretacion',
+                 'dias_min', 'dias_max')
+
+    COLUMNS = ('id', 'analitoId', 'genero', 'edadMin', 'edadMax', 'unidadEdad',
+               'valorMin', 'valorMax', 'panicoMin', 'panicoMax',
+               'referenciaVisualEspecifica', 'textoInterpretacion')
+
+    def __init__(self, row, to_days):
+        (self.id, self.analitoId, self.genero, self.edadMin, self.edadMax, self.unidadEdad,
+         self.valorMin, self.valorMax, self.panicoMin, self.panicoMax,
+         self.referenciaVisualEspecifica, self.textoInterpretacion) = row
+        self.dias_min = to_days(self.edadMin, self.unidadEdad)
+        self.dias_max = to_days(self.edadMax, self.unidadEdad)
+
+    def valores(self):
+        return (self.valorMin, self.valorMax, self.panicoMin, self.panicoMax)
+
+
+class _Segmentos:
+    """
+    Índice de intervalos cerrados [dias_min, dias_max] para una clave (analitoId, genero).
+
+    El eje de edades se divide en segmentos elementales (cada extremo y cada hueco
+    entre extremos consecutivos) y a cada segmento se le asigna de antemano el rango
+    ganador: el de menor id que lo cubre, igual que el primer match del recorrido lineal
+    anterior. Así una consulta por edad es un único bisect: O(log n).
+    """
+    __slots__ = ('puntos', 'ganadores')
+
+    def __init__(self, rangos):
+        self.puntos = sorted({r.dias_min for r in rangos} | {r.dias_max for r in rangos})
+        # slot 2i -> exactamente puntos[i]; slot 2i+1 -> hueco abierto (puntos[i], puntos[i+1])
+        self.ganadores = [None] * (2 * len(self.puntos))
+        for r in sorted(rangos, key=lambda x: x.id, reverse=True):
+            if r.dias_min > r.dias_max:
+                continue
+            i = bisect_left(self.puntos, r.dias_min)
+            j = bisect_left(self.puntos, r.dias_max)
+            for slot in range(2 * i, 2 * j + 1):
+                self.ganadores[slot] = r
+
+    def buscar(self, dias):
+        puntos = self.puntos
+        i = bisect_left(puntos, dias)
+        if i < len(puntos) and puntos[i] == dias:
+            return self.ganadores[2 * i]
+        if i == 0 or i == len(puntos):
+            return None
+        return self.ganadores[2 * (i - 1) + 1]
+
+
+class RangoIndex:
+    """
+    Índice en memoria (de proceso) de RangosReferencia.
+
+    Cada analito se carga una sola vez; sus rangos se normalizan a días y se agrupan
+    por (analitoId, genero). add_rango/delete_rango invalidan sólo el analito afectado,
+    que se vuelve a cargar en la siguiente consulta.
+    """
+
+    def __init__(self, to_days):
+        self._to_days = to_days
+        self._lock = threading.Lock()
+        self._rangos = {}     # analitoId -> [RangoNormalizado] ordenados por id
+        self._segmentos = {}  # (analitoId, genero) -> _Segmentos
+        self._rango_analito = {}  # rango id -> analitoId
+
+    def faltantes(self, analito_ids):
+        rangos = self._rangos
+        return [aid for aid in set(analito_ids) if aid not in rangos]
+
+    def cargar(self, analito_ids, rows):
+        """rows: filas con RangoNormalizado.COLUMNS, de todos los analito_ids pedidos."""
+        por_analito = {aid: [] for aid in analito_ids}
+        for row in rows:
+            r = RangoNormalizado(row, self._to_days)
+            por_analito.setdefault(r.analitoId, []).append(r)
+
+        with self._lock:
+            for aid, rangos in por_analito.items():
+                self._quitar(aid)
+                rangos.sort(key=lambda x: x.id)
+                por_genero = {}
+                for r in rangos:
+                    por_genero.setdefault(r.genero, []).append(r)
+                    self._rango_analito[r.id] = aid
+                for genero, lista in por_genero.items():
+                    self._segmentos[(aid, genero)] = _Segmentos(lista)
+                self._rangos[aid] = rangos
+
+    def invalidar(self, analito_id):
+        with self._lock:
+            self._quitar(analito_id)
+
+    def invalidar_rango(self, rango_id):
+        with self._lock:
+            aid = self._rango_analito.get(rango_id)
+            if aid is not None:
+                self._quitar(aid)
+
+    def limpiar(self):
+        with self._lock:
+            self._rangos.clear()
+            self._segmentos.clear()
+            self._rango_analito.clear()
+
+    def _quitar(self, analito_id):
+        rangos = self._rangos.pop(analito_id, None)
+        if not rangos:
+            return
+        for r in rangos:
+            self._rango_analito.pop(r.id, None)
+            self._segmentos.pop((analito_id, r.genero), None)
+
+    def rangos(self, analito_id):
+        return self._rangos.get(analito_id, [])
+
+    def buscar(self, analito_id, genero, dias):
+        """Rango aplicable (genero exacto o 'Ambos') para una edad en días, o None."""
+        candidatos = []
+        for clave in ((analito_id, genero), (analito_id, 'Ambos')):
+            seg = self._segmentos.get(clave)
+            if seg is not None:
+                r = seg.buscar(dias)
+                if r is not None:
+                    candidatos.append(r)
+        if not candidatos:
+            return None
+        return min(candidatos, key=lambda x: x.id)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ReporteCache:
+    """
+    Caché en disco de PDFs ya dibujados, direccionada por contenido.
+
+    La clave es un sha256 de todo lo que se imprime (cabecera, resultados y su estado,
+    configuración de grupos, firma, versión del render y assets), así que un cambio en
+    cualquiera de ellos produce otra clave. Lo que no entra en la clave (referencias,
+    nombres/unidades de analitos) se invalida desde DatabaseManager al editarse.
+
+    Archivos {orden_id}_{clave}.pdf en `directorio`; al pasar de `max_bytes` se borran los
+    menos usados (LRU por último acceso, que también se marca en el mtime del archivo para
+    conservar el orden entre sesiones).
+    """
+
+    def __init__(self, directorio, max_bytes=200 * 1024 * 1024):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = None  # nombre de archivo -> tamaño, del menos al más reciente
+        self._total = 0
+
+    @staticmethod
+    def clave(orden_id, header_data, config_list, include_signature, version=""):
+        contenido = json.dumps(
+            [orden_id, list(header_data), config_list, bool(include_signature), version],
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    def get(self, orden_id, clave):
+        nombre = f"{orden_id}_{clave}.pdf"
+        with self._lock:
+            self._cargar_indice()
+            if nombre not in self._entradas:
+                return None
+            self._entradas.move_to_end(nombre)
+        ruta = os.path.join(self.directorio, nombre)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            os.utime(ruta)
+            return datos
+        except OSError:
+            # Borrado por otra instancia de la aplicación
+            with self._lock:
+                self._quitar(nombre)
+            return None
+
+    def put(self, orden_id, clave, datos):
+        if len(datos) > self.max_bytes:
+            return
+        nombre = f"{orden_id}_{clave}.pdf"
+        ruta = os.path.join(self.directorio, nombre)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            with open(temporal, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print(f"No se pudo guardar el reporte en caché: {e}")
+            return
+
+        with self._lock:
+            self._cargar_indice()
+            self._quitar(nombre, borrar=False)
+            self._entradas[nombre] = len(datos)
+            self._total += len(datos)
+            while self._total > self.max_bytes and self._entradas:
+                self._quitar(next(iter(self._entradas)))
+
+    def invalidar(self, orden_ids):
+        prefijos = tuple(f"{oid}_" for oid in orden_ids)
+        if not prefijos:
+            return
+        with self._lock:
+            self._cargar_indice()
+            for nombre in [n for n in self._entradas if n.startswith(prefijos)]:
+                self._quitar(nombre)
+
+    def limpiar(self):
+        with self._lock:
+            self._cargar_indice()
+            for nombre in list(self._entradas):
+                self._quitar(nombre)
+
+    def tamano(self):
+        with self._lock:
+            self._cargar_indice()
+            return len(self._entradas), self._total
+
+    def _cargar_indice(self):
+        if self._entradas is not None:
+            return
+        archivos = []
+        try:
+            with os.scandir(self.directorio) as it:
+                for entrada in it:
+                    if entrada.is_file() and entrada.name.endswith('.pdf'):
+                        st = entrada.stat()
+                        archivos.append((st.st_mtime, entrada.name, st.st_size))
+        except FileNotFoundError:
+            pass
+        archivos.sort()
+        self._entradas = OrderedDict((nombre, size) for _, nombre, size in archivos)
+        self._total = sum(self._entradas.values())
+
+    def _quitar(self, nombre, borrar=True):
+        size = self._entradas.pop(nombre, None)
+        if size is not None:
+            self._total -= size
+        if borrar:
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+            except OSError:
+                pass
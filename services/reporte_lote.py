@@ -0,0 +1,146 @@
+"""
+Reportes por lote (p.ej. todas las órdenes completadas de un médico al cierre del día).
+
+1. Prefetch en bloque: cabeceras, resultados agrupados y referencias de todas las órdenes
+   con tres consultas (una por cada 1000 órdenes), en lugar de tres o más por orden.
+2. Render en procesos: ReportLab es CPU y el GIL no deja paralelizarlo con hilos.
+   - 'zip': un PDF por orden, repartidos entre los procesos del pool (las órdenes
+     validadas ya impresas salen de db.reportes sin dibujarse).
+   - 'pdf': un único PDF combinado, dibujado en un proceso del pool. Membrete, marca de
+     agua y firma se incrustan una sola vez para todo el lote (ver reporte_pdf).
+3. Progreso: progreso(hechas, total) se llama en el hilo que invocó generar_lote.
+"""
+import io
+import multiprocessing
+import os
+import queue
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from database import db
+from services.reporte_pdf import config_por_defecto, configurar_reportlab, es_cacheable, huella_render, renderizar_bytes
+
+# Con menos órdenes que esto no compensa arrancar procesos: se dibuja en el hilo actual
+MIN_ORDENES_POOL = 4
+
+_cola_progreso = None
+
+
+def orden_ids_por_filtro(search_term=None, medico_id=None, estado=None):
+    """Ids de las órdenes con los mismos filtros que get_ordenes_filtradas (más recientes primero)."""
+    return [o[0] for o in db.get_ordenes_filtradas(search_term, medico_id, estado)]
+
+
+def preparar_reportes(orden_ids):
+    """
+    Lee en bloque los datos de todas las órdenes.
+    Devuelve (reportes, omitidas): reportes en el orden de orden_ids, como los recibe
+    renderizar_pdf; omitidas son las órdenes inexistentes o sin resultados.
+    """
+    orden_ids = list(dict.fromkeys(orden_ids))
+    headers = db.get_report_headers_bulk(orden_ids)
+    grouped = db.get_resultados_grouped_bulk(orden_ids)
+    referencias = db.resolve_references_for_orders(orden_ids)
+
+    reportes, omitidas = [], []
+    for oid in orden_ids:
+        if oid not in headers or not grouped.get(oid):
+            omitidas.append(oid)
+            continue
+        reportes.append((oid, tuple(headers[oid]), referencias.get(oid, {}), config_por_defecto(grouped[oid])))
+    return reportes, omitidas
+
+
+def generar_lote(orden_ids, formato='pdf', include_signature=True, progreso=None, max_workers=None):
+    """
+    Genera los reportes de varias órdenes.
+    formato: 'pdf' (un PDF combinado) o 'zip' (Resultado_Orden_{id}.pdf por orden).
+    Devuelve (bytes, generadas, omitidas).
+    """
+    if formato not in ('pdf', 'zip'):
+        raise ValueError(f"Formato de lote no soportado: {formato}")
+
+    reportes, omitidas = preparar_reportes(orden_ids)
+    total = len(reportes)
+    if not reportes:
+        return None, [], omitidas
+
+    hechas = 0
+
+    def avanzar(_orden_id=None):
+        nonlocal hechas
+        hechas += 1
+        if progreso:
+            progreso(hechas, total)
+
+    if progreso:
+        progreso(0, total)
+
+    if formato == 'pdf':
+        if total >= MIN_ORDENES_POOL and max_workers != 0:
+            datos = _combinado_en_proceso(reportes, include_signature, avanzar)
+            while hechas < total:  # avisos que aún no llegaron por la cola
+                avanzar()
+        else:
+            datos = renderizar_bytes(reportes, include_signature, al_dibujar=avanzar)
+        return datos, [r[0] for r in reportes], omitidas
+
+    # Las órdenes validadas que ya se imprimieron igual salen de la caché de reportes
+    pdfs, claves, pendientes = {}, {}, []
+    for r in reportes:
+        if es_cacheable(r[3]):
+            claves[r[0]] = db.reportes.clave(r[0], r[1], r[3], include_signature, huella_render())
+            datos = db.reportes.get(r[0], claves[r[0]])
+            if datos is not None:
+                pdfs[r[0]] = datos
+                avanzar()
+                continue
+        pendientes.append(r)
+
+    def guardar(orden_id, datos):
+        pdfs[orden_id] = datos
+        if orden_id in claves:
+            db.reportes.put(orden_id, claves[orden_id], datos)
+        avanzar()
+
+    if len(pendientes) >= MIN_ORDENES_POOL and max_workers != 0:
+        workers = max_workers or min(os.cpu_count() or 1, 4)
+        with ProcessPoolExecutor(max_workers=workers, initializer=configurar_reportlab) as pool:
+            futuros = {pool.submit(renderizar_bytes, [r], include_signature): r[0] for r in pendientes}
+            for futuro in as_completed(futuros):
+                guardar(futuros[futuro], futuro.result())
+    else:
+        for r in pendientes:
+            guardar(r[0], renderizar_bytes([r], include_signature))
+
+    buffer = io.BytesIO()
+    # Los PDF ya van comprimidos: ZIP_STORED evita recomprimirlos
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zf:
+        for r in reportes:
+            zf.writestr(f"Resultado_Orden_{r[0]}.pdf", pdfs[r[0]])
+    return buffer.getvalue(), [r[0] for r in reportes], omitidas
+
+
+def _iniciar_proceso(cola):
+    # rl_config no se hereda con spawn (Windows/macOS): cada proceso lo configura como main.py
+    global _cola_progreso
+    configurar_reportlab()
+    _cola_progreso = cola
+
+
+def _combinado_con_progreso(reportes, include_signature):
+    # Corre en el proceso del pool: avisa cada orden dibujada por la cola compartida
+    return renderizar_bytes(reportes, include_signature, al_dibujar=_cola_progreso.put)
+
+
+def _combinado_en_proceso(reportes, include_signature, avanzar):
+    cola = multiprocessing.get_context().Queue()
+    with ProcessPoolExecutor(max_workers=1, initializer=_iniciar_proceso, initargs=(cola,)) as pool:
+        futuro = pool.submit(_combinado_con_progreso, reportes, include_signature)
+        while not futuro.done():
+            try:
+                cola.get(timeout=0.2)
+                avanzar()
+            except queue.Empty:
+                pass
+        return futuro.result()
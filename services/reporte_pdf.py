@@ -0,0 +1,505 @@
+import io
+import os
+from functools import lru_cache
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+
+def configurar_reportlab():
+    """
+    Ajustes de ReportLab para los reportes. rl_config es global al proceso y ReportLab no
+    acepta estas opciones por canvas, así que se llama una sola vez al iniciar (main.py).
+
+    Imágenes y páginas en binario comprimido: el ASCII85 de ReportLab (en Python puro) era lo
+    más lento al incrustar membrete y marca de agua, y agranda el PDF un 25%.
+    """
+    rl_config.useA85 = 0
+
+
+@lru_cache(maxsize=None)
+def ruta_asset(nombre):
+    """Ruta de una imagen de assets/, o None si no existe (se comprueba una sola vez por proceso)."""
+    ruta = os.path.join(os.getcwd(), "assets", nombre)
+    return ruta if os.path.exists(ruta) else None
+
+
+# Subir al cambiar el diseño del reporte: invalida los PDFs guardados en ReporteCache
+VERSION_RENDER = 2
+ASSETS = ("membrete_full.png", "membrete_cespedes.png", "microscopio_agua.png", "firma.png")
+
+
+@lru_cache(maxsize=None)
+def huella_render():
+    """Versión del render + fecha de modificación de los assets, para las claves de caché."""
+    partes = [str(VERSION_RENDER)]
+    for nombre in ASSETS:
+        ruta = ruta_asset(nombre)
+        partes.append(f"{nombre}:{os.path.getmtime(ruta) if ruta else '-'}")
+    return "|".join(partes)
+
+
+def es_cacheable(config_list):
+    """Sólo se guardan reportes con todos los resultados impresos ya validados (no van a cambiar)."""
+    items = [item for g in config_list if g['include'] for item in g['items']]
+    return bool(items) and all(item.get('estado') == 'Validado' for item in items)
+
+
+def config_por_defecto(grouped_data):
+    """config_list con todos los grupos incluidos y sin saltos de página (como abre ConfigImpresionDialog)."""
+    return [{
+        'title': g['title'],
+        'type': g['type'],
+        'items': g['items'],
+        'include': True,
+        'page_break': False
+    } for g in grouped_data]
+
+
+def renderizar_pdf(destino, reportes, include_signature=True, al_dibujar=None):
+    """
+    Dibuja uno o varios reportes en un solo PDF. No consulta la base: recibe los datos ya leídos.
+    destino: ruta o archivo abierto en modo binario (p.ej. BytesIO).
+    reportes: [(orden_id, header_data, referencias, config_list)], con header_data como
+    get_report_header y referencias como resolve_references_for_order.
+    al_dibujar: callable(orden_id) llamado tras dibujar cada orden (progreso).
+    """
+    c = canvas.Canvas(destino, pagesize=A4, pageCompression=1)
+    formas = {}
+    for i, (orden_id, header_data, referencias, config_list) in enumerate(reportes):
+        if i:
+            c.showPage()
+        dibujar_reporte(c, orden_id, header_data, referencias, config_list, include_signature, formas)
+        if al_dibujar:
+            al_dibujar(orden_id)
+    c.save()
+
+
+def renderizar_bytes(reportes, include_signature=True, al_dibujar=None):
+    """renderizar_pdf en memoria: devuelve el PDF como bytes."""
+    buffer = io.BytesIO()
+    renderizar_pdf(buffer, reportes, include_signature, al_dibujar)
+    return buffer.getvalue()
+
+
+# --- GEOMETRÍA DE LA PÁGINA ---
+W, H = A4
+MARGEN_X = 50
+MARGEN_Y_BOTTOM = 2.5 * cm
+ANCHO_UTIL = W - (MARGEN_X * 2)
+# Por debajo de esto va la firma (imagen de 90pt sobre la línea de firma)
+LIMITE_INFERIOR = MARGEN_Y_BOTTOM + 100
+
+X_RESULTADO = MARGEN_X + (ANCHO_UTIL * 0.4) + 10
+X_REFERENCIA = MARGEN_X + (ANCHO_UTIL * 0.65)
+X_UNIDADES = MARGEN_X + (ANCHO_UTIL * 0.88)
+X_OBSERVACIONES = MARGEN_X + 110
+SEPARACION = 6
+
+INTERLINEA = 12
+ESPACIO_GRUPO = 20
+
+
+def es_cespedes(medico):
+    nombre_medico = str(medico).upper() if medico else ""
+    return "CESPEDES" in nombre_medico and "HUGO" in nombre_medico
+
+
+def inicio_cuerpo(medico):
+    """'y' de la primera línea del cuerpo: debajo del membrete, los datos del paciente y la barra de títulos."""
+    membrete = ruta_asset("membrete_cespedes.png" if es_cespedes(medico) else "membrete_full.png")
+    y = (H - 20) - (170 if membrete else 50)
+    return y - 50 - 35
+
+
+@lru_cache(maxsize=4096)
+def partir_texto(texto, ancho, fuente="Courier", tamano=10):
+    """
+    Corta `texto` en líneas de como máximo `ancho` puntos: por palabras, por caracteres si una
+    palabra sola no cabe, y respetando los saltos de línea del propio texto. Devuelve una tupla.
+    """
+    if "\n" not in texto and stringWidth(texto, fuente, tamano) <= ancho:
+        return (texto,)
+
+    lineas = []
+    for parrafo in texto.splitlines() or [""]:
+        actual = ""
+        for palabra in parrafo.split():
+            prueba = f"{actual} {palabra}" if actual else palabra
+            if stringWidth(prueba, fuente, tamano) <= ancho:
+                actual = prueba
+                continue
+            if actual:
+                lineas.append(actual)
+            while len(palabra) > 1 and stringWidth(palabra, fuente, tamano) > ancho:
+                k = len(palabra) - 1
+                while k > 1 and stringWidth(palabra[:k], fuente, tamano) > ancho:
+                    k -= 1
+                lineas.append(palabra[:k])
+                palabra = palabra[k:]
+            actual = palabra
+        lineas.append(actual)
+    return tuple(lineas)
+
+
+# --- PRIMERA PASADA: MEDIDA Y PAGINACIÓN ---
+# Una línea es (tipo, alto, datos); `alto` es lo que baja la 'y' al dibujarla.
+
+def medir_grupo(group_config, referencias):
+    """
+    Líneas de un grupo ya medidas, en bloques que no se separan entre páginas: el primero
+    lleva la cabecera del examen con su primer resultado, y cada encabezado de categoría o
+    subtítulo va con el resultado que lo sigue. [] si el grupo no tiene nada que imprimir.
+    """
+    items = group_config['items']
+    bloques = []
+    pendiente = [('examen', 15, group_config['title'])]
+
+    metodo_global = items[0].get('metodo') if items else None
+    if metodo_global and metodo_global != "Automatizado":
+        pendiente.append(('metodo', 15, metodo_global))
+    pendiente.append(('espacio', 5, None))
+
+    current_cat = None
+    current_sub = None  # For Subtitle Grouping
+
+    for item in items:
+        raw_val = item['valor'] or ""
+
+        # Ghost Logic: Skip empty, UNLESS it is "0"
+        val_str = str(raw_val).strip()
+        if not val_str and val_str != "0":
+            continue
+
+        # Numeric Formatting
+        try:
+            float_val = float(val_str)
+            val_str = "{:.2f}".format(float_val)
+        except ValueError:
+            pass
+
+        cat = item.get('categoria') or "General"
+
+        # Category Header (For Profiles)
+        if group_config['type'] == 'Perfil':
+            if cat != "General" and cat != current_cat and "OBSERVACIONES" not in cat.upper():
+                pendiente.append(('categoria', 17, cat))
+                current_cat = cat
+
+        # Subtitle Header (Phase 6.5). get_resultados_grouped lo entrega como 'subtitulo'
+        subtitulo = item.get('subtitulo') or item.get('subtituloReporte')
+        if subtitulo and subtitulo != current_sub:
+            pendiente.append(('subtitulo', 17, subtitulo))
+            current_sub = subtitulo
+
+        nombre = item['nombre']
+        if nombre.upper() == "OBSERVACIONES":
+            lineas = partir_texto(val_str, W - MARGEN_X - X_OBSERVACIONES)
+            pendiente.append(('observaciones', 25 + INTERLINEA * (len(lineas) - 1), lineas))
+        else:
+            negrita = "POSITIVO" in val_str.upper() or "REACTIVO" in val_str.upper()
+            smart_ref = str(referencias.get(item['analitoId'], {}).get('referencia', "") or "")
+            uni = str(item['unidad'] or "")
+            # Sin unidad, la referencia puede ocupar también esa columna
+            fin_ref = X_UNIDADES if uni else W - MARGEN_X
+
+            nombres = partir_texto(nombre, X_RESULTADO - MARGEN_X - SEPARACION)
+            valores = partir_texto(val_str, X_REFERENCIA - X_RESULTADO - SEPARACION,
+                                   "Courier-Bold" if negrita else "Courier")
+            refs = partir_texto(smart_ref, fin_ref - X_REFERENCIA - SEPARACION)
+            filas = max(len(nombres), len(valores), len(refs))
+            pendiente.append(('fila', INTERLINEA * filas, (nombres, valores, refs, uni, negrita)))
+
+        bloques.append(pendiente)
+        pendiente = []
+
+    return bloques
+
+
+def _alto(lineas):
+    return sum(linea[1] for linea in lineas)
+
+
+def paginar(config_list, referencias, medico=None):
+    """
+    Reparte los grupos incluidos en páginas sin dibujar nada.
+    Devuelve una lista de páginas, cada una [(y, linea, indice_grupo)].
+
+    - Un grupo que no cabe en lo que queda de página empieza en la siguiente.
+    - Uno más alto que una página entera se parte entre bloques, repitiendo el título.
+    - page_break fuerza página nueva (salvo que la actual esté vacía).
+    """
+    y_inicio = inicio_cuerpo(medico)
+    disponible = y_inicio - LIMITE_INFERIOR
+    paginas = [[]]
+    y = y_inicio
+
+    def nueva_pagina():
+        nonlocal y
+        paginas.append([])
+        y = y_inicio
+
+    def colocar(lineas, indice):
+        nonlocal y
+        for linea in lineas:
+            paginas[-1].append((y, linea, indice))
+            y -= linea[1]
+
+    for indice, group_config in enumerate(config_list):
+        if not group_config['include']:
+            continue
+        bloques = medir_grupo(group_config, referencias)
+        if not bloques:
+            continue
+
+        if group_config['page_break'] and paginas[-1]:
+            nueva_pagina()
+
+        alto = sum(_alto(b) for b in bloques)
+        if y - alto < LIMITE_INFERIOR and paginas[-1] and alto <= disponible:
+            nueva_pagina()
+
+        if y - alto >= LIMITE_INFERIOR:
+            for bloque in bloques:
+                colocar(bloque, indice)
+        else:
+            continuacion = [('examen', 15, f"{group_config['title']} (cont.)"), ('espacio', 5, None)]
+            for j, bloque in enumerate(bloques):
+                if y - _alto(bloque) < LIMITE_INFERIOR and paginas[-1]:
+                    nueva_pagina()
+                    if j:
+                        colocar(continuacion, indice)
+                colocar(bloque, indice)
+
+        y -= ESPACIO_GRUPO
+
+    return paginas
+
+
+def resumen_paginas(config_list, referencias=None, medico=None):
+    """
+    (total de páginas, página donde empieza cada grupo de config_list, 1-based, None si no se imprime),
+    para previsualizar los saltos sin generar el PDF.
+    """
+    paginas = paginar(config_list, referencias or {}, medico)
+    inicio = [None] * len(config_list)
+    for n, pagina in enumerate(paginas, start=1):
+        for _, _, indice in pagina:
+            if inicio[indice] is None:
+                inicio[indice] = n
+    return len(paginas), inicio
+
+
+def contar_paginas(config_list, referencias=None, medico=None):
+    """Páginas que ocupará el reporte, sin dibujarlo."""
+    return len(paginar(config_list, referencias or {}, medico))
+
+
+# --- SEGUNDA PASADA: DIBUJO ---
+
+def dibujar_reporte(c, orden_id, header_data, referencias, config_list, include_signature=True, formas=None):
+    """
+    Dibuja las páginas de una orden en el canvas `c` (sin guardarlo), con las posiciones que
+    calcula paginar.
+    formas: form XObjects ya definidos en este canvas (nombre -> valor devuelto al dibujarla,
+    p.ej. la 'y' siguiente), para que varias órdenes del mismo PDF compartan membrete y firma.
+    """
+    if formas is None:
+        formas = {}
+
+    paciente, edad, unidad, genero, medico, fecha = header_data
+
+    ES_DR_CESPEDES = es_cespedes(medico)
+
+    # --- CONFIGURACIÓN DE PÁGINA ---
+    w, h = W, H
+
+    margen_x = MARGEN_X
+    margen_y_bottom = MARGEN_Y_BOTTOM
+    ancho_util = ANCHO_UTIL
+    color_barra = colors.HexColor("#005b96")
+
+    # --- FUNCIONES DE DIBUJO ---
+    # Membrete, marca de agua, datos del paciente, barra de títulos y firma son iguales en
+    # todas las páginas: se dibujan una vez como form XObject y cada página los referencia.
+
+    def usar_forma(nombre, dibujar):
+        if nombre not in formas:
+            c.beginForm(nombre)
+            formas[nombre] = dibujar()
+            c.endForm()
+        c.doForm(nombre)
+        return formas[nombre]
+
+    def dibujar_marca_agua():
+        if not ES_DR_CESPEDES:
+            ruta_agua = ruta_asset("microscopio_agua.png")
+            if ruta_agua:
+                c.saveState()
+                try:
+                    c.setFillAlpha(0.25)
+                    ancho_agua = 500
+                    alto_agua = 500
+                    x_pos = (w - ancho_agua) / 2
+                    y_pos = (h - alto_agua) / 2
+                    c.drawImage(ruta_agua, x_pos, y_pos, width=ancho_agua, height=alto_agua, mask='auto', preserveAspectRatio=True)
+                except Exception as e:
+                    print(f"Error cargando marca de agua: {e}")
+                finally:
+                    c.restoreState()
+
+    def dibujar_membrete(y_actual):
+        if ES_DR_CESPEDES:
+            ruta_membrete = ruta_asset("membrete_cespedes.png")
+        else:
+            ruta_membrete = ruta_asset("membrete_full.png")
+
+        if ruta_membrete:
+            try:
+                ancho_imagen = w - 20
+                altura_imagen = 160
+                c.drawImage(ruta_membrete, 10, y_actual - altura_imagen + 20, width=ancho_imagen, height=altura_imagen, mask='auto', preserveAspectRatio=True)
+            except Exception as e:
+                print(f"Error cargando membrete: {e}")
+            # Misma altura aunque falle la imagen: inicio_cuerpo ya la contó al paginar
+            return y_actual - altura_imagen - 10
+        else:
+            c.setFont("Helvetica-Bold", 16)
+            c.drawCentredString(w/2, y_actual - 30, "LABORATORIO CLÍNICO")
+            return y_actual - 50
+
+    def dibujar_firma():
+        y_firma = margen_y_bottom + 40
+        x_firma_centro = w - margen_x - 100
+
+        if include_signature:
+            ruta_firma = ruta_asset("firma.png")
+            if ruta_firma:
+                try:
+                    c.drawImage(ruta_firma, x_firma_centro - 110, y_firma - 30, width=220, height=90, mask='auto', preserveAspectRatio=True)
+                except Exception as e:
+                    print(f"Error cargando firma: {e}")
+
+        c.setStrokeColor(colors.black)
+        c.setDash(4, 3)
+        c.line(x_firma_centro - 90, y_firma, x_firma_centro + 90, y_firma)
+        c.setDash([])
+
+        c.setFont("Courier", 9)
+        c.drawCentredString(x_firma_centro, y_firma - 12, "LIC. COBEÑAS PALACIOS LUIS A.")
+        c.drawCentredString(x_firma_centro, y_firma - 22, "TECNÓLOGO MÉDICO")
+        c.drawCentredString(x_firma_centro, y_firma - 32, "C.T.M.P 10911")
+
+    def dibujar_datos_paciente(y_actual):
+        c.setStrokeColor(colors.grey)
+        c.line(margen_x, y_actual, w - margen_x, y_actual)
+        y_actual -= 15
+
+        c.setFillColor(colors.black)
+        c.setFont("Courier-Bold", 10)
+        c.drawString(margen_x, y_actual, "PACIENTE:")
+        c.setFont("Courier", 10)
+        c.drawString(margen_x + 70, y_actual, str(paciente).upper())
+
+        col2_x = w - margen_x - 200
+        c.setFont("Courier-Bold", 10)
+        c.drawString(col2_x, y_actual, "FECHA:")
+        c.setFont("Courier", 10)
+        c.drawString(col2_x + 50, y_actual, str(fecha)[:10])
+
+        y_actual -= 15
+
+        c.setFont("Courier-Bold", 10)
+        c.drawString(margen_x, y_actual, "MÉDICO:")
+        c.setFont("Courier", 10)
+        c.drawString(margen_x + 70, y_actual, str(medico or "Particular").upper())
+
+        c.setFont("Courier-Bold", 10)
+        c.drawString(col2_x, y_actual, "EDAD:")
+        c.setFont("Courier", 10)
+        c.drawString(col2_x + 50, y_actual, f"{edad} {unidad} ({genero})")
+
+        y_actual -= 10
+        c.line(margen_x, y_actual, w - margen_x, y_actual)
+        return y_actual - 10
+
+    def dibujar_barra_titulos(y_actual):
+        c.setFillColor(color_barra)
+        c.rect(margen_x, y_actual - 12, ancho_util, 14, fill=1, stroke=0)
+
+        c.setFillColor(colors.white)
+        c.setFont("Courier-Bold", 9)
+
+        c.drawString(margen_x + 5, y_actual - 9, "ANÁLISIS")
+        c.drawString(margen_x + (ancho_util * 0.4), y_actual - 9, "RESULTADO")
+        c.drawString(margen_x + (ancho_util * 0.65), y_actual - 9, "V. REFERENCIALES")
+        c.drawString(margen_x + (ancho_util * 0.88), y_actual - 9, "UNIDADES")
+
+        return y_actual - 35
+
+    variante = "cespedes" if ES_DR_CESPEDES else "full"
+
+    def init_page():
+        if not ES_DR_CESPEDES and ruta_asset("microscopio_agua.png"):
+            usar_forma("marca_agua", dibujar_marca_agua)
+        y = usar_forma(f"membrete_{variante}", lambda: dibujar_membrete(h - 20))
+        y = usar_forma(f"datos_paciente_{orden_id}", lambda: dibujar_datos_paciente(y))
+        y = usar_forma(f"barra_titulos_{variante}", lambda: dibujar_barra_titulos(y))
+        return y
+
+    def cerrar_pagina():
+        usar_forma("firma" if include_signature else "firma_sin_imagen", dibujar_firma)
+
+    def dibujar_lineas(x, y, lineas):
+        for k, texto in enumerate(lineas):
+            if texto:
+                c.drawString(x, y - INTERLINEA * k, texto)
+
+    def dibujar_linea(y, linea):
+        tipo, _, datos = linea
+        c.setFillColor(colors.black)
+
+        if tipo == 'examen':
+            c.setFont("Courier-Bold", 11)
+            c.drawString(margen_x, y, f"Examen :   {datos}")
+        elif tipo == 'metodo':
+            c.setFont("Courier", 10)
+            c.drawString(margen_x, y, f"Método :   {datos}")
+        elif tipo == 'categoria':
+            c.setFont("Courier-Bold", 10)
+            c.drawString(margen_x, y - 5, f"{datos}:")
+        elif tipo == 'subtitulo':
+            c.setFont("Courier-Bold", 10)
+            c.drawString(margen_x + 10, y - 5, datos)
+        elif tipo == 'observaciones':
+            y -= 10
+            c.setFont("Courier-Bold", 10)
+            c.drawString(margen_x, y, "OBSERVACIONES:")
+            c.setFont("Courier", 10)
+            dibujar_lineas(X_OBSERVACIONES, y, datos)
+        elif tipo == 'fila':
+            nombres, valores, refs, uni, negrita = datos
+            c.setFont("Courier", 10)
+            dibujar_lineas(margen_x, y, nombres)
+
+            if negrita:
+                c.setFont("Courier-Bold", 10)
+            dibujar_lineas(X_RESULTADO, y, valores)
+
+            c.setFont("Courier", 10)
+            dibujar_lineas(X_REFERENCIA, y, refs)
+            c.drawString(X_UNIDADES, y, uni)
+
+    # --- CUERPO ---
+    paginas = paginar(config_list, referencias, medico)
+    for n, pagina in enumerate(paginas):
+        if n:
+            c.showPage()
+        init_page()
+        for y, linea, _ in pagina:
+            dibujar_linea(y, linea)
+        cerrar_pagina()
@@ -0,0 +1,83 @@
+"""
+Fixtures comunes: el singleton `db` apuntando a una base SQLite nueva por prueba
+(services.dialectos.Sqlite crea el esquema al conectar), con cachés e índices vacíos
+y las estadísticas de consultas activas y en cero.
+"""
+
+import pytest
+
+from database import db as _db
+from services.catalog_cache import CatalogCache
+from services.connection_pool import ConnectionPool
+from services.dialectos import Sqlite
+from services.duplicados import DetectorDuplicados
+from services.paciente_index import PacienteIndex
+from services.rango_index import RangoIndex
+from services.reporte_cache import ReporteCache
+
+# Atributos del singleton que la fixture reemplaza y luego restaura
+_ESTADO = ('dialecto', 'pool', 'rango_index', 'catalogos', 'paciente_index', 'paciente_index_sync',
+           'duplicados', 'reportes', '_default_profile_id')
+
+
+@pytest.fixture
+def db(tmp_path):
+    anterior = {nombre: getattr(_db, nombre) for nombre in _ESTADO}
+    ruta_log, habilitado = _db.stats.ruta_log, _db.stats.habilitado
+
+    _db.dialecto = Sqlite(str(tmp_path / "lab.sqlite3"))
+    _db.pool = ConnectionPool(_db.stats.envolver(_db.dialecto.conectar), pool_size=2, max_overflow=2, timeout=5.0)
+    _db.rango_index = RangoIndex(_db._to_days)
+    _db.catalogos = CatalogCache(_db, check_interval=30.0)
+    _db.paciente_index = PacienteIndex()
+    _db.paciente_index_sync = 0.0
+    _db.duplicados = DetectorDuplicados()
+    _db.reportes = ReporteCache(str(tmp_path / "reportes"))
+    _db._default_profile_id = None
+    _db.stats.ruta_log = str(tmp_path / "slow_queries.jsonl")
+    _db.stats.habilitado = True
+    _db.stats.reiniciar()
+    try:
+        yield _db
+    finally:
+        _db.pool.close_all()
+        for nombre, valor in anterior.items():
+            setattr(_db, nombre, valor)
+        _db.stats.ruta_log, _db.stats.habilitado = ruta_log, habilitado
+        _db.stats.reiniciar()
+
+
+# --- DATOS ---
+def insertar(db, tabla, **columnas):
+    """INSERT directo, sin pasar por DatabaseManager, para preparar datos; devuelve el id."""
+    nombres = ", ".join(columnas)
+    marcas = ", ".join("?" * len(columnas))
+    with db.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"INSERT INTO {tabla} ({nombres}) VALUES ({marcas})", list(columnas.values()))
+        nuevo_id = cursor.lastrowid
+        conn.commit()
+    return nuevo_id
+
+
+def analito(db, nombre, tipoDato='Numérico', categoria='Bioquímica', **columnas):
+    return insertar(db, 'Analitos', nombre=nombre, tipoDato=tipoDato, categoria=categoria, **columnas)
+
+
+def perfil(db, nombre, analito_ids=(), hijos=(), categoria='Bioquímica'):
+    perfil_id = insertar(db, 'PerfilesExamen', nombre=nombre, categoria=categoria, precioEstandar=10.0)
+    for orden, aid in enumerate(analito_ids):
+        insertar(db, 'DetallePerfilAnalito', perfilExamenId=perfil_id, analitoId=aid, orden=orden)
+    for orden, hijo in enumerate(hijos):
+        insertar(db, 'DetallePerfilComposicion', perfilPadreId=perfil_id, perfilHijoId=hijo, orden=orden)
+    return perfil_id
+
+
+def paciente(db, nombre='JUAN PEREZ', edad=30, genero='M', dni=None):
+    return db.upsert_paciente({'nombreCompleto': nombre, 'edad': edad, 'unidadEdad': 'Años',
+                               'genero': genero, 'dni': dni})
+
+
+def consultas(db, metodo=None):
+    """Sentencias registradas en db.stats (de `metodo`, o todas)."""
+    return sum(fila['llamadas'] for fila in db.stats.resumen() if metodo is None or fila['metodo'] == metodo)
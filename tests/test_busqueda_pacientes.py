@@ -0,0 +1,106 @@
+import threading
+import time
+
+from services.paciente_search import PacienteSearch
+from tests.conftest import consultas, paciente
+
+
+class _Resultados:
+    """on_result para PacienteSearch: guarda cada entrega y avisa."""
+
+    def __init__(self):
+        self.entregas = []
+        self._llego = threading.Event()
+
+    def __call__(self, filas):
+        self.entregas.append(filas)
+        self._llego.set()
+
+    def esperar(self):
+        assert self._llego.wait(5)
+        self._llego.clear()
+        return self.entregas[-1]
+
+
+def _nombres(filas):
+    return [r[1] for r in filas]
+
+
+def test_dni_numerico_busca_por_prefijo_con_limite(db):
+    paciente(db, 'ANA TORRES', dni='12345678')
+    paciente(db, 'LUIS VEGA', dni='12349999')
+    paciente(db, 'EVA RIOS', dni='87654321')
+
+    assert _nombres(db.search_pacientes('1234')) == ['ANA TORRES', 'LUIS VEGA']
+    assert _nombres(db.search_pacientes('1234', limit=1)) == ['ANA TORRES']
+    assert db.search_pacientes('999') == []
+
+
+def test_dni_alfanumerico_o_con_guiones_busca_por_prefijo(db):
+    paciente(db, 'CARLOS DIAZ', dni='AB123456')
+    paciente(db, 'ROSA MEZA', dni='40-111-222')
+    paciente(db, 'ABEL RUIZ', dni='40111222')
+
+    assert _nombres(db.search_pacientes('AB1234')) == ['CARLOS DIAZ']
+    assert _nombres(db.search_pacientes('40-111')) == ['ROSA MEZA']
+
+
+def test_termino_tipo_documento_tambien_busca_por_nombre(db):
+    paciente(db, 'LUIS K9 VEGA')
+    paciente(db, 'EVA RIOS', dni='K9000')
+
+    # Primero el prefijo de DNI, luego los nombres
+    assert _nombres(db.search_pacientes('K9')) == ['EVA RIOS', 'LUIS K9 VEGA']
+
+
+def test_nombre_sin_tildes_y_en_cualquier_orden(db):
+    paciente(db, 'JUAN PÉREZ')
+    paciente(db, 'MARIA LOPEZ')
+
+    assert _nombres(db.search_pacientes('perez juan')) == ['JUAN PÉREZ']
+    assert _nombres(db.search_pacientes('lop')) == ['MARIA LOPEZ']
+    assert db.search_pacientes('   ') == []
+
+
+def test_debounce_consulta_solo_el_ultimo_termino(db):
+    paciente(db, 'JUAN PEREZ')
+    paciente(db, 'MARIA LOPEZ')
+    busqueda = PacienteSearch(debounce=0.05)
+    resultados = _Resultados()
+
+    for term in ('ma', 'mar', 'maria'):
+        busqueda.buscar(term, resultados)
+
+    assert _nombres(resultados.esperar()) == ['MARIA LOPEZ']
+    time.sleep(0.15)
+    # Las teclas anteriores no llegaron a consultar ni a entregar
+    assert len(resultados.entregas) == 1
+    assert busqueda._ultimo[0] == 'maria'
+    busqueda.cancelar()
+
+
+def test_termino_corto_no_consulta(db):
+    paciente(db, 'JUAN PEREZ')
+    busqueda = PacienteSearch(debounce=0)
+    resultados = _Resultados()
+    db.stats.reiniciar()
+
+    busqueda.buscar('j', resultados)
+
+    assert resultados.esperar() is None
+    assert consultas(db) == 0
+
+
+def test_dni_mas_largo_filtra_el_resultado_anterior(db):
+    paciente(db, 'ANA TORRES', dni='12345678')
+    paciente(db, 'LUIS VEGA', dni='12349999')
+    busqueda = PacienteSearch(debounce=0)
+    resultados = _Resultados()
+
+    busqueda.buscar('1234', resultados)
+    assert len(resultados.esperar()) == 2
+
+    db.stats.reiniciar()
+    busqueda.buscar('12345', resultados)
+    assert _nombres(resultados.esperar()) == ['ANA TORRES']
+    assert consultas(db) == 0
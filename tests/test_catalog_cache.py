@@ -0,0 +1,73 @@
+import dataclasses
+import threading
+
+import pytest
+
+from services.catalog_cache import CatalogCache
+from tests.conftest import consultas
+
+
+class _DbLenta:
+    """get_all_medicos se detiene hasta `seguir`, como si esperara una conexión del pool."""
+
+    def __init__(self):
+        self.filas = [(1, 'DR. ROJAS', 'Pediatría', None, 0)]
+        self.cargando = threading.Event()
+        self.seguir = threading.Event()
+        self.cargas = 0
+
+    def get_catalog_version(self, tabla):
+        return (len(self.filas), 0)
+
+    def get_all_medicos(self):
+        self.cargas += 1
+        filas = list(self.filas)
+        self.cargando.set()
+        assert self.seguir.wait(5)
+        return filas
+
+
+def test_invalidar_no_espera_a_una_carga_en_curso():
+    db = _DbLenta()
+    cache = CatalogCache(db, check_interval=None)
+    lector = threading.Thread(target=cache.medicos)
+    lector.start()
+    assert db.cargando.wait(5)
+
+    # La carga está bloqueada (p.ej. pool agotado) pero no tiene el lock
+    invalidador = threading.Thread(target=cache.invalidar, args=('medicos',))
+    invalidador.start()
+    invalidador.join(1)
+    assert not invalidador.is_alive()
+
+    db.filas.append((2, 'DRA. SALAS', 'Medicina', None, 1))
+    db.seguir.set()
+    lector.join(5)
+
+    # Lo leído antes de invalidar no se guardó: la próxima lectura vuelve a cargar
+    assert [m.id for m in cache.medicos()] == [1, 2]
+    assert db.cargas == 2
+    assert cache.get('medicos', 2).nombre == 'DRA. SALAS'
+
+
+def test_modelos_del_cache_son_de_solo_lectura():
+    db = _DbLenta()
+    db.seguir.set()
+    cache = CatalogCache(db, check_interval=None)
+    medico = cache.medicos()[0]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        medico.nombre = 'OTRO'
+    assert cache.medicos()[0] is medico
+
+
+def test_lecturas_desde_cache_e_invalidacion(db):
+    db.upsert_medico({'nombre': 'DR. ROJAS', 'especialidad': 'Pediatría'})
+    assert [m.nombre for m in db.catalogos.medicos()] == ['DR. ROJAS']
+
+    db.stats.reiniciar()
+    medicos = db.catalogos.medicos()
+    assert consultas(db) == 0
+    assert db.catalogos.get('medicos', medicos[0].id) is medicos[0]
+
+    db.upsert_medico({'nombre': 'DRA. SALAS', 'especialidad': 'Medicina', 'tieneConvenio': True})
+    assert [m.nombre for m in db.catalogos.medicos()] == ['DR. ROJAS', 'DRA. SALAS']
@@ -0,0 +1,81 @@
+"""El número de sentencias de crear y abrir una orden no depende de cuántos analitos tenga."""
+import re
+import threading
+
+from tests.conftest import analito, consultas, insertar, paciente, perfil
+
+# Buscar o crear el perfil por defecto (get_resultados_grouped sólo hace JOIN para el nombre)
+_LOOKUP_PERFIL = re.compile(r"\b(FROM|INTO)\s+PerfilesExamen\b", re.IGNORECASE)
+
+
+def _catalogo(db, n):
+    """Un perfil con n analitos (la mitad de tipo Opciones) y n analitos sueltos."""
+    ids = []
+    for i in range(2 * n):
+        if i % 2:
+            aid = analito(db, f"OPC {n}-{i}", tipoDato='Opciones')
+            insertar(db, 'OpcionesAnalito', analitoId=aid, valorOpcion='Negativo', esPredeterminado=1)
+            insertar(db, 'OpcionesAnalito', analitoId=aid, valorOpcion='Positivo', esPredeterminado=0)
+        else:
+            aid = analito(db, f"NUM {n}-{i}")
+        ids.append(aid)
+    perfil_id = perfil(db, f"PERFIL {n}", ids[:n])
+    return [{'type': 'perfil', 'id': perfil_id, 'precio': 10.0}] + [{'type': 'analito', 'id': aid} for aid in ids[n:]]
+
+
+def _medir(db, items, paciente_id):
+    db.stats.reiniciar()
+    orden_id = db.create_orden_trabajo(paciente_id, None, items)
+    al_crear = consultas(db)
+
+    db.stats.reiniciar()
+    grupos = db.get_resultados_grouped(orden_id)
+    al_abrir = consultas(db)
+    return al_crear, al_abrir, grupos
+
+
+def test_sentencias_constantes_con_1_y_n_analitos(db):
+    paciente_id = paciente(db)
+    pequena = _catalogo(db, 1)
+    grande = _catalogo(db, 20)
+    db.default_profile_id  # se resuelve una vez por proceso, fuera de la medición
+
+    crear_1, abrir_1, grupos_1 = _medir(db, pequena, paciente_id)
+    crear_n, abrir_n, grupos_n = _medir(db, grande, paciente_id)
+
+    assert crear_1 == crear_n > 0
+    assert abrir_1 == abrir_n > 0
+
+    assert sum(len(g['items']) for g in grupos_1) == 2
+    items_n = [item for g in grupos_n for item in g['items']]
+    assert len(items_n) == 40
+    assert all(item['opciones'] == [{'text': 'Negativo', 'default': True}, {'text': 'Positivo', 'default': False}]
+               for item in items_n if item['tipoDato'] == 'Opciones')
+
+
+def test_perfil_por_defecto_no_se_consulta_al_crear_ni_abrir(db):
+    paciente_id = paciente(db)
+    items = _catalogo(db, 2)
+    db.default_profile_id
+
+    db.stats.reiniciar()
+    orden_id = db.create_orden_trabajo(paciente_id, None, items)
+    db.get_resultados_grouped(orden_id)
+    sentencias = db.stats.resumen()
+
+    assert {fila['metodo'] for fila in sentencias} >= {'create_orden_trabajo', 'get_resultados_grouped'}
+    assert [fila['sql'] for fila in sentencias
+            if fila['metodo'] == 'ensure_default_profile' or _LOOKUP_PERFIL.search(fila['sql'])] == []
+
+
+def test_perfil_por_defecto_se_crea_una_sola_vez(db):
+    ids = []
+    hilos = [threading.Thread(target=lambda: ids.append(db.default_profile_id)) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert len(ids) == 8 and len(set(ids)) == 1
+    assert consultas(db, 'ensure_default_profile') == 2  # INSERT OR IGNORE + SELECT, una vez
+    assert [p.id for p in db.catalogos.perfiles() if p.nombre == 'Examenes Individuales'] == ids[:1]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from services.dialectos import SqlServer, Sqlite
+
+from tests.conftest import insertar, paciente
+
+
+def test_escapar_like_por_dialecto():
+    assert SqlServer.escapar_like("100%_[a]") == "100[%][_][[]a]"
+    assert Sqlite.escapar_like("100%_\\") == "100\\%\\_\\\\"
+
+
+def test_alta_de_paciente_devuelve_id_y_fecha(db):
+    pid = paciente(db, 'ANA TORRES', dni='40111222')
+    fila = db.get_paciente(pid)
+
+    assert fila[1] == 'ANA TORRES'
+    assert isinstance(fila[-1], datetime)
+
+
+def test_busqueda_de_ordenes_toma_comodines_literales(db):
+    for nombre, dni in (('ANA 100% TORRES', '40_11'), ('ANA 1000 TORRES', '40511'), ('LUIS VEGA', '40\\11')):
+        insertar(db, 'OrdenesTrabajo', pacienteId=paciente(db, nombre, dni=dni), estado='Pendiente', totalPagar=0)
+
+    def buscar(term):
+        return sorted(fila[1] for fila in db.get_ordenes_filtradas(search_term=term))
+
+    assert buscar('100%') == ['ANA 100% TORRES']
+    assert buscar('0_1') == ['ANA 100% TORRES']
+    assert buscar('0\\1') == ['LUIS VEGA']
+    assert buscar('%') == ['ANA 100% TORRES']
+    assert len(db.get_ordenes_filtradas_page(search_term='_', page_size=10)) == 1
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from services.duplicados import (UMBRAL, DetectorDuplicados, Registro, agrupar, codigo_fonetico,
+                                 puntaje)
+from tests.conftest import paciente
+
+FECHA = datetime(2024, 6, 1)
+
+
+def _registro(pid, nombre, edad=30, genero='M', dni=None):
+    return Registro(pid, nombre, edad, 'Años', genero, dni, FECHA)
+
+
+def test_codigo_fonetico_unifica_letras_que_suenan_igual():
+    assert codigo_fonetico('Vásquez') == codigo_fonetico('Basques') == codigo_fonetico('Vazquez') == 'BSKS'
+    assert codigo_fonetico('Yépez') == codigo_fonetico('Llepes')
+    assert codigo_fonetico('Hernández') == codigo_fonetico('Ernandes')
+
+
+def test_genero_distinto_no_es_duplicado():
+    # Regresión: puntuaba 0.885 (> UMBRAL) sólo por el nombre y la edad
+    juana = _registro(1, 'Juana Perez', genero='F')
+    juan = _registro(2, 'Juan Pérez', genero='M')
+    assert puntaje(juana, juan) < UMBRAL
+
+    assert puntaje(_registro(3, 'Juan Perez', genero='M'), juan) >= UMBRAL
+    # Sin género registrado en uno de los dos, el nombre y la edad deciden
+    assert puntaje(_registro(4, 'Juan Perez', genero=None), juan) >= UMBRAL
+
+
+def test_dni_igual_siempre_y_edad_lejana_no():
+    a = _registro(1, 'ROSA QUISPE', dni='40123456')
+    assert puntaje(a, _registro(2, 'R. QUISPE MAMANI', dni='40123456')) == 1.0
+    assert puntaje(a, _registro(3, 'ROSA QUISPE', edad=70)) < UMBRAL
+
+
+def test_candidatos_y_clusters():
+    detector = DetectorDuplicados()
+    detector.cargar([
+        (1, 'JUAN PEREZ', 30, 'Años', 'M', None, FECHA),
+        (2, 'JUAN PERES', 31, 'Años', 'M', None, FECHA),
+        (3, 'JUANA PEREZ', 30, 'Años', 'F', None, FECHA),
+        (4, 'PEREZ JUAN', 30, 'Años', 'M', None, FECHA),
+        (5, 'MARIA LOPEZ', 30, 'Años', 'F', None, FECHA),
+    ])
+
+    assert [pid for pid, _ in detector.candidatos('Juan Pérez', 30, 'Años', 'M', excluir=1)] == [4, 2]
+    pares, omitidos = detector.pares()
+    assert omitidos == 0
+    assert agrupar(pares) == [[1, 2, 4]]
+
+
+def test_check_paciente_duplicates(db):
+    juan = paciente(db, 'JUAN PEREZ', genero='M')
+    paciente(db, 'JUANA PEREZ', genero='F')
+    paciente(db, 'ROSA QUISPE', genero='F', dni='40123456')
+
+    assert [r[0] for r in db.check_paciente_duplicates(None, 'Juan Pérez', 30, 'Años', 'M')] == [juan]
+    assert db.check_paciente_duplicates(None, 'Juan Pérez', 30, 'Años', 'M', excluir_id=juan) == []
+    assert [r[1] for r in db.check_paciente_duplicates('40123456', 'OTRO NOMBRE')] == ['ROSA QUISPE']
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from services.executor import DataExecutor, indicador
+
+
+@pytest.fixture
+def pool():
+    ex = DataExecutor(max_workers=4, nombre="test-data")
+    yield ex
+    ex.shutdown(wait=True)
+
+
+def _esperar(*requests):
+    for request in requests:
+        request.future.result(5)
+
+
+def test_consulta_nueva_reemplaza_a_la_anterior(pool):
+    entregados = []
+    en_sql = threading.Event()
+    seguir = threading.Event()
+
+    def lenta():
+        en_sql.set()
+        assert seguir.wait(5)
+        return 'vieja'
+
+    vieja = pool.submit(lenta, key='busqueda', on_result=entregados.append)
+    assert en_sql.wait(5)
+    nueva = pool.submit(lambda: 'nueva', key='busqueda', on_result=entregados.append)
+    _esperar(nueva)
+    seguir.set()
+    _esperar(vieja)
+
+    assert entregados == ['nueva']
+
+
+def test_no_entrega_si_llega_una_consulta_nueva_mientras_corre(pool):
+    # La consulta vieja ya terminó su SQL cuando se envía la nueva: la cancelación se
+    # vuelve a comprobar al entregar, así que su resultado no pisa al nuevo.
+    entregados, nuevas = [], []
+
+    def vieja():
+        nuevas.append(pool.submit(lambda: 'nueva', key='orden', on_result=entregados.append))
+        return 'vieja'
+
+    _esperar(pool.submit(vieja, key='orden', on_result=entregados.append))
+    _esperar(*nuevas)
+
+    assert entregados == ['nueva']
+
+
+def test_cancel_apaga_el_indicador_y_descarta_el_resultado(pool):
+    entregados, estados = [], []
+    seguir = threading.Event()
+
+    request = pool.submit(lambda: seguir.wait(5), key='detalle',
+                          on_result=entregados.append, loading=estados.append)
+    assert pool.cancel('detalle')
+    assert request.cancelada
+    seguir.set()
+    pool.shutdown(wait=True)
+
+    assert entregados == []
+    assert estados == [True, False]
+    assert not pool.cancel('detalle')
+
+
+def test_errores_van_a_on_error(pool):
+    errores = []
+    _esperar(pool.submit(lambda: 1 / 0, key='x', on_result=pytest.fail, on_error=errores.append))
+
+    assert len(errores) == 1 and isinstance(errores[0], ZeroDivisionError)
+
+
+def test_escrituras_en_orden_y_sin_cancelar():
+    escrituras = DataExecutor(max_workers=1, nombre="test-escritura")
+    aplicadas, confirmadas = [], []
+    requests = [escrituras.submit(aplicadas.append, i, on_result=lambda _, i=i: confirmadas.append(i))
+                for i in range(20)]
+    _esperar(*requests)
+    escrituras.shutdown(wait=True)
+
+    assert aplicadas == list(range(20))
+    assert confirmadas == list(range(20))
+
+
+class _Barra:
+    """Control falso con el contrato que usa indicador()."""
+    page = None
+
+    def __init__(self):
+        self.visible = False
+
+
+def test_indicador_compartido_sigue_visible_hasta_la_ultima_consulta(pool):
+    barra = _Barra()
+    escrituras = DataExecutor(max_workers=1, nombre="test-escritura")
+    seguir_lectura, seguir_escritura = threading.Event(), threading.Event()
+
+    pool.submit(lambda: seguir_lectura.wait(5), key='detalle', loading=indicador(barra))
+    escritura = escrituras.submit(lambda: seguir_escritura.wait(5), loading=indicador(barra))
+
+    seguir_escritura.set()
+    _esperar(escritura)
+    assert barra.visible  # la lectura sigue en curso
+
+    # Reemplazar la lectura no apaga la barra; sólo la consulta vigente al terminar
+    seguir_lectura.set()
+    _esperar(pool.submit(lambda: 'nueva', key='detalle', loading=indicador(barra)))
+    pool.shutdown(wait=True)
+    escrituras.shutdown(wait=True)
+
+    assert not barra.visible
+
+
+def test_cancel_y_reemplazo_apagan_el_indicador_una_sola_vez(pool):
+    estados = []
+    seguir = threading.Event()
+
+    vieja = pool.submit(lambda: seguir.wait(5), key='busqueda', loading=estados.append)
+    nueva = pool.submit(lambda: seguir.wait(5), key='busqueda', loading=estados.append)
+    pool.cancel('busqueda')
+    seguir.set()
+    pool.shutdown(wait=True)
+
+    assert vieja.cancelada and nueva.cancelada
+    assert estados == [True, True, False, False]
@@ -0,0 +1,95 @@
+import pytest
+
+from services.formula_engine import (
+    FormulaCycleError, FormulaEngine, FormulaError, compilar, validar_formula, validar_formulas,
+)
+
+
+def test_evalua_con_abreviaturas():
+    f = compilar("[COL] - [HDL] - [TG] / 5")
+    assert f.dependencias == ('COL', 'HDL', 'TG')
+    assert f.evaluar({'COL': 200.0, 'HDL': 50.0, 'TG': 150.0}) == 120.0
+
+
+def test_sin_valor_o_division_entre_cero_devuelve_none():
+    f = compilar("[A] / [B]")
+    assert f.evaluar({'A': 1.0}) is None
+    assert f.evaluar({'A': 1.0, 'B': 0.0}) is None
+
+
+@pytest.mark.parametrize("texto", [
+    "__import__('os')",
+    "[A].real",
+    "abs([A])",
+    "[A] if [B] else 1",
+    "'x' * 3",
+    "True + [A]",
+    "[A] +",
+])
+def test_rechaza_lo_que_no_es_aritmetica(texto):
+    with pytest.raises(FormulaError):
+        compilar(texto)
+
+
+def test_ciclo_estricto_lanza_error():
+    with pytest.raises(FormulaCycleError) as e:
+        validar_formulas({'A': "[B] + 1", 'B': "[C] * 2", 'C': "[A]"})
+    assert e.value.ciclo[0] == e.value.ciclo[-1]
+
+
+def test_ciclo_no_estricto_descarta_solo_el_ciclo():
+    motor = FormulaEngine({'A': "[B] + 1", 'B': "[A]", 'C': "[X] * 2", 'D': "[X] +"}, estricto=False)
+    assert set(motor.compiladas) == {'C'}
+    assert {clave for clave, _ in motor.errores} >= {'D'}
+    assert len(motor.errores) == 2
+
+
+def test_recalcula_solo_los_dependientes_en_orden_topologico():
+    motor = FormulaEngine({
+        'LDL': "[COL] - [HDL] - [VLDL]",
+        'VLDL': "[TG] / 5",
+        'IA': "[COL] / [HDL]",
+        'GLO': "[PT] - [ALB]",
+    })
+    assert motor.afectados('TG') == ['VLDL', 'LDL']
+    assert motor.afectados('ALB') == ['GLO']
+    assert motor.afectados('LDL') == []
+
+    valores = {'COL': 200.0, 'HDL': 45.0, 'TG': 151.0}
+    resultados = motor.recalcular(valores, cambiado='TG', decimales=2)
+    assert resultados == [('VLDL', 30.2), ('LDL', 124.8)]
+    assert valores['LDL'] == 124.8
+
+    todos = dict(motor.recalcular(dict(valores)))
+    assert todos['GLO'] is None
+    assert round(todos['IA'], 3) == 4.444
+
+
+def test_formula_guardada_invalida_no_bloquea_la_nueva():
+    existentes = {'ROTA': "[COL] +", 'VLDL': "[TG] / 5"}
+    avisos = validar_formula('LDL', "[COL] - [HDL] - [VLDL]", existentes, conocidas={'COL', 'HDL', 'TG', 'VLDL', 'ROTA'})
+    assert [clave for clave, _ in avisos] == ['ROTA']
+
+
+def test_formula_nueva_invalida_o_con_referencia_desconocida():
+    with pytest.raises(FormulaError):
+        validar_formula('LDL', "[COL] -", {})
+    with pytest.raises(FormulaError, match=r"\[XYZ\]"):
+        validar_formula('LDL', "[COL] - [XYZ]", {}, conocidas={'COL'})
+
+
+def test_formula_nueva_que_cierra_ciclo():
+    existentes = {'B': "[C] * 2", 'C': "[A] + 1", 'D': "[B] +"}
+    with pytest.raises(FormulaCycleError) as e:
+        validar_formula('A', "[B] - 1", existentes)
+    assert e.value.ciclo == ['A', 'B', 'C', 'A']
+    with pytest.raises(FormulaCycleError):
+        validar_formula('A', "[A] * 2", {})
+
+
+def test_ciclo_previo_entre_guardadas_es_aviso():
+    existentes = {'B': "[C]", 'C': "[B]"}
+    avisos = validar_formula('A', "[X] * 2", existentes)
+    assert len(avisos) == 1
+    with pytest.raises(FormulaCycleError):
+        validar_formula('C', "[B] + 1", {'B': "[C]"})
@@ -0,0 +1,80 @@
+from tests.conftest import analito, consultas, insertar, paciente
+
+
+def _orden(db, n):
+    paciente_id = paciente(db)
+    items = [{'type': 'analito', 'id': analito(db, f"A{i}")} for i in range(n)]
+    orden_id = db.create_orden_trabajo(paciente_id, None, items)
+    ids = [item['id'] for grupo in db.get_resultados_grouped(orden_id) for item in grupo['items']]
+    return orden_id, ids
+
+
+def _estado(db, tabla, fila_id, columnas="estado"):
+    with db.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {columnas} FROM {tabla} WHERE id = ?", (fila_id,))
+        return tuple(cursor.fetchone())
+
+
+def test_guarda_solo_lo_que_cambia_y_recalcula_la_orden(db):
+    orden_id, ids = _orden(db, 3)
+
+    assert db.update_resultado_batch([{'id': ids[0], 'valor': '1'}, {'id': ids[1], 'valor': '2'}]) == 2
+    assert _estado(db, 'OrdenesTrabajo', orden_id, "estado, fechaCompletado") == ('Pendiente', None)
+
+    # Los mismos valores otra vez no tocan nada
+    assert db.update_resultado_batch([{'id': ids[0], 'valor': '1'}, {'id': ids[1], 'valor': '2'}]) == 0
+
+    assert db.update_resultado_batch([{'id': rid, 'valor': '3'} for rid in ids]) == 3
+    estado, completado = _estado(db, 'OrdenesTrabajo', orden_id, "estado, fechaCompletado")
+    assert estado == 'Completado' and completado is not None
+
+    # Vaciar un valor devuelve la orden a Pendiente
+    assert db.update_resultado_batch([{'id': ids[2], 'valor': None}]) == 1
+    assert _estado(db, 'OrdenesTrabajo', orden_id, "estado, fechaCompletado") == ('Pendiente', None)
+
+
+def test_no_modifica_resultados_validados(db):
+    orden_id, ids = _orden(db, 2)
+    db.update_resultado_batch([{'id': rid, 'valor': '5'} for rid in ids])
+    db.validate_orden(orden_id, 'tecnologo')
+
+    assert db.update_resultado_batch([{'id': ids[0], 'valor': '6'}]) == 0
+    assert _estado(db, 'OrdenResultados', ids[0], "valorResultado, estado") == ('5', 'Validado')
+
+
+def test_id_repetido_guarda_el_ultimo_valor(db):
+    _, ids = _orden(db, 2)
+    cambiadas = db.update_resultado_batch([
+        {'id': ids[0], 'valor': '1'},
+        {'id': ids[1], 'valor': '7'},
+        {'id': ids[0], 'valor': '2'},
+    ])
+    assert cambiadas == 2
+    assert _estado(db, 'OrdenResultados', ids[0], "valorResultado") == ('2',)
+    assert _estado(db, 'OrdenResultados', ids[1], "valorResultado") == ('7',)
+
+
+def test_sentencias_por_lote_y_no_por_fila(db):
+    _, pocos = _orden(db, 2)
+    _, muchos = _orden(db, 60)
+
+    db.stats.reiniciar()
+    db.update_resultado_batch([{'id': rid, 'valor': '1'} for rid in pocos])
+    con_pocos = consultas(db)
+
+    db.stats.reiniciar()
+    db.update_resultado_batch([{'id': rid, 'valor': '1'} for rid in muchos])
+    assert consultas(db) == con_pocos
+
+
+def test_mas_de_1000_filas_en_varios_lotes(db):
+    paciente_id = paciente(db)
+    aid = analito(db, "HEMOGLOBINA")
+    orden_id = db.create_orden_trabajo(paciente_id, None, [{'type': 'analito', 'id': aid}])
+    perfil_id = db.ensure_default_profile()
+    ids = [insertar(db, 'OrdenResultados', ordenTrabajoId=orden_id, perfilExamenId=perfil_id, analitoId=aid)
+           for _ in range(1500)]
+
+    assert db.update_resultado_batch([{'id': rid, 'valor': str(i)} for i, rid in enumerate(ids)]) == 1500
+    assert _estado(db, 'OrdenResultados', ids[-1], "valorResultado") == ('1499',)
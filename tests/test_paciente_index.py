@@ -0,0 +1,106 @@
+import threading
+
+from services.paciente_index import PacienteIndex, puntaje
+from services.paciente_search import PacienteSearch
+from tests.conftest import consultas, insertar, paciente
+
+
+def _indice(*nombres):
+    idx = PacienteIndex()
+    idx.cargar(enumerate(nombres, start=1))
+    return idx
+
+
+def _ids(resultados):
+    return [pid for pid, _ in resultados]
+
+
+def test_palabras_en_cualquier_orden_sin_tildes():
+    idx = _indice('JUAN PÉREZ', 'MARÍA LÓPEZ', 'JUANA PERALTA')
+
+    assert _ids(idx.buscar('perez juan')) == [1]
+    assert _ids(idx.buscar('maria lopez')) == [2]
+    assert set(_ids(idx.buscar('per'))) == {1, 3}
+
+
+def test_exacta_antes_que_prefijo_y_aproximada():
+    idx = _indice('JUAN GONZALES', 'JUAN GONZALEZ', 'JUAN GONZALEZA')
+
+    # GONZALES sólo por trigramas (0.75)
+    assert _ids(idx.buscar('juan gonzalez')) == [2, 3, 1]
+    assert idx.buscar('juan gonzalez') == idx.buscar('gonzalez juan')
+
+
+def test_agregar_y_quitar_mantienen_el_vocabulario():
+    idx = _indice('JUAN PEREZ')
+    idx.agregar(2, 'ROSA QUISPE')
+    idx.agregar(1, 'JUAN PAREDES')  # edición
+
+    assert _ids(idx.buscar('quispe')) == [2]
+    assert idx.buscar('perez') == []
+    idx.quitar(2)
+    assert idx.buscar('quis') == []
+    assert len(idx) == 1
+
+
+def test_puntaje_igual_al_del_indice():
+    nombres = ('ANA RUIZ', 'ANABEL RUIZ', 'ANAH RUIZ DIAZ')
+    idx = _indice(*nombres)
+    for term in ('ana', 'ana ruiz', 'anabe', 'ruiz'):
+        esperado = dict(idx.buscar(term))
+        for pid, nombre in enumerate(nombres, start=1):
+            assert abs(puntaje(term, nombre) - esperado.get(pid, 0.0)) < 1e-9
+
+
+def test_alta_de_otra_estacion_entra_en_la_proxima_sincronizacion(db):
+    paciente(db, 'JUAN PEREZ')
+    assert db.search_pacientes('quispe') == []
+
+    insertar(db, 'Pacientes', nombreCompleto='ROSA QUISPE', edad=40, unidadEdad='Años', genero='F')
+    db.paciente_index_sync = 0.0
+    assert [r[1] for r in db.search_pacientes('quispe')] == ['ROSA QUISPE']
+
+
+class _Resultados:
+    def __init__(self):
+        self.entregas = []
+        self._llego = threading.Event()
+
+    def __call__(self, filas):
+        self.entregas.append(filas)
+        self._llego.set()
+
+    def esperar(self):
+        assert self._llego.wait(5)
+        self._llego.clear()
+        return [r[1] for r in self.entregas[-1]]
+
+
+def test_termino_mas_largo_con_aproximada_vuelve_a_consultar(db):
+    # "onzal" se parece a "gonzal" (0.73) pero "onza" no (0.4): filtrar el resultado
+    # de "onza" en memoria perdería a GONZAL
+    paciente(db, 'PEDRO GONZAL')
+    busqueda = PacienteSearch(debounce=0)
+    resultados = _Resultados()
+
+    busqueda.buscar('onza', resultados)
+    assert resultados.esperar() == []
+
+    busqueda.buscar('onzal', resultados)
+    assert resultados.esperar() == ['PEDRO GONZAL']
+
+
+def test_prefijo_corto_reutiliza_y_reordena(db):
+    paciente(db, 'ANA RUIZ')
+    paciente(db, 'ANABEL RUIZ')
+    busqueda = PacienteSearch(debounce=0)
+    resultados = _Resultados()
+
+    busqueda.buscar('an', resultados)
+    assert resultados.esperar() == ['ANABEL RUIZ', 'ANA RUIZ']
+
+    db.stats.reiniciar()
+    busqueda.buscar('ana', resultados)
+    # "ana" ya es palabra completa de ANA RUIZ: exacta antes que prefijo
+    assert resultados.esperar() == ['ANA RUIZ', 'ANABEL RUIZ']
+    assert consultas(db) == 0
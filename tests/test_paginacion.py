@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from tests.conftest import insertar, paciente
+
+
+def _paginas(pagina, page_size, clave):
+    filas, after = [], None
+    while True:
+        lote = pagina(page_size, after)
+        assert len(lote) <= page_size
+        filas.extend(lote)
+        if len(lote) < page_size:
+            return filas
+        after = clave(lote[-1])
+
+
+def _ordenes(db):
+    juan = paciente(db, 'JUAN PEREZ', dni='40111222')
+    ana = paciente(db, 'ANA TORRES', dni='40999888')
+    medico_id = insertar(db, 'Medicos', nombre='DR. ROJAS')
+    base = datetime(2026, 3, 1, 8, 0)
+    for i in range(23):
+        # Varias órdenes comparten fechaCreacion: el id desempata
+        insertar(db, 'OrdenesTrabajo', pacienteId=juan if i % 3 else ana, medicoId=medico_id if i % 2 else None,
+                 estado='Completado' if i % 4 == 0 else 'Pendiente', totalPagar=0,
+                 fechaCreacion=base + timedelta(minutes=i // 4))
+    return medico_id
+
+
+def test_paginas_de_ordenes_sin_huecos_ni_repetidos(db):
+    _ordenes(db)
+    completas = db.get_ordenes_filtradas()
+
+    paginadas = _paginas(lambda n, after: db.get_ordenes_filtradas_page(page_size=n, after=after), 5,
+                         lambda fila: (fila[2], fila[0]))
+
+    assert [fila[0] for fila in paginadas] == [fila[0] for fila in sorted(completas, key=lambda f: (f[2], f[0]), reverse=True)]
+    assert len({fila[0] for fila in paginadas}) == 23
+
+
+def test_paginas_de_ordenes_con_filtros(db):
+    medico_id = _ordenes(db)
+    filtros = {'search_term': '40111', 'medico_id': medico_id, 'estado': 'Pendiente'}
+    completas = db.get_ordenes_filtradas(**filtros)
+
+    paginadas = _paginas(lambda n, after: db.get_ordenes_filtradas_page(page_size=n, after=after, **filtros), 2,
+                         lambda fila: (fila[2], fila[0]))
+
+    assert completas
+    assert sorted(fila[0] for fila in paginadas) == sorted(fila[0] for fila in completas)
+
+
+def test_paginas_de_pacientes(db):
+    ids = [paciente(db, f"PACIENTE {i}") for i in range(11)]
+
+    paginadas = _paginas(lambda n, after: db.get_pacientes_page(page_size=n, after_id=after), 4, lambda fila: fila[0])
+
+    assert [fila[0] for fila in paginadas] == sorted(ids, reverse=True)
+
+
+def test_fila_de_una_orden_con_los_filtros_de_la_lista(db):
+    medico_id = _ordenes(db)
+    orden_id = db.get_ordenes_filtradas(estado='Pendiente', medico_id=medico_id)[0][0]
+
+    assert tuple(db.get_orden_fila(orden_id)) == next(tuple(f) for f in db.get_ordenes_filtradas() if f[0] == orden_id)
+    assert db.get_orden_fila(orden_id, medico_id=medico_id, estado='Pendiente') is not None
+    assert db.get_orden_fila(orden_id, estado='Completado') is None
@@ -0,0 +1,61 @@
+import os
+
+from services.reporte_cache import ReporteCache
+
+
+def test_get_devuelve_lo_guardado(tmp_path):
+    cache = ReporteCache(str(tmp_path))
+    cache.put(7, "abc", b"%PDF-7")
+    assert cache.get(7, "abc") == b"%PDF-7"
+    assert cache.get(7, "otra") is None
+    assert cache.tamano() == (1, 6)
+
+
+def test_clave_cambia_con_lo_impreso():
+    header = ("PACIENTE", 30, "Años", "Femenino", "DRA. ROJAS", "2024-05-01")
+    config = [{'title': "HEMOGRAMA", 'items': [{'analitoId': 1, 'valor': "12.5", 'estado': "Validado"}]}]
+    base = ReporteCache.clave(1, header, config, True, "v1")
+
+    otra_config = [{'title': "HEMOGRAMA", 'items': [{'analitoId': 1, 'valor': "12.6", 'estado': "Validado"}]}]
+    assert ReporteCache.clave(1, header, otra_config, True, "v1") != base
+    assert ReporteCache.clave(1, header, config, False, "v1") != base
+    assert ReporteCache.clave(1, header, config, True, "v2") != base
+    assert ReporteCache.clave(1, list(header), config, True, "v1") == base
+
+
+def test_expulsa_los_menos_usados_al_pasar_el_limite(tmp_path):
+    cache = ReporteCache(str(tmp_path), max_bytes=10)
+    cache.put(1, "a", b"1234")
+    cache.put(2, "b", b"1234")
+    assert cache.get(1, "a") is not None  # la 1 pasa a ser la más reciente
+    cache.put(3, "c", b"1234")
+
+    assert cache.get(2, "b") is None
+    assert cache.get(1, "a") == b"1234"
+    assert cache.get(3, "c") == b"1234"
+    assert not os.path.exists(tmp_path / "2_b.pdf")
+
+
+def test_invalidar_borra_solo_las_ordenes_pedidas(tmp_path):
+    cache = ReporteCache(str(tmp_path))
+    cache.put(1, "a", b"x")
+    cache.put(1, "b", b"y")
+    cache.put(11, "a", b"z")
+    cache.invalidar([1])
+
+    assert cache.get(1, "a") is None and cache.get(1, "b") is None
+    assert cache.get(11, "a") == b"z"
+
+
+def test_orden_lru_se_conserva_entre_sesiones(tmp_path):
+    cache = ReporteCache(str(tmp_path))
+    cache.put(1, "a", b"1234")
+    cache.put(2, "b", b"1234")
+    os.utime(tmp_path / "1_a.pdf", (1000, 1000))
+    os.utime(tmp_path / "2_b.pdf", (2000, 2000))
+
+    reabierta = ReporteCache(str(tmp_path), max_bytes=10)
+    assert reabierta.tamano() == (2, 8)
+    reabierta.put(3, "c", b"1234")
+    assert reabierta.get(1, "a") is None
+    assert reabierta.get(2, "b") == b"1234"
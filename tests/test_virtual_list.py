@@ -0,0 +1,73 @@
+import flet as ft
+
+from views.virtual_list import VirtualList
+
+
+class _Scroll:
+    def __init__(self, pixels, viewport, max_extent):
+        self.pixels = pixels
+        self.viewport_dimension = viewport
+        self.max_scroll_extent = max_extent
+
+
+def _lista(n=200, alto=10, viewport=100, buffer=2):
+    asignaciones = []
+
+    def bind(text, item):
+        asignaciones.append(item[0])
+        text.value = item[1]
+
+    vl = VirtualList(item_height=alto, build_row=lambda: ft.Text(""), bind_row=bind,
+                     buffer=buffer, viewport_height=viewport)
+    vl.set_items([(i, f"orden {i}") for i in range(n)])
+    return vl, asignaciones
+
+
+def _visibles(vl):
+    filas = vl.list_view.controls[2:-1]
+    return [fila.content.value for fila in filas if fila.visible]
+
+
+def _scroll(vl, fila):
+    total = len(vl.items) * vl.item_height
+    vl._on_scroll(_Scroll(fila * vl.item_height, vl._viewport, total - vl._viewport))
+
+
+def test_scroll_de_una_fila_reasigna_una_sola_fila():
+    vl, asignaciones = _lista()
+    _scroll(vl, 50)
+    inicio = vl._first
+    asignaciones.clear()
+
+    _scroll(vl, 51)
+
+    assert asignaciones == [inicio + len(vl._rows)]
+    assert _visibles(vl) == [f"orden {i}" for i in range(inicio + 1, inicio + 1 + len(vl._rows))]
+    assert vl.list_view.controls[1].height == (inicio + 1) * vl.item_height
+
+
+def test_salto_largo_mantiene_el_orden_y_el_alto():
+    vl, _ = _lista()
+    for fila in (30, 31, 120, 119, 0, 195):
+        _scroll(vl, fila)
+        primero = vl._first
+        assert _visibles(vl) == [f"orden {i}" for i in range(primero, min(200, primero + len(vl._rows)))]
+        top, bottom = vl.list_view.controls[1], vl.list_view.controls[-1]
+        assert top.height + bottom.height + len(vl._rows) * vl.item_height == 200 * vl.item_height
+
+
+def test_upsert_actualiza_o_inserta_y_remove_quita():
+    vl, asignaciones = _lista(n=5)
+    asignaciones.clear()
+
+    vl.upsert((3, "orden 3 completada"))
+    assert asignaciones == [3]
+    assert vl.get(3) == (3, "orden 3 completada")
+
+    vl.upsert((99, "orden nueva"))
+    assert _visibles(vl)[0] == "orden nueva"
+    assert [item[0] for item in vl.items] == [99, 0, 1, 2, 3, 4]
+
+    assert vl.remove(0) and not vl.remove(0)
+    assert vl.get(1) == (1, "orden 1")
+    assert _visibles(vl) == ["orden nueva", "orden 1", "orden 2", "orden 3 completada", "orden 4"]
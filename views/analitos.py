@@ -2,6 +2,8 @@ import flet as ft
 from database import db
 from models.analito import Analito
 from models.rango_referencia import RangoReferencia
+from services.executor import escrituras, executor
+from services.formula_engine import FormulaError, validar_formula
 
 class AnalitosView(ft.Column):
     def __init__(self, page):
@@ -110,7 +112,8 @@ class AnalitosView(ft.Column):
             ft.ListView(controls=[self.table], expand=True, height=300)
         ]
 
-        self.load_data(initial=True)
+    def did_mount(self):
+        self.load_data()
 
     def toggle_formula(self, e):
         visible = self.chk_calculado.value
@@ -124,42 +127,52 @@ class AnalitosView(ft.Column):
         self.txt_valor_defecto.visible = not is_opciones
         self.update()
 
-    def load_data(self, initial=False):
+    def load_data(self):
+        executor.submit(
+            db.catalogos.analitos,
+            key=(id(self), 'analitos'),
+            on_result=self.render_analitos,
+            on_error=lambda ex: print(f"Error loading analitos: {ex}")
+        )
+
+    def render_analitos(self, analitos):
         self.table.rows.clear()
-        try:
-            rows = db.get_all_analitos()
-            self.analitos = [Analito.from_tuple(r) for r in rows]
-
-            for analito in self.analitos:
-                # Get abbr safely if model not updated yet (using raw tuple index if needed or attr)
-                # Model update is separate, assuming it has it or I fetch.
-                # Assuming Analito model has .abreviatura
-                abbr = getattr(analito, 'abreviatura', "") or ""
-
-                self.table.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(str(analito.id))),
-                        ft.DataCell(ft.Text(analito.nombre)),
-                        ft.DataCell(ft.Text(abbr)),
-                        ft.DataCell(ft.Text(analito.categoria)),
-                        ft.DataCell(ft.Text(analito.unidad or "")),
-                        ft.DataCell(ft.Row([
-                            ft.IconButton(ft.Icons.EDIT, on_click=lambda e, a=analito: self.edit_analito(a)),
-                            ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, aid=analito.id, name=analito.nombre: self.confirm_delete(aid, name))
-                        ])),
-                    ])
-                )
+        self.analitos = analitos
+        for analito in self.analitos:
+            # Get abbr safely if model not updated yet (using raw tuple index if needed or attr)
+            # Model update is separate, assuming it has it or I fetch.
+            # Assuming Analito model has .abreviatura
+            abbr = analito.abreviatura or ""
+
+            self.table.rows.append(
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(str(analito.id))),
+                    ft.DataCell(ft.Text(analito.nombre)),
+                    ft.DataCell(ft.Text(abbr)),
+                    ft.DataCell(ft.Text(analito.categoria)),
+                    ft.DataCell(ft.Text(analito.unidad or "")),
+                    ft.DataCell(ft.Row([
+                        ft.IconButton(ft.Icons.EDIT, on_click=lambda e, a=analito: self.edit_analito(a)),
+                        ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, aid=analito.id, name=analito.nombre: self.confirm_delete(aid, name))
+                    ])),
+                ])
+            )
 
-            if not initial:
-                self.update()
-        except Exception as e:
-            print(f"Error loading analitos: {e}")
+        self.update()
 
     def load_opciones_list(self):
-        self.lv_opciones.controls.clear()
-        if not self.selected_analito_id: return
+        if not self.selected_analito_id:
+            self.render_opciones([])
+            return
+        executor.submit(
+            db.get_opciones_analito, self.selected_analito_id,
+            key=(id(self), 'opciones'),
+            on_result=self.render_opciones,
+            on_error=lambda ex: print(f"Error loading opciones: {ex}")
+        )
 
-        opts = db.get_opciones_analito(self.selected_analito_id)
+    def render_opciones(self, opts):
+        self.lv_opciones.controls.clear()
         for o in opts:
             oid, val, isDef = o[0], o[2], bool(o[3])
             icon = ft.Icons.CHECK if isDef else None
@@ -178,27 +191,30 @@ class AnalitosView(ft.Column):
             return
         if not self.txt_opcion_val.value: return
 
-        db.add_opcion_analito(self.selected_analito_id, self.txt_opcion_val.value, self.chk_opcion_default.value)
-        self.txt_opcion_val.value = ""
-        self.chk_opcion_default.value = False
-        self.load_opciones_list()
+        def on_result(_):
+            self.txt_opcion_val.value = ""
+            self.chk_opcion_default.value = False
+            self.load_opciones_list()
+
+        escrituras.submit(db.add_opcion_analito, self.selected_analito_id, self.txt_opcion_val.value,
+                          self.chk_opcion_default.value, on_result=on_result, on_error=print)
 
     def delete_opcion(self, oid):
-        db.delete_opcion_analito(oid)
-        self.load_opciones_list()
+        escrituras.submit(db.delete_opcion_analito, oid,
+                          on_result=lambda _: self.load_opciones_list(), on_error=print)
 
     def edit_analito(self, analito: Analito):
         self.selected_analito_id = analito.id
         self.txt_nombre.value = analito.nombre
-        self.txt_abreviatura.value = getattr(analito, 'abreviatura', "") or ""
+        self.txt_abreviatura.value = analito.abreviatura or ""
         self.txt_unidad.value = analito.unidad or ""
         self.dd_categoria.value = analito.categoria
         self.txt_metodo.value = analito.metodo or ""
         self.txt_muestra.value = analito.tipoMuestra or ""
         self.dd_tipo_dato.value = analito.tipoDato
 
-        self.txt_subtitulo.value = getattr(analito, 'subtituloReporte', "") or ""
-        self.txt_valor_defecto.value = getattr(analito, 'valorPorDefecto', "") or ""
+        self.txt_subtitulo.value = analito.subtituloReporte or ""
+        self.txt_valor_defecto.value = analito.valorPorDefecto or ""
 
         self.chk_calculado.value = analito.esCalculado
         self.txt_formula.value = analito.formula or ""
@@ -232,13 +248,15 @@ class AnalitosView(ft.Column):
         self.page_ref.open(dlg)
 
     def delete_analito(self, analito_id):
-        try:
-            db.delete_analito(analito_id)
+        def on_result(_):
             self.load_data()
             self.page_ref.open(ft.SnackBar(ft.Text("Analito eliminado"), bgcolor=ft.Colors.GREEN))
-        except Exception as e:
+
+        def on_error(e):
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error al eliminar: {e}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.delete_analito, analito_id, on_result=on_result, on_error=on_error)
+
     def clear_form(self, e=None):
         self.selected_analito_id = None
         self.txt_nombre.value = ""
@@ -259,36 +277,73 @@ class AnalitosView(ft.Column):
         self.update()
 
     def save_analito(self, e):
-        try:
-            data = {
-                'id': self.selected_analito_id,
-                'nombre': self.txt_nombre.value,
-                'unidad': self.txt_unidad.value,
-                'categoria': self.dd_categoria.value,
-                'metodo': self.txt_metodo.value,
-                'tipoMuestra': self.txt_muestra.value,
-                'tipoDato': self.dd_tipo_dato.value,
-                'valorRefMin': None,
-                'valorRefMax': None,
-                'referenciaVisual': None,
-                'esCalculado': self.chk_calculado.value,
-                'formula': self.txt_formula.value,
-                'subtituloReporte': self.txt_subtitulo.value,
-                'valorPorDefecto': self.txt_valor_defecto.value,
-                'abreviatura': self.txt_abreviatura.value
-            }
-
-            db.upsert_analito(data)
-
+        data = {
+            'id': self.selected_analito_id,
+            'nombre': self.txt_nombre.value,
+            'unidad': self.txt_unidad.value,
+            'categoria': self.dd_categoria.value,
+            'metodo': self.txt_metodo.value,
+            'tipoMuestra': self.txt_muestra.value,
+            'tipoDato': self.dd_tipo_dato.value,
+            'valorRefMin': None,
+            'valorRefMax': None,
+            'referenciaVisual': None,
+            'esCalculado': self.chk_calculado.value,
+            'formula': self.txt_formula.value,
+            'subtituloReporte': self.txt_subtitulo.value,
+            'valorPorDefecto': self.txt_valor_defecto.value,
+            'abreviatura': self.txt_abreviatura.value
+        }
+
+        def on_result(resultado):
+            error, avisos = resultado
+            if error:
+                self.page_ref.open(ft.SnackBar(ft.Text(f"Fórmula inválida: {error}"), bgcolor=ft.Colors.RED))
+                return
             self.clear_form()
             self.load_data()
 
-            self.page_ref.open(ft.SnackBar(ft.Text("Guardado correctamente"), bgcolor=ft.Colors.GREEN))
+            if avisos:
+                # Fórmulas guardadas previamente que ya no son válidas: se avisa sin bloquear
+                detalle = "; ".join(f"{clave}: {ex}" for clave, ex in avisos)
+                self.page_ref.open(ft.SnackBar(ft.Text(f"Guardado. Otras fórmulas con errores: {detalle}"), bgcolor=ft.Colors.ORANGE))
+            else:
+                self.page_ref.open(ft.SnackBar(ft.Text("Guardado correctamente"), bgcolor=ft.Colors.GREEN))
 
-        except Exception as ex:
+        def on_error(ex):
             print(f"Error saving: {ex}")
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error: {ex}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(self.guardar_analito, data, on_result=on_result, on_error=on_error)
+
+    def guardar_analito(self, data):
+        # Corre en el hilo de escrituras: la validación lee las demás fórmulas guardadas
+        avisos = []
+        if data['esCalculado'] and data['formula']:
+            error, avisos = self.validar_formula(data)
+            if error:
+                return error, []
+        db.upsert_analito(data)
+        return None, avisos
+
+    def validar_formula(self, data):
+        """
+        (error, avisos) de la fórmula a guardar. Sólo su sintaxis, sus referencias y un
+        ciclo que ella cierre bloquean el guardado; las fórmulas guardadas que ya eran
+        inválidas vuelven como avisos.
+        """
+        existentes = {}
+        for aid, abbr, formula in db.get_formulas_calculadas():
+            if aid == data['id']:
+                continue
+            existentes[abbr or f"#{aid}"] = formula
+        conocidas = {a.abreviatura for a in self.analitos if a.abreviatura}
+        clave = data['abreviatura'] or f"#{data['id'] or 'nuevo'}"
+        try:
+            return None, validar_formula(clave, data['formula'], existentes, conocidas)
+        except FormulaError as ex:
+            return str(ex), []
+
     def open_rangos_dialog(self, e):
         if not self.selected_analito_id:
             return
@@ -342,52 +397,48 @@ class RangosDialog:
             ),
             actions=[ft.TextButton("Cerrar", on_click=self.close_dialog)]
         )
-        self.load_rangos(initial=True)
+        self.load_rangos()
+
+    def load_rangos(self):
+        executor.submit(
+            db.get_rangos_by_analito, self.analito_id,
+            key=(id(self), 'rangos'),
+            on_result=self.render_rangos,
+            on_error=print
+        )
 
-    def load_rangos(self, initial=False):
+    def render_rangos(self, rows):
         self.table_rangos.rows.clear()
-        try:
-            rows = db.get_rangos_by_analito(self.analito_id)
-            for r in rows:
-                rango = RangoReferencia.from_tuple(r)
-                self.table_rangos.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(rango.genero)),
-                        ft.DataCell(ft.Text(f"{rango.edadMin}-{rango.edadMax} {rango.unidadEdad}")),
-                        ft.DataCell(ft.Text(f"{rango.valorMin} - {rango.valorMax}")),
-                        ft.DataCell(ft.Text(f"{rango.panicoMin or ''} - {rango.panicoMax or ''}")),
-                        ft.DataCell(ft.IconButton(ft.Icons.DELETE, on_click=lambda e, rid=rango.id: self.delete_rango(rid)))
-                    ])
-                )
-            if not initial and self.dialog.open:
-                self.dialog.update()
-        except Exception as e:
-            print(e)
+        for r in rows:
+            rango = RangoReferencia.from_tuple(r)
+            self.table_rangos.rows.append(
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(rango.genero)),
+                    ft.DataCell(ft.Text(f"{rango.edadMin}-{rango.edadMax} {rango.unidadEdad}")),
+                    ft.DataCell(ft.Text(f"{rango.valorMin} - {rango.valorMax}")),
+                    ft.DataCell(ft.Text(f"{rango.panicoMin or ''} - {rango.panicoMax or ''}")),
+                    ft.DataCell(ft.IconButton(ft.Icons.DELETE, on_click=lambda e, rid=rango.id: self.delete_rango(rid)))
+                ])
+            )
+        if self.dialog.open:
+            self.dialog.update()
 
     def add_rango(self, e):
-        try:
-            data = {
-                'analitoId': self.analito_id,
-                'genero': self.dd_genero.value,
-                'edadMin': self.txt_edad_min.value,
-                'edadMax': self.txt_edad_max.value,
-                'unidadEdad': self.dd_unidad_edad.value,
-                'valorMin': self.txt_val_min.value,
-                'valorMax': self.txt_val_max.value,
-                'panicoMin': self.txt_panico_min.value,
-                'panicoMax': self.txt_panico_max.value
-            }
-            db.add_rango(data)
-            self.load_rangos()
-        except Exception as ex:
-            print(ex)
+        data = {
+            'analitoId': self.analito_id,
+            'genero': self.dd_genero.value,
+            'edadMin': self.txt_edad_min.value,
+            'edadMax': self.txt_edad_max.value,
+            'unidadEdad': self.dd_unidad_edad.value,
+            'valorMin': self.txt_val_min.value,
+            'valorMax': self.txt_val_max.value,
+            'panicoMin': self.txt_panico_min.value,
+            'panicoMax': self.txt_panico_max.value
+        }
+        escrituras.submit(db.add_rango, data, on_result=lambda _: self.load_rangos(), on_error=print)
 
     def delete_rango(self, rango_id):
-        try:
-            db.delete_rango(rango_id)
-            self.load_rangos()
-        except Exception as e:
-            print(e)
+        escrituras.submit(db.delete_rango, rango_id, on_result=lambda _: self.load_rangos(), on_error=print)
 
     def close_dialog(self, e):
         self.page_ref.close(self.dialog)
@@ -1,9 +1,8 @@
 import flet as ft
 from database import db
 from models.paciente import Paciente
-from models.medico import Medico
-from models.analito import Analito
-from models.perfil_examen import PerfilExamen
+from services.executor import escrituras, executor, indicador
+from services.paciente_search import PacienteSearch
 
 class CrearOrdenView(ft.Column):
     def __init__(self):
@@ -18,14 +17,17 @@ class CrearOrdenView(ft.Column):
         # --- Controls ---
 
         # 1. Patient Selector
+        self.buscador_pacientes = PacienteSearch(limit=20, debounce=0.3)
         self.txt_buscar_paciente = ft.TextField(
             label="Buscar Paciente (Nombre o DNI)",
+            on_change=self.on_search_change,
             on_submit=self.search_paciente,
             expand=True
         )
         self.btn_buscar_paciente = ft.IconButton(ft.Icons.SEARCH, on_click=self.search_paciente)
         self.lbl_paciente_seleccionado = ft.Text("Ningún paciente seleccionado", weight=ft.FontWeight.BOLD, color=ft.Colors.RED)
         self.lv_resultados_pacientes = ft.ListView(height=0, spacing=5, padding=10) # Hidden initially
+        self.pb_buscar_paciente = ft.ProgressBar(visible=False)
 
         # 2. Doctor Selector
         self.dd_medicos = ft.Dropdown(
@@ -41,6 +43,9 @@ class CrearOrdenView(ft.Column):
 
         self.dd_analitos = ft.Dropdown(label="Agregar Analito Individual", expand=True, options=[])
         self.btn_add_analito = ft.ElevatedButton("Agregar", on_click=self.add_analito)
+        self.medicos_cache = []
+        self.perfiles_cache = []
+        self.analitos_cache = []
 
         # 4. Order Summary
         self.table_items = ft.DataTable(
@@ -62,12 +67,16 @@ class CrearOrdenView(ft.Column):
             keyboard_type=ft.KeyboardType.NUMBER
         )
 
+        self.btn_crear_orden = ft.ElevatedButton("CREAR ORDEN", icon=ft.Icons.CHECK, on_click=self.save_orden, style=ft.ButtonStyle(bgcolor=ft.Colors.GREEN, color=ft.Colors.WHITE))
+        self.pb_crear_orden = ft.ProgressBar(visible=False)
+
         # --- Layout ---
 
         section_paciente = ft.Container(
             content=ft.Column([
                 ft.Text("1. Datos del Paciente", size=16, weight=ft.FontWeight.BOLD),
                 ft.Row([self.txt_buscar_paciente, self.btn_buscar_paciente]),
+                self.pb_buscar_paciente,
                 self.lv_resultados_pacientes,
                 ft.Divider(),
                 ft.Row([ft.Icon(ft.Icons.PERSON), self.lbl_paciente_seleccionado])
@@ -98,7 +107,8 @@ class CrearOrdenView(ft.Column):
                 self.table_items,
                 ft.Divider(),
                 ft.Row([ft.Text("Total: $", size=20, weight=ft.FontWeight.BOLD), self.txt_total], alignment=ft.MainAxisAlignment.END),
-                ft.ElevatedButton("CREAR ORDEN", icon=ft.Icons.CHECK, on_click=self.save_orden, style=ft.ButtonStyle(bgcolor=ft.Colors.GREEN, color=ft.Colors.WHITE))
+                self.pb_crear_orden,
+                self.btn_crear_orden
             ]),
             padding=10, border=ft.border.all(1, ft.Colors.BLUE_200), border_radius=5, bgcolor=ft.Colors.BLUE_50
         )
@@ -111,41 +121,59 @@ class CrearOrdenView(ft.Column):
             section_resumen
         ]
 
-        self.load_initial_data(initial=True)
-
-    def load_initial_data(self, initial=False):
-        try:
-            # Load Medicos
-            medicos_rows = db.get_all_medicos()
-            self.medicos_cache = [Medico.from_tuple(m) for m in medicos_rows]
-            self.dd_medicos.options = [ft.dropdown.Option(key=str(m.id), text=m.nombre) for m in self.medicos_cache]
+    def did_mount(self):
+        self.load_initial_data()
 
-            # Load Perfiles
-            perfiles = db.get_all_perfiles()
-            self.perfiles_cache = [PerfilExamen.from_tuple(p) for p in perfiles]
-            # Exclude default profile from dropdown
-            self.perfiles_cache = [p for p in self.perfiles_cache if p.nombre != "Examenes Individuales"]
-
-            self.dd_perfiles.options = [ft.dropdown.Option(key=str(p.id), text=f"{p.nombre}") for p in self.perfiles_cache]
+    def load_initial_data(self):
+        # Catálogos en segundo plano (en memoria tras la primera carga, ver db.catalogos)
+        executor.submit(
+            self.fetch_catalogos,
+            key=(id(self), 'catalogos'),
+            on_result=self.render_catalogos,
+            on_error=lambda ex: print(ex)
+        )
 
-            # Load Analitos
-            analitos = db.get_all_analitos()
-            self.analitos_cache = [Analito.from_tuple(a) for a in analitos]
-            self.dd_analitos.options = [ft.dropdown.Option(key=str(a.id), text=a.nombre) for a in self.analitos_cache]
+    def fetch_catalogos(self):
+        perfiles = db.catalogos.perfiles()
+        # Exclude default profile from dropdown
+        perfiles = [p for p in perfiles if p.nombre != "Examenes Individuales"]
+        return db.catalogos.medicos(), perfiles, db.catalogos.analitos()
+
+    def render_catalogos(self, catalogos):
+        self.medicos_cache, self.perfiles_cache, self.analitos_cache = catalogos
+        self.dd_medicos.options = [ft.dropdown.Option(key=str(m.id), text=m.nombre) for m in self.medicos_cache]
+        self.dd_perfiles.options = [ft.dropdown.Option(key=str(p.id), text=f"{p.nombre}") for p in self.perfiles_cache]
+        self.dd_analitos.options = [ft.dropdown.Option(key=str(a.id), text=a.nombre) for a in self.analitos_cache]
+        self.update()
 
-            if not initial:
-                self.update()
-        except Exception as e:
-            print(e)
+    def on_search_change(self, e):
+        # Búsqueda mientras se escribe (con debounce)
+        self.buscador_pacientes.buscar(
+            self.txt_buscar_paciente.value,
+            on_result=self.show_pacientes_results,
+            on_error=lambda ex: print(f"Error buscando pacientes: {ex}"),
+            loading=indicador(self.pb_buscar_paciente)
+        )
 
     def search_paciente(self, e):
         term = self.txt_buscar_paciente.value
         if not term: return
 
-        results = db.search_pacientes(term)
+        self.buscador_pacientes.buscar(
+            term,
+            on_result=self.show_pacientes_results,
+            on_error=lambda ex: print(f"Error buscando pacientes: {ex}"),
+            loading=indicador(self.pb_buscar_paciente),
+            inmediato=True
+        )
+
+    def show_pacientes_results(self, results):
         self.lv_resultados_pacientes.controls.clear()
 
-        if not results:
+        if results is None:
+            # Término muy corto: se oculta la lista
+            self.lv_resultados_pacientes.height = 0
+        elif not results:
             self.lv_resultados_pacientes.controls.append(ft.Text("No se encontraron pacientes."))
             self.lv_resultados_pacientes.height = 30
         else:
@@ -164,6 +192,7 @@ class CrearOrdenView(ft.Column):
         self.update()
 
     def select_paciente(self, p: Paciente):
+        self.buscador_pacientes.cancelar()
         self.selected_paciente_id = p.id
         self.lbl_paciente_seleccionado.value = f"{p.nombreCompleto} ({p.edad} {p.unidadEdad})"
         self.lbl_paciente_seleccionado.color = ft.Colors.BLACK
@@ -217,21 +246,37 @@ class CrearOrdenView(ft.Column):
             if medico and medico.tieneConvenio:
                 has_convenio = True
 
+        perfil_ids = [item['id'] for item in self.selected_items if item['type'] == 'perfil'] if has_convenio else []
+        # Tarifas en segundo plano; un cambio posterior de médico o ítems reemplaza la consulta
+        executor.submit(
+            self.fetch_tarifas, medico_id, perfil_ids,
+            key=(id(self), 'precios'),
+            on_result=self.apply_prices,
+            on_error=lambda ex: print(f"Error calculando precios: {ex}")
+        )
+
+    def fetch_tarifas(self, medico_id, perfil_ids):
+        tarifas = {}
+        for pid in dict.fromkeys(perfil_ids):
+            special_price = db.get_tarifa_especial(int(medico_id), pid)
+            if special_price is not None:
+                tarifas[pid] = special_price
+        return tarifas
+
+    def apply_prices(self, tarifas):
         total = 0.0
 
         for item in self.selected_items:
             price = item['precio_base']
 
-            if item['type'] == 'perfil' and has_convenio:
-                # Check tariff
-                special_price = db.get_tarifa_especial(int(medico_id), item['id'])
-                if special_price is not None:
-                    price = special_price
+            if item['type'] == 'perfil':
+                price = tarifas.get(item['id'], price)
 
             item['precio'] = price
             total += price
 
         self.txt_total.value = f"{total:.2f}"
+        self.refresh_table()
 
     def refresh_table(self):
         self.table_items.rows.clear()
@@ -262,16 +307,15 @@ class CrearOrdenView(ft.Column):
             self.update()
             return
 
-        try:
-            medico_id = self.dd_medicos.value
-
-            try:
-                final_price = float(self.txt_total.value)
-            except ValueError:
-                final_price = 0.0
+        medico_id = self.dd_medicos.value
 
-            orden_id = db.create_orden_trabajo(self.selected_paciente_id, medico_id, self.selected_items, final_price)
+        try:
+            final_price = float(self.txt_total.value)
+        except ValueError:
+            final_price = 0.0
 
+        def on_result(orden_id):
+            self.btn_crear_orden.disabled = False
             self.page.open(ft.SnackBar(ft.Text(f"Orden #{orden_id} Creada Exitosamente"), bgcolor=ft.Colors.GREEN))
 
             # Reset
@@ -282,7 +326,18 @@ class CrearOrdenView(ft.Column):
             self.txt_total.value = "0.00"
             self.refresh_table()
 
-        except Exception as ex:
+        def on_error(ex):
             print(f"Error creating order: {ex}")
+            self.btn_crear_orden.disabled = False
             self.page.open(ft.SnackBar(ft.Text(f"Error: {ex}"), bgcolor=ft.Colors.RED))
             self.update()
+
+        # Un solo clic por orden: el botón vuelve a habilitarse cuando termina la escritura
+        self.btn_crear_orden.disabled = True
+        self.update()
+        escrituras.submit(
+            db.create_orden_trabajo, self.selected_paciente_id, medico_id, list(self.selected_items), final_price,
+            on_result=on_result,
+            on_error=on_error,
+            loading=indicador(self.pb_crear_orden)
+        )
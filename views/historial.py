@@ -1,6 +1,7 @@
 import flet as ft
 from database import db
 from models.paciente import Paciente
+from services.executor import executor
 
 class HistorialDialog:
     def __init__(self, paciente_id, page):
@@ -48,94 +49,100 @@ class HistorialDialog:
         self.load_history()
 
     def load_history(self):
+        executor.submit(
+            db.get_historial_fechas, self.paciente_id,
+            key=(id(self), 'historial'),
+            on_result=self.render_history,
+            on_error=lambda ex: print(f"Error loading history: {ex}")
+        )
+
+    def render_history(self, history):
         self.lv_dates.controls.clear()
-        try:
-            history = db.get_historial_fechas(self.paciente_id)
-
-            if not history:
-                self.lv_dates.controls.append(ft.Text("Sin historial."))
-            else:
-                for h in history:
-                    oid = h[0]
-                    fecha = h[1].strftime("%d/%m/%Y") if h[1] else "S/F"
-
-                    self.lv_dates.controls.append(
-                        ft.ListTile(
-                            leading=ft.Icon(ft.Icons.HISTORY, color=ft.Colors.BLUE),
-                            title=ft.Text(fecha),
-                            subtitle=ft.Text(f"Orden #{oid}"),
-                            on_click=lambda e, x=oid: self.load_detail(x)
-                        )
+        if not history:
+            self.lv_dates.controls.append(ft.Text("Sin historial."))
+        else:
+            for h in history:
+                oid = h[0]
+                fecha = h[1].strftime("%d/%m/%Y") if h[1] else "S/F"
+
+                self.lv_dates.controls.append(
+                    ft.ListTile(
+                        leading=ft.Icon(ft.Icons.HISTORY, color=ft.Colors.BLUE),
+                        title=ft.Text(fecha),
+                        subtitle=ft.Text(f"Orden #{oid}"),
+                        on_click=lambda e, x=oid: self.load_detail(x)
                     )
+                )
 
-            if self.dialog.open:
-                self.dialog.update()
-        except Exception as e:
-            print(f"Error loading history: {e}")
+        if self.dialog.open:
+            self.dialog.update()
 
     def load_detail(self, orden_id):
+        # Si se elige otra fecha antes de que llegue el detalle, éste se descarta
+        executor.submit(
+            db.get_resultados_grouped, orden_id,
+            key=(id(self), 'detalle'),
+            on_result=lambda grouped_data: self.render_detail(orden_id, grouped_data),
+            on_error=lambda ex: print(f"Error loading detail: {ex}")
+        )
+
+    def render_detail(self, orden_id, grouped_data):
         self.result_container.controls.clear()
         self.lbl_orden_info.value = f"Detalle Orden #{orden_id}"
 
-        try:
-            grouped_data = db.get_resultados_grouped(orden_id)
-
-            for group in grouped_data:
-                group_title = group['title']
-                items = group['items']
-
-                card_rows = []
-                card_rows.append(ft.Row([
-                    ft.Text("Analito", weight=ft.FontWeight.BOLD, expand=2),
-                    ft.Text("Resultado", weight=ft.FontWeight.BOLD, expand=2),
-                    ft.Text("Unid.", weight=ft.FontWeight.BOLD, width=60),
-                ]))
-                card_rows.append(ft.Divider())
-
-                current_sub = None
-
-                for item in items:
-                    val = str(item['valor'] or "").strip()
-
-                    # Ghost Logic for History too? Usually history shows everything recorded?
-                    # User requirement: "REPORTE PDF (views/reporte.py) Y HISTORIAL (views/historial.py): Lógica Fantasma".
-                    # So yes, hide empty unless "0".
-                    if not val and val != "0": continue
-
-                    # Subtitle Grouping
-                    subtitulo = item.get('subtituloReporte')
-                    if subtitulo and subtitulo != current_sub:
-                        card_rows.append(ft.Text(subtitulo, weight=ft.FontWeight.BOLD))
-                        current_sub = subtitulo
-
-                    row_control = ft.Row([
-                        ft.Text(item['nombre'], expand=2),
-                        ft.Text(val, weight=ft.FontWeight.BOLD, expand=2),
-                        ft.Text(item['unidad'] or "", width=60, size=12),
-                    ], alignment=ft.MainAxisAlignment.CENTER)
-
-                    card_rows.append(row_control)
-
-                # Only add card if it has content (rows > 2 because header+divider)
-                if len(card_rows) > 2:
-                    card = ft.Card(
-                        content=ft.Container(
-                            content=ft.Column([
-                                ft.Text(group_title, weight=ft.FontWeight.BOLD, size=14, color=ft.Colors.BLUE_900),
-                                ft.Divider(),
-                                ft.Column(card_rows, spacing=5)
-                            ]),
-                            padding=10
-                        ),
-                        margin=ft.margin.only(bottom=5)
-                    )
-                    self.result_container.controls.append(card)
-
-            if self.dialog.open:
-                self.dialog.update()
+        for group in grouped_data:
+            group_title = group['title']
+            items = group['items']
+
+            card_rows = []
+            card_rows.append(ft.Row([
+                ft.Text("Analito", weight=ft.FontWeight.BOLD, expand=2),
+                ft.Text("Resultado", weight=ft.FontWeight.BOLD, expand=2),
+                ft.Text("Unid.", weight=ft.FontWeight.BOLD, width=60),
+            ]))
+            card_rows.append(ft.Divider())
+
+            current_sub = None
+
+            for item in items:
+                val = str(item['valor'] or "").strip()
+
+                # Ghost Logic for History too? Usually history shows everything recorded?
+                # User requirement: "REPORTE PDF (views/reporte.py) Y HISTORIAL (views/historial.py): Lógica Fantasma".
+                # So yes, hide empty unless "0".
+                if not val and val != "0": continue
+
+                # Subtitle Grouping
+                subtitulo = item.get('subtitulo') or item.get('subtituloReporte')
+                if subtitulo and subtitulo != current_sub:
+                    card_rows.append(ft.Text(subtitulo, weight=ft.FontWeight.BOLD))
+                    current_sub = subtitulo
+
+                row_control = ft.Row([
+                    ft.Text(item['nombre'], expand=2),
+                    ft.Text(val, weight=ft.FontWeight.BOLD, expand=2),
+                    ft.Text(item['unidad'] or "", width=60, size=12),
+                ], alignment=ft.MainAxisAlignment.CENTER)
+
+                card_rows.append(row_control)
+
+            # Only add card if it has content (rows > 2 because header+divider)
+            if len(card_rows) > 2:
+                card = ft.Card(
+                    content=ft.Container(
+                        content=ft.Column([
+                            ft.Text(group_title, weight=ft.FontWeight.BOLD, size=14, color=ft.Colors.BLUE_900),
+                            ft.Divider(),
+                            ft.Column(card_rows, spacing=5)
+                        ]),
+                        padding=10
+                    ),
+                    margin=ft.margin.only(bottom=5)
+                )
+                self.result_container.controls.append(card)
 
-        except Exception as e:
-            print(f"Error loading detail: {e}")
+        if self.dialog.open:
+            self.dialog.update()
 
     def close_dialog(self, e):
         self.page_ref.close(self.dialog)
@@ -2,6 +2,7 @@ import flet as ft
 from database import db
 from models.medico import Medico
 from models.perfil_examen import PerfilExamen
+from services.executor import escrituras, executor
 
 class MedicosView(ft.Column):
     def __init__(self, page):
@@ -61,38 +62,41 @@ class MedicosView(ft.Column):
             ft.ListView(controls=[self.table], expand=True, height=400)
         ]
 
-        self.load_data(initial=True)
+    def did_mount(self):
+        self.load_data()
 
     def toggle_tarifa_btn(self, e):
         self.btn_tarifas.disabled = not self.chk_convenio.value
         self.update()
 
-    def load_data(self, initial=False):
+    def load_data(self):
+        executor.submit(
+            db.catalogos.medicos,
+            key=(id(self), 'medicos'),
+            on_result=self.render_medicos,
+            on_error=lambda ex: print(f"Error loading medicos: {ex}")
+        )
+
+    def render_medicos(self, medicos):
         self.table.rows.clear()
-        try:
-            rows = db.get_all_medicos()
-            self.medicos = [Medico.from_tuple(r) for r in rows]
-
-            for m in self.medicos:
-                self.table.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(str(m.id))),
-                        ft.DataCell(ft.Text(m.nombre)),
-                        ft.DataCell(ft.Text(m.especialidad)),
-                        ft.DataCell(ft.Text(m.telefono or "")),
-                        ft.DataCell(ft.Icon(ft.Icons.CHECK if m.tieneConvenio else ft.Icons.CLOSE,
-                                            color=ft.Colors.GREEN if m.tieneConvenio else ft.Colors.GREY)),
-                        ft.DataCell(ft.Row([
-                            ft.IconButton(ft.Icons.EDIT, on_click=lambda e, item=m: self.edit_medico(item)),
-                            ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, mid=m.id, name=m.nombre: self.confirm_delete(mid, name))
-                        ]))
-                    ])
-                )
+        self.medicos = medicos
+        for m in self.medicos:
+            self.table.rows.append(
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(str(m.id))),
+                    ft.DataCell(ft.Text(m.nombre)),
+                    ft.DataCell(ft.Text(m.especialidad)),
+                    ft.DataCell(ft.Text(m.telefono or "")),
+                    ft.DataCell(ft.Icon(ft.Icons.CHECK if m.tieneConvenio else ft.Icons.CLOSE,
+                                        color=ft.Colors.GREEN if m.tieneConvenio else ft.Colors.GREY)),
+                    ft.DataCell(ft.Row([
+                        ft.IconButton(ft.Icons.EDIT, on_click=lambda e, item=m: self.edit_medico(item)),
+                        ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, mid=m.id, name=m.nombre: self.confirm_delete(mid, name))
+                    ]))
+                ])
+            )
 
-            if not initial:
-                self.update()
-        except Exception as e:
-            print(f"Error loading medicos: {e}")
+        self.update()
 
     def edit_medico(self, m: Medico):
         self.selected_medico_id = m.id
@@ -117,25 +121,27 @@ class MedicosView(ft.Column):
             self.page_ref.open(ft.SnackBar(ft.Text("Nombre es obligatorio"), bgcolor=ft.Colors.RED))
             return
 
-        try:
-            data = {
-                'id': self.selected_medico_id,
-                'nombre': self.txt_nombre.value,
-                'especialidad': self.txt_especialidad.value,
-                'telefono': self.txt_telefono.value,
-                'tieneConvenio': self.chk_convenio.value
-            }
-            db.upsert_medico(data)
+        data = {
+            'id': self.selected_medico_id,
+            'nombre': self.txt_nombre.value,
+            'especialidad': self.txt_especialidad.value,
+            'telefono': self.txt_telefono.value,
+            'tieneConvenio': self.chk_convenio.value
+        }
 
+        def on_result(_):
             # If we were editing and just saved, we keep the ID selection so they can manage tarifs immediately if they want?
             # Or clear. Usually clear is standard.
             self.clear_form()
             self.load_data()
             self.page_ref.open(ft.SnackBar(ft.Text("Médico guardado"), bgcolor=ft.Colors.GREEN))
-        except Exception as ex:
+
+        def on_error(ex):
             print(f"Error: {ex}")
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error: {ex}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.upsert_medico, data, on_result=on_result, on_error=on_error)
+
     def confirm_delete(self, medico_id, name):
         def close_dlg(e):
             self.page_ref.close(dlg)
@@ -156,13 +162,15 @@ class MedicosView(ft.Column):
         self.page_ref.open(dlg)
 
     def delete_medico(self, medico_id):
-        try:
-            db.delete_medico(medico_id)
+        def on_result(_):
             self.load_data()
             self.page_ref.open(ft.SnackBar(ft.Text("Médico eliminado"), bgcolor=ft.Colors.GREEN))
-        except Exception as e:
+
+        def on_error(e):
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error al eliminar: {e}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.delete_medico, medico_id, on_result=on_result, on_error=on_error)
+
     # --- TARIFAS DIALOG LOGIC ---
     def open_tarifas_dialog(self, e):
         if not self.selected_medico_id:
@@ -208,20 +216,33 @@ class TarifasContent(ft.Column):
         self.load_data()
 
     def load_data(self):
-        try:
-            # Load Dropdown
-            perfiles = db.get_all_perfiles()
-            self.dd_perfil.options = [ft.dropdown.Option(key=str(p[0]), text=p[1]) for p in perfiles]
+        executor.submit(
+            self.fetch_data,
+            key=(id(self), 'tarifas'),
+            on_result=self.render_data,
+            on_error=lambda ex: print(f"Error loading dialog data: {ex}")
+        )
 
-            # Load List
-            self.load_tarifas_list()
-            self.update()
-        except Exception as e:
-            print(f"Error loading dialog data: {e}")
+    def fetch_data(self):
+        return db.catalogos.perfiles(), db.get_tarifas_medico(self.medico_id)
+
+    def render_data(self, data):
+        perfiles, rows = data
+        # Load Dropdown
+        self.dd_perfil.options = [ft.dropdown.Option(key=str(p.id), text=p.nombre) for p in perfiles]
+        # Load List
+        self.render_tarifas(rows)
 
     def load_tarifas_list(self):
+        executor.submit(
+            db.get_tarifas_medico, self.medico_id,
+            key=(id(self), 'tarifas'),
+            on_result=self.render_tarifas,
+            on_error=lambda ex: print(f"Error loading tarifas: {ex}")
+        )
+
+    def render_tarifas(self, rows):
         self.lv_tarifas.controls.clear()
-        rows = db.get_tarifas_medico(self.medico_id)
 
         if not rows:
             self.lv_tarifas.controls.append(ft.Text("No hay tarifas especiales configuradas."))
@@ -245,6 +266,7 @@ class TarifasContent(ft.Column):
                         border_radius=5
                     )
                 )
+        self.update()
 
     def add_tarifa(self, e):
         pid = self.dd_perfil.value
@@ -253,18 +275,19 @@ class TarifasContent(ft.Column):
         if not pid or not price: return
 
         try:
-            db.upsert_tarifa_convenio(self.medico_id, int(pid), float(price))
+            price = float(price)
+        except ValueError as ex:
+            print(ex)
+            return
+
+        def on_result(_):
             self.txt_precio_esp.value = ""
             self.dd_perfil.value = None
             self.load_tarifas_list()
-            self.update()
-        except Exception as ex:
-            print(ex)
+
+        escrituras.submit(db.upsert_tarifa_convenio, self.medico_id, int(pid), price,
+                          on_result=on_result, on_error=print)
 
     def delete_tarifa(self, tarifa_id):
-        try:
-            db.delete_tarifa_convenio(tarifa_id)
-            self.load_tarifas_list()
-            self.update()
-        except Exception as ex:
-            print(ex)
+        escrituras.submit(db.delete_tarifa_convenio, tarifa_id,
+                          on_result=lambda _: self.load_tarifas_list(), on_error=print)
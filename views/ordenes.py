@@ -1,8 +1,14 @@
 import flet as ft
 from database import db
-from views.reporte import generar_pdf_orden
+from views.reporte import generar_pdf_orden, generar_pdf_lote
+from views.virtual_list import VirtualList
+from services.executor import executor, escrituras, indicador
+from services.reporte_lote import orden_ids_por_filtro
+from services.reporte_pdf import resumen_paginas
 
 class OrdenesView(ft.Column):
+    PAGE_SIZE = 50
+
     def __init__(self, page):
         super().__init__()
         self.page_ref = page
@@ -38,19 +44,38 @@ class OrdenesView(ft.Column):
             tooltip="Limpiar Filtros",
             on_click=self.clear_filters
         )
+        self.btn_imprimir_lote = ft.ElevatedButton(
+            "Imprimir lote",
+            icon=ft.Icons.PRINT,
+            tooltip="Reportes de todas las órdenes con los filtros actuales",
+            on_click=self.open_lote_dialog
+        )
 
-        # List of Orders
-        self.lv_ordenes = ft.ListView(expand=True, spacing=5, padding=10)
+        # List of Orders (virtualizada y paginada: se cargan más al llegar al final)
+        self.lv_ordenes = VirtualList(
+            item_height=100,
+            build_row=self.build_orden_row,
+            bind_row=self.bind_orden_row,
+            empty_text="No se encontraron órdenes.",
+            on_end_reached=self.load_more_ordenes,
+            padding=10
+        )
+        self.ordenes_filters = (None, None, None)
+        self.ordenes_cursor = None # (fechaCreacion, id) de la última orden cargada
+        self.ordenes_has_more = False
+        self.ordenes_loading = False
+        self.pb_ordenes = ft.ProgressBar(visible=False)
 
         self.controls = [
             ft.Text("Gestión de Órdenes e Informes", size=24, weight=ft.FontWeight.BOLD),
             ft.Container(
-                content=ft.Row([self.txt_search, self.dd_filter_medico, self.dd_filter_estado, self.btn_clear_filters]),
+                content=ft.Row([self.txt_search, self.dd_filter_medico, self.dd_filter_estado, self.btn_clear_filters, self.btn_imprimir_lote]),
                 padding=10,
                 border=ft.border.all(1, ft.Colors.GREY_300),
                 border_radius=5
             ),
             ft.Divider(),
+            self.pb_ordenes,
             self.lv_ordenes
         ]
 
@@ -60,12 +85,16 @@ class OrdenesView(ft.Column):
         self.load_ordenes(initial=False)
         
     def load_initial_data(self):
-        try:
-            medicos = db.get_all_medicos()
-            self.dd_filter_medico.options = [ft.dropdown.Option(key=str(m[0]), text=m[1]) for m in medicos]
-            self.update()
-        except Exception as e:
-            print(f"Error loading filters: {e}")
+        executor.submit(
+            db.catalogos.medicos,
+            key=(id(self), 'medicos'),
+            on_result=self.render_filtro_medicos,
+            on_error=lambda ex: print(f"Error loading filters: {ex}")
+        )
+
+    def render_filtro_medicos(self, medicos):
+        self.dd_filter_medico.options = [ft.dropdown.Option(key=str(m.id), text=m.nombre) for m in medicos]
+        self.update()
 
     def apply_filters(self, e):
         self.load_ordenes()
@@ -77,61 +106,97 @@ class OrdenesView(ft.Column):
         self.load_ordenes()
 
     def load_ordenes(self, initial=False):
-        self.lv_ordenes.controls.clear()
-        try:
-            # Get filters
-            search = self.txt_search.value
-            medico_id = self.dd_filter_medico.value
-            estado = self.dd_filter_estado.value
-
-            ordenes = db.get_ordenes_filtradas(search, medico_id, estado)
-
-            if not ordenes:
-                self.lv_ordenes.controls.append(ft.Text("No se encontraron órdenes."))
+        # Get filters
+        search = self.txt_search.value
+        medico_id = self.dd_filter_medico.value
+        estado = self.dd_filter_estado.value
+
+        self.ordenes_filters = (search, medico_id, estado)
+        self.ordenes_cursor = None
+        self.ordenes_has_more = True
+        self.request_ordenes_page(reset=True)
+
+    def load_more_ordenes(self):
+        if self.ordenes_has_more and not self.ordenes_loading:
+            self.request_ordenes_page(reset=False)
+
+    def request_ordenes_page(self, reset):
+        # En segundo plano; una nueva búsqueda deja obsoleta la página que aún se esté cargando
+        self.ordenes_loading = True
+
+        def on_result(ordenes):
+            self.ordenes_loading = False
+            self.ordenes_has_more = len(ordenes) == self.PAGE_SIZE
+            if ordenes:
+                self.ordenes_cursor = (ordenes[-1][2], ordenes[-1][0])
+            # Sólo se envían al cliente las filas visibles que cambian
+            if reset:
+                self.lv_ordenes.set_items(ordenes)
             else:
-                for o in ordenes:
-                    oid = o[0]
-                    nombre = o[1]
-                    fecha = o[2].strftime("%d/%m/%Y %H:%M") if o[2] else ""
-                    estado_orden = o[3]
-                    nombre_medico = o[4] or "Particular"
-
-                    status_color = ft.Colors.GREEN if estado_orden == 'Completado' else ft.Colors.ORANGE
-
-                    self.lv_ordenes.controls.append(
-                        ft.Container(
-                            content=ft.Row([
-                                ft.Icon(ft.Icons.RECEIPT_LONG),
-                                ft.Column([
-                                    ft.Text(f"Orden #{oid} - {nombre}", weight=ft.FontWeight.BOLD),
-                                    ft.Text(f"Médico: {nombre_medico}", size=12, italic=True),
-                                    ft.Text(f"{fecha} | Estado: {estado_orden}", size=12, color=status_color, weight=ft.FontWeight.BOLD)
-                                ], expand=True),
-                                ft.Row([
-                                    ft.IconButton(
-                                        icon=ft.Icons.PRINT,
-                                        tooltip="Configurar Impresión",
-                                        icon_color=ft.Colors.BLUE,
-                                        on_click=lambda e, x=oid: self.open_config_dialog(x)
-                                    ),
-                                    ft.IconButton(
-                                        icon=ft.Icons.DELETE,
-                                        tooltip="Eliminar Orden",
-                                        icon_color=ft.Colors.RED,
-                                        on_click=lambda e, x=oid: self.confirm_delete(x)
-                                    )
-                                ])
-                            ]),
-                            padding=10,
-                            border=ft.border.all(1, ft.Colors.GREY_300),
-                            border_radius=5
-                        )
+                self.lv_ordenes.append_items(ordenes)
+
+        def on_error(ex):
+            self.ordenes_loading = False
+            print(f"Error loading orders: {ex}")
+
+        executor.submit(
+            self.fetch_ordenes_page, self.ordenes_filters, self.ordenes_cursor,
+            key=(id(self), 'ordenes'),
+            on_result=on_result,
+            on_error=on_error,
+            loading=indicador(self.pb_ordenes)
+        )
+
+    def fetch_ordenes_page(self, filters, cursor):
+        search, medico_id, estado = filters
+        ordenes = db.get_ordenes_filtradas_page(search, medico_id, estado, page_size=self.PAGE_SIZE, after=cursor)
+        return [tuple(o) for o in ordenes]
+
+    def build_orden_row(self):
+        return ft.Container(
+            content=ft.Row([
+                ft.Icon(ft.Icons.RECEIPT_LONG),
+                ft.Column([
+                    ft.Text("", weight=ft.FontWeight.BOLD),
+                    ft.Text("", size=12, italic=True),
+                    ft.Text("", size=12, weight=ft.FontWeight.BOLD)
+                ], expand=True),
+                ft.Row([
+                    ft.IconButton(
+                        icon=ft.Icons.PRINT,
+                        tooltip="Configurar Impresión",
+                        icon_color=ft.Colors.BLUE,
+                        on_click=lambda e: self.open_config_dialog(e.control.data)
+                    ),
+                    ft.IconButton(
+                        icon=ft.Icons.DELETE,
+                        tooltip="Eliminar Orden",
+                        icon_color=ft.Colors.RED,
+                        on_click=lambda e: self.confirm_delete(e.control.data)
                     )
+                ])
+            ]),
+            padding=10,
+            margin=ft.margin.only(bottom=5),
+            border=ft.border.all(1, ft.Colors.GREY_300),
+            border_radius=5
+        )
 
-            if not initial:
-                self.update()
-        except Exception as e:
-            print(f"Error loading orders: {e}")
+    def bind_orden_row(self, row, o):
+        oid = o[0]
+        nombre = o[1]
+        fecha = o[2].strftime("%d/%m/%Y %H:%M") if o[2] else ""
+        estado_orden = o[3]
+        nombre_medico = o[4] or "Particular"
+
+        _, info, acciones = row.content.controls
+        txt_titulo, txt_medico, txt_estado = info.controls
+        txt_titulo.value = f"Orden #{oid} - {nombre}"
+        txt_medico.value = f"Médico: {nombre_medico}"
+        txt_estado.value = f"{fecha} | Estado: {estado_orden}"
+        txt_estado.color = ft.Colors.GREEN if estado_orden == 'Completado' else ft.Colors.ORANGE
+        for btn in acciones.controls:
+            btn.data = oid
 
     def confirm_delete(self, orden_id):
         def close_dlg(e):
@@ -153,26 +218,56 @@ class OrdenesView(ft.Column):
         self.page_ref.open(dlg)
 
     def delete_orden_click(self, orden_id):
-        try:
-            db.delete_orden(orden_id)
+        def on_result(_):
             self.page_ref.open(ft.SnackBar(ft.Text("Orden eliminada"), bgcolor=ft.Colors.GREEN))
-            self.load_ordenes()
-        except Exception as e:
+            self.lv_ordenes.remove(orden_id)
+
+        def on_error(e):
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error al eliminar orden: {e}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.delete_orden, orden_id, on_result=on_result, on_error=on_error,
+                          loading=indicador(self.pb_ordenes))
+
     def open_config_dialog(self, orden_id):
+        # Consulta en segundo plano; si se pide el diálogo de otra orden antes, se descarta
+        executor.submit(
+            self.fetch_config_data, orden_id,
+            key=(id(self), 'config'),
+            on_result=lambda data: self.show_config_dialog(orden_id, data),
+            on_error=lambda ex: print(f"Error loading order: {ex}"),
+            loading=indicador(self.pb_ordenes)
+        )
+
+    def fetch_config_data(self, orden_id):
         grouped_data = db.get_resultados_grouped(orden_id)
         if not grouped_data:
+            return None
+        # Médico (membrete) y referencias para previsualizar la paginación en el diálogo
+        header = db.get_report_header(orden_id)
+        referencias = db.resolve_references_for_order(orden_id)
+        return grouped_data, header, referencias
+
+    def show_config_dialog(self, orden_id, data):
+        if data is None:
             self.page_ref.open(ft.SnackBar(ft.Text("Esta orden no tiene resultados."), bgcolor=ft.Colors.RED))
             return
+        grouped_data, header, referencias = data
+        dialog = ConfigImpresionDialog(orden_id, grouped_data, self.page_ref,
+                                       medico=header[4] if header else None, referencias=referencias)
+        self.page_ref.open(dialog.dialog)
 
-        dialog = ConfigImpresionDialog(orden_id, grouped_data, self.page_ref)
+    def open_lote_dialog(self, e):
+        filters = (self.txt_search.value, self.dd_filter_medico.value, self.dd_filter_estado.value)
+        dialog = LoteImpresionDialog(filters, self.page_ref)
         self.page_ref.open(dialog.dialog)
+        dialog.load_ordenes()
 
 class ConfigImpresionDialog:
-    def __init__(self, orden_id, grouped_data, page):
+    def __init__(self, orden_id, grouped_data, page, medico=None, referencias=None):
         self.orden_id = orden_id
         self.page = page
+        self.medico = medico
+        self.referencias = referencias or {}
 
         self.config_items = []
         for g in grouped_data:
@@ -183,6 +278,7 @@ class ConfigImpresionDialog:
             })
 
         self.chk_firma = ft.Checkbox(label="Incluir Firma Digital", value=True)
+        self.txt_paginas = ft.Text("", color=ft.Colors.BLUE_GREY)
 
         self.list_view = ft.ListView(expand=True)
         
@@ -191,7 +287,7 @@ class ConfigImpresionDialog:
             title=ft.Text(f"Configurar Impresión - Orden #{orden_id}"),
             content=ft.Container(
                 content=ft.Column([
-                    self.chk_firma,
+                    ft.Row([self.chk_firma, self.txt_paginas], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                     ft.Divider(),
                     self.list_view
                 ]),
@@ -205,9 +301,22 @@ class ConfigImpresionDialog:
         )
         self.render_list()
 
+    def build_config(self):
+        return [{
+            'title': item['data']['title'],
+            'type': item['data']['type'],
+            'items': item['data']['items'],
+            'include': item['include'],
+            'page_break': item['page_break']
+        } for item in self.config_items]
+
     def render_list(self):
         self.list_view.controls.clear()
 
+        # Paginación calculada sin dibujar el PDF (ver reporte_pdf.paginar)
+        total, inicio = resumen_paginas(self.build_config(), self.referencias, self.medico)
+        self.txt_paginas.value = f"{total} página{'s' if total != 1 else ''}"
+
         for i, item in enumerate(self.config_items):
             title = item['data']['title']
             gtype = item['data']['type']
@@ -220,6 +329,7 @@ class ConfigImpresionDialog:
 
             row = ft.Row([
                 ft.Row([chk, ft.Text(f"{title} ({gtype})", weight=ft.FontWeight.BOLD)], expand=True),
+                ft.Text(f"Pág. {inicio[i]}" if inicio[i] else "-", size=12, color=ft.Colors.GREY_700),
                 ft.VerticalDivider(),
                 ft.Text("Salto Pág:"),
                 sw_break,
@@ -245,6 +355,7 @@ class ConfigImpresionDialog:
 
     def toggle_break(self, index, value):
         self.config_items[index]['page_break'] = value
+        self.render_list()
 
     def move_item(self, index, direction):
         new_index = index + direction
@@ -256,19 +367,107 @@ class ConfigImpresionDialog:
         self.page.close(self.dialog)
 
     def generate_pdf(self, e):
-        clean_config = []
-        for item in self.config_items:
-            clean_config.append({
-                'title': item['data']['title'],
-                'type': item['data']['type'],
-                'items': item['data']['items'],
-                'include': item['include'],
-                'page_break': item['page_break']
-            })
+        clean_config = self.build_config()
+
+        def on_result(res):
+            success, msg = res
+            color = ft.Colors.GREEN if success else ft.Colors.RED
+            self.page.open(ft.SnackBar(ft.Text(msg), bgcolor=color))
+            if success:
+                self.page.close(self.dialog)
+
+        # El dibujo del PDF (y sus consultas) no bloquea el diálogo; un segundo clic reemplaza al primero
+        executor.submit(
+            generar_pdf_orden, self.orden_id, clean_config,
+            include_signature=self.chk_firma.value,
+            key=(id(self), 'pdf'),
+            on_result=on_result,
+            on_error=lambda ex: self.page.open(ft.SnackBar(ft.Text(f"Error: {ex}"), bgcolor=ft.Colors.RED))
+        )
+
+
+class LoteImpresionDialog:
+    """Imprime de una vez todas las órdenes que cumplen los filtros de OrdenesView."""
 
-        success, msg = generar_pdf_orden(self.orden_id, clean_config, include_signature=self.chk_firma.value)
+    def __init__(self, filters, page):
+        self.filters = filters
+        self.page = page
+        self.orden_ids = []
+
+        self.txt_resumen = ft.Text("Buscando órdenes...")
+        self.rg_formato = ft.RadioGroup(
+            value="pdf",
+            content=ft.Row([
+                ft.Radio(value="pdf", label="Un PDF combinado"),
+                ft.Radio(value="zip", label="ZIP (un PDF por orden)")
+            ])
+        )
+        self.chk_firma = ft.Checkbox(label="Incluir Firma Digital", value=True)
+        self.pb_lote = ft.ProgressBar(value=0, visible=False)
+        self.txt_progreso = ft.Text("", size=12, color=ft.Colors.GREY_700)
+        self.btn_generar = ft.ElevatedButton("GENERAR", on_click=self.generate, icon=ft.Icons.PICTURE_AS_PDF, disabled=True)
 
-        color = ft.Colors.GREEN if success else ft.Colors.RED
-        self.page.open(ft.SnackBar(ft.Text(msg), bgcolor=color))
-        if success:
-            self.page.close(self.dialog)
+        self.dialog = ft.AlertDialog(
+            title=ft.Text("Imprimir Lote de Órdenes"),
+            content=ft.Container(
+                content=ft.Column([
+                    self.txt_resumen,
+                    ft.Divider(),
+                    self.rg_formato,
+                    self.chk_firma,
+                    self.pb_lote,
+                    self.txt_progreso
+                ], tight=True),
+                width=500
+            ),
+            actions=[
+                ft.TextButton("Cerrar", on_click=self.close),
+                self.btn_generar
+            ]
+        )
+
+    def load_ordenes(self):
+        def on_result(ids):
+            self.orden_ids = ids
+            search, medico_id, estado = self.filters
+            detalle = f" ({estado.lower()}s)" if estado and estado != "Todos" else ""
+            self.txt_resumen.value = f"{len(ids)} órdenes{detalle} con los filtros actuales."
+            self.btn_generar.disabled = not ids
+            self.dialog.update()
+
+        def on_error(ex):
+            self.txt_resumen.value = f"Error buscando órdenes: {ex}"
+            self.dialog.update()
+
+        executor.submit(orden_ids_por_filtro, *self.filters, key=(id(self), 'ids'), on_result=on_result, on_error=on_error)
+
+    def on_progreso(self, hechas, total):
+        self.pb_lote.value = hechas / total if total else 0
+        self.txt_progreso.value = f"Generando {hechas} de {total}..."
+        self.dialog.update()
+
+    def generate(self, e):
+        self.btn_generar.disabled = True
+        self.pb_lote.value = None  # indeterminada mientras se leen los datos
+        self.pb_lote.visible = True
+        self.txt_progreso.value = "Leyendo resultados..."
+        self.dialog.update()
+
+        def on_result(res):
+            success, msg = res
+            self.pb_lote.visible = False
+            self.txt_progreso.value = ""
+            self.btn_generar.disabled = False
+            self.dialog.update()
+            color = ft.Colors.GREEN if success else ft.Colors.RED
+            self.page.open(ft.SnackBar(ft.Text(msg), bgcolor=color))
+
+        executor.submit(
+            generar_pdf_lote, self.orden_ids, self.rg_formato.value, self.chk_firma.value, self.on_progreso,
+            key=(id(self), 'lote'),
+            on_result=on_result
+        )
+
+    def close(self, e):
+        executor.cancel((id(self), 'ids'))
+        self.page.close(self.dialog)
@@ -1,9 +1,12 @@
 import flet as ft
 from database import db
 from models.paciente import Paciente
+from services.executor import escrituras, executor
 from views.historial import HistorialDialog
 
 class PacientesView(ft.Column):
+    PAGE_SIZE = 100
+
     def __init__(self, page):
         super().__init__()
         self.page_ref = page
@@ -12,6 +15,8 @@ class PacientesView(ft.Column):
 
         self.pacientes = []
         self.selected_paciente_id = None
+        self.has_more = False
+        self.page_loading = False
 
         # Form Controls
         self.txt_nombre = ft.TextField(label="Nombre Completo", expand=True)
@@ -71,37 +76,67 @@ class PacientesView(ft.Column):
             ),
             ft.Divider(),
             ft.Text("Directorio de Pacientes"),
-            ft.ListView(controls=[self.table], expand=True, height=400)
+            ft.ListView(controls=[self.table], expand=True, height=400, on_scroll=self.on_table_scroll, on_scroll_interval=100)
         ]
 
-        self.load_data(initial=True)
-
-    def load_data(self, initial=False):
-        self.table.rows.clear()
-        try:
-            rows = db.get_all_pacientes()
-            self.pacientes = [Paciente.from_tuple(r) for r in rows]
-
-            for p in self.pacientes:
-                self.table.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(str(p.id))),
-                        ft.DataCell(ft.Text(p.nombreCompleto)),
-                        ft.DataCell(ft.Text(p.dni or "")),
-                        ft.DataCell(ft.Text(f"{p.edad} {p.unidadEdad}")),
-                        ft.DataCell(ft.Text(p.genero)),
-                        ft.DataCell(ft.Row([
-                            ft.IconButton(ft.Icons.HISTORY, icon_color=ft.Colors.BLUE, tooltip="Ver Historial", on_click=lambda e, pid=p.id: self.open_historial(pid)),
-                            ft.IconButton(ft.Icons.EDIT, on_click=lambda e, item=p: self.edit_paciente(item)),
-                            ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, pid=p.id, name=p.nombreCompleto: self.confirm_delete(pid, name))
-                        ])),
-                    ])
-                )
 
-            if not initial:
-                self.update()
-        except Exception as e:
-            print(f"Error loading pacientes: {e}")
+    def did_mount(self):
+        self.load_data()
+
+    def load_data(self):
+        self.has_more = True
+        self.request_page(reset=True)
+
+    def load_more(self):
+        # Siguiente página del directorio (keyset por id)
+        if self.has_more and not self.page_loading:
+            self.request_page(reset=False)
+
+    def request_page(self, reset):
+        # En segundo plano; recargar el directorio deja obsoleta la página que aún se esté cargando
+        self.page_loading = True
+        after_id = self.pacientes[-1].id if self.pacientes and not reset else None
+
+        def on_result(rows):
+            self.page_loading = False
+            if reset:
+                self.pacientes = []
+                self.table.rows.clear()
+            self.has_more = len(rows) == self.PAGE_SIZE
+            nuevos = [Paciente.from_tuple(r) for r in rows]
+            self.pacientes.extend(nuevos)
+            for p in nuevos:
+                self.table.rows.append(self.build_row(p))
+            self.update()
+
+        def on_error(ex):
+            self.page_loading = False
+            print(f"Error loading pacientes: {ex}")
+
+        executor.submit(
+            db.get_pacientes_page, self.PAGE_SIZE, after_id,
+            key=(id(self), 'pagina'),
+            on_result=on_result,
+            on_error=on_error
+        )
+
+    def build_row(self, p):
+        return ft.DataRow(cells=[
+            ft.DataCell(ft.Text(str(p.id))),
+            ft.DataCell(ft.Text(p.nombreCompleto)),
+            ft.DataCell(ft.Text(p.dni or "")),
+            ft.DataCell(ft.Text(f"{p.edad} {p.unidadEdad}")),
+            ft.DataCell(ft.Text(p.genero)),
+            ft.DataCell(ft.Row([
+                ft.IconButton(ft.Icons.HISTORY, icon_color=ft.Colors.BLUE, tooltip="Ver Historial", on_click=lambda e, pid=p.id: self.open_historial(pid)),
+                ft.IconButton(ft.Icons.EDIT, on_click=lambda e, item=p: self.edit_paciente(item)),
+                ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, pid=p.id, name=p.nombreCompleto: self.confirm_delete(pid, name))
+            ])),
+        ])
+
+    def on_table_scroll(self, e: ft.OnScrollEvent):
+        if self.has_more and e.pixels >= e.max_scroll_extent - 200:
+            self.load_more()
 
     def edit_paciente(self, p: Paciente):
         self.selected_paciente_id = p.id
@@ -139,13 +174,15 @@ class PacientesView(ft.Column):
         self.page_ref.open(dlg)
 
     def delete_paciente_click(self, paciente_id):
-        try:
-            db.delete_paciente(paciente_id)
+        def on_result(_):
             self.page_ref.open(ft.SnackBar(ft.Text("Paciente eliminado"), bgcolor=ft.Colors.GREEN))
             self.load_data()
-        except Exception as e:
+
+        def on_error(e):
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error al eliminar: {e}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.delete_paciente, paciente_id, on_result=on_result, on_error=on_error)
+
     def clear_form(self, e=None):
         self.selected_paciente_id = None
         self.txt_nombre.value = ""
@@ -198,21 +235,27 @@ class PacientesView(ft.Column):
             self.save_paciente()
             return
 
-        # Check
-        dupes = db.check_paciente_duplicates(self.txt_dni.value, self.txt_nombre.value)
-        if dupes:
-            self.show_duplicate_warning(dupes)
-        else:
-            self.save_paciente()
+        # Check (en segundo plano; un segundo clic reemplaza la comprobación pendiente)
+        def on_result(dupes):
+            if dupes:
+                self.show_duplicate_warning(dupes)
+            else:
+                self.save_paciente()
+
+        executor.submit(
+            db.check_paciente_duplicates, self.txt_dni.value, self.txt_nombre.value,
+            edad=self.txt_edad.value, unidad_edad=self.dd_unidad_edad.value, genero=self.dd_genero.value,
+            key=(id(self), 'duplicados'),
+            on_result=on_result,
+            on_error=lambda ex: print(f"Error buscando duplicados: {ex}")
+        )
 
     def show_duplicate_warning(self, dupes):
         # dupes is list of tuples (id, nombre, edad, unidad, genero, dni, ...)
 
         list_dupes = ft.ListView(height=150)
         for d in dupes:
-            # d index: 0=id, 1=name, 2=edad, 3=unidad, 4=genero... (based on SELECT *)
-            # Actually select * return order might vary slightly if schema changed but usually stable.
-            # Pacientes schema: id, nombreCompleto, edad, unidadEdad, genero, dni, telefono...
+            # d index: 0=id, 1=name, 2=edad, 3=unidad, 4=genero, 5=dni (columnas explícitas en check_paciente_duplicates)
             pid, pname, pedad, punidad, pgen = d[0], d[1], d[2], d[3], d[4]
 
             list_dupes.controls.append(
@@ -250,26 +293,27 @@ class PacientesView(ft.Column):
         self.page_ref.open(dlg)
 
     def save_paciente(self):
-        try:
-            data = {
-                'id': self.selected_paciente_id,
-                'nombreCompleto': self.txt_nombre.value,
-                'edad': self.txt_edad.value,
-                'unidadEdad': self.dd_unidad_edad.value,
-                'genero': self.dd_genero.value,
-                'dni': self.txt_dni.value,
-                'telefono': self.txt_telefono.value
-            }
-            db.upsert_paciente(data)
+        data = {
+            'id': self.selected_paciente_id,
+            'nombreCompleto': self.txt_nombre.value,
+            'edad': self.txt_edad.value,
+            'unidadEdad': self.dd_unidad_edad.value,
+            'genero': self.dd_genero.value,
+            'dni': self.txt_dni.value,
+            'telefono': self.txt_telefono.value
+        }
+
+        def on_result(_):
             self.clear_form()
             self.load_data()
-
             self.page_ref.open(ft.SnackBar(ft.Text("Paciente guardado"), bgcolor=ft.Colors.GREEN))
 
-        except Exception as ex:
+        def on_error(ex):
             print(f"Error: {ex}")
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error al guardar: {ex}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.upsert_paciente, data, on_result=on_result, on_error=on_error)
+
     def open_historial(self, paciente_id):
         dialog = HistorialDialog(paciente_id, self.page_ref)
         self.page_ref.open(dialog.dialog)
@@ -2,6 +2,7 @@ import flet as ft
 from database import db
 from models.perfil_examen import PerfilExamen
 from models.analito import Analito
+from services.executor import escrituras, executor
 
 class PerfilesView(ft.Column):
     def __init__(self, page):
@@ -106,7 +107,8 @@ class PerfilesView(ft.Column):
             ft.ListView(controls=[self.table], expand=True, height=300)
         ]
 
-        self.load_data(initial=True)
+    def did_mount(self):
+        self.load_data()
 
     def build_analitos_selector(self):
         return ft.Row([
@@ -142,39 +144,36 @@ class PerfilesView(ft.Column):
             ], expand=True)
         ], expand=True)
 
-    def load_data(self, initial=False):
-        self.table.rows.clear()
-        try:
-            # Load Perfiles
-            rows = db.get_all_perfiles()
-            self.perfiles = [PerfilExamen.from_tuple(r) for r in rows]
-
-            for p in self.perfiles:
-                self.table.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(str(p.id))),
-                        ft.DataCell(ft.Text(p.nombre)),
-                        ft.DataCell(ft.Text(p.categoria)),
-                        ft.DataCell(ft.Text(str(p.precioEstandar))),
-                        ft.DataCell(ft.Row([
-                            ft.IconButton(ft.Icons.EDIT, on_click=lambda e, item=p: self.edit_perfil(item)),
-                            ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, pid=p.id, name=p.nombre: self.confirm_delete(pid, name))
-                        ])),
-                    ])
-                )
-
-            # Load All Analitos
-            a_rows = db.get_all_analitos()
-            self.all_analitos = [Analito.from_tuple(r) for r in a_rows]
+    def load_data(self):
+        executor.submit(
+            lambda: (db.catalogos.perfiles(), db.catalogos.analitos()),
+            key=(id(self), 'catalogos'),
+            on_result=self.render_data,
+            on_error=lambda ex: print(f"Error loading perfiles: {ex}")
+        )
 
-            self.refresh_selector(initial=initial)
-            self.refresh_sub_selector(initial=initial)
+    def render_data(self, data):
+        self.table.rows.clear()
+        # Load Perfiles
+        self.perfiles, self.all_analitos = data
 
-            if not initial:
-                self.update()
+        for p in self.perfiles:
+            self.table.rows.append(
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(str(p.id))),
+                    ft.DataCell(ft.Text(p.nombre)),
+                    ft.DataCell(ft.Text(p.categoria)),
+                    ft.DataCell(ft.Text(str(p.precioEstandar))),
+                    ft.DataCell(ft.Row([
+                        ft.IconButton(ft.Icons.EDIT, on_click=lambda e, item=p: self.edit_perfil(item)),
+                        ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=lambda e, pid=p.id, name=p.nombre: self.confirm_delete(pid, name))
+                    ])),
+                ])
+            )
 
-        except Exception as e:
-            print(f"Error loading perfiles: {e}")
+        self.refresh_selector(initial=True)
+        self.refresh_sub_selector(initial=True)
+        self.update()
 
     # --- Analitos Logic ---
     def filter_analitos_disponibles(self, e):
@@ -304,12 +303,19 @@ class PerfilesView(ft.Column):
         self.dd_categoria.value = perfil.categoria
         self.txt_precio.value = str(perfil.precioEstandar)
 
+        executor.submit(
+            lambda: (db.get_perfil_analitos(perfil.id), db.get_perfil_hijos(perfil.id)),
+            key=(id(self), 'perfil'),
+            on_result=self.render_perfil_items,
+            on_error=lambda ex: print(f"Error loading perfil: {ex}")
+        )
+
+    def render_perfil_items(self, data):
+        rows, sub_rows = data
         # Load Analitos
-        rows = db.get_perfil_analitos(perfil.id)
         self.asignados_items = [Analito.from_tuple(r) for r in rows]
 
         # Load Sub-Perfiles
-        sub_rows = db.get_perfil_hijos(perfil.id)
         self.sub_asignados_items = [PerfilExamen.from_tuple(r) for r in sub_rows]
 
         self.refresh_selector()
@@ -336,13 +342,15 @@ class PerfilesView(ft.Column):
         self.page_ref.open(dlg)
 
     def delete_perfil(self, perfil_id):
-        try:
-            db.delete_perfil(perfil_id)
+        def on_result(_):
             self.load_data()
             self.page_ref.open(ft.SnackBar(ft.Text("Perfil eliminado"), bgcolor=ft.Colors.GREEN))
-        except Exception as e:
+
+        def on_error(e):
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error al eliminar: {e}"), bgcolor=ft.Colors.RED))
 
+        escrituras.submit(db.delete_perfil, perfil_id, on_result=on_result, on_error=on_error)
+
     def clear_form(self, e=None):
         self.selected_perfil_id = None
         self.txt_nombre.value = ""
@@ -355,23 +363,23 @@ class PerfilesView(ft.Column):
         self.update()
 
     def save_perfil(self, e):
-        try:
-            data = {
-                'id': self.selected_perfil_id,
-                'nombre': self.txt_nombre.value,
-                'categoria': self.dd_categoria.value,
-                'precioEstandar': self.txt_precio.value
-            }
-            analito_ids = [a.id for a in self.asignados_items]
-            sub_perfil_ids = [p.id for p in self.sub_asignados_items]
-
-            db.upsert_perfil(data, analito_ids, sub_perfil_ids)
-
+        data = {
+            'id': self.selected_perfil_id,
+            'nombre': self.txt_nombre.value,
+            'categoria': self.dd_categoria.value,
+            'precioEstandar': self.txt_precio.value
+        }
+        analito_ids = [a.id for a in self.asignados_items]
+        sub_perfil_ids = [p.id for p in self.sub_asignados_items]
+
+        def on_result(_):
             self.clear_form()
             self.load_data()
-
             self.page_ref.open(ft.SnackBar(ft.Text("Perfil guardado correctamente"), bgcolor=ft.Colors.GREEN))
 
-        except Exception as ex:
+        def on_error(ex):
             print(f"Error saving perfil: {ex}")
             self.page_ref.open(ft.SnackBar(ft.Text(f"Error: {ex}"), bgcolor=ft.Colors.RED))
+
+        escrituras.submit(db.upsert_perfil, data, analito_ids, sub_perfil_ids,
+                          on_result=on_result, on_error=on_error)
@@ -1,263 +1,92 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import cm
 from database import db
+from services.reporte_pdf import renderizar_bytes, es_cacheable, huella_render
+from services.reporte_lote import generar_lote
+from datetime import datetime
 import os, platform, subprocess
 
-def generar_pdf_orden(orden_id, config_list, include_signature=True):
-
-    # --- 1. OBTENER DATOS HEADER ---
+def abrir_archivo(ruta):
+    try:
+        if platform.system() == 'Windows': os.startfile(ruta)
+        else: subprocess.call(('xdg-open', ruta))
+    except Exception as e:
+        # El PDF ya está guardado; solo falló el visor
+        print(f"No se pudo abrir {ruta}: {e}")
+
+def generar_pdf_orden_bytes(orden_id, config_list, include_signature=True):
+    """
+    PDF de una orden en memoria (bytes); None si la orden no existe.
+    Las órdenes validadas se sirven desde db.reportes si ya se imprimieron igual antes.
+    """
     header_data = db.get_report_header(orden_id)
-    if not header_data: return False, "Datos de orden no encontrados"
-
-    paciente, edad, unidad, genero, medico, fecha = header_data
-
-    nombre_medico = str(medico).upper() if medico else ""
-    ES_DR_CESPEDES = "CESPEDES" in nombre_medico and "HUGO" in nombre_medico
-
-    # --- 2. CONFIGURACIÓN PDF ---
-    filename = f"Resultado_Orden_{orden_id}.pdf"
-    c = canvas.Canvas(filename, pagesize=A4)
-    w, h = A4
-
-    margen_x = 50
-    margen_y_bottom = 2.5 * cm
-    ancho_util = w - (margen_x * 2)
-    color_barra = colors.HexColor("#005b96")
-
-    # --- FUNCIONES DE DIBUJO ---
-
-    def dibujar_marca_agua():
-        if not ES_DR_CESPEDES:
-            ruta_agua = os.path.join(os.getcwd(), "assets", "microscopio_agua.png")
-            if os.path.exists(ruta_agua):
-                try:
-                    c.saveState()
-                    c.setFillAlpha(0.25)
-                    ancho_agua = 500
-                    alto_agua = 500
-                    x_pos = (w - ancho_agua) / 2
-                    y_pos = (h - alto_agua) / 2
-                    c.drawImage(ruta_agua, x_pos, y_pos, width=ancho_agua, height=alto_agua, mask='auto', preserveAspectRatio=True)
-                    c.restoreState()
-                except: pass
-
-    def dibujar_membrete(y_actual):
-        if ES_DR_CESPEDES:
-            ruta_membrete = os.path.join(os.getcwd(), "assets", "membrete_cespedes.png")
-        else:
-            ruta_membrete = os.path.join(os.getcwd(), "assets", "membrete_full.png")
-
-        if os.path.exists(ruta_membrete):
-            try:
-                ancho_imagen = w - 20
-                altura_imagen = 160
-                c.drawImage(ruta_membrete, 10, y_actual - altura_imagen + 20, width=ancho_imagen, height=altura_imagen, mask='auto', preserveAspectRatio=True)
-                return y_actual - altura_imagen - 10
-            except Exception as e:
-                print(f"Error cargando membrete: {e}")
-                return y_actual - 50
-        else:
-            c.setFont("Helvetica-Bold", 16)
-            c.drawCentredString(w/2, y_actual - 30, "LABORATORIO CLÍNICO")
-            return y_actual - 50
-
-    def dibujar_firma():
-        y_firma = margen_y_bottom + 40
-        x_firma_centro = w - margen_x - 100
-
-        if include_signature:
-            ruta_firma = os.path.join(os.getcwd(), "assets", "firma.png")
-            if os.path.exists(ruta_firma):
-                try:
-                    c.drawImage(ruta_firma, x_firma_centro - 110, y_firma - 30, width=220, height=90, mask='auto', preserveAspectRatio=True)
-                except: pass
-
-        c.setStrokeColor(colors.black)
-        c.setDash(4, 3)
-        c.line(x_firma_centro - 90, y_firma, x_firma_centro + 90, y_firma)
-        c.setDash([])
-
-        c.setFont("Courier", 9)
-        c.drawCentredString(x_firma_centro, y_firma - 12, "LIC. COBEÑAS PALACIOS LUIS A.")
-        c.drawCentredString(x_firma_centro, y_firma - 22, "TECNÓLOGO MÉDICO")
-        c.drawCentredString(x_firma_centro, y_firma - 32, "C.T.M.P 10911")
-
-    def dibujar_datos_paciente(y_actual):
-        c.setStrokeColor(colors.grey)
-        c.line(margen_x, y_actual, w - margen_x, y_actual)
-        y_actual -= 15
-
-        c.setFillColor(colors.black)
-        c.setFont("Courier-Bold", 10)
-        c.drawString(margen_x, y_actual, "PACIENTE:")
-        c.setFont("Courier", 10)
-        c.drawString(margen_x + 70, y_actual, str(paciente).upper())
-
-        col2_x = w - margen_x - 200
-        c.setFont("Courier-Bold", 10)
-        c.drawString(col2_x, y_actual, "FECHA:")
-        c.setFont("Courier", 10)
-        c.drawString(col2_x + 50, y_actual, str(fecha)[:10])
-
-        y_actual -= 15
-
-        c.setFont("Courier-Bold", 10)
-        c.drawString(margen_x, y_actual, "MÉDICO:")
-        c.setFont("Courier", 10)
-        c.drawString(margen_x + 70, y_actual, str(medico or "Particular").upper())
-
-        c.setFont("Courier-Bold", 10)
-        c.drawString(col2_x, y_actual, "EDAD:")
-        c.setFont("Courier", 10)
-        c.drawString(col2_x + 50, y_actual, f"{edad} {unidad} ({genero})")
-
-        y_actual -= 10
-        c.line(margen_x, y_actual, w - margen_x, y_actual)
-        return y_actual - 10
-
-    def dibujar_barra_titulos(y_actual):
-        c.setFillColor(color_barra)
-        c.rect(margen_x, y_actual - 12, ancho_util, 14, fill=1, stroke=0)
-
-        c.setFillColor(colors.white)
-        c.setFont("Courier-Bold", 9)
-
-        c.drawString(margen_x + 5, y_actual - 9, "ANÁLISIS")
-        c.drawString(margen_x + (ancho_util * 0.4), y_actual - 9, "RESULTADO")
-        c.drawString(margen_x + (ancho_util * 0.65), y_actual - 9, "V. REFERENCIALES")
-        c.drawString(margen_x + (ancho_util * 0.88), y_actual - 9, "UNIDADES")
-
-        return y_actual - 35
-
-    def init_page():
-        dibujar_marca_agua()
-        y = h - 20
-        y = dibujar_membrete(y)
-        y = dibujar_datos_paciente(y)
-        y = dibujar_barra_titulos(y)
-        return y
-
-    # --- INICIO DE PÁGINA 1 ---
-    y = init_page()
-
-    # --- CUERPO ---
-    for group_config in config_list:
-        if not group_config['include']:
+    if not header_data: return None
+
+    clave = None
+    if es_cacheable(config_list):
+        clave = db.reportes.clave(orden_id, header_data, config_list, include_signature, huella_render())
+        datos = db.reportes.get(orden_id, clave)
+        if datos is not None:
+            return datos
+
+    # Referencias de todos los analitos de la orden en una sola consulta
+    referencias = db.resolve_references_for_order(orden_id)
+    datos = renderizar_bytes([(orden_id, header_data, referencias, config_list)], include_signature)
+    if clave:
+        db.reportes.put(orden_id, clave, datos)
+    return datos
+
+def guardar_archivo(datos, filename):
+    """
+    Escribe `datos` en `filename`. Si está bloqueado (abierto en el visor de PDF) se guarda
+    como nombre_1.pdf, nombre_2.pdf... en lugar de fallar. Devuelve la ruta usada.
+    """
+    base, ext = os.path.splitext(filename)
+    for intento in range(20):
+        ruta = filename if intento == 0 else f"{base}_{intento}{ext}"
+        try:
+            with open(ruta, 'wb') as f:
+                f.write(datos)
+            return ruta
+        except PermissionError:
             continue
+    raise PermissionError(f"No se pudo escribir {filename}: el archivo está abierto")
 
-        items = group_config['items']
-        if not items: continue
-
-        # Page Break Logic (Manual)
-        if group_config['page_break']:
-             dibujar_firma()
-             c.showPage()
-             y = init_page()
-
-        # Space Calculation
-        espacio_needed = 40 + (len(items) * 15)
-        limite_inferior = margen_y_bottom + 100
-
-        if y - espacio_needed < limite_inferior:
-            dibujar_firma()
-            c.showPage()
-            y = init_page()
-
-        c.setFillColor(colors.black)
-        c.setFont("Courier-Bold", 11)
-
-        c.drawString(margen_x, y, f"Examen :   {group_config['title']}")
-        y -= 15
-
-        metodo_global = items[0].get('metodo')
-        if metodo_global and metodo_global != "Automatizado":
-             c.setFont("Courier", 10)
-             c.drawString(margen_x, y, f"Método :   {metodo_global}")
-             y -= 15
-
-        y -= 5
-
-        current_cat = None
-        current_sub = None # For Subtitle Grouping
-
-        for item in items:
-            cat = item.get('categoria') or "General"
-
-            # Category Header (For Profiles)
-            if group_config['type'] == 'Perfil':
-                 if cat != "General" and cat != current_cat and "OBSERVACIONES" not in cat.upper():
-                    y -= 5
-                    c.setFont("Courier-Bold", 10)
-                    c.drawString(margen_x, y, f"{cat}:")
-                    y -= 12
-                    current_cat = cat
-
-            # Subtitle Header (Phase 6.5)
-            subtitulo = item.get('subtituloReporte')
-            if subtitulo and subtitulo != current_sub:
-                y -= 5
-                c.setFont("Courier-Bold", 10)
-                c.drawString(margen_x + 10, y, subtitulo) # Indented slightly? or same as category?
-                y -= 12
-                current_sub = subtitulo
-
-            nombre = item['nombre']
-            raw_val = item['valor'] or ""
-
-            # Ghost Logic: Skip empty, UNLESS it is "0"
-            val_str = str(raw_val).strip()
-            if not val_str and val_str != "0":
-                continue
-
-            # Numeric Formatting
-            try:
-                float_val = float(val_str)
-                val_str = "{:.2f}".format(float_val)
-            except ValueError:
-                pass
-
-            smart_ref = db.get_smart_reference(item['analitoId'], genero, edad, unidad)
-            uni = str(item['unidad'] or "")
-
-            if nombre.upper() == "OBSERVACIONES":
-                y -= 10
-                c.setFont("Courier-Bold", 10)
-                c.drawString(margen_x, y, "OBSERVACIONES:")
-                c.setFont("Courier", 10)
-                if val_str: c.drawString(margen_x + 110, y, val_str)
-                y -= 15
-                continue
-
-            c.setFont("Courier", 10)
-            c.drawString(margen_x, y, nombre)
-
-            if "POSITIVO" in val_str.upper() or "REACTIVO" in val_str.upper():
-                c.setFont("Courier-Bold", 10)
-
-            c.drawString(margen_x + (ancho_util * 0.4) + 10, y, val_str)
-
-            c.setFont("Courier", 10)
-            c.drawString(margen_x + (ancho_util * 0.65), y, smart_ref)
-            c.drawString(margen_x + (ancho_util * 0.88), y, uni)
-
-            y -= 12
-        y -= 5
-        y -= 15
-
-    # --- FIRMA FINAL ---
-    dibujar_firma()
+def generar_pdf_orden(orden_id, config_list, include_signature=True):
+    try:
+        datos = generar_pdf_orden_bytes(orden_id, config_list, include_signature)
+    except Exception as e:
+        return False, f"Error al generar PDF: {str(e)}"
+    if datos is None: return False, "Datos de orden no encontrados"
 
-    # --- GUARDAR ---
+    filename = f"Resultado_Orden_{orden_id}.pdf"
     try:
-        c.save()
-        try:
-            if platform.system() == 'Windows': os.startfile(filename)
-            else: subprocess.call(('xdg-open', filename))
-        except: pass
-        return True, "PDF Generado Correctamente"
+        ruta = guardar_archivo(datos, filename)
     except PermissionError:
         return False, "ERROR: El archivo PDF está abierto. Ciérrelo e intente de nuevo."
     except Exception as e:
         return False, f"Error al guardar PDF: {str(e)}"
+
+    abrir_archivo(ruta)
+    if ruta != filename:
+        return True, f"PDF Generado Correctamente (el anterior seguía abierto: se guardó como {ruta})"
+    return True, "PDF Generado Correctamente"
+
+def generar_pdf_lote(orden_ids, formato='pdf', include_signature=True, progreso=None):
+    """Reportes de varias órdenes en un PDF combinado o un ZIP (ver services.reporte_lote)."""
+    try:
+        datos, generadas, omitidas = generar_lote(orden_ids, formato, include_signature, progreso)
+    except Exception as e:
+        return False, f"Error generando el lote: {str(e)}"
+    if not generadas:
+        return False, "Ninguna de las órdenes tiene resultados para imprimir"
+
+    filename = f"Lote_Ordenes_{datetime.now():%Y%m%d_%H%M%S}.{formato}"
+    try:
+        ruta = guardar_archivo(datos, filename)
+    except Exception as e:
+        return False, f"Error al guardar el lote: {str(e)}"
+    abrir_archivo(ruta)
+
+    msg = f"Lote generado: {len(generadas)} órdenes"
+    if omitidas:
+        msg += f" ({len(omitidas)} sin resultados omitidas)"
+    return True, msg
@@ -1,9 +1,13 @@
 import flet as ft
 from database import db
 from models.paciente import Paciente
-import re
+from services.formula_engine import FormulaEngine
+from views.virtual_list import VirtualList
+from services.executor import executor, escrituras, indicador
 
 class ResultadosView(ft.Column):
+    PAGE_SIZE = 50
+
     def __init__(self, page):
         super().__init__()
         self.page_ref = page
@@ -13,6 +17,8 @@ class ResultadosView(ft.Column):
         self.inputs_map = {} # abbr -> control (TextField/Dropdown)
         self.ordered_inputs = [] # List of controls for navigation
         self.input_data_map = {} # Metadata store
+        self.formula_engine = None
+        self.formula_controls = {} # clave fórmula -> control calculado
         self.current_orden_id = None
         self.is_validated = False # Track validation status
 
@@ -46,8 +52,20 @@ class ResultadosView(ft.Column):
             on_click=self.clear_filters
         )
 
-        # Left Panel: List of Orders
-        self.lv_ordenes = ft.ListView(expand=True, spacing=5, padding=10)
+        # Left Panel: List of Orders (virtualizada y paginada: se cargan más al llegar al final)
+        self.lv_ordenes = VirtualList(
+            item_height=72,
+            build_row=self.build_orden_tile,
+            bind_row=self.bind_orden_tile,
+            empty_text="No se encontraron órdenes.",
+            on_end_reached=self.load_more_ordenes,
+            padding=10
+        )
+        self.ordenes_filters = (None, None, None)
+        self.ordenes_cursor = None # (fechaCreacion, id) de la última orden cargada
+        self.ordenes_has_more = False
+        self.ordenes_loading = False
+        self.pb_ordenes = ft.ProgressBar(visible=False)
 
         # Right Panel: Results Detail (Grouped)
         self.lbl_orden_info = ft.Text("Seleccione una Orden", size=18, weight=ft.FontWeight.BOLD)
@@ -62,6 +80,7 @@ class ResultadosView(ft.Column):
         self.lbl_validado_info = ft.Text("", color=ft.Colors.GREEN, weight=ft.FontWeight.BOLD)
 
         self.result_container = ft.Column(scroll=ft.ScrollMode.ALWAYS, expand=True)
+        self.pb_detalle = ft.ProgressBar(visible=False)
         self.input_controls = []
 
         # Split View
@@ -81,6 +100,7 @@ class ResultadosView(ft.Column):
                     content=ft.Column([
                         ft.Text("Lista de Órdenes", weight=ft.FontWeight.BOLD),
                         ft.Divider(),
+                        self.pb_ordenes,
                         self.lv_ordenes
                     ]),
                     border=ft.border.only(right=ft.BorderSide(1, ft.Colors.GREY_300))
@@ -91,6 +111,7 @@ class ResultadosView(ft.Column):
                     padding=20,
                     content=ft.Column([
                         self.lbl_orden_info,
+                        self.pb_detalle,
                         ft.Row([self.switch_validar, self.lbl_validado_info]),
                         ft.Divider(),
                         self.result_container
@@ -104,12 +125,16 @@ class ResultadosView(ft.Column):
         self.load_ordenes(initial=False)
 
     def load_initial_data(self):
-        try:
-            medicos = db.get_all_medicos()
-            self.dd_filter_medico.options = [ft.dropdown.Option(key=str(m[0]), text=m[1]) for m in medicos]
-            self.update()
-        except Exception as e:
-            print(f"Error loading filters: {e}")
+        executor.submit(
+            db.catalogos.medicos,
+            key=(id(self), 'medicos'),
+            on_result=self.render_filtro_medicos,
+            on_error=lambda ex: print(f"Error loading filters: {ex}")
+        )
+
+    def render_filtro_medicos(self, medicos):
+        self.dd_filter_medico.options = [ft.dropdown.Option(key=str(m.id), text=m.nombre) for m in medicos]
+        self.update()
 
     def apply_filters(self, e):
         self.load_ordenes()
@@ -121,38 +146,98 @@ class ResultadosView(ft.Column):
         self.load_ordenes()
 
     def load_ordenes(self, initial=False):
-        self.lv_ordenes.controls.clear()
-        try:
-            search = self.txt_search.value
-            medico_id = self.dd_filter_medico.value
-            estado = self.dd_filter_estado.value
+        # Get filters
+        search = self.txt_search.value
+        medico_id = self.dd_filter_medico.value
+        estado = self.dd_filter_estado.value
+
+        self.ordenes_filters = (search, medico_id, estado)
+        self.ordenes_cursor = None
+        self.ordenes_has_more = True
+        self.request_ordenes_page(reset=True)
+
+    def load_more_ordenes(self):
+        if self.ordenes_has_more and not self.ordenes_loading:
+            self.request_ordenes_page(reset=False)
+
+    def request_ordenes_page(self, reset):
+        # En segundo plano; una nueva búsqueda deja obsoleta la página que aún se esté cargando
+        self.ordenes_loading = True
+
+        def on_result(ordenes):
+            self.ordenes_loading = False
+            self.ordenes_has_more = len(ordenes) == self.PAGE_SIZE
+            if ordenes:
+                self.ordenes_cursor = (ordenes[-1][2], ordenes[-1][0])
+            # Sólo se envían al cliente las filas visibles que cambian
+            if reset:
+                self.lv_ordenes.set_items(ordenes)
+            else:
+                self.lv_ordenes.append_items(ordenes)
+
+        def on_error(ex):
+            self.ordenes_loading = False
+            print(f"Error loading orders: {ex}")
+
+        executor.submit(
+            self.fetch_ordenes_page, self.ordenes_filters, self.ordenes_cursor,
+            key=(id(self), 'ordenes'),
+            on_result=on_result,
+            on_error=on_error,
+            loading=indicador(self.pb_ordenes)
+        )
 
-            ordenes = db.get_ordenes_filtradas(search, medico_id, estado)
+    def fetch_ordenes_page(self, filters, cursor):
+        search, medico_id, estado = filters
+        ordenes = db.get_ordenes_filtradas_page(search, medico_id, estado, page_size=self.PAGE_SIZE, after=cursor)
+        return [tuple(o) for o in ordenes]
+
+    def build_orden_tile(self):
+        return ft.ListTile(
+            leading=ft.Icon(ft.Icons.RECEIPT_LONG),
+            title=ft.Text(""),
+            subtitle=ft.Text(""),
+            on_click=lambda e: self.load_detalle_orden(e.control.data)
+        )
 
-            if not ordenes:
-                self.lv_ordenes.controls.append(ft.Text("No se encontraron órdenes."))
-            else:
-                for o in ordenes:
-                    oid = o[0]
-                    nombre = o[1]
-                    fecha = o[2].strftime("%d/%m %H:%M") if o[2] else ""
-                    estado_orden = o[3]
-
-                    self.lv_ordenes.controls.append(
-                        ft.ListTile(
-                            leading=ft.Icon(ft.Icons.RECEIPT_LONG),
-                            title=ft.Text(f"#{oid} - {nombre}"),
-                            subtitle=ft.Text(f"{fecha} | {estado_orden}"),
-                            on_click=lambda e, x=oid: self.load_detalle_orden(x)
-                        )
-                    )
+    def bind_orden_tile(self, tile, o):
+        fecha = o[2].strftime("%d/%m %H:%M") if o[2] else ""
+        tile.data = o[0]
+        tile.title.value = f"#{o[0]} - {o[1]}"
+        tile.subtitle.value = f"{fecha} | {o[3]}"
 
-            if not initial:
-                self.update()
-        except Exception as e:
-            print(f"Error loading orders: {e}")
+    def fetch_orden_row(self, orden_id, filters):
+        search, medico_id, estado = filters
+        fila = db.get_orden_fila(orden_id, search, medico_id, estado)
+        return tuple(fila) if fila else None
+
+    def refresh_orden_row(self, orden_id, fila):
+        # Se actualiza en la lista si está cargada, o se quita si ya no cumple los filtros
+        if fila is None:
+            self.lv_ordenes.remove(orden_id)
+        elif self.lv_ordenes.get(orden_id) is not None:
+            self.lv_ordenes.upsert(fila)
 
     def load_detalle_orden(self, orden_id):
+        # Consulta en segundo plano; si se elige otra orden antes de que llegue, se descarta
+        executor.submit(
+            self.fetch_detalle_orden, orden_id,
+            key=(id(self), 'detalle'),
+            on_result=lambda data: self.render_detalle_orden(orden_id, data),
+            on_error=lambda ex: print(f"Error loading order detail: {ex}"),
+            loading=indicador(self.pb_detalle)
+        )
+
+    def fetch_detalle_orden(self, orden_id):
+        header_tuple = db.get_orden_header(orden_id)
+        if not header_tuple: return None
+        paciente = Paciente.from_tuple(db.get_paciente(header_tuple[1]))
+        grouped_data = db.get_resultados_grouped(orden_id)
+        # Rangos y textos de referencia de toda la orden en una sola consulta
+        referencias = db.resolve_references_for_order(orden_id)
+        return paciente, grouped_data, referencias
+
+    def render_detalle_orden(self, orden_id, data):
         self.current_orden_id = orden_id
         self.input_controls = []
         self.inputs_map = {}
@@ -161,11 +246,10 @@ class ResultadosView(ft.Column):
         self.result_container.controls.clear()
         self.is_validated = False # Default until checked
 
-        # Header
-        header_tuple = db.get_orden_header(orden_id)
-        if not header_tuple: return
-        paciente_tuple = db.get_paciente(header_tuple[1])
-        paciente = Paciente.from_tuple(paciente_tuple)
+        if data is None:
+            self.update()
+            return
+        paciente, grouped_data, referencias = data
 
         self.lbl_orden_info.value = f"Orden #{orden_id} - {paciente.nombreCompleto} ({paciente.edad} {paciente.unidadEdad})"
 
@@ -182,8 +266,6 @@ class ResultadosView(ft.Column):
         )
         self.page_ref.update()
 
-        grouped_data = db.get_resultados_grouped(orden_id)
-
         # Check validation status from data
         # If ANY item has state 'Validado', we consider the order validated (since it's all or nothing per requirement)
         # But let's check the first one or loop.
@@ -218,7 +300,8 @@ class ResultadosView(ft.Column):
                 current_val = item['valor']
                 aid = item['analitoId']
 
-                range_vals = db.get_patient_range_values(aid, paciente.genero, paciente.edad, paciente.unidadEdad)
+                ref_data = referencias.get(aid, {})
+                range_vals = ref_data.get('valores')
 
                 val_to_display = current_val
                 if val_to_display is None:
@@ -280,7 +363,7 @@ class ResultadosView(ft.Column):
                 self.ordered_inputs.append(input_control)
                 self.input_controls.append({'id': item['id'], 'control': input_control})
 
-                smart_ref = db.get_smart_reference(aid, paciente.genero, paciente.edad, paciente.unidadEdad)
+                smart_ref = ref_data.get('referencia', "")
 
                 row_control = ft.Row([
                     ft.Text(item['nombre'], expand=2),
@@ -304,12 +387,15 @@ class ResultadosView(ft.Column):
             )
             self.result_container.controls.append(card)
 
+        self.build_formula_engine()
+
         # Initial validation run
         self.run_validations_and_calcs()
         self.update()
 
     def toggle_validation(self, e):
         is_locking = self.switch_validar.value
+        orden_id = self.current_orden_id
 
         if is_locking:
             # Check for empty fields
@@ -326,40 +412,70 @@ class ResultadosView(ft.Column):
                 self.update()
                 return
 
-            # Save first then validate
-            self.save_all(None) # Force save
-
-            # Call DB validate
-            db.validate_orden(self.current_orden_id, "ADMIN")
-            self.lbl_validado_info.value = "VALIDADO POR: ADMIN"
-            self.page_ref.open(ft.SnackBar(ft.Text("Orden Validada y Bloqueada"), bgcolor=ft.Colors.GREEN))
+            # Save first then validate (una sola escritura en segundo plano)
+            def on_result(fila):
+                self.refresh_orden_row(orden_id, fila)
+                if self.current_orden_id != orden_id:
+                    return  # ya se abrió otra orden: no se toca el detalle
+                self.lbl_validado_info.value = "VALIDADO POR: ADMIN"
+                self.page_ref.open(ft.SnackBar(ft.Text("Orden Validada y Bloqueada"), bgcolor=ft.Colors.GREEN))
+                self.set_inputs_locked(True)
 
-            # Lock UI
-            for inp in self.input_controls:
-                ctrl = inp['control']
-                if isinstance(ctrl, ft.TextField):
-                    ctrl.read_only = True
-                else:
-                    ctrl.disabled = True
-                ctrl.update()
+            self.submit_escritura(orden_id, self.guardar_y_validar, orden_id, self.collect_updates(), "ADMIN",
+                                  self.ordenes_filters, on_result=on_result, error_text="Error al validar")
 
         else:
             # Unlock
-            db.unlock_orden(self.current_orden_id)
-            self.lbl_validado_info.value = ""
-            self.page_ref.open(ft.SnackBar(ft.Text("Orden Desbloqueada"), bgcolor=ft.Colors.ORANGE))
+            def on_result(_):
+                if self.current_orden_id != orden_id:
+                    return
+                self.lbl_validado_info.value = ""
+                self.page_ref.open(ft.SnackBar(ft.Text("Orden Desbloqueada"), bgcolor=ft.Colors.ORANGE))
+                self.set_inputs_locked(False)
 
-            # Unlock UI
-            for inp in self.input_controls:
-                ctrl = inp['control']
-                if isinstance(ctrl, ft.TextField):
-                    ctrl.read_only = False
-                else:
-                    ctrl.disabled = False
-                ctrl.update()
+            self.submit_escritura(orden_id, db.unlock_orden, orden_id,
+                                  on_result=on_result, error_text="Error al desbloquear")
 
+    def set_inputs_locked(self, locked):
+        for inp in self.input_controls:
+            ctrl = inp['control']
+            if isinstance(ctrl, ft.TextField):
+                ctrl.read_only = locked
+            else:
+                ctrl.disabled = locked
         self.update()
 
+    def submit_escritura(self, orden_id, fn, *args, on_result, error_text):
+        # Escrituras en el hilo de escrituras; el switch queda bloqueado hasta que terminen
+        self.switch_validar.disabled = True
+        self.update()
+
+        def terminar():
+            if self.current_orden_id == orden_id:
+                self.switch_validar.disabled = False
+                self.update()
+
+        def on_ok(resultado):
+            on_result(resultado)
+            terminar()
+
+        def on_error(ex):
+            print(ex)
+            if self.current_orden_id == orden_id:
+                # La orden no cambió: el switch vuelve a su estado anterior
+                self.switch_validar.value = not self.switch_validar.value
+                self.page_ref.open(ft.SnackBar(ft.Text(error_text), bgcolor=ft.Colors.RED))
+            terminar()
+
+        escrituras.submit(fn, *args, on_result=on_ok, on_error=on_error, loading=indicador(self.pb_detalle))
+
+    def guardar_y_validar(self, orden_id, updates, user, filters):
+        if updates:
+            db.update_resultado_batch(updates)
+        if user:
+            db.validate_orden(orden_id, user)
+        # El estado de la orden pudo cambiar: sólo se reenvía su fila de la lista
+        return self.fetch_orden_row(orden_id, filters)
 
     def run_validations_and_calcs(self):
         # 1. Recalculate Formulas
@@ -371,7 +487,9 @@ class ResultadosView(ft.Column):
     def on_result_change(self, e):
         ctrl = e.control
         self.validate_ranges(ctrl)
-        self.recalculate_formulas()
+        abbr = ctrl.data.get('abreviatura')
+        if abbr:
+            self.recalculate_formulas(abbr)
         self.update()
 
     def validate_ranges(self, control):
@@ -407,46 +525,44 @@ class ResultadosView(ft.Column):
         except ValueError:
             pass # Not a number
 
-    def recalculate_formulas(self):
-        # Iterate all inputs, find calculated ones
+    def build_formula_engine(self):
+        # Compila las fórmulas de la orden una sola vez y resuelve su orden de cálculo
+        formulas = {}
+        self.formula_controls = {}
         for ctrl in self.ordered_inputs:
             meta = ctrl.data
             if meta.get('esCalculado') and meta.get('formula'):
-                formula = meta['formula']
-
-                # Replace tokens [ABBR] with values
-                tokens = re.findall(r'\[(.*?)\]', formula)
-
-                can_calc = True
-                calc_expr = formula
-
-                for token in tokens:
-                    src_ctrl = self.inputs_map.get(token)
-                    if src_ctrl:
-                        val_str = src_ctrl.value
-                        try:
-                            val = float(val_str)
-                            calc_expr = calc_expr.replace(f"[{token}]", str(val))
-                        except (ValueError, TypeError):
-                            can_calc = False
-                            break
-                    else:
-                        can_calc = False
+                clave = meta.get('abreviatura') or f"#{meta['id']}"
+                formulas[clave] = meta['formula']
+                self.formula_controls[clave] = ctrl
 
-                if can_calc:
-                    try:
-                        allowed_chars = "0123456789.+-*/() "
-                        if not all(c in allowed_chars for c in calc_expr):
-                            continue
+        self.formula_engine = FormulaEngine(formulas, estricto=False)
+        for clave, error in self.formula_engine.errores:
+            print(f"Fórmula ignorada ({clave}): {error}")
 
-                        res = eval(calc_expr)
-                        ctrl.value = "{:.2f}".format(res)
-                        ctrl.update()
+    def recalculate_formulas(self, changed_abbr=None):
+        # Sin changed_abbr recalcula todo; si no, sólo los calculados que dependen de él
+        if not self.formula_engine or not self.formula_controls:
+            return
+        if changed_abbr is not None and not self.formula_engine.afectados(changed_abbr):
+            return
 
-                        # Re-validate this control
-                        self.validate_ranges(ctrl)
-                    except:
-                        pass
+        valores = {}
+        for abbr, src_ctrl in self.inputs_map.items():
+            try:
+                valores[abbr] = float(src_ctrl.value)
+            except (ValueError, TypeError):
+                pass
+
+        for clave, res in self.formula_engine.recalcular(valores, changed_abbr, decimales=2):
+            if res is None:
+                continue
+            ctrl = self.formula_controls[clave]
+            ctrl.value = "{:.2f}".format(res)
+            ctrl.update()
+
+            # Re-validate this control
+            self.validate_ranges(ctrl)
 
     def focus_next(self, e):
         ctrl = e.control
@@ -458,30 +574,37 @@ class ResultadosView(ft.Column):
         except ValueError:
             pass
 
-    def save_all(self, e):
-        if self.is_validated and self.switch_validar.value:
-             if e: # Only show toast if clicked manually, not if called by toggle
-                 self.page_ref.open(ft.SnackBar(ft.Text("Orden Validada. Desbloquee para editar."), bgcolor=ft.Colors.GREY))
-             return
-
+    def collect_updates(self):
         updates = []
         for inp in self.input_controls:
             val = inp['control'].value
             # Save updates
             if val is not None:
                 updates.append({'id': inp['id'], 'valor': val})
+        return updates
+
+    def save_all(self, e):
+        if self.is_validated and self.switch_validar.value:
+             if e: # Only show toast if clicked manually, not if called by toggle
+                 self.page_ref.open(ft.SnackBar(ft.Text("Orden Validada. Desbloquee para editar."), bgcolor=ft.Colors.GREY))
+             return
 
+        updates = self.collect_updates()
         if not updates:
             if e:
                 self.page_ref.open(ft.SnackBar(ft.Text("No hay datos para guardar"), bgcolor=ft.Colors.GREY))
             return
 
-        try:
-            db.update_resultado_batch(updates)
+        orden_id = self.current_orden_id
+
+        def on_result(fila):
+            self.refresh_orden_row(orden_id, fila)
             if e:
                 self.page_ref.open(ft.SnackBar(ft.Text("Resultados guardados y estado actualizado"), bgcolor=ft.Colors.GREEN))
-            # Refresh list (optional, might reset view)
-            # self.load_ordenes()
-        except Exception as ex:
+
+        def on_error(ex):
             print(ex)
             self.page_ref.open(ft.SnackBar(ft.Text("Error al guardar"), bgcolor=ft.Colors.RED))
+
+        escrituras.submit(self.guardar_y_validar, orden_id, updates, None, self.ordenes_filters,
+                          on_result=on_result, on_error=on_error, loading=indicador(self.pb_detalle))
@@ -0,0 +1,186 @@
+import math
+import flet as ft
+
+
+class VirtualList(ft.Container):
+    """
+    Lista virtualizada para filas de alto fijo.
+
+    Sólo existen controles para las filas visibles (más un margen `buffer` arriba y abajo);
+    al hacer scroll las filas que salen por un extremo se re-asignan a los items que entran
+    por el otro y dos espaciadores mantienen el alto total de la lista. Los cambios (set_items, append_items, upsert, remove) se
+    comparan con lo que cada fila ya muestra y sólo se envían al cliente las filas que cambian.
+
+    build_row() -> control vacío de la fila
+    bind_row(row, item) -> rellena el control con los datos del item
+    key(item) -> clave única del item (por defecto item[0], p.ej. el id de la orden)
+    """
+
+    def __init__(self, item_height, build_row, bind_row, key=None, buffer=5, viewport_height=600,
+                 empty_text="Sin resultados.", on_end_reached=None, padding=None, expand=True):
+        super().__init__(expand=expand)
+        self.item_height = item_height
+        self.build_row = build_row
+        self.bind_row = bind_row
+        self.key = key or (lambda item: item[0])
+        self.buffer = buffer
+        self.on_end_reached = on_end_reached
+
+        self.items = []
+        self._positions = {}  # clave -> posición en self.items
+        self._first = 0       # índice del item mostrado en la primera fila visible del pool
+        self._shown = 0       # _first del último render
+        self._base = 0        # el item idx usa la fila (idx - _base) % tamaño del pool
+        self._viewport = viewport_height
+
+        self._rows = []       # pool de filas (Containers de alto fijo)
+        self._bound = []      # item que muestra cada fila del pool (None si está libre)
+        self._top = ft.Container(height=0)
+        self._bottom = ft.Container(height=0)
+        self._empty = ft.Text(empty_text, visible=False)
+
+        self.list_view = ft.ListView(
+            controls=[self._empty, self._top, self._bottom],
+            expand=True,
+            spacing=0,
+            padding=padding,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=50
+        )
+        self.content = self.list_view
+        self._ensure_pool()
+
+    # --- API ---
+
+    def set_items(self, items, reset_scroll=True):
+        """Reemplaza todos los items (p.ej. al cambiar filtros)."""
+        self.items = list(items)
+        self._reindex()
+        if reset_scroll and self._first:
+            self._first = 0
+            if self.page:
+                self.list_view.scroll_to(offset=0)
+        self._render()
+
+    def append_items(self, items):
+        """Agrega items al final (siguiente página)."""
+        start = len(self.items)
+        self.items.extend(items)
+        for i in range(start, len(self.items)):
+            self._positions[self.key(self.items[i])] = i
+        self._render()
+
+    def upsert(self, item, at=0):
+        """Actualiza el item con la misma clave o lo inserta en la posición `at`."""
+        pos = self._positions.get(self.key(item))
+        if pos is not None:
+            self.items[pos] = item
+        else:
+            self.items.insert(at, item)
+            self._reindex()
+        self._render()
+
+    def remove(self, key):
+        pos = self._positions.get(key)
+        if pos is None:
+            return False
+        del self.items[pos]
+        self._reindex()
+        self._render()
+        return True
+
+    def get(self, key):
+        pos = self._positions.get(key)
+        return self.items[pos] if pos is not None else None
+
+    # --- Internals ---
+
+    def _reindex(self):
+        self._positions = {self.key(item): i for i, item in enumerate(self.items)}
+
+    def _pool_size(self):
+        return math.ceil(self._viewport / self.item_height) + 2 * self.buffer
+
+    def _ensure_pool(self):
+        # Devuelve True si se crearon filas nuevas (requiere actualizar el ListView completo)
+        faltan = self._pool_size() - len(self._rows)
+        if faltan <= 0:
+            return False
+        for _ in range(faltan):
+            row = ft.Container(content=self.build_row(), height=self.item_height, visible=False)
+            self._rows.append(row)
+            self._bound.append(None)
+        self.list_view.controls = [self._empty, self._top] + self._rows + [self._bottom]
+        return True
+
+    def _render(self, pool_changed=False):
+        n = len(self.items)
+        pool = len(self._rows)
+        self._first = max(0, min(self._first, n - pool))
+
+        # Anillo: al desplazarse k filas sólo se re-asignan k filas; las demás conservan su
+        # item y sólo cambian de lugar en el ListView. En un salto sin filas en común (o con
+        # un pool nuevo) todas se re-asignan igual, así que se conserva el orden actual.
+        if pool_changed:
+            self._base = self._first
+        elif abs(self._first - self._shown) >= pool:
+            self._base = self._first - (self._shown - self._base) % pool
+        self._shown = self._first
+
+        orden = []
+        changed = []
+        for i in range(pool):
+            idx = self._first + i
+            j = (idx - self._base) % pool
+            row = self._rows[j]
+            orden.append(row)
+            item = self.items[idx] if idx < n else None
+            if item is None:
+                if row.visible:
+                    row.visible = False
+                    self._bound[j] = None
+                    changed.append(row)
+            elif not row.visible or self._bound[j] != item:
+                self.bind_row(row.content, item)
+                row.visible = True
+                self._bound[j] = item
+                changed.append(row)
+
+        actuales = self.list_view.controls[2:2 + pool]
+        reordered = any(a is not b for a, b in zip(orden, actuales))
+        if reordered:
+            self.list_view.controls = [self._empty, self._top] + orden + [self._bottom]
+
+        top = self._first * self.item_height
+        bottom = max(0, n - self._first - pool) * self.item_height
+        if self._top.height != top:
+            self._top.height = top
+            changed.append(self._top)
+        if self._bottom.height != bottom:
+            self._bottom.height = bottom
+            changed.append(self._bottom)
+        if self._empty.visible != (n == 0):
+            self._empty.visible = n == 0
+            changed.append(self._empty)
+
+        if not self.page:
+            return
+        if pool_changed or reordered:
+            # Un solo update del ListView: mueve las filas y envía las que cambiaron
+            self.list_view.update()
+        elif changed:
+            self.page.update(*changed)
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        pool_changed = False
+        if e.viewport_dimension and e.viewport_dimension > self._viewport:
+            self._viewport = e.viewport_dimension
+            pool_changed = self._ensure_pool()
+
+        first = max(0, int(e.pixels // self.item_height) - self.buffer)
+        if first != self._first or pool_changed:
+            self._first = first
+            self._render(pool_changed)
+
+        if self.on_end_reached and e.pixels >= e.max_scroll_extent - self.buffer * self.item_height:
+            self.on_end_reached()